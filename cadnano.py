@@ -42,13 +42,27 @@ def ignoreEnv():
 
 # The global application object used when cadnano is run as a python module
 
+class HeadlessSignal(object):
+    """Stands in for the app signals of CadnanoQt; nothing listens headless."""
+    def connect(self, slot):
+        pass
+    def emit(self, *args):
+        pass
+
 class HeadlessCadnano(object):
     undoGroup = None
+    documentWasCreatedSignal = HeadlessSignal()
     def isInMaya(self):
         return False
     class prefs():
+        honeycombRows = 30
+        honeycombCols = 32
+        honeycombSteps = 2
         squareRows = 50
         squareCols = 50
+        squareSteps = 2
+        lazyOpenMinHelices = 0
+        stapleSortOrder = 0
     def isGui(self):
         return False
 
@@ -280,21 +280,27 @@ def set_oligos_color(color, enableRedo=True):
             oligo.applyColor(color)
     else:
         for oligo in selectedOs:
-            oligo.setColor(color) # setColor does not emit the
-            oligo.oligoAppearanceChangedSignal(oligo)
+            oligo.applyColor(color, useUndoStack=False)
 
 
 def get_oligos_with_color(color):
     """
     Returns the set of oligos that has color <color>.
+    Uses the part's oligo index, see p().oligoIndex().
     """
     if isinstance(color, basestring):
-        util.qtWrapImport('QtCore', globals(), ['QString'])
         if color[0] != "#" and len(color) == 6:
             # Probably forgot to add '#' in #ff00ff:
             color = '#'+color
-        color = QString(color.lower())  # colors should be lower-case
-    return set(oligo for oligo in get_all_oligos() if oligo.color() == color)
+    return p().oligoIndex().oligosWithColor(color)
+
+def get_oligos_with_motif(motif, bothStrands=True):
+    """
+    Returns a list of (oligo, position, isReverse) for every occurrence of
+    the sequence <motif> in an oligo (and of its reverse complement, if
+    bothStrands). Oligos need sequences, see apply_sequence.
+    """
+    return p().oligoIndex().findMotif(motif, bothStrands)
 
 
 def parse_locstring(oligo_locstring):
@@ -314,6 +320,10 @@ def get_oligo_from_locstring(oligo_locstring):
     See also:
         get_strand_from_locstring(locstring)
     """
+    oligo = p().oligoIndex().oligoFromLocString(oligo_locstring)
+    if oligo:
+        return oligo
+    # not a 5' end; look for a strand starting there
     strand = get_strand_from_locstring(oligo_locstring)
     if not strand:
         print "Strand not found: ", strand
@@ -349,34 +359,11 @@ def get_stranditem_for_strand(strand):
     Stranditems are connected to the model strand via a StrandItemController,
     which just connects model strand and model oligo events to strand item slots.
 
-    Hmm... VirtualHelixItem.strandAddedSlot() simply creates a
-        StrandItem(strand, self, self._viewroot)
-    where strand is model strand, self=virtualHelixItem, viewroot is ?
-    but does not save any direct reference to this.
-
-    pitm = w().pathroot.partItemsForPart() -> partItem.
-    vhitm = pitm._virtualHelixItemList, getOrderedVirtualHelixList(), vhItemForVH(vhref)
-
-    vhitem.childItems()
-    """
-    # When a strand is selected, it is REMOVED from vhitem.childItems() ??
-    # When deselected, the strand is included in vhitem.childItems() again ??
-    # StrandItem.PathRootItem.SelectionItemGroup(QGraphicsItemGroup).addToGroup method
-    # strandItem._viewroot.strandItemSelectionGroup().addToGroup(strandItem)
-    #   "Adds the given item and item's child items to this item group.
-    #   The item and child items will be reparented to this group,
-    #   but its position and transformation relative to the scene will stay intact."
-    # So... it is probably this re-parenting which does it.
-    # Which just means that you should grab stranditem from the viewroot.strandItemSelectionGroup() instead.
-    vhitem = vhi(strand.virtualHelix())
-    try:
-        strandItem = next(item for item in vhitem.childItems() if getattr(item, '_modelStrand', None) == strand)
-    except StopIteration:
-        sisg = vhitem.viewroot().strandItemSelectionGroup()
-        strandItem = next((item for item in sisg.childItems() if getattr(item, '_modelStrand', None) == strand), None)
-    # Alternatively, you could search for the strand item in the list of path scene items:
-    # strandItem = next((item for item in pathscene().items() if getattr(item, '_modelStrand', None) == strand), None)
-    return strandItem
+    The path view only keeps StrandItems for strands in or near the viewport
+    (see PartItem._updateVisibleItems), and each VirtualHelixItem maps its
+    model strands to them. Returns None for strands that are out of view.
+    """
+    return vhi(strand.virtualHelix()).strandItemForStrand(strand)
 
 def get_selected_stranditems():
     """
@@ -421,6 +408,18 @@ def getRealItemScenePos(item):
     # mapping to scene produces variable results.
     return vhitem.mapToScene(*linepos)
 
+def getStrandScenePos(strand):
+    """
+    Returns the center of strand in scene space. Computed from the model and
+    its virtualhelixitem, so it works for strands without a StrandItem.
+    """
+    from views import styles
+    vhitem = vhi(strand.virtualHelix())
+    halfbase = styles.PATH_BASE_WIDTH / 2.0
+    xl, y = vhitem.upperLeftCornerOfBase(strand.lowIdx(), strand)
+    xh, y = vhitem.upperLeftCornerOfBase(strand.highIdx(), strand)
+    return vhitem.mapToScene((xl + xh) / 2.0 + halfbase, y + halfbase)
+
 def getViewCenterPos(relativeToItem=None):
     """
     Returns QPointF with the view's center in scene space.
@@ -710,13 +709,14 @@ Old comments:
             print "No strand selected, using last recorded selection:"
             strand = current_follow_strand_tuple[0][0] # either 0 or 1
     # get basic elements:
-    si = get_stranditem_for_strand(strand)
-    root = si.viewroot()      # Root ITEM in the scene. Parent for all other graphics items.
+    # (the strand may have no StrandItem while it is out of view)
+    vhitem = vhi(strand.virtualHelix())
+    root = vhitem.viewroot()      # Root ITEM in the scene. Parent for all other graphics items.
     view = pathview()
 
     # calculate translation:
     viewcenterpos = getViewCenterPos()
-    strandpos = getRealItemScenePos(si)
+    strandpos = getStrandScenePos(strand)
     dx = viewcenterpos.x() - strandpos.x()
     dy = viewcenterpos.y() - strandpos.y()
     # Translate root item (tranlating the view doesn't work, unfortunately...)
@@ -985,6 +985,121 @@ def exportStaplesToFile(filepath=None):
         fd.write(output)
     print "Staple sequences written to file:", filepath
 
+def exportStaplePlatesToFile(filepath=None, plateSize=96, groupByColor=False,
+                             lengthBins=None, fmt='csv'):
+    """
+    Export staples as 96 or 384-well plate layouts, optionally with one
+    set of plates per color and per (low, high) length bin.
+    If filepath is None, will use the current document's filename
+    appended with '.plates.csv' (or '.plates.tsv').
+    """
+    from model.io.plateexport import write_plates, PLATE_96, PLATE_384
+    if filepath is None:
+        filepath = os.path.splitext(get_filename())[0]+'.plates.'+fmt
+    size = PLATE_384 if plateSize == 384 else PLATE_96
+    with open(filepath, 'w') as fd:
+        write_plates(p(), fd, fmt, plateSize=size, groupByColor=groupByColor,
+                     lengthBins=lengthBins)
+    print "Staple plates written to file:", filepath
+
+def exportSVGToFile(filepath=None, showSequences=False):
+    """
+    Export the path view of the current part as SVG, drawn from the model
+    in the path view helix order. If filepath is None, will use the
+    current document's filename with '.svg'.
+    """
+    from model.io.svgexport import write_svg
+    if filepath is None:
+        filepath = os.path.splitext(get_filename())[0]+'.svg'
+    with open(filepath, 'w') as fd:
+        write_svg(p(), fd, pathroot().getSelectedPartOrderedVHList(),
+                  showSequences=showSequences)
+    print "SVG written to file:", filepath
+
+def get_statistics(oligoConc=None, saltConc=None):
+    """
+    Returns the staple statistics report of the current part: staple
+    count, length histogram, GC content and nearest-neighbor melting
+    temperatures (see model.statistics). Concentrations are molar; None
+    uses the defaults in styles.
+    """
+    kwargs = {}
+    if oligoConc is not None:
+        kwargs['oligoConc'] = oligoConc
+    if saltConc is not None:
+        kwargs['saltConc'] = saltConc
+    return p().statistics().report(**kwargs)
+
+def print_statistics():
+    """ Prints a summary of get_statistics. """
+    report = get_statistics()
+    print "%d staples" % report['staples']
+    for name in ('length', 'gc', 'tm'):
+        summary = report[name]
+        if summary:
+            print "%-6s min %.2f  mean %.2f  max %.2f" % \
+                (name, summary['min'], summary['mean'], summary['max'])
+    for low, high, count in report['lengthHistogram']:
+        print "%3d-%-3d %s" % (low, high, '#' * count)
+
+def find_staple_repeats(minLength=12, quiet=False):
+    """
+    Finds runs of at least minLength bases shared by two staples (or
+    repeated in one). Prints and returns them as
+    (oligoA, posA, oligoB, posB, length) tuples.
+    """
+    matches = p().kmerIndex().sharedRepeats(minLength)
+    if not quiet:
+        for oligoA, posA, oligoB, posB, length in matches:
+            print "%s+%d and %s+%d share %d bases" % \
+                (oligoA.locString(), posA, oligoB.locString(), posB, length)
+    return matches
+
+def find_complementary_staples(minLength=10, quiet=False):
+    """
+    Finds staples with at least minLength bases complementary to another
+    staple (or to themselves). Prints and returns them as
+    (oligoA, posA, oligoB, posB, length) tuples.
+    """
+    matches = p().kmerIndex().complementaryStaples(minLength)
+    if not quiet:
+        for oligoA, posA, oligoB, posB, length in matches:
+            print "%s+%d complements %s+%d over %d bases" % \
+                (oligoA.locString(), posA, oligoB.locString(), posB, length)
+    return matches
+
+def find_staples_complementing(seq, minLength=10):
+    """
+    Returns the (oligo, pos, regionPos, length) of staple stretches of at
+    least minLength bases complementary to seq[regionPos:regionPos+length].
+    """
+    return p().kmerIndex().complementsOf(seq, minLength)
+
+def diff_with_file(filepath=None, quiet=False):
+    """
+    Structural diff from the design in filepath to the current part, see
+    model.designdiff. If filepath is None, will use the current document's
+    file, listing the unsaved changes.
+    Prints the differences unless quiet, and returns the DesignDiff.
+    """
+    from model.designdiff import diff_designs
+    if filepath is None:
+        filepath = get_filename()
+    diff = diff_designs(filepath, p())
+    if not quiet:
+        for line in diff.lines():
+            print line
+    return diff
+
+def diff_files(filepath_a, filepath_b, quiet=False):
+    """ Structural diff between two design files, as diff_with_file. """
+    from model.designdiff import diff_designs
+    diff = diff_designs(filepath_a, filepath_b)
+    if not quiet:
+        for line in diff.lines():
+            print line
+    return diff
+
 
 
 ### Other ###
@@ -1012,7 +1127,7 @@ def get_doctitle():
 
 def open_document(filepath=None):
     if filepath:
-        dc().openAfterMaybeSaveCallback(filepath)
+        dc().openAfterMaybeSaveCallback(filepath, inBackground=False)
     else:
         #dc().openAfterMaybeSave()
         dc().actionOpenSlot()
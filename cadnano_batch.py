@@ -0,0 +1,339 @@
+# The MIT License
+#
+# Copyright (c) 2011 Wyss Institute at Harvard University
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# http://www.opensource.org/licenses/mit-license.php
+
+"""
+cadnano_batch
+Headless batch conversion of caDNAno designs.
+
+Each job opens one design, runs a list of operations on it and writes the
+requested outputs. Jobs are spread over a multiprocessing pool; every
+worker process has its own headless cadnano app, since cadnano.app() is a
+per-process singleton. Results are plain dicts with per-operation timings
+and the error of a failed job, so they can be pickled back to the caller.
+
+Operations are tuples:
+    ('sequence', name, vhNum, idx)  apply a scaffold sequence; name is a key
+                                    of data.dnasequences, a sequence or a
+                                    file path, and
+                                    vhNum/idx pick the scaffold strand (None
+                                    uses the first scaffold oligo)
+    ('autostaple',)                 run autostaple
+    ('autobreak', minLegLen, minLen, maxLen)
+                                    break staples with the autobreak plugin
+                                    (all arguments optional)
+    ('csv', path)                   export staple sequences
+    ('plates', path, plateSize)     export 96 or 384-well plate layouts
+    ('stats', path)                 write staple length, GC content and
+                                    melting temperature statistics as JSON
+    ('json', path)                  save as legacy JSON
+    ('binary', path)                save in the binary format
+An output path of None writes next to the input design.
+
+Example:
+    python cadnano_batch.py -j 4 --sequence p7560 --autostaple --csv *.json
+"""
+
+import os
+import sys
+import time
+import traceback
+from StringIO import StringIO
+from multiprocessing import Pool, cpu_count
+from optparse import OptionParser
+
+sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)))
+
+# default output suffixes, replacing the extension of the input design
+OUTPUT_SUFFIXES = {'csv': '.staples.csv',
+                   'plates': '.plates.csv',
+                   'stats': '.stats.json',
+                   'json': '.converted.json',
+                   'binary': '.cn2b'}
+
+
+def init_worker():
+    """Pool initializer: gives the worker process its own headless app."""
+    import cadnano
+    cadnano.initAppWithoutGui([])
+# end def
+
+def run_job(job):
+    """
+    Runs one (inputPath, operations) job in the current process and returns
+    a result dict with keys input, ok, error, traceback, timings (a list of
+    (operation, seconds)), outputs, seconds and pid.
+    """
+    inputPath, operations = job
+    result = {'input': inputPath, 'ok': False, 'error': None,
+              'traceback': None, 'timings': [], 'outputs': [],
+              'seconds': 0.0, 'pid': os.getpid()}
+    jobStart = time.time()
+    try:
+        start = time.time()
+        document = open_design(inputPath)
+        result['timings'].append(('open', time.time() - start))
+        for op in operations:
+            start = time.time()
+            output = run_operation(document, inputPath, op)
+            if output != None:
+                result['outputs'].append(output)
+            result['timings'].append((op[0], time.time() - start))
+        result['ok'] = True
+    except Exception, e:
+        result['error'] = "%s: %s" % (e.__class__.__name__, e)
+        result['traceback'] = traceback.format_exc()
+    result['seconds'] = time.time() - jobStart
+    return result
+# end def
+
+def open_design(inputPath):
+    """Decodes a legacy JSON or binary design file into a new Document."""
+    with open(inputPath, 'rb') as f:
+        return open_design_data(f.read(), inputPath)
+# end def
+
+def open_design_data(data, name="design"):
+    """Decodes legacy JSON or binary design data into a new Document."""
+    from model.document import Document
+    from model.io.decoder import decode
+    document = Document()
+    decode(document, data)
+    if document.selectedPart() == None:
+        raise ValueError("No part found in %s" % name)
+    return document
+# end def
+
+def helix_order(part):
+    """Helix order to save part in: the file order, else by number."""
+    order = part.importedVHelixOrder()
+    if order:
+        return [coord for coord in order if part.hasVirtualHelixAtCoord(coord)]
+    helices = sorted(part.getVirtualHelices(), key=lambda vh: vh.number())
+    return [vh.coord() for vh in helices]
+# end def
+
+def run_operation(document, inputPath, op):
+    """Runs op on document; returns the path written, if any."""
+    name = op[0]
+    if edit_design(document, op):
+        return None
+    if name not in OUTPUT_SUFFIXES:
+        raise ValueError("Unknown operation %r" % (name,))
+    path = op[1] if len(op) > 1 and op[1] else \
+           os.path.splitext(inputPath)[0] + OUTPUT_SUFFIXES[name]
+    if name == 'json' and os.path.abspath(path) == os.path.abspath(inputPath):
+        raise ValueError("Refusing to overwrite the input design %s" % path)
+    with open(path, 'wb' if name == 'binary' else 'w') as f:
+        plateSize = op[2] if name == 'plates' and len(op) > 2 else 96
+        write_output(document, name, f, plateSize)
+    return path
+# end def
+
+def edit_design(document, op):
+    """
+    Runs op if it is an editing operation ('sequence', 'autostaple' or
+    'autobreak') and returns True, else returns False.
+    """
+    part = document.selectedPart()
+    name = op[0]
+    if name == 'sequence':
+        apply_scaffold_sequence(part, *op[1:])
+    elif name == 'autostaple':
+        part.autoStaple()
+    elif name == 'autobreak':
+        autobreak_staples(part, *op[1:])
+    else:
+        return False
+    return True
+# end def
+
+def write_output(document, name, f, plateSize=96):
+    """Writes document to the file object f as 'csv', 'plates', 'stats',
+    'json' or 'binary'; f needs a name attribute for the design formats."""
+    part = document.selectedPart()
+    if name == 'csv':
+        part.writeStapleSequences(f)
+    elif name == 'plates':
+        from model.io.plateexport import write_plates, PLATE_96, PLATE_384
+        write_plates(part, f, plateSize=PLATE_384 if plateSize == 384 \
+                                                       else PLATE_96)
+    elif name == 'stats':
+        import json
+        json.dump(part.statistics().report(), f, indent=1)
+    elif name == 'json':
+        from model.io.encoder import encode
+        encode(document, helix_order(part), f)
+    elif name == 'binary':
+        from model.io.binaryencoder import encode_binary
+        encode_binary(document, helix_order(part), f)
+    else:
+        raise ValueError("Unknown output format %r" % (name,))
+# end def
+
+def process_design_data(data, operations, outputFormat='json',
+                        plateSize=96, name="design"):
+    """
+    Decodes design data, runs the editing operations on it and returns the
+    result in outputFormat (see write_output) as a string. Used by
+    cadnano_server to run requests on its process pool.
+    """
+    document = open_design_data(data, name)
+    for op in operations:
+        if not edit_design(document, op):
+            raise ValueError("Not an editing operation: %r" % (op[0],))
+    f = StringIO()
+    f.name = name  # the design formats store the file name
+    write_output(document, outputFormat, f, plateSize)
+    return f.getvalue()
+# end def
+
+def apply_scaffold_sequence(part, seqName, vhNum=None, idx=None):
+    """
+    Applies a named sequence (see data.dnasequences) or the contents of a
+    sequence file to the scaffold oligo at vhNum[idx], or to the first
+    scaffold oligo if vhNum is None.
+    """
+    seq = lookup_sequence(seqName)
+    if vhNum == None:
+        oligo = next(o for o in part.oligos() if not o.isStaple())
+    else:
+        strand = part.virtualHelix(vhNum).scaffoldStrandSet().getStrand(idx)
+        if strand == None:
+            raise ValueError("No scaffold strand at %d[%d]" % (vhNum, idx))
+        oligo = strand.oligo()
+    oligo.applySequence(seq, useUndoStack=False)
+# end def
+
+def lookup_sequence(seqName, allowFiles=True):
+    """
+    Returns the bases of a named sequence (see data.dnasequences), of
+    seqName itself if it is made of bases, or of the sequence file seqName
+    when allowFiles is set. Raises ValueError otherwise.
+    """
+    from data.dnasequences import sequences
+    if seqName in sequences:
+        return sequences[seqName]
+    elif _isSequence(seqName):
+        return seqName
+    elif not allowFiles:
+        raise ValueError("Unknown sequence %r" % seqName)
+    with open(seqName) as f:
+        return ''.join(f.read().split())
+# end def
+
+def _isSequence(text):
+    return len(text) > 0 and not text.strip('ACGTNacgtn')
+# end def
+
+def autobreak_staples(part, minStapleLegLen=3, minStapleLen=30,
+                      maxStapleLen=60):
+    """Breaks the staples of part with the autobreak plugin."""
+    autobreakPath = os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                                 'plugins', 'autobreak')
+    if autobreakPath not in sys.path:
+        # the plugin package itself sets up GUI actions, so only its
+        # autobreak module is imported
+        sys.path.insert(0, autobreakPath)
+    import autobreak
+    settings = {'stapleScorer': autobreak.tgtLengthStapleScorer,
+                'minStapleLegLen': minStapleLegLen,
+                'minStapleLen': minStapleLen,
+                'maxStapleLen': maxStapleLen}
+    autobreak.breakStaples(part, settings)
+# end def
+
+def run_batch(jobs, processes=None, isolateJobs=False):
+    """
+    Runs (inputPath, operations) jobs over a pool of processes (default:
+    one per CPU) and returns their result dicts in job order. With
+    isolateJobs, every job gets a fresh worker process.
+    """
+    if processes == None:
+        processes = min(cpu_count(), len(jobs)) or 1
+    pool = Pool(processes, initializer=init_worker,
+                maxtasksperchild=1 if isolateJobs else None)
+    try:
+        results = pool.map(run_job, jobs, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+    return results
+# end def
+
+def main(argv=None):
+    parser = OptionParser(usage="%prog [options] design.json ...")
+    parser.add_option("-j", "--jobs", type="int", default=None,
+                      help="number of worker processes (default: CPUs)")
+    parser.add_option("--sequence", metavar="NAME",
+                      help="apply a scaffold sequence by name or file")
+    parser.add_option("--autostaple", action="store_true")
+    parser.add_option("--autobreak", action="store_true")
+    parser.add_option("--csv", action="store_true",
+                      help="export staple sequences")
+    parser.add_option("--plates", type="int", metavar="96|384",
+                      help="export staple plate layouts")
+    parser.add_option("--stats", action="store_true",
+                      help="write staple statistics as JSON")
+    parser.add_option("--json", action="store_true",
+                      help="save as legacy JSON")
+    parser.add_option("--binary", action="store_true",
+                      help="save in the binary format")
+    parser.add_option("--isolate", action="store_true",
+                      help="use a fresh process for every design")
+    options, paths = parser.parse_args(argv)
+    if not paths:
+        parser.error("no designs given")
+    operations = []
+    if options.sequence:
+        operations.append(('sequence', options.sequence, None, None))
+    if options.autostaple:
+        operations.append(('autostaple',))
+    if options.autobreak:
+        operations.append(('autobreak',))
+    if options.csv:
+        operations.append(('csv', None))
+    if options.plates:
+        operations.append(('plates', None, options.plates))
+    if options.stats:
+        operations.append(('stats', None))
+    if options.json:
+        operations.append(('json', None))
+    if options.binary:
+        operations.append(('binary', None))
+    results = run_batch([(path, operations) for path in paths],
+                        options.jobs, options.isolate)
+    numFailed = 0
+    for result in results:
+        timings = ' '.join(["%s=%.3fs" % t for t in result['timings']])
+        if result['ok']:
+            print "ok     %s (%.3fs) %s" % (result['input'],
+                                           result['seconds'], timings)
+        else:
+            numFailed += 1
+            print "FAILED %s: %s" % (result['input'], result['error'])
+    return 1 if numFailed else 0
+# end def
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,71 @@
+# The MIT License
+#
+# Copyright (c) 2011 Wyss Institute at Harvard University
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# http://www.opensource.org/licenses/mit-license.php
+
+"""
+cadnano_diff
+Structural diff of two caDNAno designs (legacy JSON or binary), listing
+added, removed and resized strands, changed crossovers, insertions and
+recolored oligos. Helices are matched by lattice coordinate; see
+model.designdiff.
+
+The exit status is 0 if the designs are the same, 1 if they differ and 2
+on error, as for diff.
+
+Example:
+    python cadnano_diff.py Nature09_monolith.json Nature09_monolith_v2.json
+"""
+
+import json
+import os
+import sys
+from optparse import OptionParser
+
+sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)))
+
+
+def main(argv=None):
+    parser = OptionParser(usage="%prog [options] old-design new-design")
+    parser.add_option("--json", action="store_true",
+                      help="print the diff as JSON")
+    parser.add_option("-q", "--quiet", action="store_true",
+                      help="only set the exit status")
+    options, paths = parser.parse_args(argv)
+    if len(paths) != 2:
+        parser.error("two designs are needed")
+    from model.designdiff import diff_designs
+    try:
+        diff = diff_designs(paths[0], paths[1])
+    except (IOError, ValueError, KeyError) as e:
+        sys.stderr.write("cadnano_diff: %s\n" % e)
+        return 2
+    if options.json:
+        print json.dumps(diff.asDict())
+    elif not options.quiet:
+        for line in diff.lines():
+            print line
+    return 0 if diff.isEmpty() else 1
+# end def
+
+if __name__ == '__main__':
+    sys.exit(main())
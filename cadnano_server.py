@@ -0,0 +1,457 @@
+# The MIT License
+#
+# Copyright (c) 2011 Wyss Institute at Harvard University
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# http://www.opensource.org/licenses/mit-license.php
+
+"""
+cadnano_server
+A local JSON-RPC 2.0 server that keeps a warm headless cadnano app, so
+other tools can use the model without starting a Python process per call.
+
+Requests and responses are single lines of JSON over a TCP socket bound to
+localhost or over a Unix socket. Designs are referred to by the SHA-1 of
+their file contents; load returns it, and every editing method returns
+the hash of the edited design, which is cached alongside the original in
+the binary format.
+The most recently used designs are kept, both as file data and, once
+queried, as a decoded Document.
+
+This runs on Python 2, which has no asyncio: each connection gets a
+SocketServer thread, all model access in the server process is serialized
+by a lock, and the CPU-heavy methods (editing and exports) are handed to a
+multiprocessing pool whose workers each run their own headless app.
+
+Methods:
+    ping()
+    load(content=None, path=None, encoding=None) -> {design, name, helices}
+        content is legacy JSON, or base64 design data with encoding
+        'base64'; path names a .json or .cn2b design file under the
+        server's --root directory
+    applySequence(design, sequence, vhNum=None, idx=None) -> {design}
+        sequence is a name from data.dnasequences or the bases themselves
+    autostaple(design) -> {design}
+    autobreak(design, minStapleLegLen=3, minStapleLen=30, maxStapleLen=60)
+        -> {design}
+    export(design, format='csv', plateSize=96) -> {data, encoding}
+        format is one of csv, plates, json or binary (base64 encoded)
+    query(design, what='summary') -> summary dict, or the staple export
+        rows for what='staples'
+
+Example:
+    python cadnano_server.py --port 7411 -j 4 --root ~/designs
+    echo '{"jsonrpc": "2.0", "id": 1, "method": "ping"}' | nc localhost 7411
+"""
+
+import base64
+import hashlib
+import inspect
+import json
+import os
+import socket
+import sys
+import threading
+from collections import OrderedDict
+from multiprocessing import Pool
+from optparse import OptionParser
+import SocketServer
+
+sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)))
+
+import cadnano_batch
+
+DEFAULT_PORT = 7411
+DEFAULT_CACHE_SIZE = 32  # designs
+DESIGN_SUFFIXES = ('.json', '.cn2b')  # the files load(path=...) will read
+
+# JSON-RPC 2.0 error codes
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+SERVER_ERROR = -32000
+
+
+class RpcError(Exception):
+    def __init__(self, code, message):
+        Exception.__init__(self, message)
+        self.code = code
+        self.message = message
+# end class
+
+
+class DesignCache(object):
+    """
+    LRU cache of design file data keyed by content hash. The decoded
+    Document of a design is kept with its data once it is asked for, and
+    dropped with it.
+    """
+    def __init__(self, maxDesigns=DEFAULT_CACHE_SIZE):
+        self._maxDesigns = maxDesigns
+        self._entries = OrderedDict()  # hash -> [data, document or None]
+    # end def
+
+    def __len__(self):
+        return len(self._entries)
+    # end def
+
+    def __contains__(self, key):
+        return key in self._entries
+    # end def
+
+    def add(self, data):
+        """Adds design data and returns its hash."""
+        key = hashlib.sha1(data).hexdigest()
+        entry = self._entries.pop(key, None) or [data, None]
+        self._entries[key] = entry
+        while len(self._entries) > self._maxDesigns:
+            self._entries.popitem(last=False)
+        return key
+    # end def
+
+    def data(self, key):
+        return self._entry(key)[0]
+    # end def
+
+    def document(self, key):
+        """The decoded Document of design key, decoding it if needed."""
+        entry = self._entry(key)
+        if entry[1] == None:
+            entry[1] = cadnano_batch.open_design_data(entry[0], key)
+        return entry[1]
+    # end def
+
+    def _entry(self, key):
+        try:
+            entry = self._entries.pop(key)
+        except KeyError:
+            raise RpcError(SERVER_ERROR, "Unknown design %s" % key)
+        self._entries[key] = entry  # most recently used
+        return entry
+    # end def
+# end class
+
+
+class DesignService(object):
+    """
+    The RPC methods. processes is the size of the worker pool; 0 runs the
+    heavy methods in the server process instead. root is the directory
+    load(path=...) may read designs from; None refuses paths altogether.
+    """
+    _methods = ('ping', 'load', 'applySequence', 'autostaple', 'autobreak',
+                'export', 'query')
+
+    def __init__(self, processes=None, maxDesigns=DEFAULT_CACHE_SIZE,
+                 root=None):
+        self._cache = DesignCache(maxDesigns)
+        self._root = os.path.realpath(root) if root != None else None
+        self._lock = threading.Lock()  # guards the cache and the model
+        self._pool = None
+        if processes != 0:
+            self._pool = Pool(processes, initializer=cadnano_batch.init_worker)
+    # end def
+
+    def close(self):
+        if self._pool != None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+    # end def
+
+    def dispatch(self, method, params):
+        if method not in self._methods:
+            raise RpcError(METHOD_NOT_FOUND, "Method not found: %s" % method)
+        if isinstance(params, list):
+            args, kwargs = params, {}
+        elif isinstance(params, dict):
+            args, kwargs = [], dict((str(k), v) for k, v in params.items())
+        else:
+            raise RpcError(INVALID_PARAMS, "params must be a list or object")
+        function = getattr(self, method)
+        try:
+            inspect.getcallargs(function, *args, **kwargs)
+        except TypeError, e:  # the params do not fit the method
+            raise RpcError(INVALID_PARAMS, str(e))
+        try:
+            return function(*args, **kwargs)
+        except RpcError:
+            raise
+        except Exception, e:
+            raise RpcError(INTERNAL_ERROR, "%s: %s" % (e.__class__.__name__, e))
+    # end def
+
+    ### RPC METHODS ###
+    def ping(self):
+        return "pong"
+    # end def
+
+    def load(self, content=None, path=None, encoding=None):
+        if path != None:
+            with open(self._designPath(path), 'rb') as f:
+                data = f.read()
+        elif content != None:
+            data = base64.b64decode(content) if encoding == 'base64' \
+                                             else content.encode('utf-8')
+        else:
+            raise RpcError(INVALID_PARAMS, "load needs content or path")
+        with self._lock:
+            key = self._cache.add(data)
+            part = self._cache.document(key).selectedPart()
+            return {'design': key,
+                    'helices': part.numberOfVirtualHelices(),
+                    'name': os.path.basename(path) if path else None}
+    # end def
+
+    def applySequence(self, design, sequence, vhNum=None, idx=None):
+        try:
+            # resolved here, so a client cannot make a worker read a file
+            sequence = cadnano_batch.lookup_sequence(sequence,
+                                                     allowFiles=False)
+        except ValueError, e:
+            raise RpcError(INVALID_PARAMS, str(e))
+        return self._edit(design, ('sequence', sequence, vhNum, idx))
+    # end def
+
+    def autostaple(self, design):
+        return self._edit(design, ('autostaple',))
+    # end def
+
+    def autobreak(self, design, minStapleLegLen=3, minStapleLen=30,
+                  maxStapleLen=60):
+        return self._edit(design, ('autobreak', minStapleLegLen,
+                                   minStapleLen, maxStapleLen))
+    # end def
+
+    def export(self, design, format='csv', plateSize=96):
+        if format not in cadnano_batch.OUTPUT_SUFFIXES:
+            raise RpcError(INVALID_PARAMS, "Unknown format %r" % format)
+        data = self._process(design, [], format, plateSize)
+        if format == 'binary':
+            return {'data': base64.b64encode(data), 'encoding': 'base64'}
+        return {'data': data, 'encoding': None}
+    # end def
+
+    def query(self, design, what='summary'):
+        with self._lock:
+            part = self._cache.document(design).selectedPart()
+            if what == 'staples':
+                # the color is a QString, which json cannot encode
+                return [list(row[:-1]) + [str(row[-1])] \
+                                    for row in part.iterStapleExportRows()]
+            elif what == 'summary':
+                oligos = list(part.oligos())
+                staples = [o for o in oligos if o.isStaple()]
+                return {'helices': part.numberOfVirtualHelices(),
+                        'bases': part.maxBaseIdx() + 1,
+                        'staples': len(staples),
+                        'scaffolds': len(oligos) - len(staples),
+                        'stapleLoops': len(part.getStapleLoopOligos())}
+            raise RpcError(INVALID_PARAMS, "Unknown query %r" % what)
+    # end def
+
+    ### PRIVATE SUPPORT METHODS ###
+    def _designPath(self, path):
+        """Returns path resolved under the root, or raises RpcError."""
+        if self._root == None:
+            raise RpcError(INVALID_PARAMS, "Loading by path is disabled")
+        fullPath = os.path.realpath(os.path.join(self._root, path))
+        if not fullPath.startswith(os.path.join(self._root, '')):
+            raise RpcError(INVALID_PARAMS, "Path is outside the server root")
+        if os.path.splitext(fullPath)[1].lower() not in DESIGN_SUFFIXES:
+            raise RpcError(INVALID_PARAMS, "Not a design file: %s" % path)
+        return fullPath
+    # end def
+
+    def _edit(self, design, op):
+        # the binary format keeps applied sequences, legacy JSON does not
+        data = self._process(design, [op], 'binary')
+        with self._lock:
+            return {'design': self._cache.add(data)}
+    # end def
+
+    def _process(self, design, operations, outputFormat, plateSize=96):
+        with self._lock:
+            data = self._cache.data(design)
+        args = (data, operations, outputFormat, plateSize, design)
+        try:
+            if self._pool == None:
+                with self._lock:
+                    return cadnano_batch.process_design_data(*args)
+            return self._pool.apply(cadnano_batch.process_design_data, args)
+        except RpcError:
+            raise
+        except Exception, e:
+            raise RpcError(SERVER_ERROR, "%s: %s" % (e.__class__.__name__, e))
+    # end def
+# end class
+
+
+def handle_request(service, request):
+    """Returns the JSON-RPC response dict for a request, or None for a
+    notification."""
+    reqId = None
+    try:
+        if not isinstance(request, dict) or 'method' not in request:
+            raise RpcError(INVALID_REQUEST, "Invalid request")
+        reqId = request.get('id')
+        result = service.dispatch(request['method'], request.get('params', {}))
+        response = {'jsonrpc': '2.0', 'id': reqId, 'result': result}
+    except RpcError, e:
+        response = {'jsonrpc': '2.0', 'id': reqId,
+                    'error': {'code': e.code, 'message': e.message}}
+    except Exception, e:
+        response = {'jsonrpc': '2.0', 'id': reqId,
+                    'error': {'code': SERVER_ERROR,
+                              'message': "%s: %s" % (e.__class__.__name__, e)}}
+    if isinstance(request, dict) and 'id' not in request:
+        return None  # notification
+    return response
+# end def
+
+
+def encode_response(response):
+    """
+    Returns response, or a batch of them, as JSON. A result json cannot
+    encode becomes an internal error, so the client still gets an answer.
+    """
+    if isinstance(response, list):
+        return '[%s]' % ', '.join(encode_response(r) for r in response)
+    try:
+        return json.dumps(response)
+    except (TypeError, ValueError), e:
+        message = "Unserializable result: %s" % e
+        return json.dumps({'jsonrpc': '2.0', 'id': response.get('id'),
+                           'error': {'code': INTERNAL_ERROR,
+                                     'message': message}})
+# end def
+
+
+class RpcRequestHandler(SocketServer.StreamRequestHandler):
+    """Answers newline-delimited JSON-RPC requests until the peer closes."""
+    def handle(self):
+        service = self.server.service
+        for line in iter(self.rfile.readline, ''):
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+            except ValueError:
+                response = {'jsonrpc': '2.0', 'id': None,
+                            'error': {'code': PARSE_ERROR,
+                                      'message': "Parse error"}}
+            else:
+                if isinstance(request, list):  # batch
+                    response = [r for r in (handle_request(service, req) \
+                                            for req in request) if r != None]
+                else:
+                    response = handle_request(service, request)
+            if response:
+                self.wfile.write(encode_response(response) + '\n')
+                self.wfile.flush()
+    # end def
+# end class
+
+
+class RpcTCPServer(SocketServer.ThreadingMixIn, SocketServer.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+# end class
+
+
+if hasattr(SocketServer, 'UnixStreamServer'):
+    class RpcUnixServer(SocketServer.ThreadingMixIn,
+                        SocketServer.UnixStreamServer):
+        daemon_threads = True
+    # end class
+
+
+def make_server(service, port=DEFAULT_PORT, unixPath=None):
+    """
+    Returns a server for service on localhost:port (port 0 picks a free
+    one, see server.server_address) or on the Unix socket unixPath.
+    """
+    if unixPath != None:
+        if os.path.exists(unixPath):
+            os.remove(unixPath)
+        server = RpcUnixServer(unixPath, RpcRequestHandler)
+    else:
+        server = RpcTCPServer(('127.0.0.1', port), RpcRequestHandler)
+    server.service = service
+    return server
+# end def
+
+
+def call(address, method, **params):
+    """
+    Minimal client: sends one request to address, a (host, port) tuple or
+    a Unix socket path, and returns its result or raises RpcError.
+    """
+    if isinstance(address, tuple):
+        sock = socket.create_connection(address)
+    else:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(address)
+    try:
+        f = sock.makefile('rwb')
+        f.write(json.dumps({'jsonrpc': '2.0', 'id': 1, 'method': method,
+                            'params': params}) + '\n')
+        f.flush()
+        response = json.loads(f.readline())
+        f.close()
+    finally:
+        sock.close()
+    if 'error' in response:
+        raise RpcError(response['error']['code'], response['error']['message'])
+    return response['result']
+# end def
+
+
+def main(argv=None):
+    parser = OptionParser(usage="%prog [options]")
+    parser.add_option("--port", type="int", default=DEFAULT_PORT,
+                      help="localhost TCP port (default %d)" % DEFAULT_PORT)
+    parser.add_option("--unix", metavar="PATH",
+                      help="listen on a Unix socket instead")
+    parser.add_option("-j", "--jobs", type="int", default=None,
+                      help="worker processes, 0 for none (default: CPUs)")
+    parser.add_option("--cache", type="int", default=DEFAULT_CACHE_SIZE,
+                      help="designs to keep cached")
+    parser.add_option("--root", metavar="DIR",
+                      help="directory load(path=...) may read designs from "
+                           "(default: loading by path is disabled)")
+    options, args = parser.parse_args(argv)
+    cadnano_batch.init_worker()  # the warm app of the server process
+    service = DesignService(options.jobs, options.cache, options.root)
+    server = make_server(service, options.port, options.unix)
+    print "cadnano server listening on", server.server_address
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+    return 0
+# end def
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,253 @@
+# The MIT License
+#
+# Copyright (c) 2011 Wyss Institute at Harvard University
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# http://www.opensource.org/licenses/mit-license.php
+
+"""
+autosavecontroller
+Watches the undo stack of a DocumentController and keeps an autosave
+journal (see model.io.journal) next to its file. Journal records are small
+and appended on the GUI thread; full snapshots are taken there with
+snapshotDesign but written by a SaveWorker.
+"""
+
+import itertools
+import os
+import tempfile
+
+from controllers.fileworkers import SaveWorker
+from model.contenthash import collect_command_helices
+from model.io.encoder import snapshotDesign
+from model.io.journal import journal_record, append_journal_record, \
+                             journal_paths, start_journal, has_snapshot, \
+                             has_recovery, recover_legacy_dict, \
+                             discard_journal, untitled_filename, \
+                             orphaned_untitled_journals, move_journal
+from views import styles
+import util
+
+util.qtWrapImport('QtCore', globals(), ['QCoreApplication', 'QTimer'])
+
+
+class AutosaveController(object):
+    _untitledSerials = itertools.count()  # per process, for the journal name
+
+    def __init__(self, documentController):
+        self._docCtrlr = documentController
+        self._untitledFilename = untitled_filename(tempfile.gettempdir(),
+                                    os.getpid(), self._untitledSerials.next())
+        self._lastIndex = 0
+        self._dirtyHelices = set()
+        self._descs = []
+        self._needsSnapshot = False
+        self._numRecords = 0
+        self._snapshotWorker = None  # SaveWorker writing a snapshot
+        self._snapshotFilename = None  # the journal it is written for
+        self._timer = QTimer()
+        self._timer.timeout.connect(self.flush)
+        self._timer.start(styles.AUTOSAVE_INTERVAL_MS)
+        documentController.undoStack().indexChanged.connect(
+                                            self.undoStackIndexChangedSlot)
+    # end def
+
+    ### SLOTS ###
+    def undoStackIndexChangedSlot(self, index):
+        """
+        Collects the helices referenced by every command that was done or
+        undone since the last index change.
+        """
+        undoStack = self._docCtrlr.undoStack()
+        for i in xrange(min(index, self._lastIndex), max(index, self._lastIndex)):
+            command = undoStack.command(i)
+            if command == None:  # the stack was cleared
+                self._needsSnapshot = True
+                continue
+            self._descs.append(unicode(command.text()))
+            if collect_command_helices(command, self._dirtyHelices):
+                self._needsSnapshot = True
+        self._lastIndex = index
+    # end def
+
+    ### PUBLIC METHODS ###
+    def journalFilename(self):
+        """
+        The design file the journal belongs to. Untitled documents get a
+        name of their own in the temp directory.
+        """
+        if self._docCtrlr._hasNoAssociatedFile:
+            return self._untitledFilename
+        return str(self._docCtrlr.filename())
+    # end def
+
+    def orphanedJournals(self):
+        """Untitled journals left behind by sessions that are not running."""
+        return orphaned_untitled_journals(tempfile.gettempdir())
+    # end def
+
+    def adopt(self, filename):
+        """
+        Takes over the journal of filename after it was recovered into
+        this document, so later records are appended on top of it.
+        """
+        self._stopSnapshot()
+        if filename != self.journalFilename():
+            move_journal(filename, self.journalFilename())
+        self._lastIndex = self._docCtrlr.undoStack().index()
+    # end def
+
+    def flush(self):
+        """
+        Appends a journal record for the pending edits, if any, or starts
+        writing a snapshot. Edits made while a snapshot is being written
+        stay pending until it is on disk.
+        """
+        document = self._docCtrlr.document()
+        part = document.selectedPart()
+        if not (self._dirtyHelices or self._needsSnapshot):
+            return
+        if part == None:
+            self.discard()
+            return
+        if self._snapshotWorker != None:
+            return
+        filename = self.journalFilename()
+        if self._needsSnapshot or not self._hasBase(filename) or \
+                self._numRecords >= styles.AUTOSAVE_RECORDS_PER_SNAPSHOT:
+            helixOrderList = self._docCtrlr.win.pathroot.getSelectedPartOrderedVHList()
+            self._startSnapshot(snapshotDesign(document, helixOrderList),
+                                filename)
+        else:
+            helices, removed = [], []
+            for vh in self._dirtyHelices:
+                if part.virtualHelixAtCoord(vh.coord()) is vh:
+                    helices.append(vh)
+                else:
+                    removed.append(list(vh.coord()))
+            desc = "; ".join(self._descs)
+            record = journal_record(part, desc, helices, removed)
+            try:
+                append_journal_record(filename, record)
+            except (IOError, OSError), e:
+                self._showError("Autosave failed: %s" % e)
+                return
+            self._numRecords += 1
+        self._dirtyHelices.clear()
+        self._descs = []
+        self._needsSnapshot = False
+    # end def
+
+    def waitForSnapshot(self):
+        """Blocks until the snapshot being written, if any, is finished."""
+        worker = self._snapshotWorker
+        if worker != None:
+            worker.wait()
+            QCoreApplication.processEvents()  # deliver its signals
+    # end def
+
+    def reset(self):
+        """
+        Called after a document is opened or saved: the file on disk is now
+        the base of the journal.
+        """
+        self._lastIndex = self._docCtrlr.undoStack().index()
+        self._dirtyHelices.clear()
+        self._descs = []
+        self._needsSnapshot = False
+        self._numRecords = 0
+        self.discard()
+    # end def
+
+    def discard(self, filename=None):
+        """Deletes the journal of filename, by default our own."""
+        self._stopSnapshot()
+        discard_journal(filename if filename else self.journalFilename())
+    # end def
+
+    def hasRecovery(self, filename):
+        return has_recovery(filename)
+    # end def
+
+    def recoveredDesign(self, filename):
+        """Legacy JSON dict of filename with its journal replayed."""
+        return recover_legacy_dict(filename)
+    # end def
+
+    ### PRIVATE SUPPORT METHODS ###
+    def _startSnapshot(self, snapshot, filename):
+        """Writes a snapshotDesign list for the journal of filename."""
+        worker = SaveWorker(journal_paths(filename)[1], snapshot)
+        worker.savedSignal.connect(
+                        lambda path: self._snapshotSavedSlot(worker))
+        worker.failedSignal.connect(
+                        lambda message: self._snapshotFailedSlot(worker,
+                                                                 message))
+        self._snapshotWorker = worker
+        self._snapshotFilename = filename
+        worker.start()
+    # end def
+
+    def _snapshotSavedSlot(self, worker):
+        """The snapshot is on disk: start a new, empty journal on it."""
+        if worker is not self._snapshotWorker:
+            return  # stopped by discard or adopt
+        self._snapshotWorker = None
+        try:
+            start_journal(self._snapshotFilename)
+        except (IOError, OSError), e:
+            self._needsSnapshot = True
+            self._showError("Autosave failed: %s" % e)
+            return
+        self._numRecords = 0
+    # end def
+
+    def _snapshotFailedSlot(self, worker, message):
+        if worker is not self._snapshotWorker:
+            return
+        self._snapshotWorker = None
+        self._needsSnapshot = True  # try again at the next flush
+        self._showError("Autosave failed: %s" % message)
+    # end def
+
+    def _stopSnapshot(self):
+        """Cancels the snapshot being written and waits for its worker."""
+        worker = self._snapshotWorker
+        if worker != None:
+            self._snapshotWorker = None
+            worker.cancel()
+            worker.wait()
+    # end def
+
+    def _showError(self, message):
+        """Autosave runs unattended, so errors go to the status bar."""
+        win = self._docCtrlr.win
+        if win != None:
+            win.statusBar().showMessage(message)
+    # end def
+
+    def _hasBase(self, filename):
+        """Records apply on top of the snapshot, or else the saved file."""
+        if self._docCtrlr._hasNoAssociatedFile:
+            return has_snapshot(filename)
+        return has_snapshot(filename) or os.path.exists(filename)
+    # end def
+
+# end class
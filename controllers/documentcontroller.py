@@ -23,31 +23,54 @@
 # http://www.opensource.org/licenses/mit-license.php
 
 import os
+import mmap
+import json
+import time
 from cadnano import app
+from controllers.autosavecontroller import AutosaveController
+from controllers.fileworkers import OpenWorker, SaveWorker
+from controllers.validationcontroller import ValidationController
 from model.document import Document
-from model.io.decoder import decode
-from model.io.encoder import encode
+from model.io.decoder import decode, iter_apply_plan
+from model.io.encoder import encode, snapshotDesign
+from model.io.binaryencoder import encode_binary, snapshot_binary
+from model.io.binaryformat import EXTENSION as BINARY_EXTENSION
+from model.io.plateexport import write_plates, PLATE_96, PLATE_384
+from model.io.svgexport import write_svg
 from views.documentwindow import DocumentWindow
 from views import styles
 import util
-util.qtWrapImport('QtCore', globals(), ['QDir', 'QFileInfo', 'QRect',
-                                        'QString', 'QStringList', 'QSettings',
-                                        'QSize', 'Qt'])
+util.qtWrapImport('QtCore', globals(), ['pyqtSignal', 'QObject', 'QDir',
+                                        'QFileInfo', 'QString',
+                                        'QStringList', 'QSettings',
+                                        'Qt', 'QTimer'])
 util.qtWrapImport('QtGui', globals(), ['QApplication', 'QDialog',
                                        'QDockWidget', 'QFileDialog',
-                                       'QKeySequence', 'QGraphicsItem',
-                                       'QMainWindow',
-                                       'QMessageBox', 'QPainter', 'QIcon',
-                                       'QStyleOptionGraphicsItem'])
-util.qtWrapImport('QtSvg', globals(), ['QSvgGenerator'])
-
-class DocumentController():
+                                       'QKeySequence', 'QMainWindow',
+                                       'QMessageBox', 'QIcon',
+                                       'QProgressDialog'])
+
+# staple export file filters -> plate size and color grouping, or None
+# for the plain staple list
+_stapleExportFilters = [("Staple list (*.csv)", None),
+                        ("96-well plates (*.csv)", (PLATE_96, False)),
+                        ("384-well plates (*.csv)", (PLATE_384, False)),
+                        ("96-well plates, one pool per color (*.csv)",
+                                                        (PLATE_96, True)),
+                        ("384-well plates, one pool per color (*.csv)",
+                                                        (PLATE_384, True))]
+
+class DocumentController(QObject):
     """
     Connects UI buttons to their corresponding actions in the model.
     """
+    # emitted while a file is opened or saved in the background
+    fileProgressSignal = pyqtSignal(str, int, int)  # task, done, total
+
     ### INIT METHODS ###
     def __init__(self):
         """docstring for __init__"""
+        super(DocumentController, self).__init__()
         # initialize variables
         self._document = Document()
         self._document.setController(self)
@@ -61,6 +84,12 @@ class DocumentController():
         self.win = None
         self.fileopendialog = None
         self.filesavedialog = None
+        self._fileWorker = None  # OpenWorker or SaveWorker in progress
+        self._fileTask = None
+        self._applyIter = None  # iter_apply_plan of a background open
+        self._documentId = 0  # bumped by newDocument, tags file tasks
+        self._pendingSave = None  # (SaveWorker, document id, undo index)
+        self._progressDialog = None
 
         self.settings = QSettings()
         self._readSettings()
@@ -70,6 +99,11 @@ class DocumentController():
         if app().isInMaya():
             self._initMaya()
         app().documentControllers.add(self)
+        self._autosave = AutosaveController(self)
+        self._validation = ValidationController(self)
+        for fname in self._autosave.orphanedJournals():
+            if self._maybeRecoverJournal(fname):
+                break
 
     def _initWindow(self):
         """docstring for initWindow"""
@@ -300,7 +334,7 @@ class DocumentController():
         if self._hasNoAssociatedFile:
             self.saveFileDialog()
             return
-        self.writeDocumentToFile()
+        self.writeDocumentToFile(inBackground=True)
 
     def actionSaveAsSlot(self):
         """Open a save file dialog so user can choose a name."""
@@ -326,13 +360,11 @@ class DocumentController():
         self.svgsavedialog.filesSelected.connect(self.saveSVGDialogCallback)
         fdialog.open()
 
-    class DummyChild(QGraphicsItem):
-        def boundingRect(self):
-            return QRect(200, 200) # self.parentObject().boundingRect()
-        def paint(self, painter, option, widget=None):
-            pass
-
     def saveSVGDialogCallback(self, selected):
+        """
+        Writes the path view of the active part to the selected file as
+        SVG, drawn from the model (see model.io.svgexport).
+        """
         if isinstance(selected, QStringList) or isinstance(selected, list):
             fname = selected[0]
         else:
@@ -346,31 +378,23 @@ class DocumentController():
             self.svgsavedialog.filesSelected.disconnect(self.saveSVGDialogCallback)
             del self.svgsavedialog  # prevents hang
             self.svgsavedialog = None
+        try:
+            with open(fname, 'w') as f:
+                self.writeSVG(f)
+        except IOError:
+            self._showFileError("Could not write to '%s'." % fname)
+            return False
 
-        generator = QSvgGenerator()
-        generator.setFileName(fname)
-        generator.setSize(QSize(200, 200))
-        generator.setViewBox(QRect(0, 0, 2000, 2000))
-        painter = QPainter()
-
-        # Render through scene
-        # painter.begin(generator)
-        # self.win.pathscene.render(painter)
-        # painter.end()
-
-        # Render item-by-item
-        painter = QPainter()
-        styleOption = QStyleOptionGraphicsItem()
-        q = [self.win.pathroot]
-        painter.begin(generator)
-        while q:
-            graphicsItem = q.pop()
-            transform = graphicsItem.itemTransform(self.win.sliceroot)[0]
-            painter.setTransform(transform)
-            if graphicsItem.isVisible():
-                graphicsItem.paint(painter, styleOption, None)
-                q.extend(graphicsItem.childItems())
-        painter.end()
+    def writeSVG(self, io):
+        """
+        Writes the active part to io as SVG in the path view order, with
+        sequences only if the path view currently shows them.
+        """
+        pathroot = self.win.pathroot
+        helixOrderList = pathroot.getSelectedPartOrderedVHList()
+        partItem = pathroot.partItemForPart(self.activePart())
+        write_svg(self.activePart(), io, helixOrderList,
+                  showSequences=partItem.showsSequences())
 
     def actionExportStaplesSlot(self):
         """
@@ -404,20 +428,21 @@ class DocumentController():
             directory = "."
         else:
             directory = QFileInfo(fname).path()
+        filters = ";;".join([f for f, layout in _stapleExportFilters])
         if util.isWindows():  # required for native looking file window
-            fname = QFileDialog.getSaveFileName(
+            fname, nameFilter = QFileDialog.getSaveFileNameAndFilter(
                             self.win,
                             "%s - Export As" % QApplication.applicationName(),
                             directory,
-                            "(*.csv)")
+                            filters)
             self.saveStaplesDialog = None
-            self.exportStaplesCallback(fname)
+            self.exportStaplesCallback(fname, nameFilter)
         else:  # access through non-blocking callback
             fdialog = QFileDialog(
                             self.win,
                             "%s - Export As" % QApplication.applicationName(),
                             directory,
-                            "(*.csv)")
+                            filters)
             fdialog.setAcceptMode(QFileDialog.AcceptSave)
             fdialog.setWindowFlags(Qt.Sheet)
             fdialog.setWindowModality(Qt.WindowModal)
@@ -496,6 +521,9 @@ class DocumentController():
     ### PRIVATE SUPPORT METHODS ###
     def newDocument(self, doc=None, fname=None):
         """Creates a new Document, reusing the DocumentController."""
+        self._applyIter = None  # stop building a background open
+        self._documentId += 1  # a save in progress no longer applies
+        self._autosave.discard()  # the old document was saved or discarded
         self._document.resetViews()
         self._document.removeAllParts()  # clear out old parts
         self._document.undoStack().clear()  # reset undostack
@@ -504,6 +532,33 @@ class DocumentController():
         self._activePart = None
         self.win.setWindowTitle(self.documentTitle() + '[*]')
 
+    def _maybeRecoverJournal(self, fname):
+        """
+        If fname has an autosave journal, offers to replay it into the
+        document. Returns True if the recovered design was loaded.
+        """
+        if not self._autosave.hasRecovery(fname):
+            return False
+        if app().dontAskAndJustDiscardUnsavedChanges:
+            self._autosave.discard(fname)
+            return False
+        ret = QMessageBox.question(self.win, "cadnano",
+                "%s has unsaved changes from an earlier session.\n"
+                "Do you want to recover them?" % os.path.basename(fname),
+                QMessageBox.Yes | QMessageBox.No, QMessageBox.Yes)
+        if ret != QMessageBox.Yes:
+            self._autosave.discard(fname)
+            return False
+        obj = self._autosave.recoveredDesign(fname)
+        if obj == None:
+            return False
+        decode(self._document, json.dumps(obj),
+               lazyMinHelices=app().prefs.lazyOpenMinHelices)
+        self._autosave.adopt(fname)
+        self._validation.reset()
+        self.win.setWindowModified(True)
+        return True
+
     def saveFileDialog(self):
         fname = self.filename()
         if fname == None:
@@ -515,14 +570,14 @@ class DocumentController():
                             self.win,
                             "%s - Save As" % QApplication.applicationName(),
                             directory,
-                            "%s (*.json)" % QApplication.applicationName())
-            self.writeDocumentToFile(fname)
+                            "%s (*.json *.cn2b)" % QApplication.applicationName())
+            self.writeDocumentToFile(fname, inBackground=True)
         else:  # access through non-blocking callback
             fdialog = QFileDialog(
                             self.win,
                             "%s - Save As" % QApplication.applicationName(),
                             directory,
-                            "%s (*.json)" % QApplication.applicationName())
+                            "%s (*.json *.cn2b)" % QApplication.applicationName())
             fdialog.setAcceptMode(QFileDialog.AcceptSave)
             fdialog.setWindowFlags(Qt.Sheet)
             fdialog.setWindowModality(Qt.WindowModal)
@@ -563,8 +618,11 @@ class DocumentController():
             self.filesavedialog = None
         self.newDocument()
 
-    def exportStaplesCallback(self, selected):
-        """Export all staple sequences to selected CSV file."""
+    def exportStaplesCallback(self, selected, nameFilter=None):
+        """
+        Export all staple sequences to selected CSV file, as a staple list
+        or as plate layouts depending on the chosen nameFilter.
+        """
         if isinstance(selected, QStringList) or isinstance(selected, list):
             fname = selected[0]
         else:
@@ -575,14 +633,23 @@ class DocumentController():
         if not fname.lower().endswith(".csv"):
             fname += ".csv"
         if self.saveStaplesDialog != None:
+            nameFilter = self.saveStaplesDialog.selectedNameFilter()
             self.saveStaplesDialog.filesSelected.disconnect(self.exportStaplesCallback)
             # manual garbage collection to prevent hang (in osx)
             del self.saveStaplesDialog
             self.saveStaplesDialog = None
+        layout = dict(_stapleExportFilters).get(str(nameFilter), None)
         # write the file
-        output = self.activePart().getStapleSequences()
         with open(fname, 'w') as f:
-            f.write(output)
+            if layout == None:
+                self.activePart().writeStapleSequences(f,
+                                            app().prefs.stapleSortOrder)
+            else:
+                plateSize, groupByColor = layout
+                write_plates(self.activePart(), f, plateSize=plateSize,
+                             groupByColor=groupByColor,
+                             lengthBins=styles.PLATE_LENGTH_BINS,
+                             sortBy=app().prefs.stapleSortOrder)
     # end def
 
     def newClickedCallback(self):
@@ -598,7 +665,7 @@ class DocumentController():
             self.filesavedialog = None
         self.newDocument()
 
-    def openAfterMaybeSaveCallback(self, selected):
+    def openAfterMaybeSaveCallback(self, selected, inBackground=True):
         """
         Receives file selection info from the dialog created by
         openAfterMaybeSave, following user input.
@@ -606,6 +673,8 @@ class DocumentController():
         Extracts the file name and passes it to the decode method, which
         returns a new document doc, which is then set as the open document
         by newDocument. Calls finalizeImport and disconnects dialog signaling.
+        If inBackground is True the file is parsed on a worker thread and
+        built in slices on the event loop, see _startOpen.
         """
         if isinstance(selected, QStringList) or isinstance(selected, list):
             fname = selected[0]
@@ -616,8 +685,20 @@ class DocumentController():
         fname = str(fname)
         self._writeFileOpenPath(os.path.dirname(fname))
         self.newDocument(fname=fname)
-        with open(fname) as fd:
-            decode(self._document, fd.read())
+        if self._maybeRecoverJournal(fname):
+            pass
+        elif inBackground:
+            self._startOpen(fname)
+        else:
+            with open(fname, 'rb') as fd:
+                if fname.lower().endswith(BINARY_EXTENSION):
+                    data = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+                else:
+                    data = fd.read()
+            decode(self._document, data,
+                   lazyMinHelices=app().prefs.lazyOpenMinHelices)
+            self._autosave.reset()
+            self._validation.reset()
         if hasattr(self, "filesavedialog"): # user did save
             if self.fileopendialog != None:
                 self.fileopendialog.filesSelected.disconnect(\
@@ -635,20 +716,25 @@ class DocumentController():
         if fname.isEmpty() or os.path.isdir(fname):
             return False
         fname = str(fname)
-        if not fname.lower().endswith(".json"):
+        if not fname.lower().endswith((".json", BINARY_EXTENSION)):
             fname += ".json"
         if self.filesavedialog != None:
             self.filesavedialog.filesSelected.disconnect(
                                                 self.saveFileDialogCallback)
             del self.filesavedialog  # prevents hang
             self.filesavedialog = None
-        self.writeDocumentToFile(fname)
+        self.writeDocumentToFile(fname, inBackground=True)
         self._writeFileOpenPath(os.path.dirname(fname))
 
     ### EVENT HANDLERS ###
     def windowCloseEventHandler(self, event):
         """Intercept close events when user attempts to close the window."""
+        if self._fileWorker != None:
+            # let a save in progress finish and deliver its signals
+            self._fileWorker.wait()
+            QApplication.processEvents()
         if self.maybeSave():
+            self._autosave.discard()
             event.accept()
             if app().isInMaya():
                 self.windock.setVisible(False)
@@ -688,7 +774,7 @@ class DocumentController():
             fname = QFileDialog.getOpenFileName(
                         None,
                         "Open Document", path,
-                        "cadnano1 / cadnano2 Files (*.nno *.json *.cadnano)")
+                        "cadnano1 / cadnano2 Files (*.nno *.json *.cn2b *.cadnano)")
             self.filesavedialog = None
             self.openAfterMaybeSaveCallback(fname)
         else:  # access through non-blocking callback
@@ -696,7 +782,7 @@ class DocumentController():
                         self.win,
                         "Open Document",
                         path,
-                        "cadnano1 / cadnano2 Files (*.nno *.json *.cadnano)")
+                        "cadnano1 / cadnano2 Files (*.nno *.json *.cn2b *.cadnano)")
             fdialog.setAcceptMode(QFileDialog.AcceptOpen)
             fdialog.setWindowFlags(Qt.Sheet)
             fdialog.setWindowModality(Qt.WindowModal)
@@ -731,29 +817,178 @@ class DocumentController():
                 return False
         return True
 
-    def writeDocumentToFile(self, filename=None):
+    def writeDocumentToFile(self, filename=None, inBackground=False):
+        """
+        Saves the document to filename, or to its current file. If
+        inBackground is True, the model is snapshotted here and written
+        by a SaveWorker; returns True once the save has started.
+        """
         if filename == None:
             assert(not self._hasNoAssociatedFile)
             filename = self.filename()
+        filename = str(filename)
+        isBinary = filename.lower().endswith(BINARY_EXTENSION)
+        helixOrderList = self.win.pathroot.getSelectedPartOrderedVHList()
+        if inBackground:
+            if isBinary:
+                snapshot = snapshot_binary(self._document, helixOrderList,
+                                           os.path.basename(filename))
+            else:
+                snapshot = snapshotDesign(self._document, helixOrderList)
+            worker = SaveWorker(filename, snapshot)
+            worker.savedSignal.connect(self._saveWorkerSavedSlot)
+            self._pendingSave = (worker, self._documentId,
+                                 self.undoStack().index())
+            self._startFileTask("Saving %s" % os.path.basename(filename),
+                                worker)
+            return True
         try:
-            with open(filename, 'w') as f:
-                helixOrderList = self.win.pathroot.getSelectedPartOrderedVHList()
-                encode(self._document, helixOrderList, f)
+            with open(filename, 'wb' if isBinary else 'w') as f:
+                if isBinary:
+                    encode_binary(self._document, helixOrderList, f)
+                else:
+                    encode(self._document, helixOrderList, f)
         except IOError:
-            flags = Qt.Dialog | Qt.MSWindowsFixedSizeDialogHint | Qt.Sheet
-            errorbox = QMessageBox(QMessageBox.Critical,
-                                   "cadnano",
-                                   "Could not write to '%s'." % filename,
-                                   QMessageBox.Ok,
-                                   self.win,
-                                   flags)
-            errorbox.setWindowModality(Qt.WindowModal)
-            errorbox.open()
+            self._showFileError("Could not write to '%s'." % filename)
             return False
+        self._autosave.discard()
         self.undoStack().setClean()
         self.setFilename(filename)
+        self._autosave.reset()
         return True
 
+    def _showFileError(self, message):
+        flags = Qt.Dialog | Qt.MSWindowsFixedSizeDialogHint | Qt.Sheet
+        errorbox = QMessageBox(QMessageBox.Critical,
+                               "cadnano",
+                               message,
+                               QMessageBox.Ok,
+                               self.win,
+                               flags)
+        errorbox.setWindowModality(Qt.WindowModal)
+        errorbox.open()
+
+    ### BACKGROUND FILE TASKS ###
+    def cancelFileTask(self):
+        """
+        Stops the open or save in progress. A cancelled save leaves the
+        file on disk untouched; a cancelled open leaves an empty document.
+        """
+        isOpen = self._applyIter != None or \
+                 isinstance(self._fileWorker, OpenWorker)
+        if self._fileWorker != None:
+            self._fileWorker.cancel()
+        self._endFileTask()
+        if isOpen:
+            self.newDocument()
+
+    def _startOpen(self, fname):
+        """Parses fname on an OpenWorker, then builds it in _applyPlanStep."""
+        worker = OpenWorker(fname, app().prefs.lazyOpenMinHelices)
+        worker.planReadySignal.connect(self._openWorkerPlanReadySlot)
+        self._startFileTask("Reading %s" % os.path.basename(fname), worker)
+
+    def _startFileTask(self, task, worker):
+        if self._fileWorker != None:  # one file task at a time
+            if not isinstance(self._fileWorker, SaveWorker):
+                self._fileWorker.cancel()
+            # a save is finished rather than dropped
+            self._fileWorker.wait()
+        self._endFileTask()
+        self._fileWorker = worker
+        self._fileTask = task
+        worker.progressSignal.connect(self._fileWorkerProgressSlot)
+        worker.failedSignal.connect(self._fileWorkerFailedSlot)
+        worker.finished.connect(self._fileWorkerFinishedSlot)
+        if self.win != None:
+            dialog = QProgressDialog(task, "Cancel", 0, 0, self.win)
+            dialog.setWindowModality(Qt.WindowModal)
+            dialog.setMinimumDuration(styles.FILE_PROGRESS_DELAY_MS)
+            dialog.canceled.connect(self.cancelFileTask)
+            self.fileProgressSignal.connect(self._fileProgressDialogSlot)
+            self._progressDialog = dialog
+        worker.start()
+
+    def _endFileTask(self):
+        self._applyIter = None
+        self._fileTask = None
+        if self._progressDialog != None:
+            self.fileProgressSignal.disconnect(self._fileProgressDialogSlot)
+            self._progressDialog.canceled.disconnect(self.cancelFileTask)
+            self._progressDialog.close()
+            self._progressDialog = None
+
+    def _applyPlanStep(self):
+        """
+        Model objects belong to the GUI thread, so a parsed plan is applied
+        here, a slice of helices per event loop iteration.
+        """
+        if self._applyIter == None:  # cancelled
+            return
+        deadline = time.time() + styles.FILE_APPLY_SLICE_MS / 1000.
+        try:
+            while time.time() < deadline:
+                done, total = self._applyIter.next()
+        except StopIteration:
+            self._endFileTask()
+            self._autosave.reset()
+            self._validation.reset()
+            return
+        self.fileProgressSignal.emit(self._fileTask, done, total)
+        QTimer.singleShot(0, self._applyPlanStep)
+
+    def _fileProgressDialogSlot(self, task, done, total):
+        dialog = self._progressDialog
+        dialog.setLabelText(task)
+        dialog.setMaximum(total)
+        dialog.setValue(done)
+
+    def _fileWorkerProgressSlot(self, done, total):
+        if self._fileTask != None:
+            self.fileProgressSignal.emit(self._fileTask, done, total)
+
+    def _fileWorkerFailedSlot(self, message):
+        if self.sender() is not self._fileWorker:
+            self._showFileError(message)  # a save that ended during an open
+            return
+        isOpen = isinstance(self._fileWorker, OpenWorker)
+        self._endFileTask()
+        self._showFileError(message)
+        if isOpen:
+            self.newDocument()
+
+    def _fileWorkerFinishedSlot(self):
+        worker = self.sender()
+        if worker is self._fileWorker:
+            self._fileWorker = None
+            if self._applyIter == None:  # nothing left to build
+                self._endFileTask()
+
+    def _openWorkerPlanReadySlot(self, plan):
+        if self.sender() is not self._fileWorker:
+            return  # a stale or cancelled open
+        self._fileTask = "Opening %s" % os.path.basename(self.filename())
+        self._applyIter = iter_apply_plan(self._document, plan)
+        QTimer.singleShot(0, self._applyPlanStep)
+
+    def _saveWorkerSavedSlot(self, filename):
+        pending = self._pendingSave
+        if pending == None or self.sender() is not pending[0]:
+            return  # superseded by a later save
+        self._pendingSave = None
+        worker, documentId, undoIndex = pending
+        if documentId != self._documentId:
+            return  # the saved design was closed while it was written
+        filename = str(filename)
+        if self.undoStack().index() == undoIndex:
+            self._autosave.discard()
+            self.undoStack().setClean()
+            self.setFilename(filename)
+            self._autosave.reset()
+        else:
+            # edits made during the save stay dirty and keep journaling
+            self.setFilename(filename)
+
     def actionCadnanoWebsiteSlot(self):
         import webbrowser
         webbrowser.open("http://cadnano.org/")
@@ -0,0 +1,142 @@
+# The MIT License
+#
+# Copyright (c) 2011 Wyss Institute at Harvard University
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# http://www.opensource.org/licenses/mit-license.php
+
+"""
+fileworkers
+QThreads that do the slow, model-free parts of opening and saving a
+design: reading and parsing a file into a DecodePlan, and writing a
+snapshot of the model to disk. Both report progress through
+progressSignal and stop early when cancel() is called.
+"""
+
+import mmap
+import os
+
+from model.io.decoder import plan_decode
+from model.io.binaryformat import EXTENSION as BINARY_EXTENSION
+from model.io.encoder import writeDesignSnapshot
+import util
+
+util.qtWrapImport('QtCore', globals(), ['pyqtSignal', 'QThread'])
+
+
+class FileWorker(QThread):
+    progressSignal = pyqtSignal(int, int)  # done, total
+    failedSignal = pyqtSignal(str)  # error message
+
+    def __init__(self, filename, parent=None):
+        super(FileWorker, self).__init__(parent)
+        self._filename = filename
+        self._isCancelled = False
+    # end def
+
+    def cancel(self):
+        """Asks the worker to stop at the next helix."""
+        self._isCancelled = True
+    # end def
+
+    def filename(self):
+        return self._filename
+    # end def
+
+    def isCancelled(self):
+        return self._isCancelled
+    # end def
+
+    def _progress(self, done, total):
+        self.progressSignal.emit(done, total)
+        return self._isCancelled
+    # end def
+# end class
+
+
+class OpenWorker(FileWorker):
+    """Reads and parses a design file into a DecodePlan."""
+    planReadySignal = pyqtSignal(object)  # DecodePlan
+
+    def __init__(self, filename, lazyMinHelices=0, parent=None):
+        super(OpenWorker, self).__init__(filename, parent)
+        self._lazyMinHelices = lazyMinHelices
+    # end def
+
+    def run(self):
+        try:
+            with open(self._filename, 'rb') as fd:
+                if self._filename.lower().endswith(BINARY_EXTENSION):
+                    data = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+                else:
+                    data = fd.read()
+            plan = plan_decode(data, self._lazyMinHelices, self._progress)
+            # a binary plan reads its BinaryDesign, which closes the
+            # mapping once the plan is applied
+            if isinstance(data, mmap.mmap) and \
+                                    (plan == None or plan.design == None):
+                data.close()
+        except (IOError, ValueError, KeyError), e:
+            self.failedSignal.emit("Could not open '%s': %s" % \
+                                                    (self._filename, e))
+            return
+        if plan != None and not self._isCancelled:
+            self.planReadySignal.emit(plan)
+    # end def
+# end class
+
+
+class SaveWorker(FileWorker):
+    """
+    Writes a snapshot taken on the GUI thread to a temporary file next to
+    filename, and renames it over filename once it is complete, so a
+    cancelled or failed save leaves the old file in place. snapshot is
+    either a snapshotDesign list or a binary writer from snapshot_binary.
+    """
+    savedSignal = pyqtSignal(str)  # filename
+
+    def __init__(self, filename, snapshot, parent=None):
+        super(SaveWorker, self).__init__(filename, parent)
+        self._snapshot = snapshot
+    # end def
+
+    def run(self):
+        tmpname = self._filename + '.tmp'
+        try:
+            with open(tmpname, 'wb') as f:
+                if isinstance(self._snapshot, list):
+                    name = os.path.basename(self._filename)
+                    complete = writeDesignSnapshot(self._snapshot, f, name,
+                                                   self._progress)
+                else:
+                    self._snapshot.write(f)
+                    complete = not self._progress(1, 1)
+            if not complete:
+                os.remove(tmpname)
+                return
+            if os.path.exists(self._filename):
+                os.remove(self._filename)  # rename does not replace on windows
+            os.rename(tmpname, self._filename)
+        except (IOError, OSError):
+            self.failedSignal.emit("Could not write to '%s'." % self._filename)
+            return
+        self.savedSignal.emit(self._filename)
+    # end def
+# end class
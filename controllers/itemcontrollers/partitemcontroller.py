@@ -37,6 +37,10 @@ class PartItemController(object):
             mP.partHideSignal.connect(pI.partHideSlot)
         if hasattr(pI, "partActiveVirtualHelixChangedSlot"):
             mP.partActiveVirtualHelixChangedSignal.connect(pI.partActiveVirtualHelixChangedSlot)
+        if hasattr(pI, "partStrandChangedSlot"):
+            mP.partStrandChangedSignal.connect(pI.partStrandChangedSlot)
+        if hasattr(pI, "partOligoChangedSlot"):
+            mP.partOligoChangedSignal.connect(pI.partOligoChangedSlot)
 
         mP.partDimensionsChangedSignal.connect(pI.partDimensionsChangedSlot)
         mP.partParentChangedSignal.connect(pI.partParentChangedSlot)
@@ -57,6 +61,10 @@ class PartItemController(object):
             mP.partHideSignal.disconnect(pI.partHideSlot)
         if hasattr(pI, "partActiveVirtualHelixChangedSlot"):
             mP.partActiveVirtualHelixChangedSignal.disconnect(pI.partActiveVirtualHelixChangedSlot)
+        if hasattr(pI, "partStrandChangedSlot"):
+            mP.partStrandChangedSignal.disconnect(pI.partStrandChangedSlot)
+        if hasattr(pI, "partOligoChangedSlot"):
+            mP.partOligoChangedSignal.disconnect(pI.partOligoChangedSlot)
 
         mP.partDimensionsChangedSignal.disconnect(pI.partDimensionsChangedSlot)
         mP.partParentChangedSignal.disconnect(pI.partParentChangedSlot)
@@ -0,0 +1,90 @@
+# The MIT License
+#
+# Copyright (c) 2011 Wyss Institute at Harvard University
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# http://www.opensource.org/licenses/mit-license.php
+
+"""
+validationcontroller
+Shows live design-rule violation counts (see model.validation) in the
+status bar of the document window.
+"""
+
+from views import styles
+import util
+
+util.qtWrapImport('QtCore', globals(), ['QTimer'])
+util.qtWrapImport('QtGui', globals(), ['QLabel'])
+
+
+class ValidationController(object):
+    def __init__(self, documentController):
+        self._docCtrlr = documentController
+        self._label = QLabel()
+        documentController.win.statusBar().addPermanentWidget(self._label)
+        self._isRefreshPending = False
+        documentController.undoStack().indexChanged.connect(
+                                            self.undoStackIndexChangedSlot)
+    # end def
+
+    ### SLOTS ###
+    def undoStackIndexChangedSlot(self, index):
+        """Refreshes once the current batch of events has been handled."""
+        if not self._isRefreshPending:
+            self._isRefreshPending = True
+            QTimer.singleShot(0, self.refresh)
+    # end def
+
+    ### PUBLIC METHODS ###
+    def reset(self):
+        """
+        Called after a document is opened: it was built without the undo
+        stack, so the whole part is checked again.
+        """
+        part = self._docCtrlr.document().selectedPart()
+        if part != None:
+            part.validator().invalidate()
+        self.undoStackIndexChangedSlot(None)
+    # end def
+
+    def refresh(self):
+        self._isRefreshPending = False
+        part = self._docCtrlr.document().selectedPart()
+        if part == None or self._docCtrlr._applyIter != None:
+            self._label.clear()  # nothing to check, or an open in progress
+            return
+        validator = part.validator()
+        counts = [(rule, n) for rule, n in validator.counts() if n > 0]
+        if not counts:
+            self._label.setText("No design rule violations")
+            self._label.setToolTip("")
+            return
+        self._label.setText(", ".join(["%d %s" % (n, rule.description) \
+                                                    for rule, n in counts]))
+        msgs = []
+        for msg in validator.messages():
+            if len(msgs) == styles.VALIDATION_TOOLTIP_LINES:
+                msgs.append("...")
+                break
+            msgs.append(msg)
+        self._label.setToolTip("\n".join(msgs))
+    # end def
+# end class
@@ -0,0 +1,244 @@
+# The MIT License
+#
+# Copyright (c) 2011 Wyss Institute at Harvard University
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# http://www.opensource.org/licenses/mit-license.php
+
+"""
+contenthash
+A canonical content hash of a Part, kept up to date as commands run on its
+undo stack, for keying cached export and analysis results.
+"""
+
+import hashlib
+from collections import defaultdict
+
+from model.document import Document
+from model.enum import StrandType
+from model.oligo import Oligo
+from model.parts.part import Part
+from model.strand import Strand
+from model.strandset import StrandSet
+from model.virtualhelix import VirtualHelix
+
+# commands that change more than the helices they reference
+wholePartCommands = (Part.RenumberVirtualHelicesCommand,
+                     Part.ResizePartCommand,
+                     Part.RemovePartCommand,
+                     Document.AddPartCommand)
+
+
+def collect_command_helices(command, helices, wholeOligos=False):
+    """
+    Adds the VirtualHelix objects that command (and its children) refer to
+    to the set helices. Returns True if the command changes the part as a
+    whole (see wholePartCommands). With wholeOligos, an Oligo adds the
+    helices of all its strands instead of just its 5' end.
+    """
+    isWholePart = isinstance(command, wholePartCommands)
+    for i in xrange(command.childCount()):
+        if collect_command_helices(command.child(i), helices, wholeOligos):
+            isWholePart = True
+    for value in vars(command).itervalues():
+        _collectObject(value, helices, wholeOligos, 2)
+    return isWholePart
+# end def
+
+def _collectObject(obj, helices, wholeOligos, depth):
+    """Adds the VirtualHelix objects that obj refers to."""
+    if isinstance(obj, VirtualHelix):
+        helices.add(obj)
+    elif isinstance(obj, StrandSet):
+        helices.add(obj.virtualHelix())
+    elif isinstance(obj, Strand):
+        # crossovers are recorded on both of the helices they join
+        for strand in (obj, obj.connection5p(), obj.connection3p()):
+            if strand != None and strand.virtualHelix() != None:
+                helices.add(strand.virtualHelix())
+    elif isinstance(obj, Oligo):
+        strand5p = obj.strand5p()
+        if strand5p == None:
+            return
+        if wholeOligos:
+            # sequences change on every strand of the oligo
+            for strand in strand5p.generator3pStrand():
+                if strand.virtualHelix() != None:
+                    helices.add(strand.virtualHelix())
+        else:
+            # colors are stored with the helix of the 5' end
+            _collectObject(strand5p, helices, wholeOligos, depth)
+    elif isinstance(obj, (list, tuple, set)) and depth > 0:
+        for item in obj:
+            _collectObject(item, helices, wholeOligos, depth - 1)
+# end def
+
+
+class PartChangeTracker(object):
+    """
+    Collects the helices touched by the commands done or undone on the
+    undo stack of a part, including every helix of the oligos they refer
+    to. Commands run without the undo stack are caught from the strand and
+    oligo change signals of the part; other edits must be reported with
+    invalidate. Subclasses call takeChanges when they bring their results
+    up to date.
+    """
+    def __init__(self, part):
+        self._part = part
+        self._dirty = set()
+        self._isDirtyAll = True
+        undoStack = part.undoStack()
+        self._lastIndex = undoStack.index()
+        undoStack.indexChanged.connect(self.undoStackIndexChangedSlot)
+        part.partStrandChangedSignal.connect(self.partStrandChangedSlot)
+        part.partOligoChangedSignal.connect(self.partOligoChangedSlot)
+    # end def
+
+    ### SLOTS ###
+    def partStrandChangedSlot(self, part, virtualHelix):
+        if virtualHelix != None:
+            self.invalidate(virtualHelix)
+    # end def
+
+    def partOligoChangedSlot(self, part, oligo):
+        _collectObject(oligo, self._dirty, True, 0)
+        self.changed()
+    # end def
+
+    def undoStackIndexChangedSlot(self, index):
+        undoStack = self._part.undoStack()
+        for i in xrange(min(index, self._lastIndex), max(index, self._lastIndex)):
+            command = undoStack.command(i)
+            if command == None or \
+                    collect_command_helices(command, self._dirty, True):
+                self._isDirtyAll = True
+        self._lastIndex = index
+        self.changed()
+    # end def
+
+    ### PUBLIC METHODS ###
+    def invalidate(self, virtualHelix=None):
+        """Marks virtualHelix, or the whole part, as changed."""
+        if virtualHelix == None:
+            self._isDirtyAll = True
+        else:
+            self._dirty.add(virtualHelix)
+        self.changed()
+    # end def
+
+    def changed(self):
+        """Called when helices have been marked as changed."""
+        pass
+    # end def
+
+    def takeChanges(self):
+        """
+        Returns (isAll, helices): whether the whole part changed, and
+        otherwise the set of changed helices. Removed helices are included;
+        see isLiveHelix.
+        """
+        ret = (self._isDirtyAll, self._dirty)
+        self._dirty = set()
+        self._isDirtyAll = False
+        return ret
+    # end def
+
+    def isLiveHelix(self, virtualHelix):
+        part = self._part
+        return part.virtualHelixAtCoord(virtualHelix.coord()) is virtualHelix
+    # end def
+# end class
+
+
+class PartHasher(PartChangeTracker):
+    """
+    Hashes a Part as the XOR of per-helix SHA-1 digests of the strand
+    bounds and connections, insertions, staple colors and sequences of each
+    helix. Only the helices touched by commands since the last digest are
+    hashed again, so an unchanged part is hashed in constant time.
+    """
+    def __init__(self, part):
+        super(PartHasher, self).__init__(part)
+        self._digests = {}  # VirtualHelix -> digest as a long
+        self._combined = 0L
+        self._hexDigest = None
+        self._pendingSeqs = None
+    # end def
+
+    ### PUBLIC METHODS ###
+    def changed(self):
+        self._hexDigest = None
+    # end def
+
+    def hexDigest(self):
+        if self._hexDigest != None:
+            return self._hexDigest
+        part = self._part
+        self._pendingSeqs = None  # built when a pending helix is hashed
+        isAll, dirty = self.takeChanges()
+        if isAll:
+            self._digests = {}
+            self._combined = 0L
+            dirty = part.getVirtualHelices()
+        for vh in dirty:
+            self._combined ^= self._digests.pop(vh, 0L)
+            if self.isLiveHelix(vh):
+                digest = self._helixDigest(vh)
+                self._digests[vh] = digest
+                self._combined ^= digest
+        self._hexDigest = hashlib.sha1("%d:%d:%x" % (part.crossSectionType(),
+                                                     part.maxBaseIdx(),
+                                                     self._combined)).hexdigest()
+        return self._hexDigest
+    # end def
+
+    ### PRIVATE SUPPORT METHODS ###
+    def _helixDigest(self, vh):
+        h = hashlib.sha1()
+        row, col = vh.coord()
+        h.update("%d,%d,%d;" % (row, col, vh.number()))
+        for strandType in (StrandType.Scaffold, StrandType.Staple):
+            strandSet = vh.getStrandSetByType(strandType)
+            h.update(strandSet.getLegacyFlatArray().tostring())
+            if strandSet.isPending():
+                key = (strandType, vh.number())
+                seqs = self._pendingSequences().get(key, ())
+            else:
+                seqs = [(s.idx5Prime(), s.sequence()) for s in strandSet \
+                                                            if s.sequence()]
+            h.update(repr(sorted(seqs)))
+        insertions = self._part.insertions().get((row, col), {})
+        h.update(repr(sorted((idx, ins.length()) \
+                             for idx, ins in insertions.iteritems())))
+        h.update(repr(vh.stapleStrandSet().getLegacyColorList()))
+        return long(h.hexdigest(), 16)
+    # end def
+
+    def _pendingSequences(self):
+        """(strandType, vhNum) -> [(idx5p, sequence), ...] of unbuilt strands."""
+        if self._pendingSeqs == None:
+            self._pendingSeqs = defaultdict(list)
+            records = self._part.helixRecords()
+            if records != None:
+                for strandType, vhNum, idx5p, seq in records.sequences():
+                    self._pendingSeqs[(strandType, vhNum)].append((idx5p, seq))
+        return self._pendingSeqs
+    # end def
+# end class
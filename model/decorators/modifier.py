@@ -48,5 +48,5 @@ class Modifier(object):
         return self._highIdx - self._lowIdx + 1
 
     def modifierType(self):
-        return self._mtype
+        return self._mType
 # end class
\ No newline at end of file
@@ -0,0 +1,294 @@
+# The MIT License
+#
+# Copyright (c) 2011 Wyss Institute at Harvard University
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# http://www.opensource.org/licenses/mit-license.php
+
+"""
+designdiff
+Structural diff of two designs, helix by helix. Each helix is reduced to
+sorted strand-bound runs, crossover edges, insertions and staple colors,
+keyed by lattice coordinate so renumbered helices still line up. Helices
+whose base arrays are identical are skipped without being decoded, so
+diffing two revisions costs little more than comparing their arrays.
+
+Designs can be Parts, legacy JSON dicts or files in either native format.
+"""
+
+import json
+from array import array
+from itertools import chain
+
+from model.enum import StrandType
+from model.io.binaryformat import isBinaryDesign, runsFromLegacyArray
+
+_strandTypeNames = {StrandType.Scaffold: 'scaf', StrandType.Staple: 'stap'}
+
+
+class HelixSummary(object):
+    """The plain values of one helix that a diff looks at."""
+    def __init__(self, row, col, num, scaf, stap, insertions, colors):
+        self.coord = (row, col)
+        self.num = num
+        self.bases = {StrandType.Scaffold: scaf,  # flat array('i')
+                      StrandType.Staple: stap}
+        self.insertions = insertions  # idx -> length, skips are -1
+        self.colors = colors          # 5' idx -> 0xRRGGBB
+    # end def
+
+    def isSameAs(self, other):
+        return self.num == other.num and self.bases == other.bases and \
+               self.insertions == other.insertions and \
+               self.colors == other.colors
+    # end def
+
+    def runs(self, strandType):
+        """Returns the sorted (low, high) strand runs and 3' crossovers."""
+        flat = self.bases[strandType]
+        bases = zip(*[iter(flat)] * 4)
+        runs, xovers = runsFromLegacyArray(self.num, strandType, bases)
+        return zip(runs[0::2], runs[1::2]), zip(*[iter(xovers)] * 4)
+    # end def
+# end class
+
+
+class DesignDiff(object):
+    """
+    The differences from design a to design b, as lists of plain tuples:
+        addedHelices, removedHelices    (row, col, num)
+        renumberedHelices               (row, col, oldNum, newNum)
+        addedStrands, removedStrands    (row, col, strandType, low, high)
+        resizedStrands                  (row, col, strandType, oldLow,
+                                         oldHigh, newLow, newHigh)
+        addedXovers, removedXovers      (strandType, fromRow, fromCol,
+                                         from3pIdx, toRow, toCol, to5pIdx)
+        changedInsertions               (row, col, idx, oldLength,
+                                         newLength)
+        recoloredOligos                 (row, col, idx5p, oldColor,
+                                         newColor)
+    Lengths are 0 for no insertion and -1 for a skip; colors are '#rrggbb'.
+    """
+    fields = ('addedHelices', 'removedHelices', 'renumberedHelices',
+              'addedStrands', 'removedStrands', 'resizedStrands',
+              'addedXovers', 'removedXovers', 'changedInsertions',
+              'recoloredOligos')
+
+    def __init__(self, numBasesA=0, numBasesB=0):
+        self.numBases = (numBasesA, numBasesB)
+        for field in self.fields:
+            setattr(self, field, [])
+    # end def
+
+    def isEmpty(self):
+        return self.numBases[0] == self.numBases[1] and \
+               not any(getattr(self, field) for field in self.fields)
+    # end def
+
+    def asDict(self):
+        """Returns the diff as a JSON serializable dict."""
+        ret = dict((field, getattr(self, field)) for field in self.fields)
+        ret['numBases'] = self.numBases
+        return ret
+    # end def
+
+    def lines(self):
+        """Yields a human readable line per difference."""
+        st = _strandTypeNames
+        if self.numBases[0] != self.numBases[1]:
+            yield "~ helix length %d -> %d" % self.numBases
+        for row, col, num in self.addedHelices:
+            yield "+ helix %d at (%d,%d)" % (num, row, col)
+        for row, col, num in self.removedHelices:
+            yield "- helix %d at (%d,%d)" % (num, row, col)
+        for row, col, old, new in self.renumberedHelices:
+            yield "~ helix (%d,%d) renumbered %d -> %d" % (row, col, old, new)
+        for row, col, strandType, lo, hi in self.addedStrands:
+            yield "+ %s strand (%d,%d)[%d-%d]" % (st[strandType], row, col,
+                                                  lo, hi)
+        for row, col, strandType, lo, hi in self.removedStrands:
+            yield "- %s strand (%d,%d)[%d-%d]" % (st[strandType], row, col,
+                                                  lo, hi)
+        for row, col, strandType, lo0, hi0, lo1, hi1 in self.resizedStrands:
+            yield "~ %s strand (%d,%d)[%d-%d] -> [%d-%d]" % \
+                            (st[strandType], row, col, lo0, hi0, lo1, hi1)
+        for xover in self.addedXovers:
+            yield "+ %s xover (%d,%d)[%d] -> (%d,%d)[%d]" % \
+                                        ((st[xover[0]],) + tuple(xover[1:]))
+        for xover in self.removedXovers:
+            yield "- %s xover (%d,%d)[%d] -> (%d,%d)[%d]" % \
+                                        ((st[xover[0]],) + tuple(xover[1:]))
+        for row, col, idx, old, new in self.changedInsertions:
+            yield "~ insertion (%d,%d)[%d] %d -> %d" % (row, col, idx, old, new)
+        for row, col, idx, old, new in self.recoloredOligos:
+            yield "~ oligo (%d,%d)[%d] color %s -> %s" % (row, col, idx,
+                                                          old, new)
+    # end def
+# end class
+
+
+def summarize_part(part):
+    """Returns (numBases, {coord: HelixSummary}) for part."""
+    from model.io.encoder import snapshotHelix
+    helices = {}
+    for vh in part.getVirtualHelices():
+        row, col, num, scaf, stap, insts, skips, stapColors = \
+                                                    snapshotHelix(part, vh)
+        helices[(row, col)] = HelixSummary(row, col, num, scaf, stap,
+                                           _insertionDict(insts, skips),
+                                           dict(map(tuple, stapColors)))
+    return part.maxBaseIdx() + 1, helices
+# end def
+
+def summarize_legacy_dict(obj):
+    """Returns (numBases, {coord: HelixSummary}) for a legacy JSON dict."""
+    helices = {}
+    numBases = 0
+    for helix in obj['vstrands']:
+        row, col = helix['row'], helix['col']
+        numBases = len(helix['scaf'])
+        helices[(row, col)] = HelixSummary(row, col, helix['num'],
+                array('i', chain.from_iterable(helix['scaf'])),
+                array('i', chain.from_iterable(helix['stap'])),
+                _insertionDict(helix['loop'], helix['skip']),
+                dict(map(tuple, helix.get('stap_colors', []))))
+    return numBases, helices
+# end def
+
+def summarize_file(path):
+    """Returns (numBases, {coord: HelixSummary}) for a design file."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if isBinaryDesign(data):
+        from model.io.binarydecoder import legacy_dict_from_binary
+        obj = legacy_dict_from_binary(data)
+    else:
+        obj = json.loads(data)
+    return summarize_legacy_dict(obj)
+# end def
+
+def diff_designs(a, b):
+    """
+    Returns the DesignDiff from a to b, where each is a Part, a legacy JSON
+    dict, a file path or a (numBases, helices) summary.
+    """
+    numBasesA, helicesA = _summarize(a)
+    numBasesB, helicesB = _summarize(b)
+    diff = DesignDiff(numBasesA, numBasesB)
+    coordsA = dict((h.num, h.coord) for h in helicesA.itervalues())
+    coordsB = dict((h.num, h.coord) for h in helicesB.itervalues())
+    # identical arrays only mean identical crossovers if the numbers in
+    # them still point at the same coords
+    canSkip = coordsA == coordsB
+    for coord in sorted(set(helicesA) | set(helicesB)):
+        hA, hB = helicesA.get(coord), helicesB.get(coord)
+        if hB == None:
+            diff.removedHelices.append(coord + (hA.num,))
+        elif hA == None:
+            diff.addedHelices.append(coord + (hB.num,))
+        elif hA.num != hB.num:
+            diff.renumberedHelices.append(coord + (hA.num, hB.num))
+        if canSkip and hA != None and hB != None and hA.isSameAs(hB):
+            continue
+        _diffHelix(diff, coord, hA, hB, coordsA, coordsB)
+    for field in DesignDiff.fields:
+        getattr(diff, field).sort()
+    return diff
+# end def
+
+def _summarize(design):
+    if isinstance(design, tuple):
+        return design
+    if isinstance(design, basestring):
+        return summarize_file(design)
+    if isinstance(design, dict):
+        return summarize_legacy_dict(design)
+    return summarize_part(design)
+# end def
+
+def _insertionDict(loops, skips):
+    return dict((idx, loop + skip) for idx, (loop, skip) in \
+                                enumerate(zip(loops, skips)) if loop or skip)
+# end def
+
+def _diffHelix(diff, coord, hA, hB, coordsA, coordsB):
+    for strandType in (StrandType.Scaffold, StrandType.Staple):
+        runsA, xoversA = hA.runs(strandType) if hA != None else ([], [])
+        runsB, xoversB = hB.runs(strandType) if hB != None else ([], [])
+        if runsA != runsB:
+            _diffRuns(diff, coord, strandType, runsA, runsB)
+        xoversA = set(_xoverCoords(strandType, x, coordsA) for x in xoversA)
+        xoversB = set(_xoverCoords(strandType, x, coordsB) for x in xoversB)
+        diff.addedXovers.extend(xoversB - xoversA)
+        diff.removedXovers.extend(xoversA - xoversB)
+    insA = hA.insertions if hA != None else {}
+    insB = hB.insertions if hB != None else {}
+    for idx in set(insA) | set(insB):
+        old, new = insA.get(idx, 0), insB.get(idx, 0)
+        if old != new:
+            diff.changedInsertions.append(coord + (idx, old, new))
+    if hA != None and hB != None:
+        for idx, color in hB.colors.iteritems():
+            old = hA.colors.get(idx, color)
+            if old != color:
+                diff.recoloredOligos.append(coord + (idx, "#%06x" % old,
+                                                          "#%06x" % color))
+# end def
+
+def _diffRuns(diff, coord, strandType, runsA, runsB):
+    """
+    Matches two sorted run lists in one sweep. Unmatched runs that overlap
+    exactly one unmatched run of the other list were resized; the rest
+    were added or removed (splits and merges show up as both).
+    """
+    setA, setB = set(runsA), set(runsB)
+    onlyA = [r for r in runsA if r not in setB]
+    onlyB = [r for r in runsB if r not in setA]
+    overlapsA = [[] for r in onlyA]
+    overlapsB = [[] for r in onlyB]
+    i = j = 0
+    while i < len(onlyA) and j < len(onlyB):
+        (loA, hiA), (loB, hiB) = onlyA[i], onlyB[j]
+        if loA <= hiB and loB <= hiA:
+            overlapsA[i].append(j)
+            overlapsB[j].append(i)
+        if hiA < hiB:
+            i += 1
+        else:
+            j += 1
+    resizedB = set()
+    for i, run in enumerate(onlyA):
+        if len(overlapsA[i]) == 1 and len(overlapsB[overlapsA[i][0]]) == 1:
+            j = overlapsA[i][0]
+            resizedB.add(j)
+            diff.resizedStrands.append(coord + (strandType,) + run + onlyB[j])
+        else:
+            diff.removedStrands.append(coord + (strandType,) + run)
+    for j, run in enumerate(onlyB):
+        if j not in resizedB:
+            diff.addedStrands.append(coord + (strandType,) + run)
+# end def
+
+def _xoverCoords(strandType, xover, coords):
+    fromVh, from3pIdx, toVh, to5pIdx = xover
+    toCoord = coords.get(toVh, (-1, -1))
+    return (strandType,) + coords[fromVh] + (from3pIdx,) + toCoord + \
+                                                                (to5pIdx,)
+# end def
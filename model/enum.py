@@ -37,6 +37,13 @@ class StrandType:
     Staple = 1
 
 
+class StapleSort:
+    Default = 0  # model order
+    Helix = 1  # by 5' helix, then 5' index
+    Position5p = 2  # by 5' index, then 5' helix
+    Color = 3  # by color, then 5' helix and index
+
+
 class Parity:
     Even = 0
     Odd = 1
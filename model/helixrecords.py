@@ -0,0 +1,334 @@
+# The MIT License
+#
+# Copyright (c) 2011 Wyss Institute at Harvard University
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# http://www.opensource.org/licenses/mit-license.php
+
+"""
+helixrecords
+Lightweight strand records for virtual helices that have not been built
+into Strand and Oligo objects yet (see the lazy mode of
+import_legacy_dict).
+"""
+
+from bisect import bisect_right
+from collections import defaultdict
+
+from model.enum import StrandType
+from model.io.binaryformat import isDrawn5to3, legacyArrayFromRuns
+from views import styles
+
+
+class HelixRecords(object):
+    """
+    Holds the strands of pending StrandSets as (low, high) runs plus
+    crossover edges, keyed by (strandType, vhNum). A StrandSet stays
+    pending until its strand list is first touched; it is then built
+    together with every pending StrandSet of the same type that it is
+    connected to through crossovers, so that oligos are always complete.
+
+    Queries that the views and exporters make for every helix
+    (hasStrandAt, legacy arrays, staple colors and export rows) are
+    answered from the records without building anything.
+    """
+    def __init__(self, part):
+        self._part = part
+        self._runs = {}  # (strandType, vhNum) -> [low, high, low, high, ...]
+        self._xovers3p = defaultdict(dict)  # key -> {idx3p: (toVhNum, idx5p)}
+        self._xovers5p = defaultdict(dict)  # key -> {idx5p: (fromVhNum, idx3p)}
+        self._colors = defaultdict(dict)  # vhNum -> {staple idx5p: 0xRRGGBB}
+        self._sequences = {}  # (strandType, vhNum, idx5p) -> sequence
+    # end def
+
+    ### PUBLIC METHODS FOR QUERYING THE RECORDS ###
+    def isEmpty(self):
+        return len(self._runs) == 0
+    # end def
+
+    def isPending(self, strandType, vhNum):
+        return (strandType, vhNum) in self._runs
+    # end def
+
+    def pendingKeys(self):
+        return self._runs.keys()
+    # end def
+
+    def runs(self, strandType, vhNum):
+        return self._runs[(strandType, vhNum)]
+    # end def
+
+    def hasStrandAt(self, strandType, vhNum, idxLow, idxHigh):
+        """True if any run overlaps [idxLow, idxHigh]."""
+        runs = self._runs[(strandType, vhNum)]
+        i = bisect_right(runs[0::2], idxHigh) - 1
+        return i >= 0 and runs[2*i + 1] >= idxLow
+    # end def
+
+    def indexOfRightmostNonemptyBase(self, strandType, vhNum):
+        runs = self._runs[(strandType, vhNum)]
+        return runs[-1] if runs else 0
+    # end def
+
+    def legacyArray(self, strandType, vhNum, numBases):
+        key = (strandType, vhNum)
+        return legacyArrayFromRuns(vhNum, strandType, numBases,
+                                   self._runs[key],
+                                   self._xovers3p.get(key, {}),
+                                   self._xovers5p.get(key, {}))
+    # end def
+
+    def crossovers(self, strandType, vhNum):
+        """Flat (vhNum, idx3p, toVhNum, idx5p) edges leaving the helix."""
+        ret = []
+        for idx3p, (toVhNum, idx5p) in \
+                    sorted(self._xovers3p.get((strandType, vhNum), {}).items()):
+            ret.extend((vhNum, idx3p, toVhNum, idx5p))
+        return ret
+    # end def
+
+    def stapleColors(self, vhNum):
+        """
+        [[idx5p, 0xRRGGBB], ...] for the staple oligos that start on the
+        helix, as stored in the legacy stap_colors field.
+        """
+        key = (StrandType.Staple, vhNum)
+        default = int(styles.DEFAULT_STAP_COLOR[1:], 16)
+        colors = self._colors.get(vhNum, {})
+        xovers5p = self._xovers5p.get(key, {})
+        ret = []
+        for idx5p in self._idxs5p(key):
+            if idx5p not in xovers5p:
+                ret.append([idx5p, colors.get(idx5p, default)])
+        return ret
+    # end def
+
+    def sequences(self):
+        """Yields (strandType, vhNum, idx5p, sequence) not yet applied."""
+        for (strandType, vhNum, idx5p), seq in self._sequences.iteritems():
+            yield strandType, vhNum, idx5p, seq
+    # end def
+
+    def staple5pEnds(self):
+        """
+        Yields (vhNum, idx5p, color) for the 5' end of every pending staple
+        oligo, with color as a '#rrggbb' string.
+        """
+        return self.oligo5pEnds(StrandType.Staple)
+    # end def
+
+    def oligo5pEnds(self, strandType):
+        """
+        Yields (vhNum, idx5p, color) for the 5' end of every pending oligo
+        of strandType. Pending scaffolds have the default scaffold color.
+        """
+        if strandType == StrandType.Staple:
+            default = int(styles.DEFAULT_STAP_COLOR[1:], 16)
+        else:
+            default = int(styles.DEFAULT_SCAF_COLOR[1:], 16)
+        for key in sorted(self._runs):
+            if key[0] != strandType:
+                continue
+            vhNum = key[1]
+            xovers5p = self._xovers5p.get(key, {})
+            colors = self._colors.get(vhNum, {}) \
+                            if strandType == StrandType.Staple else {}
+            for idx5p in self._idxs5p(key):
+                if idx5p not in xovers5p:  # else not the 5' end of an oligo
+                    yield vhNum, idx5p, '#%06x' % colors.get(idx5p, default)
+    # end def
+
+    def stapleExportRow(self, vhNum, idx5p, color, visited=None):
+        """
+        Follows the pending staple oligo that starts at vhNum[idx5p] and
+        returns its export row, like Oligo.exportRow. visited, if given,
+        collects the (vhNum, low) of each run on the way.
+        """
+        strandType = StrandType.Staple
+        insertions = self._part.insertions()
+        length = 0
+        for curVh, lo, hi in self.iterOligoRuns(strandType, vhNum, idx5p):
+            if visited != None:
+                visited.add((curVh, lo))
+            length += hi - lo + 1
+            insDict = insertions[self._part.virtualHelix(curVh).coord()]
+            if hi - lo + 1 < len(insDict):
+                # probe the run's indices rather than the helix's insertions
+                runInsertions = (insDict.get(i) for i in xrange(lo, hi + 1))
+            else:
+                runInsertions = (insertion for idx, insertion in \
+                                    insDict.iteritems() if lo <= idx <= hi)
+            for insertion in runInsertions:
+                if insertion != None:
+                    length += insertion.length()
+        idx3p = hi if isDrawn5to3(curVh, strandType) else lo
+        return (vhNum, idx5p, curVh, idx3p, '?' * length, length, color)
+    # end def
+
+    def iterOligoRuns(self, strandType, vhNum, idx5p):
+        """
+        Yields (vhNum, low, high) for each run of the pending oligo that
+        starts at vhNum[idx5p], from its 5' end to its 3' end.
+        """
+        curVh, curIdx = vhNum, idx5p
+        while True:
+            lo, hi = self._runAt((strandType, curVh), curIdx)
+            yield curVh, lo, hi
+            idx3p = hi if isDrawn5to3(curVh, strandType) else lo
+            nxt = self._xovers3p.get((strandType, curVh), {}).get(idx3p)
+            if nxt == None:
+                break
+            curVh, curIdx = nxt
+    # end def
+
+    def iterStapleExportRows(self, visited=None):
+        """Yields the export row of every pending staple oligo."""
+        for vhNum, idx5p, color in self.staple5pEnds():
+            yield self.stapleExportRow(vhNum, idx5p, color, visited)
+    # end def
+
+    def stapleLoopKeys(self):
+        """
+        Keys of the pending staple StrandSets that are part of a circular
+        oligo, which has no 5' end and therefore no export row.
+        """
+        visited = set()
+        for row in self.iterStapleExportRows(visited):
+            pass
+        loops = set()
+        for key in self._runs:
+            if key[0] != StrandType.Staple:
+                continue
+            runs = self._runs[key]
+            for i in xrange(0, len(runs), 2):
+                if (key[1], runs[i]) not in visited:
+                    loops.add(key)
+        return loops
+    # end def
+
+    ### PUBLIC METHODS FOR EDITING THE RECORDS ###
+    def addStrandSet(self, strandType, vhNum, runs, xovers):
+        """
+        Stores runs (flat low, high list) for a StrandSet, and xovers as a
+        flat (vhNum, idx3p, toVhNum, idx5p) list of the crossovers that
+        leave its 3' ends.
+        """
+        key = (strandType, vhNum)
+        self._runs[key] = list(runs)
+        for i in xrange(0, len(xovers), 4):
+            fromVh, idx3p, toVh, idx5p = xovers[i:i + 4]
+            self._xovers3p[key][idx3p] = (toVh, idx5p)
+            self._xovers5p[(strandType, toVh)][idx5p] = (fromVh, idx3p)
+    # end def
+
+    def setStapleColors(self, vhNum, colors):
+        """colors is a list of [idx5p, 0xRRGGBB] pairs."""
+        self._colors[vhNum].update((idx, color) for idx, color in colors)
+    # end def
+
+    def setSequence(self, strandType, vhNum, idx5p, sequence):
+        self._sequences[(strandType, vhNum, idx5p)] = sequence
+    # end def
+
+    def materialize(self, strandType, vhNum):
+        """
+        Builds the Strands, crossovers and Oligos for the pending StrandSet
+        and everything of the same type it is connected to, without using
+        the undo stack.
+        """
+        part = self._part
+        keys = self._component(strandType, vhNum)
+        strandSets = []
+        for key in keys:
+            strandSet = part.virtualHelix(key[1]).getStrandSetByType(strandType)
+            strandSet.setPending(False)
+            strandSets.append((key, strandSet, self._runs.pop(key)))
+        for key, strandSet, runs in strandSets:
+            for i in xrange(0, len(runs), 2):
+                strandSet.createStrand(runs[i], runs[i + 1], useUndoStack=False)
+        for key, strandSet, runs in strandSets:
+            self._xovers5p.pop(key, None)
+            for idx3p, (toVhNum, idx5p) in self._xovers3p.pop(key, {}).iteritems():
+                strand5p = strandSet.getStrand(idx3p)
+                toStrandSet = part.virtualHelix(toVhNum).getStrandSetByType(strandType)
+                strand3p = toStrandSet.getStrand(idx5p)
+                part.createXover(strand5p, idx3p, strand3p, idx5p,
+                                 useUndoStack=False)
+        oligos = set()
+        for key, strandSet, runs in strandSets:
+            oligos.update(strand.oligo() for strand in strandSet)
+        for oligo in oligos:
+            strand5p = oligo.strand5p()
+            key5p = (strandType, strand5p.virtualHelix().number(),
+                     strand5p.idx5Prime())
+            if strandType == StrandType.Staple:
+                c = self._colors.get(key5p[1], {}).get(key5p[2])
+                color = styles.DEFAULT_STAP_COLOR if c == None else '#%06x' % c
+            else:
+                color = styles.DEFAULT_SCAF_COLOR
+            oligo.applyColor(color, useUndoStack=False)
+            seq = self._sequences.pop(key5p, None)
+            if seq:
+                oligo.applySequence(seq, useUndoStack=False)
+        if strandType == StrandType.Staple:
+            for key, strandSet, runs in strandSets:
+                self._colors.pop(key[1], None)
+    # end def
+
+    def materializeAll(self):
+        while self._runs:
+            strandType, vhNum = next(iter(self._runs))
+            self.materialize(strandType, vhNum)
+    # end def
+
+    ### PRIVATE SUPPORT METHODS ###
+    def _component(self, strandType, vhNum):
+        """Pending keys reachable from (strandType, vhNum) via crossovers."""
+        start = (strandType, vhNum)
+        seen = set([start])
+        stack = [start]
+        while stack:
+            key = stack.pop()
+            neighbors = self._xovers3p.get(key, {}).values() + \
+                        self._xovers5p.get(key, {}).values()
+            for otherVh, idx in neighbors:
+                other = (strandType, otherVh)
+                if other not in seen and other in self._runs:
+                    seen.add(other)
+                    stack.append(other)
+        return sorted(seen)
+    # end def
+
+    def _idxs5p(self, key):
+        """5' idx of each run."""
+        runs = self._runs[key]
+        if isDrawn5to3(key[1], key[0]):
+            return runs[0::2]
+        else:
+            return runs[1::2]
+    # end def
+
+    def _runAt(self, key, idx):
+        runs = self._runs[key]
+        # lows and highs interleave in order, so no slice is needed
+        i = (bisect_right(runs, idx) - 1) // 2
+        return runs[2*i], runs[2*i + 1]
+    # end def
+# end class
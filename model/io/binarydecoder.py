@@ -0,0 +1,366 @@
+# The MIT License
+#
+# Copyright (c) 2011 Wyss Institute at Harvard University
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# http://www.opensource.org/licenses/mit-license.php
+
+import json
+import mmap
+from bisect import bisect_right
+
+from model.decorators.insertion import Insertion
+from model.enum import StrandType
+from model.helixrecords import HelixRecords
+from binaryformat import MAGIC, VERSION, HEADER, SECTION, HELIX, SECTIONS
+from binaryformat import unpackInts, legacyArrayFromRuns
+from legacydecoder import create_part, applyDefaultColors, legacyColorName
+
+
+class BinaryDesign(object):
+    """
+    Read-only view of a binary native design. data may be a str or an
+    mmap; only the header, directory and helix table are parsed up front,
+    the strand tables are sliced out of data when a helix is asked for.
+    """
+    def __init__(self, data):
+        if data[:len(MAGIC)] != MAGIC:
+            raise ValueError("Not a binary caDNAno design")
+        self._data = data
+        magic, version, flags, numBases, numHelices, nameLen = \
+                                    HEADER.unpack_from(data, 0)
+        if version > VERSION:
+            raise ValueError("Unsupported binary design version %d" % version)
+        self._numBases = numBases
+        pos = HEADER.size
+        self._name = data[pos:pos + nameLen].decode('utf-8')
+        pos += nameLen
+        self._sections = {}
+        for name, width in SECTIONS:
+            self._sections[name] = (SECTION.unpack_from(data, pos), width)
+            pos += SECTION.size
+        self._helices = []
+        self._helixByNum = {}
+        for i in xrange(numHelices):
+            helix = HELIX.unpack_from(data, pos)
+            self._helixByNum[helix[0]] = len(self._helices)
+            self._helices.append(helix)
+            pos += HELIX.size
+        self._xovers = {}  # cache of unpacked crossover tables
+        self._seqIndex = None
+    # end def
+
+    @classmethod
+    def fromFile(cls, path):
+        """Memory maps the file at path; the mapping is private and read-only."""
+        with open(path, 'rb') as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(data)
+    # end def
+
+    def close(self):
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+    # end def
+
+    ### PUBLIC METHODS FOR QUERYING THE DESIGN ###
+    def name(self):
+        return self._name
+    # end def
+
+    def numBases(self):
+        return self._numBases
+    # end def
+
+    def helixNumbers(self):
+        """Helix numbers in file (helix order list) order."""
+        return [helix[0] for helix in self._helices]
+    # end def
+
+    def coord(self, vhNum):
+        helix = self._helices[self._helixByNum[vhNum]]
+        return helix[1], helix[2]
+    # end def
+
+    def strands(self, vhNum, strandType):
+        """Flat array('i') of (low, high) runs for one helix and strand type."""
+        helix = self._helices[self._helixByNum[vhNum]]
+        if strandType == StrandType.Scaffold:
+            start, count = helix[3], helix[4]
+        else:
+            start, count = helix[5], helix[6]
+        return self._records('runs', start, count)
+    # end def
+
+    def insertions(self, vhNum):
+        """Flat array('i') of (idx, loop, skip) records for one helix."""
+        helix = self._helices[self._helixByNum[vhNum]]
+        return self._records('insertions', helix[7], helix[8])
+    # end def
+
+    def colors(self, vhNum):
+        """Flat array('i') of (5' idx, 0xRRGGBB) records for one helix."""
+        helix = self._helices[self._helixByNum[vhNum]]
+        return self._records('colors', helix[9], helix[10])
+    # end def
+
+    def xovers(self, strandType):
+        """Flat array('i') of (fromVh, from3pIdx, toVh, to5pIdx) edges."""
+        key = 'scafXovers' if strandType == StrandType.Scaffold else 'stapXovers'
+        if key not in self._xovers:
+            (offset, count), width = self._sections[key]
+            self._xovers[key] = self._records(key, 0, count)
+        return self._xovers[key]
+    # end def
+
+    def sequence(self, strandType, vhNum, idx5p):
+        """
+        Returns the applied sequence of the oligo whose 5' end is at
+        (vhNum, idx5p), or None.
+        """
+        if self._seqIndex == None:
+            (offset, count), width = self._sections['sequences']
+            seqs = self._records('sequences', 0, count)
+            self._seqIndex = [tuple(seqs[i:i + 3]) for i in xrange(0, len(seqs), 5)]
+            self._seqs = seqs
+        key = (strandType, vhNum, idx5p)
+        i = bisect_right(self._seqIndex, key) - 1
+        if i < 0 or self._seqIndex[i] != key:
+            return None
+        start, length = self._seqs[5*i + 3], self._seqs[5*i + 4]
+        offset = self._sections['sequenceData'][0][0]
+        return self._data[offset + start:offset + start + length]
+    # end def
+
+    def sequences(self):
+        """Yields (strandType, vhNum, idx5p, sequence) for all sequences."""
+        (offset, count), width = self._sections['sequences']
+        for i in xrange(count):
+            strandType, vhNum, idx5p = self._records('sequences', i, 1)[:3]
+            yield strandType, vhNum, idx5p, self.sequence(strandType, vhNum, idx5p)
+    # end def
+
+    def toLegacyDict(self):
+        """Returns the design as a legacy JSON dict."""
+        xovers3p = {}
+        xovers5p = {}
+        for strandType in (StrandType.Scaffold, StrandType.Staple):
+            edges = self.xovers(strandType)
+            for i in xrange(0, len(edges), 4):
+                fromVh, fromIdx, toVh, toIdx = edges[i:i + 4]
+                xovers3p.setdefault((strandType, fromVh), {})[fromIdx] = (toVh, toIdx)
+                xovers5p.setdefault((strandType, toVh), {})[toIdx] = (fromVh, fromIdx)
+        numBases = self._numBases
+        vhList = []
+        for helix in self._helices:
+            num, row, col = helix[0:3]
+            arrays = []
+            for strandType in (StrandType.Scaffold, StrandType.Staple):
+                arrays.append(legacyArrayFromRuns(num, strandType, numBases,
+                                self.strands(num, strandType),
+                                xovers3p.get((strandType, num), {}),
+                                xovers5p.get((strandType, num), {})))
+            loops = [0] * numBases
+            skips = [0] * numBases
+            ins = self.insertions(num)
+            for i in xrange(0, len(ins), 3):
+                loops[ins[i]] = ins[i + 1]
+                skips[ins[i]] = ins[i + 2]
+            colors = self.colors(num)
+            vhList.append({"row": row,
+                           "col": col,
+                           "num": num,
+                           "scaf": arrays[0],
+                           "stap": arrays[1],
+                           "loop": loops,
+                           "skip": skips,
+                           "scafLoop": [],
+                           "stapLoop": [],
+                           "stap_colors": [[colors[i], colors[i + 1]] \
+                                       for i in xrange(0, len(colors), 2)]})
+        return {"name": self._name, "vstrands": vhList}
+    # end def
+
+    ### PRIVATE SUPPORT METHODS ###
+    def _records(self, section, start, count):
+        (offset, total), width = self._sections[section]
+        begin = offset + 4*width*start
+        return unpackInts(self._data[begin:begin + 4*width*count])
+    # end def
+# end class
+
+
+def legacy_dict_from_binary(data):
+    """Returns the legacy JSON dict for binary design data."""
+    return BinaryDesign(data).toLegacyDict()
+# end def
+
+def binary_to_json(binaryPath, jsonPath):
+    """Converts a binary native file to a caDNAno2 legacy JSON file."""
+    design = BinaryDesign.fromFile(binaryPath)
+    try:
+        obj = design.toLegacyDict()
+    finally:
+        design.close()
+    with open(jsonPath, 'w') as f:
+        json.dump(obj, f, separators=(',', ':'))
+# end def
+
+def decode_binary(document, data, lazyMinHelices=0):
+    """
+    Imports binary design data into document, then applies any stored
+    oligo sequences. Sequences of lazily opened strands are applied when
+    those are built.
+    """
+    design = BinaryDesign(data)
+    lazy = 0 < lazyMinHelices <= len(design.helixNumbers())
+    for progress in iter_import_binary_design(document, design, lazy):
+        pass
+    coords = dict((num, design.coord(num)) for num in design.helixNumbers())
+    apply_sequences(document.selectedPart(), design.sequences(), coords)
+# end def
+
+def iter_import_binary_design(document, design, lazy=False):
+    """
+    Imports a BinaryDesign into document, yielding (done, total) like
+    iter_import_legacy_dict. Strands and crossovers are created straight
+    from the run and crossover tables, without per-base legacy arrays.
+    """
+    numbers = design.helixNumbers()
+    vhNumToCoord = dict((num, design.coord(num)) for num in numbers)
+    orderedCoordList = [vhNumToCoord[num] for num in numbers]
+    part = create_part(document, design.numBases(), orderedCoordList)
+    numSteps = len(numbers) * (2 if lazy else 4)
+    step = 0
+    # make sure we retain the original order
+    for vhNum in sorted(vhNumToCoord.iterkeys()):
+        row, col = vhNumToCoord[vhNum]
+        part.createVirtualHelix(row, col, useUndoStack=False)
+        step += 1
+        yield step, numSteps
+    part.setImportedVHelixOrder(orderedCoordList)
+
+    if lazy:
+        import_binary_helix_records(part, design)
+        yield numSteps, numSteps
+        return
+
+    strandSets = {}
+    for vhNum in numbers:
+        vh = part.virtualHelixAtCoord(vhNumToCoord[vhNum])
+        for strandType in (StrandType.Scaffold, StrandType.Staple):
+            strandSet = strandSets[(strandType, vhNum)] = \
+                                        vh.getStrandSetByType(strandType)
+            runs = design.strands(vhNum, strandType)
+            for i in xrange(0, len(runs), 2):
+                strandSet.createStrand(runs[i], runs[i + 1],
+                                       useUndoStack=False)
+        step += 1
+        yield step, numSteps
+
+    for strandType in (StrandType.Scaffold, StrandType.Staple):
+        edges = design.xovers(strandType)
+        for i in xrange(0, len(edges), 4):
+            fromVh, idx3p, toVh, idx5p = edges[i:i + 4]
+            strand5p = strandSets[(strandType, fromVh)].getStrand(idx3p)
+            strand3p = strandSets[(strandType, toVh)].getStrand(idx5p)
+            part.createXover(strand5p, idx3p, strand3p, idx5p,
+                             useUndoStack=False)
+    step += len(numbers)
+    yield step, numSteps
+
+    applyDefaultColors(part)
+    for vhNum in numbers:
+        scafStrandSet = strandSets[(StrandType.Scaffold, vhNum)]
+        stapStrandSet = strandSets[(StrandType.Staple, vhNum)]
+        ins = design.insertions(vhNum)
+        for i in xrange(0, len(ins), 3):
+            baseIdx, length = ins[i], ins[i + 1] + ins[i + 2]
+            strand = scafStrandSet.getStrand(baseIdx) or \
+                     stapStrandSet.getStrand(baseIdx)
+            if length != 0 and strand:
+                strand.addInsertion(baseIdx, length, useUndoStack=False)
+        colors = design.colors(vhNum)
+        for i in xrange(0, len(colors), 2):
+            strand = stapStrandSet.getStrand(colors[i])
+            strand.oligo().applyColor(legacyColorName(colors[i + 1]),
+                                      useUndoStack=False)
+        step += 1
+        yield step, numSteps
+# end def
+
+def import_binary_helix_records(part, design):
+    """
+    Stores the strands of design as pending HelixRecords on part, passing
+    on the stored runs and crossovers as they are, and installs insertions
+    and skips directly since they belong to the helix.
+    """
+    records = HelixRecords(part)
+    xovers = {}  # (strandType, fromVh) -> flat crossover list
+    for strandType in (StrandType.Scaffold, StrandType.Staple):
+        edges = design.xovers(strandType)
+        for i in xrange(0, len(edges), 4):
+            xovers.setdefault((strandType, edges[i]), []).extend(edges[i:i + 4])
+    for vhNum in design.helixNumbers():
+        coord = design.coord(vhNum)
+        vh = part.virtualHelixAtCoord(coord)
+        runs = {}
+        for strandType in (StrandType.Scaffold, StrandType.Staple):
+            runs[strandType] = design.strands(vhNum, strandType)
+            records.addStrandSet(strandType, vhNum, runs[strandType],
+                                 xovers.get((strandType, vhNum), ()))
+            vh.getStrandSetByType(strandType).setPending(True)
+        colors = design.colors(vhNum)
+        records.setStapleColors(vhNum, [colors[i:i + 2] \
+                                        for i in xrange(0, len(colors), 2)])
+        insertionDict = part.insertions()[coord]
+        ins = design.insertions(vhNum)
+        for i in xrange(0, len(ins), 3):
+            baseIdx, sumOfInsertSkip = ins[i], ins[i + 1] + ins[i + 2]
+            if sumOfInsertSkip != 0 and \
+                    (_isInRuns(runs[StrandType.Scaffold], baseIdx) or \
+                     _isInRuns(runs[StrandType.Staple], baseIdx)):
+                length = -1 if sumOfInsertSkip < 0 else sumOfInsertSkip
+                insertionDict[baseIdx] = Insertion(baseIdx, length)
+    part.setHelixRecords(records)
+# end def
+
+def _isInRuns(runs, idx):
+    """True if idx is in one of the sorted (low, high) runs of flat runs."""
+    i = bisect_right(runs, idx)
+    return i % 2 == 1 or (i > 0 and runs[i - 1] == idx)
+# end def
+
+def apply_sequences(part, sequences, coords):
+    """
+    Applies (strandType, vhNum, idx5p, sequence) tuples to the oligos of
+    part, where coords maps the vhNum of the file to its (row, col).
+    Sequences of pending strand sets are stored on the HelixRecords.
+    """
+    records = part.helixRecords()
+    for strandType, vhNum, idx5p, seq in sequences:
+        if records != None and records.isPending(strandType, vhNum):
+            records.setSequence(strandType, vhNum, idx5p, seq)
+            continue
+        vh = part.virtualHelixAtCoord(coords[vhNum])
+        strand = vh.getStrandSetByType(strandType).getStrand(idx5p)
+        if strand != None:
+            strand.oligo().applySequence(seq, useUndoStack=False)
+# end def
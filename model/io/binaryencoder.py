@@ -0,0 +1,218 @@
+# The MIT License
+#
+# Copyright (c) 2011 Wyss Institute at Harvard University
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# http://www.opensource.org/licenses/mit-license.php
+
+import json
+from array import array
+from os.path import basename
+
+from model.enum import StrandType
+from binaryformat import MAGIC, VERSION, HEADER, SECTION, HELIX, SECTIONS
+from binaryformat import SECTION_NAMES, packInts, runsFromLegacyArray
+
+
+class _BinaryWriter(object):
+    """Collects helix records and packed tables, then writes them out."""
+    def __init__(self, name, numBases):
+        self.name = name.encode('utf-8') if isinstance(name, unicode) else name
+        self.numBases = numBases
+        self.helices = []
+        self.tables = dict((name, array('i')) for name in SECTION_NAMES)
+        self.seqData = []
+        self._seqOffset = 0
+    # end def
+
+    def addHelix(self, num, row, col, scafRuns, stapRuns, insertions, colors):
+        t = self.tables
+        runs = t['runs']
+        scafStart = len(runs) / 2
+        runs.extend(scafRuns)
+        stapStart = len(runs) / 2
+        runs.extend(stapRuns)
+        insStart = len(t['insertions']) / 3
+        t['insertions'].extend(insertions)
+        colorStart = len(t['colors']) / 2
+        t['colors'].extend(colors)
+        self.helices.append((num, row, col,
+                             scafStart, len(scafRuns) / 2,
+                             stapStart, len(stapRuns) / 2,
+                             insStart, len(insertions) / 3,
+                             colorStart, len(colors) / 2))
+    # end def
+
+    def addXovers(self, strandType, xovers):
+        key = 'scafXovers' if strandType == StrandType.Scaffold else 'stapXovers'
+        self.tables[key].extend(xovers)
+    # end def
+
+    def addSequence(self, strandType, vhNum, idx5p, sequence):
+        sequence = str(sequence)
+        self.tables['sequences'].extend((strandType, vhNum, idx5p,
+                                         self._seqOffset, len(sequence)))
+        self.seqData.append(sequence)
+        self._seqOffset += len(sequence)
+    # end def
+
+    def write(self, io):
+        t = self.tables
+        # sort the sequence index so readers can bisect it
+        seqs = t['sequences']
+        rows = sorted(tuple(seqs[i:i + 5]) for i in xrange(0, len(seqs), 5))
+        t['sequences'] = array('i', [x for row in rows for x in row])
+        blobs = []
+        for name, width in SECTIONS:
+            if name == 'sequenceData':
+                data = ''.join(self.seqData)
+                blobs.append((data, len(data)))
+            else:
+                blobs.append((packInts(t[name]), len(t[name]) / width))
+        offset = HEADER.size + len(self.name) + SECTION.size * len(SECTIONS) + \
+                 HELIX.size * len(self.helices)
+        io.write(HEADER.pack(MAGIC, VERSION, 0, self.numBases,
+                             len(self.helices), len(self.name)))
+        io.write(self.name)
+        for data, count in blobs:
+            io.write(SECTION.pack(offset, count))
+            offset += len(data)
+        for helix in self.helices:
+            io.write(HELIX.pack(*helix))
+        for data, count in blobs:
+            io.write(data)
+    # end def
+# end class
+
+
+def encode_binary(document, helixOrderList, io):
+    """
+    Writes the selected part of document to io in the binary native format.
+    Applied oligo sequences are stored in the packed sequence table.
+    """
+    snapshot_binary(document, helixOrderList, basename(str(io.name))).write(io)
+# end def
+
+def snapshot_binary(document, helixOrderList, name):
+    """
+    Packs the selected part of document into a writer whose write(io)
+    produces the binary file. The writer holds no model references, so
+    write can be called from another thread.
+    """
+    part = document.selectedPart()
+    writer = _BinaryWriter(name, part.maxBaseIdx() + 1)
+    for row, col in helixOrderList:
+        vh = part.virtualHelixAtCoord((row, col))
+        num = vh.number()
+        runs = []
+        for strandType in (StrandType.Scaffold, StrandType.Staple):
+            strandSet = vh.getStrandSetByType(strandType)
+            typeRuns, xovers = _runsFromStrandSet(strandSet, num)
+            runs.append(typeRuns)
+            writer.addXovers(strandType, xovers)
+        insertions = array('i')
+        for idx, insertion in sorted(part.insertions()[(row, col)].iteritems()):
+            if insertion.isSkip():
+                insertions.extend((idx, 0, insertion.length()))
+            else:
+                insertions.extend((idx, insertion.length(), 0))
+        colors = [x for pair in vh.stapleStrandSet().getLegacyColorList() \
+                                                            for x in pair]
+        writer.addHelix(num, row, col, runs[0], runs[1], insertions, colors)
+    for oligo in part.loadedOligos():
+        seq = oligo.sequence()
+        if seq:
+            strand5p = oligo.strand5p()
+            writer.addSequence(strand5p.strandType(),
+                               strand5p.virtualHelix().number(),
+                               strand5p.idx5Prime(), seq)
+    records = part.helixRecords()
+    if records != None:
+        for strandType, vhNum, idx5p, seq in records.sequences():
+            writer.addSequence(strandType, vhNum, idx5p, seq)
+    return writer
+# end def
+
+def _runsFromStrandSet(strandSet, num):
+    """
+    Returns flat runs and crossover edges for a StrandSet. Strands that
+    are joined end to end at adjacent bases are a single run, matching
+    what runsFromLegacyArray reads back from the legacy JSON.
+    """
+    if strandSet.isPending():
+        records = strandSet.part().helixRecords()
+        strandType = strandSet.strandType()
+        return records.runs(strandType, num), records.crossovers(strandType, num)
+    runs = array('i')
+    xovers = array('i')
+    is5to3 = strandSet.isDrawn5to3()
+    prev = None
+    for strand in strandSet:
+        lo, hi = strand.idxs()
+        if prev != None and runs[-1] == lo - 1:
+            # 5' -> 3' link between neighbors that continues the run
+            if is5to3 and prev.connection3p() == strand or \
+                    not is5to3 and strand.connection3p() == prev:
+                runs[-1] = hi
+                prev = strand
+                continue
+        runs.extend((lo, hi))
+        prev = strand
+    # crossovers leave from the 3' end of runs
+    for i in xrange(0, len(runs), 2):
+        idx3p = runs[i + 1] if is5to3 else runs[i]
+        strand = strandSet.getStrand(idx3p)
+        s3p = strand.connection3p()
+        if s3p != None:
+            xovers.extend((num, idx3p,
+                           s3p.virtualHelix().number(), s3p.idx5Prime()))
+    return runs, xovers
+# end def
+
+def binary_from_legacy_dict(obj, io):
+    """Converts a legacy JSON dict (as read from file) to the binary format."""
+    vstrands = obj['vstrands']
+    numBases = len(vstrands[0]['scaf']) if vstrands else 0
+    writer = _BinaryWriter(obj.get('name', ''), numBases)
+    for helix in vstrands:
+        num = helix['num']
+        runs = []
+        for strandType, key in ((StrandType.Scaffold, 'scaf'),
+                                (StrandType.Staple, 'stap')):
+            typeRuns, xovers = runsFromLegacyArray(num, strandType, helix[key])
+            runs.append(typeRuns)
+            writer.addXovers(strandType, xovers)
+        insertions = []
+        for idx, (loop, skip) in enumerate(zip(helix['loop'], helix['skip'])):
+            if loop != 0 or skip != 0:
+                insertions.extend((idx, loop, skip))
+        colors = [x for pair in helix['stap_colors'] for x in pair]
+        writer.addHelix(num, helix['row'], helix['col'], runs[0], runs[1],
+                        insertions, colors)
+    writer.write(io)
+# end def
+
+def json_to_binary(jsonPath, binaryPath):
+    """Converts a caDNAno2 legacy JSON file to a binary native file."""
+    with open(jsonPath) as f:
+        obj = json.load(f)
+    with open(binaryPath, 'wb') as f:
+        binary_from_legacy_dict(obj, f)
+# end def
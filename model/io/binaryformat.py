@@ -0,0 +1,156 @@
+# The MIT License
+#
+# Copyright (c) 2011 Wyss Institute at Harvard University
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# http://www.opensource.org/licenses/mit-license.php
+
+"""
+binaryformat
+Shared definitions for the compact binary native format (.cn2b).
+
+Layout (all integers little-endian):
+    header          HEADER: magic, version, flags, numBases, numHelices,
+                    length of the utf-8 encoded design name
+    name            the design name
+    directory       one SECTION (offset, count) per entry of SECTIONS
+    helix table     numHelices HELIX records, in helix order
+    sections        packed int32 tables, see SECTIONS
+
+Strands are stored as (low, high) runs per helix and strand type, and
+crossovers as (fromVh, from3pIdx, toVh, to5pIdx) edges, so the file size
+grows with the design content instead of with helix length x helix count.
+"""
+
+import sys
+import struct
+from array import array
+
+from model.enum import StrandType
+
+MAGIC = 'CN2B'
+VERSION = 1
+EXTENSION = '.cn2b'
+
+HEADER = struct.Struct('<4sHHIII')
+SECTION = struct.Struct('<II')  # byte offset, number of records
+# num, row, col, scafRunStart, scafRunCount, stapRunStart, stapRunCount,
+# insertionStart, insertionCount, colorStart, colorCount
+HELIX = struct.Struct('<iii8I')
+
+# section name, ints per record
+SECTIONS = (('runs', 2),          # lowIdx, highIdx
+            ('scafXovers', 4),    # fromVh, from3pIdx, toVh, to5pIdx
+            ('stapXovers', 4),    # fromVh, from3pIdx, toVh, to5pIdx
+            ('insertions', 3),    # idx, loop length, skip length
+            ('colors', 2),        # 5' idx, 0xRRGGBB
+            ('sequences', 5),     # strandType, vhNum, 5' idx, offset, length
+            ('sequenceData', 0))  # raw bytes, count is the byte length
+SECTION_NAMES = [name for name, width in SECTIONS]
+
+assert array('i').itemsize == 4
+
+
+def isBinaryDesign(data):
+    """Returns True if data (str or mmap) starts with the format magic."""
+    return data[:len(MAGIC)] == MAGIC
+# end def
+
+def packInts(ints):
+    """Returns the little-endian byte string for an array('i')."""
+    if sys.byteorder == 'big':
+        ints = array('i', ints)
+        ints.byteswap()
+    return ints.tostring()
+# end def
+
+def unpackInts(data):
+    """Returns an array('i') for a little-endian byte string."""
+    ints = array('i')
+    ints.fromstring(data)
+    if sys.byteorder == 'big':
+        ints.byteswap()
+    return ints
+# end def
+
+def isDrawn5to3(vhNum, strandType):
+    """Legacy parity rule: scaffold runs 5'->3' on even helices."""
+    return (vhNum % 2 == 0) == (strandType == StrandType.Scaffold)
+# end def
+
+def runsFromLegacyArray(vhNum, strandType, bases):
+    """
+    Splits a legacy per-base array ([5'vh, 5'idx, 3'vh, 3'idx] per base)
+    into (low, high) runs of naturally linked bases. Returns the flat
+    run list and the crossover edges leaving the 3' ends of the runs as
+    a flat (fromVh, from3pIdx, toVh, to5pIdx) list.
+    """
+    runs = []
+    xovers = []
+    is5to3 = isDrawn5to3(vhNum, strandType)
+    lowIdx = None
+    prev = None
+    for idx, base in enumerate(bases):
+        if base[0] == -1 and base[2] == -1:  # null base
+            if lowIdx != None:
+                runs.extend((lowIdx, idx - 1))
+                lowIdx = None
+            prev = None
+            continue
+        if lowIdx != None:
+            # the link is always recorded on the 3' field of the 5' base
+            if is5to3:
+                linked = prev[2] == vhNum and prev[3] == idx
+            else:
+                linked = base[2] == vhNum and base[3] == idx - 1
+            if not linked:
+                runs.extend((lowIdx, idx - 1))
+                lowIdx = None
+        if lowIdx == None:
+            lowIdx = idx
+        prev = base
+    if lowIdx != None:
+        runs.extend((lowIdx, len(bases) - 1))
+    for i in xrange(0, len(runs), 2):
+        idx3p = runs[i + 1] if is5to3 else runs[i]
+        base = bases[idx3p]
+        if base[2] != -1:
+            xovers.extend((vhNum, idx3p, base[2], base[3]))
+    return runs, xovers
+# end def
+
+def legacyArrayFromRuns(vhNum, strandType, numBases, runs, xovers3p, xovers5p):
+    """
+    Inverse of runsFromLegacyArray. xovers3p maps a run's 3' idx to the
+    (toVh, toIdx) it connects to, xovers5p maps a run's 5' idx to the
+    (fromVh, fromIdx) connecting into it.
+    """
+    ret = [[-1, -1, -1, -1] for i in xrange(numBases)]
+    is5to3 = isDrawn5to3(vhNum, strandType)
+    step = 1 if is5to3 else -1
+    for i in xrange(0, len(runs), 2):
+        lo, hi = runs[i], runs[i + 1]
+        for idx in xrange(lo, hi + 1):
+            ret[idx] = [vhNum, idx - step, vhNum, idx + step]
+        idx5p, idx3p = (lo, hi) if is5to3 else (hi, lo)
+        ret[idx5p][0:2] = list(xovers5p.get(idx5p, (-1, -1)))
+        ret[idx3p][2:4] = list(xovers3p.get(idx3p, (-1, -1)))
+    return ret
+# end def
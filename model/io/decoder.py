@@ -24,15 +24,27 @@
 
 import json
 from exceptions import ImportError
-from legacydecoder import import_legacy_dict
-from ui.dialogs.ui_latticetype import Ui_LatticeType
+from model.enum import StrandType
+from legacydecoder import import_legacy_dict, iter_import_legacy_dict
+from binaryformat import isBinaryDesign, runsFromLegacyArray
+from binarydecoder import BinaryDesign, decode_binary, apply_sequences
+from binarydecoder import iter_import_binary_design
 import util, cadnano
 if cadnano.app().isGui():#headless:
     from ui.dialogs.ui_latticetype import Ui_LatticeType
     util.qtWrapImport('QtGui', globals(),  ['QDialog', 'QDialogButtonBox'])
 
 
-def decode(document, string):
+def decode(document, string, lazyMinHelices=0):
+    """
+    Imports a legacy JSON or binary design into document. Designs with at
+    least lazyMinHelices helices (0 disables this) are opened lazily, see
+    import_legacy_dict.
+    """
+    if isBinaryDesign(string):
+        decode_binary(document, string, lazyMinHelices)
+        return
+
     if cadnano.app().isGui():
         # from ui.dialogs.ui_latticetype import Ui_LatticeType
         # util.qtWrapImport('QtGui', globals(),  ['QDialog', 'QDialogButtonBox'])
@@ -54,4 +66,87 @@ def decode(document, string):
     packageObject = json.loads(string)
 
     if packageObject.get('.format', None) != 'caDNAno2':
-        import_legacy_dict(document, packageObject)
\ No newline at end of file
+        numHelices = len(packageObject['vstrands'])
+        lazy = 0 < lazyMinHelices <= numHelices
+        import_legacy_dict(document, packageObject, lazy=lazy)
+# end def
+
+
+class DecodePlan(object):
+    """
+    A parsed design that is ready to be applied to a document. Building a
+    plan touches no model or Qt objects, so it can be done off the GUI
+    thread; applying it with iter_apply_plan cannot. A binary design is
+    kept as its BinaryDesign (design) rather than a legacy dict (obj).
+    """
+    def __init__(self, obj, sequences=(), lazy=False, plannedRuns=None,
+                 design=None):
+        self.obj = obj
+        self.sequences = sequences
+        self.lazy = lazy
+        self.plannedRuns = plannedRuns
+        self.design = design
+    # end def
+
+    def numHelices(self):
+        if self.design != None:
+            return len(self.design.helixNumbers())
+        return len(self.obj['vstrands'])
+# end class
+
+def plan_decode(string, lazyMinHelices=0, progress=None):
+    """
+    Parses a legacy JSON or binary design into a DecodePlan. For lazy opens
+    the strand runs of every helix are split out ahead of time. progress,
+    if given, is called as progress(done, total) after each helix; if it
+    returns True the planning is cancelled and None is returned.
+    """
+    if isBinaryDesign(string):
+        # the binary format already stores runs, so there is nothing to
+        # split out ahead of time
+        design = BinaryDesign(string)
+        numHelices = len(design.helixNumbers())
+        if progress != None and progress(numHelices, numHelices):
+            return None
+        return DecodePlan(None, list(design.sequences()),
+                          0 < lazyMinHelices <= numHelices, design=design)
+    obj = json.loads(string)
+    if obj.get('.format', None) == 'caDNAno2':
+        return DecodePlan(obj)
+    vstrands = obj['vstrands']
+    lazy = 0 < lazyMinHelices <= len(vstrands)
+    plannedRuns = {} if lazy else None
+    for i, helix in enumerate(vstrands):
+        if lazy:
+            vhNum = helix['num']
+            for strandType, key in ((StrandType.Scaffold, 'scaf'),
+                                    (StrandType.Staple, 'stap')):
+                plannedRuns[(strandType, vhNum)] = \
+                        runsFromLegacyArray(vhNum, strandType, helix[key])
+        if progress != None and progress(i + 1, len(vstrands)):
+            return None
+    return DecodePlan(obj, (), lazy, plannedRuns)
+# end def
+
+def iter_apply_plan(document, plan):
+    """
+    Imports a DecodePlan into document, yielding (done, total) as it goes
+    like iter_import_legacy_dict. Must run on the GUI thread.
+    """
+    design = plan.design
+    if design != None:
+        for progress in iter_import_binary_design(document, design,
+                                                  plan.lazy):
+            yield progress
+        coords = dict((num, design.coord(num)) \
+                                        for num in design.helixNumbers())
+        apply_sequences(document.selectedPart(), plan.sequences, coords)
+        design.close()
+        return
+    obj = plan.obj
+    if obj.get('.format', None) == 'caDNAno2':
+        return
+    for progress in iter_import_legacy_dict(document, obj, lazy=plan.lazy,
+                                            plannedRuns=plan.plannedRuns):
+        yield progress
+# end def
@@ -22,10 +22,127 @@
 #
 # http://www.opensource.org/licenses/mit-license.php
 
+from array import array
 from json import dumps
-from legacyencoder import legacy_dict_from_doc
+from os.path import basename
+from model.enum import StrandType
 
 def encode(document, helixOrderList, io):
-    obj = legacy_dict_from_doc(document, io.name, helixOrderList)
-    json_string = dumps(obj, separators=(',',':'))  # compact encoding
-    io.write(json_string)
+    """
+    Writes the document to io in the caDNAno2 legacy JSON format.
+
+    The output is streamed one virtual helix at a time, so memory use is
+    bounded by the size of a single helix instead of the whole design.
+    The result is equivalent to dumping legacy_dict_from_doc with compact
+    separators.
+    """
+    part = document.selectedPart()
+    numBases = part.maxBaseIdx() + 1
+    baseFmt = _legacyBaseFormat(numBases)
+    intFmt = _intListFormat(numBases)
+    _writeHeader(io, basename(str(io.name)))
+    for i, (row, col) in enumerate(helixOrderList):
+        if i > 0:
+            io.write(',')
+        vh = part.virtualHelixAtCoord((row, col))
+        writeHelix(io, part, vh, baseFmt, intFmt)
+    io.write(']}')
+# end def
+
+def writeHelix(io, part, vh, baseFmt=None, intFmt=None):
+    """Writes the legacy JSON object for a single virtual helix to io."""
+    writeHelixSnapshot(io, snapshotHelix(part, vh), baseFmt, intFmt)
+# end def
+
+def snapshotHelix(part, vh):
+    """
+    Copies everything writeHelix needs from vh into plain values, as a
+    (row, col, num, scaf, stap, loop, skip, stapColors) tuple.
+    """
+    numBases = part.maxBaseIdx() + 1
+    row, col = vh.coord()
+    # insertions and skips
+    insts = array('i', [0]) * numBases
+    skips = array('i', [0]) * numBases
+    for idx, insertion in part.insertions()[(row, col)].iteritems():
+        if insertion.isSkip():
+            skips[idx] = insertion.length()
+        else:
+            insts[idx] = insertion.length()
+    # colors
+    stapColors = vh.stapleStrandSet().getLegacyColorList()
+    scaf = vh.getStrandSetByType(StrandType.Scaffold).getLegacyFlatArray()
+    stap = vh.getStrandSetByType(StrandType.Staple).getLegacyFlatArray()
+    return (row, col, vh.number(), scaf, stap, insts, skips, stapColors)
+# end def
+
+def writeHelixSnapshot(io, snapshot, baseFmt=None, intFmt=None):
+    """Writes a helix tuple returned by snapshotHelix to io."""
+    row, col, num, scaf, stap, insts, skips, stapColors = snapshot
+    numBases = len(insts)
+    if baseFmt == None:
+        baseFmt = _legacyBaseFormat(numBases)
+    if intFmt == None:
+        intFmt = _intListFormat(numBases)
+    io.write('{"row":%d,"col":%d,"num":%d,"scaf":' % (row, col, num))
+    io.write(baseFmt % tuple(scaf))
+    io.write(',"stap":')
+    io.write(baseFmt % tuple(stap))
+    io.write(',"loop":')
+    io.write(intFmt % tuple(insts))
+    io.write(',"skip":')
+    io.write(intFmt % tuple(skips))
+    io.write(',"scafLoop":[],"stapLoop":[],"stap_colors":')
+    io.write(dumps(stapColors, separators=(',', ':')))
+    io.write('}')
+# end def
+
+def snapshotDesign(document, helixOrderList):
+    """
+    Returns a list of snapshotHelix tuples for the selected part of
+    document. The snapshot shares no state with the model, so it can be
+    written by writeDesignSnapshot on another thread while editing goes on.
+    """
+    part = document.selectedPart()
+    return [snapshotHelix(part, part.virtualHelixAtCoord(coord)) \
+                                            for coord in helixOrderList]
+# end def
+
+def writeDesignSnapshot(snapshot, io, name=None, progress=None):
+    """
+    Writes a snapshotDesign list to io in the legacy JSON format, producing
+    the same output as encode. progress, if given, is called as
+    progress(done, total) after each helix; if it returns True writing
+    stops and False is returned.
+    """
+    if name == None:
+        name = basename(str(io.name))
+    numBases = len(snapshot[0][5]) if snapshot else 0
+    baseFmt = _legacyBaseFormat(numBases)
+    intFmt = _intListFormat(numBases)
+    _writeHeader(io, name)
+    for i, helix in enumerate(snapshot):
+        if i > 0:
+            io.write(',')
+        writeHelixSnapshot(io, helix, baseFmt, intFmt)
+        if progress != None and progress(i + 1, len(snapshot)):
+            return False
+    io.write(']}')
+    return True
+# end def
+
+def _writeHeader(io, name):
+    io.write('{"name":%s,"vstrands":[' % dumps(name))
+# end def
+
+def _legacyBaseFormat(numBases):
+    """Format string for numBases [5'vh,5'idx,3'vh,3'idx] quadruples."""
+    if numBases == 0:
+        return '[]'
+    return '[' + ','.join(['[%d,%d,%d,%d]'] * numBases) + ']'
+# end def
+
+def _intListFormat(numBases):
+    """Format string for a flat list of numBases integers."""
+    return '[' + ','.join(['%d'] * numBases) + ']'
+# end def
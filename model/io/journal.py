@@ -0,0 +1,220 @@
+# The MIT License
+#
+# Copyright (c) 2011 Wyss Institute at Harvard University
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# http://www.opensource.org/licenses/mit-license.php
+
+"""
+journal
+Autosave journal for a design file. Edits are appended to
+<file>.journal as one JSON record per line, holding the legacy JSON of
+every virtual helix the edit touched, so the cost of a record scales with
+the edit rather than the design. The journal is periodically compacted
+into a full snapshot, <file>.autosave, written with the regular encoder.
+
+Recovery starts from the snapshot if there is one, otherwise from the
+design file itself, and applies the journal records in order.
+
+Untitled documents journal to cadnano-untitled-<pid>-<n>.json in the temp
+directory, so every session has its own journal. Only journals whose
+owning process is gone are offered for recovery.
+"""
+
+import errno
+import json
+import os
+import re
+import sys
+from cStringIO import StringIO
+
+from encoder import encode, writeHelix
+from binaryformat import isBinaryDesign
+from binarydecoder import legacy_dict_from_binary
+
+JOURNAL_SUFFIX = '.journal'
+SNAPSHOT_SUFFIX = '.autosave'
+UNTITLED_RE = re.compile(r'^cadnano-untitled-(\d+)-(\d+)\.json(%s|%s)$' % \
+                         (re.escape(JOURNAL_SUFFIX), re.escape(SNAPSHOT_SUFFIX)))
+
+
+def journal_paths(filename):
+    """Returns the (journal, snapshot) paths that belong to filename."""
+    return filename + JOURNAL_SUFFIX, filename + SNAPSHOT_SUFFIX
+# end def
+
+def untitled_filename(directory, pid, serial):
+    """The journal base name for untitled document serial of process pid."""
+    return os.path.join(directory,
+                        "cadnano-untitled-%d-%d.json" % (pid, serial))
+# end def
+
+def process_is_running(pid):
+    """True if a process with the given pid exists."""
+    if pid == os.getpid():
+        return True
+    if sys.platform == 'win32':
+        # os.kill would terminate the process on windows
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(0x1000, False, pid)  # QUERY_LIMITED_INFO
+        if not handle:
+            return False
+        kernel32.CloseHandle(handle)
+        return True
+    try:
+        os.kill(pid, 0)
+    except OSError, e:
+        return e.errno == errno.EPERM  # alive, but owned by someone else
+    return True
+# end def
+
+def orphaned_untitled_journals(directory):
+    """
+    Returns the sorted untitled journal base names in directory that have
+    something to recover and whose owning process is no longer running.
+    """
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return []
+    orphans = set()
+    for name in names:
+        match = UNTITLED_RE.match(name)
+        if match == None:
+            continue
+        filename = os.path.join(directory, name[:-len(match.group(3))])
+        if filename in orphans or not has_recovery(filename):
+            continue
+        if not process_is_running(int(match.group(1))):
+            orphans.add(filename)
+    return sorted(orphans)
+# end def
+
+def move_journal(filename, newFilename):
+    """Moves the journal and snapshot of filename over to newFilename."""
+    for path, newPath in zip(journal_paths(filename),
+                             journal_paths(newFilename)):
+        if os.path.exists(newPath):
+            os.remove(newPath)
+        if os.path.exists(path):
+            os.rename(path, newPath)
+# end def
+
+def journal_record(part, desc, virtualHelices, removedCoords):
+    """
+    Returns one journal line: the current state of virtualHelices and the
+    coords of helices that were removed from part.
+    """
+    helices = []
+    for vh in virtualHelices:
+        io = StringIO()
+        writeHelix(io, part, vh)
+        helices.append(io.getvalue())
+    return '{"desc":%s,"removed":%s,"helices":[%s]}\n' % \
+                (json.dumps(desc), json.dumps(sorted(removedCoords)),
+                 ','.join(helices))
+# end def
+
+def append_journal_record(filename, record):
+    journalPath, snapshotPath = journal_paths(filename)
+    with open(journalPath, 'a') as f:
+        f.write(record)
+# end def
+
+def write_snapshot(document, helixOrderList, filename):
+    """Writes a full snapshot and starts a new, empty journal."""
+    journalPath, snapshotPath = journal_paths(filename)
+    tmpPath = snapshotPath + '.tmp'
+    with open(tmpPath, 'w') as f:
+        encode(document, helixOrderList, f)
+    if os.path.exists(snapshotPath):
+        os.remove(snapshotPath)  # rename does not replace on windows
+    os.rename(tmpPath, snapshotPath)
+    start_journal(filename)
+# end def
+
+def start_journal(filename):
+    """Starts a new, empty journal on top of the snapshot of filename."""
+    open(journal_paths(filename)[0], 'w').close()
+# end def
+
+def has_snapshot(filename):
+    return os.path.exists(journal_paths(filename)[1])
+# end def
+
+def has_recovery(filename):
+    """True if filename has journal records or a snapshot to recover."""
+    journalPath, snapshotPath = journal_paths(filename)
+    if os.path.exists(snapshotPath):
+        return True
+    return os.path.exists(journalPath) and os.path.getsize(journalPath) > 0
+# end def
+
+def discard_journal(filename):
+    for path in journal_paths(filename):
+        if os.path.exists(path):
+            os.remove(path)
+# end def
+
+def apply_journal_record(obj, record):
+    """Applies one decoded journal record to a legacy JSON dict."""
+    vstrands = obj['vstrands']
+    removed = set(tuple(coord) for coord in record['removed'])
+    if removed:
+        vstrands[:] = [helix for helix in vstrands \
+                        if (helix['row'], helix['col']) not in removed]
+    index = dict(((helix['row'], helix['col']), i) \
+                        for i, helix in enumerate(vstrands))
+    for helix in record['helices']:
+        coord = (helix['row'], helix['col'])
+        if coord in index:
+            vstrands[index[coord]] = helix
+        else:
+            index[coord] = len(vstrands)
+            vstrands.append(helix)
+# end def
+
+def recover_legacy_dict(filename):
+    """
+    Returns the legacy JSON dict for filename with the snapshot and
+    journal applied, or None if there is nothing to start from. A
+    truncated last line (from a crash while appending) is ignored.
+    """
+    journalPath, snapshotPath = journal_paths(filename)
+    basePath = snapshotPath if os.path.exists(snapshotPath) else filename
+    if not os.path.exists(basePath):
+        return None
+    with open(basePath, 'rb') as f:
+        data = f.read()
+    if isBinaryDesign(data):
+        obj = legacy_dict_from_binary(data)
+    else:
+        obj = json.loads(data)
+    if os.path.exists(journalPath):
+        with open(journalPath) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                apply_journal_record(obj, record)
+    return obj
+# end def
@@ -23,11 +23,14 @@
 # http://www.opensource.org/licenses/mit-license.php
 
 from collections import defaultdict
+from model.decorators.insertion import Insertion
 from model.document import Document
+from model.helixrecords import HelixRecords
 from model.enum import LatticeType, StrandType
 from model.parts.honeycombpart import HoneycombPart
 from model.parts.squarepart import SquarePart
 from model.virtualhelix import VirtualHelix
+from model.io.binaryformat import runsFromLegacyArray
 from views import styles
 import util, cadnano
 # import Qt stuff into the module namespace with PySide, PyQt4 independence
@@ -53,69 +56,31 @@ STAPLE = "staple"
 INSERTION = "insertion"
 DELETION = "deletion"
 
-def import_legacy_dict(document, obj, latticeType=LatticeType.Honeycomb):
+def import_legacy_dict(document, obj, latticeType=None, lazy=False):
     """
     Parses a dictionary (obj) created from reading a json file and uses it
     to populate the given document with model data.
+
+    If lazy is True, only the virtual helices and insertions are created;
+    strands are kept as HelixRecords and built when first touched.
+    Headless, a latticeType of None is guessed from the helix length.
     """
-    numBases = len(obj['vstrands'][0]['scaf'])
-    if cadnano.app().isGui():
-        # from ui.dialogs.ui_latticetype import Ui_LatticeType
-        # util.qtWrapImport('QtGui', globals(),  ['QDialog', 'QDialogButtonBox'])
-        dialog = QDialog()
-        dialogLT = Ui_LatticeType()
-        dialogLT.setupUi(dialog)
-        # DETERMINE LATTICE TYPE
-        if numBases % 21 == 0 and numBases % 32 == 0:
-            if dialog.exec_() == 1:
-                latticeType = LatticeType.Square
-            else:
-                latticeType = LatticeType.Honeycomb
-        elif numBases % 32 == 0:
-            latticeType = LatticeType.Square
-        elif numBases % 21 == 0:
-            latticeType = LatticeType.Honeycomb
-        else:
-            if dialog.exec_() == 1:
-                latticeType = LatticeType.Square
-            else:
-                latticeType = LatticeType.Honeycomb
-    else:  # Headless, assume the latticeType arg was meaningful
+    for progress in iter_import_legacy_dict(document, obj, latticeType, lazy):
         pass
+# end def
 
-    # DETERMINE MAX ROW,COL
-    maxRowJson = maxColJson = 0
-    for helix in obj['vstrands']:
-        maxRowJson = max(maxRowJson, int(helix['row'])+1)
-        maxColJson = max(maxColJson, int(helix['col'])+1)
-
-    # CREATE PART ACCORDING TO LATTICE TYPE
-    if latticeType == LatticeType.Honeycomb:
-        steps = numBases/21
-        nRows = max(30, maxRowJson, cadnano.app().prefs.honeycombRows)
-        nCols = max(32, maxColJson, cadnano.app().prefs.honeycombCols)
-        part = HoneycombPart(document=document, maxRow=nRows, maxCol=nCols, maxSteps=steps)
-    elif latticeType == LatticeType.Square:
-        isSQ100 = True  # check for custom SQ100 format
-        for helix in obj['vstrands']:
-            if helix['col'] != 0:
-                isSQ100 = False
-                break
-        if isSQ100:
-            dialogLT.label.setText("Is this a SQ100 file?")
-            if dialog.exec_() == 1:
-                nRows, nCols = 100, 1
-            else:
-                nRows, nCols = 40, 30
-        else:
-            nRows, nCols = 40, 30
-        steps = numBases/32
-        nRows = max(30, maxRowJson, cadnano.app().prefs.squareRows)
-        nCols = max(32, maxColJson, cadnano.app().prefs.squareCols)
-        part = SquarePart(document=document, maxRow=nRows, maxCol=nCols, maxSteps=steps)
-    else:
-        raise TypeError("Lattice type not recognized")
-    document._addPart(part, useUndoStack=False)
+def iter_import_legacy_dict(document, obj, latticeType=None,
+                            lazy=False, plannedRuns=None):
+    """
+    Generator version of import_legacy_dict that yields (done, total)
+    after each helix of each import step, so the caller can spread the
+    import over several event loop iterations and report progress.
+    plannedRuns optionally holds the runsFromLegacyArray results for
+    lazy imports, keyed by (strandType, vhNum), computed ahead of time.
+    """
+    numBases = len(obj['vstrands'][0]['scaf'])
+    coords = [(helix['row'], helix['col']) for helix in obj['vstrands']]
+    part = create_part(document, numBases, coords, latticeType)
 
     # POPULATE VIRTUAL HELICES
     orderedCoordList = []
@@ -128,12 +93,21 @@ def import_legacy_dict(document, obj, latticeType=LatticeType.Honeycomb):
         coord = (row, col)
         vhNumToCoord[vhNum] = coord
         orderedCoordList.append(coord)
+    numSteps = len(obj['vstrands']) * (2 if lazy else 4)
+    step = 0
     # make sure we retain the original order
     for vhNum in sorted(vhNumToCoord.iterkeys()):
         row, col = vhNumToCoord[vhNum]
         part.createVirtualHelix(row, col, useUndoStack=False)
+        step += 1
+        yield step, numSteps
     part.setImportedVHelixOrder(orderedCoordList)
 
+    if lazy:
+        import_helix_records(part, obj, plannedRuns)
+        yield numSteps, numSteps
+        return
+
     # INSTALL STRANDS AND COLLECT XOVER LOCATIONS
     numHelixes = len(obj['vstrands'])-1
     scaf_seg = defaultdict(list)
@@ -190,10 +164,13 @@ def import_legacy_dict(document, obj, latticeType=LatticeType.Honeycomb):
                 lowIdx = stap_seg[vhNum][i]
                 highIdx = stap_seg[vhNum][i+1]
                 stapStrandSet.createStrand(lowIdx, highIdx, useUndoStack=False)
+            step += 1
+            yield step, numSteps
     except AssertionError:
         if not cadnano.app().isGui():
             print "Unrecognized file format."
         else:
+            dialog, dialogLT = _latticeDialog()
             dialogLT.label.setText("Unrecognized file format.")
             dialogLT.buttonBox.setStandardButtons(QDialogButtonBox.Ok)
             dialog.exec_()
@@ -224,14 +201,11 @@ def import_legacy_dict(document, obj, latticeType=LatticeType.Honeycomb):
             toVh = part.virtualHelixAtCoord(vhNumToCoord[toVhNum])
             strand3p = toVh.stapleStrandSet().getStrand(idx3p)
             part.createXover(strand5p, idx5p, strand3p, idx3p, useUndoStack=False)
+        step += 1
+        yield step, numSteps
 
     # SET DEFAULT COLOR
-    for oligo in part.oligos():
-        if oligo.isStaple():
-            defaultColor = styles.DEFAULT_STAP_COLOR
-        else:
-            defaultColor = styles.DEFAULT_SCAF_COLOR
-        oligo.applyColor(defaultColor, useUndoStack=False)
+    applyDefaultColors(part)
 
     # COLORS, INSERTIONS, SKIPS
     for helix in obj['vstrands']:
@@ -258,9 +232,131 @@ def import_legacy_dict(document, obj, latticeType=LatticeType.Honeycomb):
         # end for
         # populate colors
         for baseIdx, colorNumber in helix['stap_colors']:
-            color = QColor((colorNumber>>16)&0xFF, (colorNumber>>8)&0xFF, colorNumber&0xFF).name()
+            color = legacyColorName(colorNumber)
             strand = stapStrandSet.getStrand(baseIdx)
             strand.oligo().applyColor(color, useUndoStack=False)
+        step += 1
+        yield step, numSteps
+
+def create_part(document, numBases, coords, latticeType=None):
+    """
+    Creates the part of an imported design with numBases bases per helix
+    and helices at coords, a list of (row, col), and adds it to document.
+    The lattice type is asked for or guessed as in import_legacy_dict.
+    """
+    if cadnano.app().isGui():
+        dialog, dialogLT = _latticeDialog()
+        # DETERMINE LATTICE TYPE
+        if numBases % 21 == 0 and numBases % 32 == 0:
+            if dialog.exec_() == 1:
+                latticeType = LatticeType.Square
+            else:
+                latticeType = LatticeType.Honeycomb
+        elif numBases % 32 == 0:
+            latticeType = LatticeType.Square
+        elif numBases % 21 == 0:
+            latticeType = LatticeType.Honeycomb
+        else:
+            if dialog.exec_() == 1:
+                latticeType = LatticeType.Square
+            else:
+                latticeType = LatticeType.Honeycomb
+    elif latticeType == None:  # Headless, guess it like the GUI does
+        if numBases % 32 == 0 and numBases % 21 != 0:
+            latticeType = LatticeType.Square
+        else:
+            latticeType = LatticeType.Honeycomb
+
+    # DETERMINE MAX ROW,COL
+    maxRowJson = maxColJson = 0
+    for row, col in coords:
+        maxRowJson = max(maxRowJson, int(row)+1)
+        maxColJson = max(maxColJson, int(col)+1)
+
+    # CREATE PART ACCORDING TO LATTICE TYPE
+    if latticeType == LatticeType.Honeycomb:
+        steps = numBases/21
+        nRows = max(30, maxRowJson, cadnano.app().prefs.honeycombRows)
+        nCols = max(32, maxColJson, cadnano.app().prefs.honeycombCols)
+        part = HoneycombPart(document=document, maxRow=nRows, maxCol=nCols, maxSteps=steps)
+    elif latticeType == LatticeType.Square:
+        isSQ100 = True  # check for custom SQ100 format
+        for row, col in coords:
+            if col != 0:
+                isSQ100 = False
+                break
+        if isSQ100 and cadnano.app().isGui():
+            dialogLT.label.setText("Is this a SQ100 file?")
+            if dialog.exec_() == 1:
+                nRows, nCols = 100, 1
+            else:
+                nRows, nCols = 40, 30
+        elif isSQ100:  # Headless, keep the guessed square lattice as SQ100
+            nRows, nCols = 100, 1
+        else:
+            nRows, nCols = 40, 30
+        steps = numBases/32
+        nRows = max(30, maxRowJson, cadnano.app().prefs.squareRows)
+        nCols = max(32, maxColJson, cadnano.app().prefs.squareCols)
+        part = SquarePart(document=document, maxRow=nRows, maxCol=nCols, maxSteps=steps)
+    else:
+        raise TypeError("Lattice type not recognized")
+    document._addPart(part, useUndoStack=False)
+    return part
+# end def
+
+def applyDefaultColors(part):
+    """Colors every oligo of part with the default scaffold or staple color."""
+    for oligo in part.oligos():
+        if oligo.isStaple():
+            defaultColor = styles.DEFAULT_STAP_COLOR
+        else:
+            defaultColor = styles.DEFAULT_SCAF_COLOR
+        oligo.applyColor(defaultColor, useUndoStack=False)
+# end def
+
+def legacyColorName(colorNumber):
+    """The color name of a 0xRRGGBB stap_colors entry."""
+    return QColor((colorNumber>>16)&0xFF, (colorNumber>>8)&0xFF, colorNumber&0xFF).name()
+# end def
+
+def _latticeDialog():
+    dialog = QDialog()
+    dialogLT = Ui_LatticeType()  # reusing this dialog, should rename
+    dialogLT.setupUi(dialog)
+    return dialog, dialogLT
+# end def
+
+def import_helix_records(part, obj, plannedRuns=None):
+    """
+    Stores the strands of obj as pending HelixRecords on part, and installs
+    insertions and skips directly since they belong to the helix.
+    """
+    records = HelixRecords(part)
+    for helix in obj['vstrands']:
+        vhNum = helix['num']
+        coord = (helix['row'], helix['col'])
+        vh = part.virtualHelixAtCoord(coord)
+        for strandType, key in ((StrandType.Scaffold, 'scaf'),
+                                (StrandType.Staple, 'stap')):
+            if plannedRuns != None:
+                runs, xovers = plannedRuns[(strandType, vhNum)]
+            else:
+                runs, xovers = runsFromLegacyArray(vhNum, strandType, helix[key])
+            records.addStrandSet(strandType, vhNum, runs, xovers)
+            vh.getStrandSetByType(strandType).setPending(True)
+        records.setStapleColors(vhNum, helix['stap_colors'])
+        insertionDict = part.insertions()[coord]
+        for baseIdx, (loop, skip) in enumerate(zip(helix['loop'], helix['skip'])):
+            sumOfInsertSkip = loop + skip
+            if sumOfInsertSkip != 0 and (helix['scaf'][baseIdx][0] != -1 or \
+                                         helix['scaf'][baseIdx][2] != -1 or \
+                                         helix['stap'][baseIdx][0] != -1 or \
+                                         helix['stap'][baseIdx][2] != -1):
+                length = -1 if sumOfInsertSkip < 0 else sumOfInsertSkip
+                insertionDict[baseIdx] = Insertion(baseIdx, length)
+    part.setHelixRecords(records)
+# end def
 
 def isSegmentStartOrEnd(strandType, vhNum, baseIdx, fiveVH, fiveIdx, threeVH, threeIdx):
     """Returns True if the base is a breakpoint or crossover."""
@@ -43,12 +43,7 @@ def legacy_dict_from_doc(document, fname, helixOrderList):
             else:
                 insts[idx] = insertion.length()
         # colors
-        stapColors = []
-        stapStrandSet = vh.stapleStrandSet()
-        for strand in stapStrandSet:
-            if strand.connection5p() == None:
-                c = str(strand.oligo().color())[1:]  # drop the hash
-                stapColors.append([strand.idx5Prime(), int(c, 16)])
+        stapColors = vh.stapleStrandSet().getLegacyColorList()
 
         vhDict = {"row":row,
                   "col":col,
@@ -0,0 +1,112 @@
+# The MIT License
+#
+# Copyright (c) 2011 Wyss Institute at Harvard University
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# http://www.opensource.org/licenses/mit-license.php
+
+"""
+plateexport
+Writes staple orders as 96 or 384-well plate spreadsheets straight from the
+model, in a single pass over Part.iterStapleExportRows.
+"""
+
+from model.enum import StapleSort
+
+PLATE_96 = (8, 12)  # rows, columns
+PLATE_384 = (16, 24)
+FORMATS = {'csv': ',', 'tsv': '\t'}  # format -> field separator
+PLATE_COLUMNS = ("Plate Name", "Well Position", "Sequence Name", "Sequence",
+                 "Length", "Color", "Modifications")
+
+
+def well_name(plateSize, i):
+    """Name of well i of a plate filled column by column: A1, B1, ..., A2."""
+    rows, cols = plateSize
+    return "%s%d" % (chr(ord('A') + i % rows), i / rows + 1)
+# end def
+
+def length_bin(length, lengthBins):
+    """
+    Label of the (low, high) bin in lengthBins that holds length, or ''
+    if lengthBins is empty or no bin holds it.
+    """
+    for low, high in lengthBins or ():
+        if low <= length <= high:
+            return "%d-%d nt" % (low, high)
+    return ''
+# end def
+
+def staple_modifications(part, vhNum, idx5p):
+    """
+    Modification flags of the staple oligo whose 5' end is at vhNum[idx5p],
+    as "position:type" words. Pending strands carry no modifiers.
+    """
+    strandSet = part.virtualHelix(vhNum).stapleStrandSet()
+    if strandSet.isPending():
+        return ''
+    oligo = strandSet.getStrand(idx5p).oligo()
+    return ' '.join("%s:%s" % mod for mod in oligo.modifications())
+# end def
+
+def iter_plate_rows(part, plateSize=PLATE_96, groupByColor=False,
+                    lengthBins=None, separateModified=True,
+                    sortBy=StapleSort.Default, plateName="Plate"):
+    """
+    Yields one PLATE_COLUMNS tuple per staple of part. Staples are grouped
+    by color (if groupByColor), by length bin, and by whether they carry
+    modifications (if separateModified); every group fills its own plates,
+    which are numbered in the order they are first needed. Only the open
+    plate of each group is kept, so memory does not grow with the design.
+    """
+    wellsPerPlate = plateSize[0] * plateSize[1]
+    plates = {}  # group -> [plate name, wells used]
+    numPlates = 0
+    for vhNum5p, idx5p, vhNum3p, idx3p, seq, length, color in \
+                                            part.iterStapleExportRows(sortBy):
+        color = str(color)
+        mods = staple_modifications(part, vhNum5p, idx5p)
+        group = (color if groupByColor else '',
+                 length_bin(length, lengthBins),
+                 'modified' if mods and separateModified else '')
+        plate = plates.get(group)
+        if plate == None or plate[1] == wellsPerPlate:
+            numPlates += 1
+            name = "%s %d" % (plateName, numPlates)
+            label = ' / '.join([g for g in group if g])
+            if label:
+                name += " (%s)" % label
+            plate = plates[group] = [name, 0]
+        yield (plate[0], well_name(plateSize, plate[1]),
+               "%d[%d]-%d[%d]" % (vhNum5p, idx5p, vhNum3p, idx3p),
+               seq, length, color, mods)
+        plate[1] += 1
+# end def
+
+def write_plates(part, io, fmt='csv', **kwargs):
+    """
+    Writes the plate layout of part to the file object io as csv or tsv.
+    Keyword arguments are passed on to iter_plate_rows.
+    """
+    sep = FORMATS[fmt]
+    io.write(sep.join(PLATE_COLUMNS) + '\n')
+    for row in iter_plate_rows(part, **kwargs):
+        io.write(sep.join([str(field) for field in row]) + '\n')
+# end def
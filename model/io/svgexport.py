@@ -0,0 +1,230 @@
+# The MIT License
+#
+# Copyright (c) 2011 Wyss Institute at Harvard University
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# http://www.opensource.org/licenses/mit-license.php
+
+"""
+svgexport
+Writes the path view of a part as SVG straight from the model, without
+graphics items. Helices are streamed one group at a time in the path view
+order, followed by a layer of crossovers, so the output is written in
+time linear in the design and memory bounded by the size of one helix.
+Pending StrandSets are drawn from their HelixRecords without being built.
+Drawing attributes live in a shared style sheet; elements carry classes
+and strand paths a stroke color, one path per oligo color and helix.
+"""
+
+from cgi import escape
+from model.enum import StrandType
+from model.io.binaryformat import isDrawn5to3
+from views import styles
+
+_bw = styles.PATH_BASE_WIDTH
+_step = styles.PATH_HELIX_HEIGHT + styles.PATH_HELIX_PADDING
+_margin = 3 * _bw  # room for the helix numbers
+
+_STYLE = (".h{fill:%s;stroke:%s;stroke-width:%g}"
+          ".n{font:bold %dpx sans-serif;text-anchor:middle}"
+          ".s,.x{fill:none;stroke-width:%g;stroke-linecap:round}"
+          ".i{fill:none;stroke:%s;stroke-width:1}"
+          ".i text{font:%dpx sans-serif;fill:%s;stroke:none;text-anchor:middle}"
+          ".k{stroke:%s;stroke-width:2}"
+          ".q{font:%gpx monospace}") % (
+            styles.grayfill.name(), styles.graystroke.name(),
+            styles.PATH_GRID_STROKE_WIDTH, _bw / 2,
+            styles.PATH_STRAND_STROKE_WIDTH, styles.graystroke.name(), _bw / 2, styles.graystroke.name(),
+            styles.redstroke.name(), _bw / 3.)
+
+
+def helix_runs(part, vh, strandType, pendingColors, pendingSeqs):
+    """
+    Yields (low, high, color, sequence, xover3p) for each strand of the
+    strandType StrandSet of vh, where xover3p is the (vhNum, idx5p) the
+    3' end connects to, or None. The colors and sequences of pending
+    staples are looked up in pendingColors, keyed (vhNum, low), and the
+    pending sequences in pendingSeqs, keyed (strandType, vhNum, idx5p).
+    """
+    strandSet = vh.getStrandSetByType(strandType)
+    if not strandSet.isPending():
+        for strand in strandSet:
+            low, high = strand.idxs()
+            strand3p = strand.connection3p()
+            xover3p = None
+            if strand3p != None:
+                xover3p = (strand3p.virtualHelix().number(),
+                           strand3p.idx5Prime())
+            yield (low, high, str(strand.oligo().color()).lower(),
+                   strand.sequence(), xover3p)
+        return
+    records = part.helixRecords()
+    vhNum = vh.number()
+    if strandType == StrandType.Scaffold:
+        pendingColors = {}  # keyed by staple runs only
+        default = styles.DEFAULT_SCAF_COLOR
+    else:
+        default = styles.DEFAULT_STAP_COLOR
+    xovers = records.crossovers(strandType, vhNum)
+    xovers3p = dict((xovers[i + 1], (xovers[i + 2], xovers[i + 3])) \
+                                        for i in xrange(0, len(xovers), 4))
+    is5to3 = isDrawn5to3(vhNum, strandType)
+    runs = records.runs(strandType, vhNum)
+    for i in xrange(0, len(runs), 2):
+        low, high = runs[i], runs[i + 1]
+        idx5p, idx3p = (low, high) if is5to3 else (high, low)
+        yield (low, high, pendingColors.get((vhNum, low), default),
+               pendingSeqs.get((strandType, vhNum, idx5p), ''),
+               xovers3p.get(idx3p))
+# end def
+
+def iter_svg(part, helixOrderList=None, showSequences=False):
+    """
+    Yields the SVG document of part in chunks. helixOrderList gives the
+    (row, col) of the helices from top to bottom, as in the path view;
+    by default they are drawn in order of number. Strand sequences are
+    drawn if showSequences is True.
+    """
+    if helixOrderList == None:
+        helices = sorted(part.getVirtualHelices(), key=lambda vh: vh.number())
+    else:
+        helices = [part.virtualHelixAtCoord(coord) for coord in helixOrderList]
+    pendingColors, pendingSeqs = _pendingStyles(part, showSequences)
+    rowY = dict((vh.number(), i * _step) for i, vh in enumerate(helices))
+    width = (part.maxBaseIdx() + 1) * _bw
+    yield ('<?xml version="1.0" encoding="UTF-8"?>\n'
+           '<svg xmlns="http://www.w3.org/2000/svg" version="1.1" '
+           'width="%d" height="%d" viewBox="%d 0 %d %d">\n'
+           '<style type="text/css">%s</style>\n') % (
+            width + _margin, len(helices) * _step, -_margin,
+            width + _margin, len(helices) * _step, _STYLE)
+    for vh in helices:
+        yield _helixGroup(part, vh, rowY[vh.number()], width,
+                          pendingColors, pendingSeqs, showSequences)
+    yield '<g class="x">\n'
+    for vh in helices:
+        vhNum = vh.number()
+        for strandType in (StrandType.Scaffold, StrandType.Staple):
+            for low, high, color, seq, xover3p in \
+                    helix_runs(part, vh, strandType, pendingColors, {}):
+                if xover3p == None or xover3p[0] not in rowY:
+                    continue
+                idx3p = high if isDrawn5to3(vhNum, strandType) else low
+                toVhNum, idx5p = xover3p
+                yield _xoverPath(vhNum, rowY[vhNum], idx3p, toVhNum,
+                                 rowY[toVhNum], idx5p, strandType, color)
+    yield '</g>\n</svg>\n'
+# end def
+
+def write_svg(part, io, helixOrderList=None, showSequences=False):
+    """
+    Writes the SVG document of part to the file object io. Arguments are
+    as for iter_svg.
+    """
+    for chunk in iter_svg(part, helixOrderList, showSequences):
+        io.write(chunk)
+# end def
+
+def _pendingStyles(part, showSequences):
+    """
+    Colors of the pending staple runs, keyed (vhNum, low), found by
+    following each pending oligo from its 5' end, and the pending
+    sequences keyed (strandType, vhNum, idx5p) if showSequences.
+    """
+    colors, seqs = {}, {}
+    records = part.helixRecords()
+    if records == None or records.isEmpty():
+        return colors, seqs
+    for vhNum, idx5p, color in records.staple5pEnds():
+        for runVhNum, low, high in \
+                    records.iterOligoRuns(StrandType.Staple, vhNum, idx5p):
+            colors[(runVhNum, low)] = color
+    if showSequences:
+        for strandType, vhNum, idx5p, seq in records.sequences():
+            seqs[(strandType, vhNum, idx5p)] = seq
+    return colors, seqs
+# end def
+
+def _strandY(vhNum, strandType):
+    """Offset of the strand midline from the top of its helix."""
+    isOnTop = (vhNum % 2 == 0) == (strandType == StrandType.Scaffold)
+    return _bw / 2. if isOnTop else 1.5 * _bw
+# end def
+
+def _helixGroup(part, vh, y, width, pendingColors, pendingSeqs,
+                                                        showSequences):
+    vhNum = vh.number()
+    out = ['<g id="vh%d" transform="translate(0,%d)">'
+           '<rect class="h" width="%d" height="%d"/>'
+           '<text class="n" x="%g" y="%g">%d</text>\n' % (
+            vhNum, y, width, 2 * _bw, -1.5 * _bw, 1.25 * _bw, vhNum)]
+    texts = []
+    for strandType in (StrandType.Scaffold, StrandType.Staple):
+        sy = _strandY(vhNum, strandType)
+        is5to3 = isDrawn5to3(vhNum, strandType)
+        byColor = {}
+        for low, high, color, seq, xover3p in \
+                helix_runs(part, vh, strandType, pendingColors, pendingSeqs):
+            # drawn from 5' to 3'
+            x0, x1 = (low + .5) * _bw, (high + .5) * _bw
+            if not is5to3:
+                x0, x1 = x1, x0
+            byColor.setdefault(color, []).append(
+                                    'M%g %gH%g' % (x0, sy, x1))
+            if showSequences and seq:
+                if not is5to3:
+                    seq = seq[::-1]
+                texts.append('<text class="q" x="%g" y="%g" textLength="%g" '
+                    'lengthAdjust="spacing">%s</text>' % (
+                    low * _bw, sy - .3 * _bw if sy < _bw else sy + .6 * _bw,
+                    (high - low + 1) * _bw, escape(seq)))
+        # end for
+        for color, paths in sorted(byColor.iteritems()):
+            out.append('<path class="s" stroke="%s" d="%s"/>\n' % (
+                                                    color, ''.join(paths)))
+    # end for
+    for idx, insertion in sorted(part.insertions()[vh.coord()].iteritems()):
+        x = (idx + .5) * _bw
+        if insertion.isSkip():
+            r = _bw / 4.
+            out.append('<path class="k" d="M%g %gl%g %gm0 %gl%g %g"/>\n' % (
+                        x - r, _bw - r, 2 * r, 2 * r, -2 * r, -2 * r, 2 * r))
+        elif insertion.length() > 0:
+            out.append('<g class="i"><circle cx="%g" cy="%g" r="%g"/>'
+                       '<text x="%g" y="%g">%d</text></g>\n' % (
+                        x, _bw, _bw / 3., x, -.2 * _bw, insertion.length()))
+    out.extend(texts)
+    out.append('</g>\n')
+    return ''.join(out)
+# end def
+
+def _xoverPath(fromVhNum, fromY, idx3p, toVhNum, toY, idx5p, strandType,
+                                                                    color):
+    """A quadratic curve from the 3' end to the 5' end of a crossover."""
+    x0 = (idx3p + .5) * _bw
+    y0 = fromY + _strandY(fromVhNum, strandType)
+    x1 = (idx5p + .5) * _bw
+    y1 = toY + _strandY(toVhNum, strandType)
+    # bulge past the 3' end, as drawn in the path view
+    bulge = _bw if isDrawn5to3(fromVhNum, strandType) else -_bw
+    cx, cy = (x0 + x1) / 2. + bulge, (y0 + y1) / 2.
+    return '<path stroke="%s" d="M%g %gQ%g %g %g %g"/>\n' % (
+                                            color, x0, y0, cx, cy, x1, y1)
+# end def
@@ -0,0 +1,255 @@
+# The MIT License
+#
+# Copyright (c) 2011 Wyss Institute at Harvard University
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# http://www.opensource.org/licenses/mit-license.php
+
+"""
+kmerindex
+A k-mer table over the oligo sequences of a part, for screening staples
+for long shared repeats and unwanted complementarity before ordering, and
+for finding sequence motifs.
+
+Every k-mer of every oligo maps to the oligos and positions it occurs at.
+A query seeds on shared k-mers and extends each seed to the full match,
+starting only at the first base of a match so each is reported once;
+repeat and complement queries are therefore limited to matches of at
+least k bases. The table follows the undo stack: only the oligos on
+changed helices are indexed again.
+"""
+
+from collections import defaultdict
+
+from model.contenthash import PartChangeTracker
+from views import styles
+import util
+
+BASES = 'ACGT'
+
+
+class KmerIndex(PartChangeTracker):
+    def __init__(self, part, k=styles.KMER_INDEX_K):
+        super(KmerIndex, self).__init__(part)
+        self._k = k
+        self._table = defaultdict(dict)  # kmer -> {oligo: [pos, ...]}
+        self._sequences = {}  # Oligo -> upper case sequence
+        self._staples = set()
+    # end def
+
+    ### ACCESSORS ###
+    def k(self):
+        return self._k
+    # end def
+
+    def sequences(self):
+        """Returns {oligo: sequence} for the oligos that have a sequence."""
+        self._update()
+        return self._sequences
+    # end def
+
+    ### PUBLIC METHODS ###
+    def sharedRepeats(self, minLength):
+        """
+        Returns [(oligoA, posA, oligoB, posB, length), ...] for every
+        maximal run of at least minLength bases that occurs in two staples,
+        or twice in one.
+        """
+        self._checkLength(minLength)
+        self._update()
+        seqs = self._sequences
+        ret = []
+        staples = self._staples
+        for hits in self._table.itervalues():
+            if len(hits) == 1 and len(hits.values()[0]) == 1:
+                continue
+            occurrences = [(oligo, pos) for oligo, positions in \
+                                    hits.iteritems() if oligo in staples \
+                                    for pos in positions]
+            for i, (oligoA, posA) in enumerate(occurrences):
+                seqA = seqs[oligoA]
+                for oligoB, posB in occurrences[i + 1:]:
+                    seqB = seqs[oligoB]
+                    if _extendsLeft(seqA, posA, seqB, posB):
+                        continue
+                    length = _matchLength(seqA, posA, seqB, posB)
+                    if length >= minLength:
+                        ret.append((oligoA, posA, oligoB, posB, length))
+        return ret
+    # end def
+
+    def complementsOf(self, sequence, minLength):
+        """
+        Returns [(oligo, pos, regionPos, length), ...] for every maximal
+        stretch of at least minLength bases of a staple, starting at pos,
+        that is complementary to sequence[regionPos:regionPos + length].
+        """
+        self._checkLength(minLength)
+        self._update()
+        target = util.rcomp(str(sequence).upper())
+        k = self._k
+        ret = []
+        for p in xrange(len(target) - k + 1):
+            hits = self._table.get(target[p:p + k])
+            if hits == None:
+                continue
+            for oligo, positions in hits.iteritems():
+                if oligo not in self._staples:
+                    continue
+                seq = self._sequences[oligo]
+                for pos in positions:
+                    if _extendsLeft(target, p, seq, pos):
+                        continue
+                    length = _matchLength(target, p, seq, pos)
+                    if length >= minLength:
+                        regionPos = len(target) - p - length
+                        ret.append((oligo, pos, regionPos, length))
+        return ret
+    # end def
+
+    def complementaryStaples(self, minLength):
+        """
+        Returns [(oligoA, posA, oligoB, posB, length), ...] where length
+        bases of oligoA from posA are complementary to oligoB from posB,
+        each pair of staples listed once; oligoA may be oligoB (hairpins).
+        """
+        self._update()
+        order = dict((oligo, i) for i, oligo in enumerate(self._staples))
+        ret = []
+        for oligoA in order:
+            seqA = self._sequences[oligoA]
+            for oligoB, posB, posA, length in \
+                                    self.complementsOf(seqA, minLength):
+                if order[oligoB] > order[oligoA] or \
+                        (oligoB is oligoA and posB >= posA):
+                    ret.append((oligoA, posA, oligoB, posB, length))
+        return ret
+    # end def
+
+    def findMotif(self, motif, bothStrands=False):
+        """
+        Returns [(oligo, pos, isReverse), ...] for every occurrence of
+        motif in an oligo sequence, and of its reverse complement as well
+        if bothStrands. Motifs of at least k bases are looked up in the
+        table; shorter ones are searched for in every sequence.
+        """
+        self._update()
+        motif = str(motif).upper()
+        ret = self._findMotif(motif, False)
+        rcMotif = util.rcomp(motif)
+        if bothStrands and rcMotif != motif:
+            ret.extend(self._findMotif(rcMotif, True))
+        return ret
+    # end def
+
+    ### PRIVATE SUPPORT METHODS ###
+    def _findMotif(self, motif, isReverse):
+        ret = []
+        if len(motif) >= self._k:
+            hits = self._table.get(motif[:self._k], {})
+            for oligo, positions in hits.iteritems():
+                seq = self._sequences[oligo]
+                for pos in positions:
+                    if seq.startswith(motif, pos):
+                        ret.append((oligo, pos, isReverse))
+            return ret
+        for oligo, seq in self._sequences.iteritems():
+            pos = seq.find(motif)
+            while pos != -1:
+                ret.append((oligo, pos, isReverse))
+                pos = seq.find(motif, pos + 1)
+        return ret
+    # end def
+
+    def _checkLength(self, minLength):
+        if minLength < self._k:
+            raise ValueError("Matches shorter than the index k (%d) "
+                             "can not be found" % self._k)
+    # end def
+
+    def _update(self):
+        part = self._part
+        isAll, dirty = self.takeChanges()
+        if isAll:
+            self._table.clear()
+            self._sequences = {}
+            self._staples = set()
+            records = part.helixRecords()
+            if records != None and part.hasScaffoldSequence():
+                # pending staples get their sequence when they are built
+                records.materializeAll()
+            oligos = part.loadedOligos()
+        else:
+            oligos = set()
+            for vh in dirty:
+                if self.isLiveHelix(vh):
+                    for strandSet in vh.getStrandSets():
+                        oligos.update(s.oligo() for s in strandSet)
+            loaded = part.loadedOligos()
+            oligos.update(o for o in self._sequences if o not in loaded)
+        for oligo in oligos:
+            self._remove(oligo)
+            if oligo in part.loadedOligos() and oligo.strand5p() != None:
+                seq = oligo.sequence()
+                if seq:
+                    self._add(oligo, seq.upper())
+    # end def
+
+    def _add(self, oligo, seq):
+        self._sequences[oligo] = seq
+        if oligo.isStaple():
+            self._staples.add(oligo)
+        k = self._k
+        for pos in xrange(len(seq) - k + 1):
+            kmer = seq[pos:pos + k]
+            if not kmer.strip(BASES):  # only ACGT
+                self._table[kmer].setdefault(oligo, []).append(pos)
+    # end def
+
+    def _remove(self, oligo):
+        seq = self._sequences.pop(oligo, None)
+        self._staples.discard(oligo)
+        if seq == None:
+            return
+        k = self._k
+        for pos in xrange(len(seq) - k + 1):
+            hits = self._table.get(seq[pos:pos + k])
+            if hits != None:
+                hits.pop(oligo, None)
+                if not hits:
+                    del self._table[seq[pos:pos + k]]
+    # end def
+# end class
+
+
+def _extendsLeft(seqA, posA, seqB, posB):
+    """True if the match at posA, posB is part of one starting earlier."""
+    return posA > 0 and posB > 0 and seqA[posA - 1] == seqB[posB - 1] and \
+           seqA[posA - 1] in BASES
+# end def
+
+def _matchLength(seqA, posA, seqB, posB):
+    length = 0
+    maxLength = min(len(seqA) - posA, len(seqB) - posB)
+    while length < maxLength and seqA[posA + length] == seqB[posB + length] \
+                             and seqA[posA + length] in BASES:
+        length += 1
+    return length
+# end def
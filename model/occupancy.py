@@ -0,0 +1,125 @@
+# The MIT License
+#
+# Copyright (c) 2011 Wyss Institute at Harvard University
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# http://www.opensource.org/licenses/mit-license.php
+
+"""
+occupancy
+Which helices of a part have scaffold or staple at each base index.
+
+Every helix is kept as one bitmap per strand type, a long with bit i set
+when a strand covers base i, built from its strands or, for pending
+StrandSets, from the HelixRecords runs without materializing them. A
+column, the helices occupied at one index, is then a bitmap over helix
+slots; columns are memoized until a helix changes. Helices touched by
+commands on the undo stack are rebuilt when the map is next queried.
+"""
+
+from model.contenthash import PartChangeTracker
+from model.enum import StrandType
+from views import styles
+
+
+class OccupancyMap(PartChangeTracker):
+    def __init__(self, part):
+        super(OccupancyMap, self).__init__(part)
+        self._masks = {}  # (strandType, vh) -> bitmap over base indices
+        self._slots = {}  # vh -> bit of the helix in a column
+        self._helices = []  # slot -> vh, or None once removed
+        self._columns = {}  # (strandType, idx) -> bitmap over slots
+    # end def
+
+    ### PUBLIC METHODS ###
+    def changed(self):
+        self._columns = {}
+    # end def
+
+    def isOccupied(self, virtualHelix, idx, strandType=StrandType.Scaffold):
+        """True if a strandType strand of virtualHelix covers idx."""
+        self._update()
+        return bool(self._masks.get((strandType, virtualHelix), 0) >> idx & 1)
+    # end def
+
+    def occupiedHelices(self, idx, strandType=StrandType.Scaffold):
+        """Returns the set of helices with a strandType strand at idx."""
+        column = self._column(idx, strandType)
+        helices = self._helices
+        ret = set()
+        while column:
+            bit = column & -column
+            ret.add(helices[bit.bit_length() - 1])
+            column ^= bit
+        return ret
+    # end def
+
+    ### PRIVATE SUPPORT METHODS ###
+    def _column(self, idx, strandType):
+        self._update()
+        key = (strandType, idx)
+        column = self._columns.get(key)
+        if column == None:
+            column = 0L
+            masks = self._masks
+            for vh, slot in self._slots.iteritems():
+                if masks.get((strandType, vh), 0) >> idx & 1:
+                    column |= 1L << slot
+            if len(self._columns) >= styles.OCCUPANCY_COLUMN_CACHE_ENTRIES:
+                self._columns = {}
+            self._columns[key] = column
+        return column
+    # end def
+
+    def _update(self):
+        isAll, dirty = self.takeChanges()
+        if isAll:
+            self._masks = {}
+            self._slots = {}
+            self._helices = []
+            dirty = self._part.getVirtualHelices()
+        for vh in dirty:
+            if self.isLiveHelix(vh):
+                if vh not in self._slots:
+                    self._slots[vh] = len(self._helices)
+                    self._helices.append(vh)
+                for strandSet in vh.getStrandSets():
+                    key = (strandSet.strandType(), vh)
+                    self._masks[key] = self._helixMask(strandSet)
+            elif vh in self._slots:
+                self._helices[self._slots.pop(vh)] = None
+                for strandType in (StrandType.Scaffold, StrandType.Staple):
+                    self._masks.pop((strandType, vh), None)
+        # end for
+    # end def
+
+    def _helixMask(self, strandSet):
+        mask = 0L
+        if strandSet.isPending():
+            runs = self._part.helixRecords().runs(strandSet.strandType(),
+                                        strandSet.virtualHelix().number())
+            bounds = zip(runs[0::2], runs[1::2])
+        else:
+            bounds = (strand.idxs() for strand in strandSet)
+        for low, high in bounds:
+            mask |= ((1L << (high - low + 1)) - 1) << low
+        return mask
+    # end def
+# end class
@@ -33,6 +33,9 @@ from strand import Strand
 util.qtWrapImport('QtCore', globals(), ['pyqtSignal', 'QObject'])
 util.qtWrapImport('QtGui', globals(), ['QUndoCommand'])
 
+# one line of the staple CSV export, formatted from Oligo.exportRow
+STAPLE_CSV_HEADER = "Start,End,Sequence,Length,Color\n"
+STAPLE_CSV_ROW = "%d[%d],%d[%d],%s,%s,%s\n"
 
 class Oligo(QObject):
     """
@@ -136,21 +139,50 @@ class Oligo(QObject):
             return None
     # end def
 
-    def sequenceExport(self):
+    def exportRow(self):
+        """
+        Returns (vhNum5p, idx5p, vhNum3p, idx3p, sequence, length, color)
+        for the staple CSV export.
+        """
         vhNum5p = self.strand5p().virtualHelix().number()
         idx5p = self.strand5p().idx5Prime()
-        seq = ''
+        seq = []
         if self.isLoop():
             print "A loop exists"
             raise Exception
         for strand in self.strand5p().generator3pStrand():
-            seq = seq + Strand.sequence(strand, forExport=True)
+            seq.append(Strand.sequence(strand, forExport=True))
             if strand.connection3p() == None:  # last strand in the oligo
                 vhNum3p = strand.virtualHelix().number()
                 idx3p = strand.idx3Prime()
-        output = "%d[%d],%d[%d],%s,%s,%s\n" % \
-                (vhNum5p, idx5p, vhNum3p, idx3p, seq, len(seq), self._color)
-        return output
+        seq = ''.join(seq)
+        return (vhNum5p, idx5p, vhNum3p, idx3p, seq, len(seq), self._color)
+    # end def
+
+    def modifications(self):
+        """
+        Returns (position, modifierType) for every typed Modifier on the
+        oligo, from 5' to 3', where position is "5'", "3'" or "int".
+        """
+        ret = []
+        strand5p = self._strand5p
+        for strand in strand5p.generator3pStrand():
+            isLast = strand.connection3p() == None
+            for idx, modifier in sorted(strand.modifiers().iteritems()):
+                if modifier.modifierType() == None:
+                    continue
+                if strand == strand5p and idx == strand.idx5Prime():
+                    position = "5'"
+                elif isLast and idx == strand.idx3Prime():
+                    position = "3'"
+                else:
+                    position = "int"
+                ret.append((position, modifier.modifierType()))
+        return ret
+    # end def
+
+    def sequenceExport(self):
+        return STAPLE_CSV_ROW % self.exportRow()
     # end def
 
     def shouldHighlight(self):
@@ -303,27 +335,6 @@ class Oligo(QObject):
     ### PRIVATE SUPPORT METHODS ###
 
     ### COMMANDS ###
-    class ApplyColorCommand(QUndoCommand):
-        def __init__(self, oligo, color):
-            super(Oligo.ApplyColorCommand, self).__init__()
-            self._oligo = oligo
-            self._newColor = color
-            self._oldColor = oligo.color()
-        # end def
-
-        def redo(self):
-            olg = self._oligo
-            olg.setColor(self._newColor)
-            olg.oligoAppearanceChangedSignal.emit(olg)
-        # end def
-
-        def undo(self):
-            olg = self._oligo
-            olg.setColor(self._oldColor)
-            olg.oligoAppearanceChangedSignal.emit(olg)
-        # end def
-    # end class
-
     class ApplySequenceCommand(QUndoCommand):
         def __init__(self, oligo, sequence):
             super(Oligo.ApplySequenceCommand, self).__init__()
@@ -351,8 +362,10 @@ class Oligo(QObject):
                 if nS == None and nS_original:
                     break
             # end for
+            part = olg.part()
             for oligo in oligoList:
                 oligo.oligoSequenceAddedSignal.emit(oligo)
+                part.partOligoChangedSignal.emit(part, oligo)
         # end def
 
         def undo(self):
@@ -373,8 +386,10 @@ class Oligo(QObject):
                 # end for
             # for
 
+            part = olg.part()
             for oligo in oligoList:
                 oligo.oligoSequenceAddedSignal.emit(oligo)
+                part.partOligoChangedSignal.emit(part, oligo)
         # end def
     # end class
     class ApplyColorCommand(QUndoCommand):
@@ -389,12 +404,14 @@ class Oligo(QObject):
             olg = self._oligo
             olg.setColor(self._newColor)
             olg.oligoAppearanceChangedSignal.emit(olg)
+            olg.part().partOligoChangedSignal.emit(olg.part(), olg)
         # end def
 
         def undo(self):
             olg = self._oligo
             olg.setColor(self._oldColor)
             olg.oligoAppearanceChangedSignal.emit(olg)
+            olg.part().partOligoChangedSignal.emit(olg.part(), olg)
         # end def
     # end class
 
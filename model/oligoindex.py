@@ -0,0 +1,208 @@
+# The MIT License
+#
+# Copyright (c) 2011 Wyss Institute at Harvard University
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# http://www.opensource.org/licenses/mit-license.php
+
+"""
+oligoindex
+Looks up the oligos of a part by color, by the locString of their 5' end
+and by sequence motif, without scanning every oligo.
+
+The index is filled on first use, then kept up to date from the
+oligoAppearanceChangedSignal of each oligo, from Part.addOligo and
+Part.removeOligo, and from the helices touched by commands on the undo
+stack, which also covers 5' ends that move. Changes are applied when the
+index is next queried. Motifs are looked up in Part.kmerIndex.
+
+Oligos still pending in HelixRecords are indexed by the 5' ends and
+colors stored in the records; only the helices of oligos that a query
+returns are built.
+"""
+
+import re
+from collections import defaultdict
+
+from model.contenthash import PartChangeTracker
+from model.enum import StrandType
+
+_locStringPattern = re.compile(r'\s*(\d+)\[(\d+)\]')
+
+
+class OligoIndex(PartChangeTracker):
+    def __init__(self, part):
+        super(OligoIndex, self).__init__(part)
+        self._byColor = defaultdict(set)  # '#rrggbb' -> oligos
+        self._byLoc = {}  # (vhNum, idx5p, isStaple) -> oligo
+        self._keys = {}  # oligo -> (color, loc, virtualHelix)
+        self._helixOligos = defaultdict(set)  # vh -> oligos with 5' on it
+        self._dirtyOligos = set()
+        self._connected = set()
+        self._pendingByColor = defaultdict(set)  # color -> (strandType, vhNum)
+        self._pendingByLoc = {}  # (vhNum, idx5p, isStaple) -> (strandType, vhNum)
+        self._numPendingKeys = None
+    # end def
+
+    ### SLOTS ###
+    def oligoAppearanceChangedSlot(self, oligo):
+        self._dirtyOligos.add(oligo)
+    # end def
+
+    ### PUBLIC METHODS ###
+    def oligoAdded(self, oligo):
+        """Called by Part.addOligo."""
+        self._dirtyOligos.add(oligo)
+    # end def
+
+    def oligoRemoved(self, oligo):
+        """Called by Part.removeOligo."""
+        self._dirtyOligos.add(oligo)
+    # end def
+
+    def colors(self):
+        """Returns the colors in use, as '#rrggbb' strings."""
+        self._update()
+        return list(set(self._byColor).union(self._pendingByColor))
+    # end def
+
+    def oligosWithColor(self, color):
+        """Returns the set of oligos of color (a QColor name or string)."""
+        if hasattr(color, 'name'):  # a QColor
+            color = color.name()
+        color = str(color).lower()
+        self._update()
+        if color in self._pendingByColor:
+            self._build(self._pendingByColor[color])
+        return set(self._byColor.get(color, ()))
+    # end def
+
+    def oligoAt(self, vhNum, idx5p):
+        """
+        Returns the oligo with its 5' end at vhNum[idx5p], preferring the
+        staple if a staple and the scaffold both start there, or None.
+        """
+        self._update()
+        for isStaple in (True, False):
+            pending = self._pendingByLoc.get((vhNum, idx5p, isStaple))
+            if pending != None:
+                self._build([pending])
+            oligo = self._byLoc.get((vhNum, idx5p, isStaple))
+            if oligo != None:
+                return oligo
+        return None
+    # end def
+
+    def oligoFromLocString(self, locString):
+        """Returns the oligo for a locString such as '59[63]', or None."""
+        match = _locStringPattern.match(locString)
+        if match == None:
+            return None
+        return self.oligoAt(int(match.group(1)), int(match.group(2)))
+    # end def
+
+    def findMotif(self, motif, bothStrands=False):
+        """See KmerIndex.findMotif."""
+        return self._part.kmerIndex().findMotif(motif, bothStrands)
+    # end def
+
+    ### PRIVATE SUPPORT METHODS ###
+    def _update(self):
+        part = self._part
+        records = part.helixRecords()
+        numPendingKeys = len(records.pendingKeys()) if records != None else 0
+        isAll, dirty = self.takeChanges()
+        if isAll or numPendingKeys != self._numPendingKeys:
+            # strands built from the records leave no trace on the undo stack
+            for oligo in self._keys.keys():
+                self._unindex(oligo)
+            self._byColor.clear()
+            self._byLoc = {}
+            self._helixOligos.clear()
+            self._pendingByColor.clear()
+            self._pendingByLoc = {}
+            if numPendingKeys:
+                for strandType in (StrandType.Scaffold, StrandType.Staple):
+                    isStaple = strandType == StrandType.Staple
+                    for vhNum, idx5p, color in records.oligo5pEnds(strandType):
+                        self._pendingByColor[color].add((strandType, vhNum))
+                        self._pendingByLoc[(vhNum, idx5p, isStaple)] = \
+                                                        (strandType, vhNum)
+            self._numPendingKeys = numPendingKeys
+            oligos = set(part.loadedOligos())
+        else:
+            oligos = self._dirtyOligos
+            for vh in dirty:
+                oligos.update(self._helixOligos.get(vh, ()))
+                if self.isLiveHelix(vh):
+                    for strandSet in vh.getStrandSets():
+                        oligos.update(s.oligo() for s in strandSet)
+        self._dirtyOligos = set()
+        loaded = part.loadedOligos()
+        for oligo in oligos:
+            self._unindex(oligo)
+            if oligo in loaded and oligo.strand5p() != None:
+                self._index(oligo)
+    # end def
+
+    def _build(self, pendingKeys):
+        """
+        Builds the pending StrandSets of pendingKeys, (strandType, vhNum)
+        pairs, and indexes the oligos that now exist.
+        """
+        records = self._part.helixRecords()
+        for strandType, vhNum in list(pendingKeys):
+            if records.isPending(strandType, vhNum):
+                records.materialize(strandType, vhNum)
+        self._update()
+    # end def
+
+    def _index(self, oligo):
+        if oligo not in self._connected:
+            oligo.oligoAppearanceChangedSignal.connect(
+                                            self.oligoAppearanceChangedSlot)
+            self._connected.add(oligo)
+        strand5p = oligo.strand5p()
+        vh = strand5p.virtualHelix()
+        color = str(oligo.color()).lower()
+        loc = (vh.number(), strand5p.idx5Prime(), strand5p.isStaple())
+        self._keys[oligo] = (color, loc, vh)
+        self._byColor[color].add(oligo)
+        self._byLoc[loc] = oligo
+        self._helixOligos[vh].add(oligo)
+    # end def
+
+    def _unindex(self, oligo):
+        if oligo in self._connected:
+            oligo.oligoAppearanceChangedSignal.disconnect(
+                                            self.oligoAppearanceChangedSlot)
+            self._connected.discard(oligo)
+        keys = self._keys.pop(oligo, None)
+        if keys == None:
+            return
+        color, loc, vh = keys
+        self._byColor[color].discard(oligo)
+        if not self._byColor[color]:
+            del self._byColor[color]
+        if self._byLoc.get(loc) is oligo:
+            del self._byLoc[loc]
+        self._helixOligos[vh].discard(oligo)
+    # end def
+# end class
@@ -25,6 +25,7 @@
 #
 # http://www.opensource.org/licenses/mit-license.php
 
+from math import floor
 from cadnano import app
 from part import Part
 from model.enum import LatticeType
@@ -113,16 +114,23 @@ class HoneycombPart(Part):
     # end def
 
     def positionToCoord(self, x, y, scaleFactor=1.0):
-        radius = self._radius
-        column = int(x/(radius*root3*scaleFactor) + 0.5)
-
-        rowTemp = y/(radius*scaleFactor)
-        if (rowTemp % 3) + 0.5 > 1.0:
-            # odd parity
-            row = int((rowTemp-1)/3 + 0.5)
-        else:
-            # even parity
-            row = int(rowTemp/3 + 0.5)
+        """
+        Returns the (row, column) whose lattice position is nearest to x, y.
+        Odd parity positions sit one radius lower, so the rows nearest
+        under either offset are compared in the neighboring columns too.
+        """
+        radius = self._radius*scaleFactor
+        column = int(floor(x/(radius*root3) + 0.5))
+        rows = (int(floor(y/(3*radius) + 0.5)),
+                int(floor((y - radius)/(3*radius) + 0.5)))
+        best = None
+        for col in (column - 1, column, column + 1):
+            for row in rows:
+                px, py = self.latticeCoordToPositionXY(row, col, scaleFactor)
+                dist = (px - x)**2 + (py - y)**2
+                if best == None or dist < best[0]:
+                    best = (dist, row, col)
+        return best[1], best[2]
     # end def
 
     ########################## Archiving / Unarchiving #########################
@@ -29,13 +29,15 @@ from exceptions import KeyError
 from heapq import heapify, heappush, heappop
 from itertools import product, izip, islice
 from collections import defaultdict
+from cStringIO import StringIO
 import random
 
-from model.enum import StrandType
+from model.enum import StrandType, StapleSort
 from model.virtualhelix import VirtualHelix
 from model.strand import Strand
-from model.oligo import Oligo
+from model.oligo import Oligo, STAPLE_CSV_HEADER, STAPLE_CSV_ROW
 from model.strandset import StrandSet
+from model.resultcache import resultCache
 from views import styles
 
 import util
@@ -43,6 +45,12 @@ import util
 util.qtWrapImport('QtCore', globals(), ['pyqtSignal', 'QObject'])
 util.qtWrapImport('QtGui', globals(), ['QUndoCommand'])
 
+# sort keys for (vhNum5p, idx5p, color, oligo) staple export entries
+_stapleSortKeys = {
+    StapleSort.Helix: lambda e: (e[0], e[1]),
+    StapleSort.Position5p: lambda e: (e[1], e[0]),
+    StapleSort.Color: lambda e: (e[2], e[0], e[1]),
+}
 
 class Part(QObject):
     """
@@ -94,6 +102,13 @@ class Part(QObject):
         self._highestUsedOdd = -1  # Used in _reserveHelixIDNumber
         self._highestUsedEven = -2  # same
         self._importedVHelixOrder = None
+        self._helixRecords = None  # HelixRecords of a lazily opened design
+        self._hasher = None  # PartHasher, made on the first contentHash
+        self._validator = None  # ValidationEngine, made on first use
+        self._statistics = None  # DesignStatistics, made on first use
+        self._kmerIndex = None  # KmerIndex, made on first use
+        self._oligoIndex = None  # OligoIndex, made on first use
+        self._occupancy = None  # OccupancyMap, made on first use
         # Runtime state
         self._activeBaseIndex = self._step
         self._activeVirtualHelix = None
@@ -110,6 +125,7 @@ class Part(QObject):
     partActiveSliceResizeSignal = pyqtSignal(QObject)      # self
     partDimensionsChangedSignal = pyqtSignal(QObject)      # self
     partInstanceAddedSignal = pyqtSignal(QObject)          # self
+    partOligoChangedSignal = pyqtSignal(object, QObject)   # self, oligo
     partParentChangedSignal = pyqtSignal(QObject)          # self
     partPreDecoratorSelectedSignal = pyqtSignal(object, int, int, int)  # row,col,idx
     partRemovedSignal = pyqtSignal(QObject)                # self
@@ -129,9 +145,25 @@ class Part(QObject):
     # end def
 
     def oligos(self):
+        """All oligos; builds any strands still pending in HelixRecords."""
+        if self._helixRecords != None:
+            self._helixRecords.materializeAll()
         return self._oligos
     # end def
 
+    def loadedOligos(self):
+        """Oligos that have been built, leaving HelixRecords untouched."""
+        return self._oligos
+    # end def
+
+    def helixRecords(self):
+        return self._helixRecords
+    # end def
+
+    def setHelixRecords(self, helixRecords):
+        self._helixRecords = helixRecords
+    # end def
+
     def setDocument(self, document):
         self._document = document
     # end def
@@ -191,13 +223,92 @@ class Part(QObject):
         return self.latticeCoordToPositionXY(self._maxRow, self._maxCol)
     # end def
 
-    def getStapleSequences(self):
-        """getStapleSequences"""
-        s = "Start,End,Sequence,Length,Color\n"
-        for oligo in self._oligos:
-            if oligo.strand5p().strandSet().isStaple():
-                s = s + oligo.sequenceExport()
-        return s
+    def latticeDimensions(self):
+        """Returns (maxRow, maxCol), the number of lattice rows and columns."""
+        return self._maxRow, self._maxCol
+    # end def
+
+    def contentHash(self):
+        """
+        Returns a hex digest of the helices, strands, sequences, insertions
+        and colors of the part, for keying cached results (see
+        model.resultcache). Only helices edited since the last call are
+        hashed again.
+        """
+        if self._hasher == None:
+            from model.contenthash import PartHasher
+            self._hasher = PartHasher(self)
+        return self._hasher.hexDigest()
+    # end def
+
+    def getStapleSequences(self, sortBy=StapleSort.Default):
+        """Returns the staple CSV export as a string."""
+        io = StringIO()
+        self.writeStapleSequences(io, sortBy)
+        return io.getvalue()
+
+    def writeStapleSequences(self, io, sortBy=StapleSort.Default):
+        """
+        Writes the staple CSV export to the file object io, row by row. An
+        export no longer than styles.STAPLE_CSV_CACHE_BYTES is cached by
+        content hash, so an unchanged part is written from the cache; a
+        larger one is only streamed and never held in memory whole.
+        """
+        key = (self.contentHash(), 'staples-csv', sortBy)
+        cached = resultCache.get(key)
+        if cached != None:
+            io.write(cached)
+            return
+        io.write(STAPLE_CSV_HEADER)
+        chunks = [STAPLE_CSV_HEADER]
+        size = len(STAPLE_CSV_HEADER)
+        for row in self.iterStapleExportRows(sortBy):
+            chunk = STAPLE_CSV_ROW % row
+            io.write(chunk)
+            if chunks != None:
+                size += len(chunk)
+                if size > styles.STAPLE_CSV_CACHE_BYTES:
+                    chunks = None  # too big to cache, stop collecting
+                else:
+                    chunks.append(chunk)
+        if chunks != None:
+            resultCache.put(key, ''.join(chunks))
+
+    def iterStapleExportRows(self, sortBy=StapleSort.Default):
+        """
+        Yields an Oligo.exportRow tuple for every staple oligo, pending ones
+        included, in the StapleSort order sortBy. Rows are built one at a
+        time; sorting only keeps a small key per staple.
+        """
+        records = self._helixRecords
+        if records != None and self.hasScaffoldSequence():
+            # pending staples need the sequence of their complement
+            records.materializeAll()
+        if records != None and records.isEmpty():
+            records = None
+        stapleOligos = (o for o in self._oligos \
+                                if o.strand5p().strandSet().isStaple())
+        if sortBy == StapleSort.Default:
+            for oligo in stapleOligos:
+                yield oligo.exportRow()
+            if records != None:
+                for row in records.iterStapleExportRows():
+                    yield row
+            return
+        entries = []
+        for oligo in stapleOligos:
+            strand5p = oligo.strand5p()
+            entries.append((strand5p.virtualHelix().number(),
+                            strand5p.idx5Prime(), str(oligo.color()), oligo))
+        if records != None:
+            for vhNum, idx5p, color in records.staple5pEnds():
+                entries.append((vhNum, idx5p, color, None))
+        entries.sort(key=_stapleSortKeys[sortBy])
+        for vhNum, idx5p, color, oligo in entries:
+            if oligo != None:
+                yield oligo.exportRow()
+            else:
+                yield records.stapleExportRow(vhNum, idx5p, color)
 
     def getVirtualHelices(self):
         """yield an iterator to the virtualHelix references in the part"""
@@ -233,11 +344,74 @@ class Part(QObject):
         actionExportStaplesSlot in documentcontroller to validate before
         exporting staple sequences.
         """
-        stapLoopOlgs = []
-        for o in list(self.oligos()):
-            if o.isStaple() and o.isLoop():
-                stapLoopOlgs.append(o)
-        return stapLoopOlgs
+        return list(self.validator().violations('stapleLoop'))
+
+    def kmerIndex(self):
+        """
+        Returns the KmerIndex of the staple sequences of the part (see
+        model.kmerindex), for repeat and complementarity screening.
+        """
+        if self._kmerIndex == None:
+            from model.kmerindex import KmerIndex
+            self._kmerIndex = KmerIndex(self)
+        return self._kmerIndex
+    # end def
+
+    def oligoIndex(self):
+        """
+        Returns the OligoIndex of the part (see model.oligoindex), for
+        looking up oligos by color, locString or sequence motif.
+        """
+        if self._oligoIndex == None:
+            from model.oligoindex import OligoIndex
+            self._oligoIndex = OligoIndex(self)
+        return self._oligoIndex
+    # end def
+
+    def occupancy(self):
+        """
+        Returns the OccupancyMap of the part (see model.occupancy), for
+        finding the helices that have strands at a base index.
+        """
+        if self._occupancy == None:
+            from model.occupancy import OccupancyMap
+            self._occupancy = OccupancyMap(self)
+        return self._occupancy
+    # end def
+
+    def statistics(self):
+        """
+        Returns the DesignStatistics of the part (see model.statistics),
+        for staple length, GC content and melting temperature reports.
+        """
+        if self._statistics == None:
+            from model.statistics import DesignStatistics
+            self._statistics = DesignStatistics(self)
+        return self._statistics
+    # end def
+
+    def validator(self):
+        """
+        Returns the ValidationEngine of the part (see model.validation),
+        which keeps design-rule violations up to date as the part is edited.
+        """
+        if self._validator == None:
+            from model.validation import ValidationEngine
+            self._validator = ValidationEngine(self)
+        return self._validator
+    # end def
+
+    def hasScaffoldSequence(self):
+        """True if a scaffold oligo, built or pending, has a sequence."""
+        for oligo in self._oligos:
+            if not oligo.isStaple() and oligo.strand5p().sequence():
+                return True
+        if self._helixRecords != None:
+            for strandType, vhNum, idx5p, seq in self._helixRecords.sequences():
+                if strandType == StrandType.Scaffold:
+                    return True
+        return False
+    # end def
 
     def hasVirtualHelixAtCoord(self, coord):
         return coord in self._coordToVirtualHelix
@@ -517,7 +691,8 @@ class Part(QObject):
 
     def addOligo(self, oligo):
         self._oligos.add(oligo)
-
+        if self._oligoIndex != None:
+            self._oligoIndex.oligoAdded(oligo)
     # end def
 
     def createVirtualHelix(self, row, col, useUndoStack=True):
@@ -774,9 +949,13 @@ class Part(QObject):
         except KeyError:
             print util.trace(5)
             # print "error removing oligo", oligo
+        if self._oligoIndex != None:
+            self._oligoIndex.oligoRemoved(oligo)
     # end def
 
     def renumber(self, coordList, useUndoStack=True):
+        if self._helixRecords != None:
+            self._helixRecords.materializeAll()  # records are keyed by number
         if useUndoStack:
             self.undoStack().beginMacro("Renumber VirtualHelices")
         c = Part.RenumberVirtualHelicesCommand(self, coordList)
@@ -1084,7 +1263,8 @@ class Part(QObject):
             virtualHelixA == virtualHelixB
     # end def
 
-    def potentialCrossoverList(self, virtualHelix, idx=None):
+    def potentialCrossoverList(self, virtualHelix, idx=None, minIdx=0,
+                               maxIdx=None):
         """
         Returns a list of tuples
             (neighborVirtualHelix, index, strandType, isLowIdx)
@@ -1096,6 +1276,9 @@ class Part(QObject):
         strandType is from the enum (StrandType.Scaffold, StrandType.Staple)
         isLowIdx is whether or not it's the at the low index (left in the Path
         view) of a potential Xover site
+
+        Only indices between minIdx and maxIdx are considered, e.g. the
+        bases visible in the path view.
         """
         vh = virtualHelix
         ret = []  # LUT = Look Up Table
@@ -1123,6 +1306,10 @@ class Part(QObject):
         if idx != None:
             baseRange = filter(lambda x: x >= idx - 3 * part._step and \
                                         x <= idx + 2 * part._step, baseRange)
+        if maxIdx == None:
+            maxIdx = numBases
+        baseRange = filter(lambda x: x > minIdx - part._step and \
+                                    x <= maxIdx, baseRange)
 
         fromStrandSets = vh.getStrandSets()
         neighbors = self.getVirtualHelixNeighbors(vh)
@@ -1145,7 +1332,7 @@ class Part(QObject):
                 for pt, isLowIdx in izip(pts, (True, False)):
                     for i, j in product(baseRange, pt):
                         index = i + j
-                        if index < numBases:
+                        if index < numBases and minIdx <= index <= maxIdx:
                             if fromSS.hasNoStrandAtOrNoXover(index) and \
                                     toSS.hasNoStrandAtOrNoXover(index):
                                 ret.append((neighbor, index, st, isLowIdx))
@@ -1165,6 +1352,10 @@ class Part(QObject):
                 toSS.hasStrandAtAndNoXover(idx)
     # end def
 
+    def importedVHelixOrder(self):
+        """The (row, col) order of the helices in the file, if imported."""
+        return self._importedVHelixOrder
+
     def setImportedVHelixOrder(self, orderedCoordList):
         """Used on file import to store the order of the virtual helices."""
         self._importedVHelixOrder = orderedCoordList
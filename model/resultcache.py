@@ -0,0 +1,144 @@
+# The MIT License
+#
+# Copyright (c) 2011 Wyss Institute at Harvard University
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# http://www.opensource.org/licenses/mit-license.php
+
+"""
+resultcache
+An LRU cache for export and analysis results, keyed by tuples that start
+with a Part.contentHash so that an unchanged design is never exported or
+analyzed twice. Entries may also be pickled to a directory, so results
+survive across sessions and batch runs.
+"""
+
+import cPickle
+import hashlib
+import os
+import tempfile
+from collections import OrderedDict
+from threading import Lock
+
+from views import styles
+
+
+class ResultCache(object):
+    def __init__(self, maxEntries=styles.RESULT_CACHE_ENTRIES,
+                 directory=styles.RESULT_CACHE_DIR):
+        self._maxEntries = maxEntries
+        self._directory = directory
+        self._entries = OrderedDict()
+        self._lock = Lock()  # the RPC server shares the cache across threads
+        self.hits = 0
+        self.misses = 0
+    # end def
+
+    ### ACCESSORS ###
+    def directory(self):
+        return self._directory
+    # end def
+
+    def setDirectory(self, directory):
+        """Pickles entries to directory as well; None keeps them in memory."""
+        if directory != None and not os.path.isdir(directory):
+            os.makedirs(directory)
+        self._directory = directory
+    # end def
+
+    ### PUBLIC METHODS ###
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._entries:
+                value = self._entries.pop(key)
+                self._entries[key] = value  # most recently used goes last
+                self.hits += 1
+                return value
+        value = self._load(key)
+        if value is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        self._remember(key, value)
+        return value
+    # end def
+
+    def put(self, key, value):
+        self._remember(key, value)
+        self._store(key, value)
+    # end def
+
+    def cached(self, key, compute):
+        """Returns the value for key, calling compute() on a miss."""
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, value)
+        return value
+    # end def
+
+    def clear(self):
+        """Forgets the entries in memory; files on disk are kept."""
+        with self._lock:
+            self._entries.clear()
+    # end def
+
+    ### PRIVATE SUPPORT METHODS ###
+    def _remember(self, key, value):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = value
+            while len(self._entries) > self._maxEntries:
+                self._entries.popitem(last=False)
+    # end def
+
+    def _path(self, key):
+        name = hashlib.sha1(repr(key)).hexdigest()
+        return os.path.join(self._directory, name + '.pickle')
+    # end def
+
+    def _load(self, key):
+        if self._directory == None:
+            return None
+        try:
+            with open(self._path(key), 'rb') as f:
+                storedKey, value = cPickle.load(f)
+        except (IOError, EOFError, cPickle.UnpicklingError):
+            return None
+        return value if storedKey == key else None
+    # end def
+
+    def _store(self, key, value):
+        """Writes to a temporary file first so readers never see half."""
+        if self._directory == None:
+            return
+        fd, tmpPath = tempfile.mkstemp(dir=self._directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                cPickle.dump((key, value), f, cPickle.HIGHEST_PROTOCOL)
+            os.rename(tmpPath, self._path(key))
+        except (IOError, OSError, cPickle.PicklingError):
+            if os.path.exists(tmpPath):
+                os.remove(tmpPath)
+    # end def
+# end class
+
+# shared by every part in the process
+resultCache = ResultCache()
@@ -0,0 +1,286 @@
+# The MIT License
+#
+# Copyright (c) 2011 Wyss Institute at Harvard University
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# http://www.opensource.org/licenses/mit-license.php
+
+"""
+statistics
+Staple length histograms, GC content and nearest-neighbor melting
+temperatures for the staples of a part.
+
+Sequences are packed into one buffer and evaluated in a single pass with
+NumPy when it is installed, with a pure Python fallback otherwise. Melting
+temperatures are memoized by sequence, and DesignStatistics only reads
+the staples on helices that changed since the last report.
+
+Melting temperatures use the unified nearest-neighbor parameters of
+SantaLucia (PNAS 95:1460, 1998) with its sodium correction of the
+entropy; sequences with unassigned bases have no Tm.
+"""
+
+import math
+from collections import defaultdict
+
+from model.contenthash import PartChangeTracker
+from model.enum import StrandType
+from model.resultcache import resultCache
+from views import styles
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+R = 1.987  # gas constant, cal/(K mol)
+BASES = 'ACGT'
+
+# (dH kcal/mol, dS cal/(K mol)) per 5'->3' dinucleotide
+_nnParams = {'AA': (-7.9, -22.2), 'TT': (-7.9, -22.2),
+             'AT': (-7.2, -20.4),
+             'TA': (-7.2, -21.3),
+             'CA': (-8.5, -22.7), 'TG': (-8.5, -22.7),
+             'GT': (-8.4, -22.4), 'AC': (-8.4, -22.4),
+             'CT': (-7.8, -21.0), 'AG': (-7.8, -21.0),
+             'GA': (-8.2, -22.2), 'TC': (-8.2, -22.2),
+             'CG': (-10.6, -27.2),
+             'GC': (-9.8, -24.4),
+             'GG': (-8.0, -19.9), 'CC': (-8.0, -19.9)}
+# initiation, per terminal base
+_initParams = {'G': (0.1, -2.8), 'C': (0.1, -2.8),
+               'A': (2.3, 4.1), 'T': (2.3, 4.1)}
+
+_tmCache = {}  # (sequence, oligoConc, saltConc) -> Tm or None
+
+if numpy != None:
+    # base codes 0-3 for ACGT, 4 for anything else
+    _codeTable = numpy.empty(256, dtype=numpy.intp)
+    _codeTable.fill(4)
+    for i, base in enumerate(BASES):
+        _codeTable[ord(base)] = _codeTable[ord(base.lower())] = i
+    _pairDH = numpy.zeros(25)
+    _pairDS = numpy.zeros(25)
+    for pair, (dH, dS) in _nnParams.iteritems():
+        _pairDH[5 * BASES.index(pair[0]) + BASES.index(pair[1])] = dH
+        _pairDS[5 * BASES.index(pair[0]) + BASES.index(pair[1])] = dS
+    _initDH = numpy.array([_initParams[b][0] for b in BASES] + [0.])
+    _initDS = numpy.array([_initParams[b][1] for b in BASES] + [0.])
+# end if
+
+
+def melting_temperatures(sequences, oligoConc=styles.TM_OLIGO_CONC,
+                         saltConc=styles.TM_SALT_CONC):
+    """
+    Returns the melting temperature in degrees C of each sequence paired
+    with its complement, at oligoConc (M) of each strand and saltConc (M)
+    of Na+, or None where the sequence is not all ACGT.
+    """
+    keys = [(seq, oligoConc, saltConc) for seq in sequences]
+    missing = list(set(key[0] for key in keys if key not in _tmCache))
+    if missing:
+        if len(_tmCache) + len(missing) > styles.TM_CACHE_ENTRIES:
+            _tmCache.clear()
+        for seq, tm in zip(missing, _meltingTemperatures(missing, oligoConc,
+                                                         saltConc)):
+            _tmCache[(seq, oligoConc, saltConc)] = tm
+    return [_tmCache[key] for key in keys]
+# end def
+
+def gc_contents(sequences):
+    """Returns the G+C fraction of the ACGT bases of each sequence."""
+    if numpy != None and sequences:
+        codes, owner, lengths = _pack(sequences)
+        n = len(sequences)
+        gc = numpy.bincount(owner, weights=(codes == 1) | (codes == 2),
+                            minlength=n)
+        known = numpy.bincount(owner, weights=codes < 4, minlength=n)
+        return [g / k if k else 0. for g, k in zip(gc.tolist(), known.tolist())]
+    ret = []
+    for seq in sequences:
+        seq = seq.upper()
+        known = sum(seq.count(b) for b in BASES)
+        gc = seq.count('G') + seq.count('C')
+        ret.append(float(gc) / known if known else 0.)
+    return ret
+# end def
+
+def length_histogram(lengths, binWidth=styles.STATS_LENGTH_BIN_WIDTH):
+    """Returns [(low, high, count), ...] for bins of binWidth bases."""
+    counts = defaultdict(int)
+    for length in lengths:
+        counts[length // binWidth] += 1
+    return [(b * binWidth, (b + 1) * binWidth - 1, counts[b]) \
+                                                    for b in sorted(counts)]
+# end def
+
+def _pack(sequences):
+    """Returns the base codes of sequences, the index of the sequence of
+    each base and the sequence lengths, as NumPy arrays."""
+    data = ''.join(str(s) for s in sequences)
+    if data:
+        codes = _codeTable[numpy.frombuffer(data, dtype=numpy.uint8)]
+    else:
+        codes = numpy.zeros(0, dtype=numpy.intp)
+    lengths = numpy.array([len(s) for s in sequences], dtype=numpy.intp)
+    owner = numpy.repeat(numpy.arange(len(sequences)), lengths)
+    return codes, owner, lengths
+# end def
+
+def _meltingTemperatures(sequences, oligoConc, saltConc):
+    if numpy == None:
+        return [_meltingTemperature(seq.upper(), oligoConc, saltConc) \
+                                                        for seq in sequences]
+    n = len(sequences)
+    codes, owner, lengths = _pack(sequences)
+    pairs = 5 * codes[:-1] + codes[1:]
+    inside = owner[:-1] == owner[1:]  # pairs within one sequence
+    pairOwner = owner[:-1][inside]
+    pairs = pairs[inside]
+    dH = numpy.bincount(pairOwner, weights=_pairDH[pairs], minlength=n)
+    dS = numpy.bincount(pairOwner, weights=_pairDS[pairs], minlength=n)
+    unknown = numpy.bincount(owner, weights=codes == 4, minlength=n)
+    ends = numpy.cumsum(lengths)
+    nonEmpty = lengths > 0
+    first = numpy.zeros(n, dtype=numpy.intp) + 4
+    last = numpy.zeros(n, dtype=numpy.intp) + 4
+    first[nonEmpty] = codes[(ends - lengths)[nonEmpty]]
+    last[nonEmpty] = codes[ends[nonEmpty] - 1]
+    dH += _initDH[first] + _initDH[last]
+    dS += _initDS[first] + _initDS[last]
+    dS += 0.368 * (lengths - 1) * math.log(saltConc)
+    tm = 1000. * dH / (dS + R * math.log(oligoConc / 4.)) - 273.15
+    valid = (unknown == 0) & (lengths > 1)
+    return [t if v else None for t, v in zip(tm.tolist(), valid.tolist())]
+# end def
+
+def _meltingTemperature(seq, oligoConc, saltConc):
+    """Pure Python version of _meltingTemperatures for one sequence."""
+    if len(seq) < 2 or any(b not in BASES for b in seq):
+        return None
+    dH = _initParams[seq[0]][0] + _initParams[seq[-1]][0]
+    dS = _initParams[seq[0]][1] + _initParams[seq[-1]][1]
+    for i in xrange(len(seq) - 1):
+        pairDH, pairDS = _nnParams[seq[i:i + 2]]
+        dH += pairDH
+        dS += pairDS
+    dS += 0.368 * (len(seq) - 1) * math.log(saltConc)
+    return 1000. * dH / (dS + R * math.log(oligoConc / 4.)) - 273.15
+# end def
+
+
+class DesignStatistics(PartChangeTracker):
+    """
+    Keeps (locString, length, sequence) for every staple oligo of a part,
+    re-reading only the oligos on helices changed since the last report.
+    Staples still pending in HelixRecords are read from the records,
+    with the sequences stored there.
+    """
+    def __init__(self, part):
+        super(DesignStatistics, self).__init__(part)
+        self._staples = {}  # Oligo -> (locString, length, sequence)
+        self._pendingRows = []
+        self._numPendingKeys = None
+    # end def
+
+    ### PUBLIC METHODS ###
+    def staples(self):
+        """Returns [(locString, length, sequence), ...] for all staples."""
+        self._update()
+        return self._staples.values() + self._pendingRows
+    # end def
+
+    def report(self, oligoConc=styles.TM_OLIGO_CONC,
+               saltConc=styles.TM_SALT_CONC):
+        """
+        Returns a dict of staple count, length histogram and summary,
+        GC content and Tm summary, and per staple rows of (locString,
+        length, gc, tm). Reports are cached by the content hash of the
+        part.
+        """
+        key = (self._part.contentHash(), 'statistics', oligoConc, saltConc)
+        return resultCache.cached(key,
+                                  lambda: self._report(oligoConc, saltConc))
+    # end def
+
+    ### PRIVATE SUPPORT METHODS ###
+    def _report(self, oligoConc, saltConc):
+        staples = sorted(self.staples())
+        lengths = [length for loc, length, seq in staples]
+        seqs = [seq for loc, length, seq in staples if seq]
+        gcs = dict(zip(seqs, gc_contents(seqs)))
+        tms = dict(zip(seqs, melting_temperatures(seqs, oligoConc, saltConc)))
+        rows = [(loc, length, gcs.get(seq), tms.get(seq)) \
+                                            for loc, length, seq in staples]
+        knownTms = [tm for tm in tms.itervalues() if tm != None]
+        return {'staples': len(staples),
+                'lengthHistogram': length_histogram(lengths),
+                'length': _summary(lengths),
+                'gc': _summary(gcs.values()),
+                'tm': _summary(knownTms),
+                'rows': rows}
+    # end def
+
+    def _update(self):
+        part = self._part
+        records = part.helixRecords()
+        numPendingKeys = len(records.pendingKeys()) if records != None else 0
+        isAll, dirty = self.takeChanges()
+        if isAll or numPendingKeys != self._numPendingKeys:
+            # strands built from the records leave no trace on the undo stack
+            self._staples = {}
+            oligos = part.loadedOligos()
+            self._pendingRows = []
+            if numPendingKeys:
+                seqs = dict(((vhNum, idx5p), seq) for strandType, vhNum, \
+                                idx5p, seq in records.sequences() \
+                                if strandType == StrandType.Staple)
+                for row in records.iterStapleExportRows():
+                    vhNum5p, idx5p, length = row[0], row[1], row[5]
+                    self._pendingRows.append(("%d[%d]" % (vhNum5p, idx5p),
+                                    length, seqs.get((vhNum5p, idx5p), '')))
+            self._numPendingKeys = numPendingKeys
+        else:
+            oligos = set()
+            for vh in dirty:
+                if self.isLiveHelix(vh):
+                    for strandSet in vh.getStrandSets():
+                        oligos.update(s.oligo() for s in strandSet)
+            loaded = part.loadedOligos()
+            for oligo in self._staples.keys():
+                if oligo not in loaded or oligo.strand5p() == None:
+                    del self._staples[oligo]
+        for oligo in oligos:
+            self._staples.pop(oligo, None)
+            if oligo.strand5p() != None and oligo.isStaple() and \
+                                                        not oligo.isLoop():
+                self._staples[oligo] = (oligo.locString(), oligo.length(),
+                                        oligo.sequence() or '')
+    # end def
+# end class
+
+
+def _summary(values):
+    """Returns {min, max, mean} of values, or None if there are none."""
+    if not values:
+        return None
+    return {'min': min(values), 'max': max(values),
+            'mean': float(sum(values)) / len(values)}
+# end def
@@ -182,6 +182,10 @@ class Strand(QObject):
         return self._decorators
     # end def
 
+    def modifiers(self):
+        return self._modifiers
+    # end def
+
     def isStaple(self):
         return self._strandSet.isStaple()
 
@@ -247,6 +251,9 @@ class Strand(QObject):
         # i.e. both endpoints thanks to multiple selections so just redo the 
         # whole thing
         self._sequence = None
+        if compSS.isPending():
+            # the complement strands push their sequence when they are built
+            return
         
         for compStrand in compSS._findOverlappingRanges(self):
             compSeq = compStrand.sequence()
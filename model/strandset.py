@@ -25,6 +25,7 @@
 import random
 from operator import itemgetter
 from itertools import izip, repeat
+from array import array
 
 from strand import Strand
 from oligo import Oligo
@@ -52,12 +53,27 @@ class StrandSet(QObject):
         super(StrandSet, self).__init__(virtualHelix)
         self._virtualHelix = virtualHelix
         self._doc = virtualHelix.document()
-        self._strandList = []
+        self._strands = []
+        self._isPending = False  # strands are still in the part's HelixRecords
         self._undoStack = None
         self._lastStrandSetIndex = None
+        self._lastEmptyRegion = None  # see getBoundsOfEmptyRegionContaining
         self._strandType = strandType
     # end def
 
+    def _getStrandList(self):
+        """Builds pending strands the first time the list is touched."""
+        if self._isPending:
+            self.materialize()
+        return self._strands
+    # end def
+
+    def _setStrandList(self, strandList):
+        self._strands = strandList
+    # end def
+
+    _strandList = property(_getStrandList, _setStrandList)
+
     def __iter__(self):
         """Iterate over each strand in the strands list."""
         return self._strandList.__iter__()
@@ -91,6 +107,15 @@ class StrandSet(QObject):
         return iter(self._strandList)
     # end def
 
+    def isPending(self):
+        """True while the strands only exist as HelixRecords."""
+        return self._isPending
+    # end def
+
+    def setPending(self, isPending):
+        self._isPending = isPending
+    # end def
+
     ### PUBLIC METHODS FOR QUERYING THE MODEL ###
     def isDrawn5to3(self):
         return self._virtualHelix.isDrawn5to3(self)
@@ -137,12 +162,19 @@ class StrandSet(QObject):
         """
         Returns the (tight) bounds of the contiguous stretch of unpopulated
         bases that includes the baseIdx.
+
+        The last region found is remembered along with the strands on
+        either side of it, so asking again about the same gap (as hover
+        handlers do) skips the search until those strands change.
         """
         lowIdx, highIdx = 0, self.partMaxBaseIdx()  # init the return values
-        lenStrands = len(self._strandList)
+        strandList = self._strandList
+        lenStrands = len(strandList)
 
-        # not sure how to set this up this to help in caching
-        # lastIdx = self._lastStrandSetIndex
+        last = self._lastEmptyRegion
+        if last is not None and last[0] <= baseIdx <= last[1] and \
+                                self._isEmptyRegionCurrent(last, highIdx):
+            return last[:2]
 
         if lenStrands == 0:  # empty strandset, just return the part bounds
             return (lowIdx, highIdx)
@@ -151,7 +183,7 @@ class StrandSet(QObject):
         high = lenStrands    # index of the last (right-most) strand
         while low < high:    # perform binary search to find empty region
             mid = (low + high) / 2
-            midStrand = self._strandList[mid]
+            midStrand = strandList[mid]
             mLow, mHigh = midStrand.idxs()
             if baseIdx < mLow:  # baseIdx is to the left of crntStrand
                 high = mid   # continue binary search to the left
@@ -162,11 +194,37 @@ class StrandSet(QObject):
             else:
                 return (None, None)  # baseIdx was not empty
         self._lastStrandSetIndex = (low + high) / 2  # set cache
+        self._lastEmptyRegion = (lowIdx, highIdx, low,
+                    strandList[low - 1] if low > 0 else None,
+                    strandList[low] if low < lenStrands else None)
         return (lowIdx, highIdx)
     # end def
 
+    def _isEmptyRegionCurrent(self, region, maxBaseIdx):
+        """
+        True if the strands that bounded region are still neighbors at the
+        same list position, with the same ends, so the gap is unchanged.
+        """
+        lowIdx, highIdx, pos, strandLow, strandHigh = region
+        strandList = self._strandList
+        if strandLow is None:
+            if pos != 0 or lowIdx != 0:
+                return False
+        elif not (0 < pos <= len(strandList) and \
+                    strandList[pos - 1] is strandLow and \
+                    strandLow.highIdx() + 1 == lowIdx):
+            return False
+        if strandHigh is None:
+            return pos == len(strandList) and highIdx == maxBaseIdx
+        return pos < len(strandList) and strandList[pos] is strandHigh and \
+                    strandHigh.lowIdx() - 1 == highIdx
+    # end def
+
     def indexOfRightmostNonemptyBase(self):
         """Returns the high baseIdx of the last strand, or 0."""
+        if self._isPending:
+            return self._records().indexOfRightmostNonemptyBase(
+                            self._strandType, self._virtualHelix.number())
         if len(self._strandList) > 0:
             return self._strandList[-1].highIdx()
         else:
@@ -186,6 +244,16 @@ class StrandSet(QObject):
     # end def
 
     ### PUBLIC METHODS FOR EDITING THE MODEL ###
+    def materialize(self):
+        """
+        Builds the Strands and Oligos of a pending StrandSet, along with
+        the pending StrandSets it shares oligos with.
+        """
+        if self._isPending:
+            self._records().materialize(self._strandType,
+                                        self._virtualHelix.number())
+    # end def
+
     def createStrand(self, baseIdxLow, baseIdxHigh, useUndoStack=True):
         """
         Assumes a strand is being created at a valid set of indices.
@@ -357,6 +425,9 @@ class StrandSet(QObject):
     def hasStrandAt(self, idxLow, idxHigh):
         """
         """
+        if self._isPending:
+            return self._records().hasStrandAt(self._strandType,
+                            self._virtualHelix.number(), idxLow, idxHigh)
         dummyStrand = Strand(self, idxLow, idxHigh)
         strandList = [s for s in self._findOverlappingRanges(dummyStrand)]
         dummyStrand._strandSet = None
@@ -433,6 +504,9 @@ class StrandSet(QObject):
     def getLegacyArray(self):
         """docstring for getLegacyArray"""
         num = self._virtualHelix.number()
+        if self._isPending:
+            return self._records().legacyArray(self._strandType, num,
+                                               self.part().maxBaseIdx() + 1)
         ret = [[-1, -1, -1, -1] for i in range(self.part().maxBaseIdx() + 1)]
         if self.isDrawn5to3():
             for strand in self._strandList:
@@ -490,7 +564,91 @@ class StrandSet(QObject):
         return ret
     # end def
 
+    def getLegacyFlatArray(self):
+        """
+        Returns the same information as getLegacyArray, flattened into a
+        single array('i') of 4 ints per base. The array is filled with
+        strided slice assignments per strand, so the cost is proportional
+        to the number of strands rather than to nested per-base lists.
+        Used by the streaming encoder.
+        """
+        num = self._virtualHelix.number()
+        if self._isPending:
+            return array('i', [x for base in self.getLegacyArray() for x in base])
+        ret = array('i', [-1]) * (4 * (self.part().maxBaseIdx() + 1))
+        for strand in self._strandList:
+            lo, hi = strand.idxs()
+            nInternal = hi - lo - 1
+            if nInternal > 0:
+                start, stop = 4 * (lo + 1), 4 * hi
+                nums = array('i', [num]) * nInternal
+                ret[start:stop:4] = nums
+                ret[start + 2:stop + 2:4] = nums
+            if self.isDrawn5to3():
+                assert strand.idx5Prime() == lo and strand.idx3Prime() == hi
+                # map the first base (5' xover if necessary)
+                s5p = strand.connection5p()
+                if s5p != None:
+                    ret[4 * lo] = s5p.virtualHelix().number()
+                    ret[4 * lo + 1] = s5p.idx3Prime()
+                ret[4 * lo + 2] = num
+                ret[4 * lo + 3] = lo + 1
+                # map the internal bases
+                if nInternal > 0:
+                    ret[start + 1:stop + 1:4] = array('i', xrange(lo, hi - 1))
+                    ret[start + 3:stop + 3:4] = array('i', xrange(lo + 2, hi + 1))
+                # map the last base (3' xover if necessary)
+                ret[4 * hi] = num
+                ret[4 * hi + 1] = hi - 1
+                s3p = strand.connection3p()
+                if s3p != None:
+                    ret[4 * hi + 2] = s3p.virtualHelix().number()
+                    ret[4 * hi + 3] = s3p.idx5Prime()
+            else:
+                assert strand.idx3Prime() == lo and strand.idx5Prime() == hi
+                # map the first base (3' xover if necessary)
+                ret[4 * lo] = num
+                ret[4 * lo + 1] = lo + 1
+                s3p = strand.connection3p()
+                if s3p != None:
+                    ret[4 * lo + 2] = s3p.virtualHelix().number()
+                    ret[4 * lo + 3] = s3p.idx5Prime()
+                # map the internal bases
+                if nInternal > 0:
+                    ret[start + 1:stop + 1:4] = array('i', xrange(lo + 2, hi + 1))
+                    ret[start + 3:stop + 3:4] = array('i', xrange(lo, hi - 1))
+                # map the last base (5' xover if necessary)
+                ret[4 * hi + 2] = num
+                ret[4 * hi + 3] = hi - 1
+                s5p = strand.connection5p()
+                if s5p != None:
+                    ret[4 * hi] = s5p.virtualHelix().number()
+                    ret[4 * hi + 1] = s5p.idx3Prime()
+            # end if
+        # end for
+        return ret
+    # end def
+
+    def getLegacyColorList(self):
+        """
+        Returns [[idx5p, 0xRRGGBB], ...] for the oligos whose 5' end is in
+        the StrandSet, as stored in the legacy stap_colors field.
+        """
+        if self._isPending:
+            return self._records().stapleColors(self._virtualHelix.number())
+        ret = []
+        for strand in self._strandList:
+            if strand.connection5p() == None:
+                c = str(strand.oligo().color())[1:]  # drop the hash
+                ret.append([strand.idx5Prime(), int(c, 16)])
+        return ret
+    # end def
+
     ### PRIVATE SUPPORT METHODS ###
+    def _records(self):
+        return self.part().helixRecords()
+    # end def
+
     def _addToStrandList(self, strand, idx):
         """Inserts strand into the _strandList at idx."""
         self._strandList.insert(idx, strand)
@@ -0,0 +1,295 @@
+# The MIT License
+#
+# Copyright (c) 2011 Wyss Institute at Harvard University
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# http://www.opensource.org/licenses/mit-license.php
+
+"""
+validation
+Design-rule checks that are kept up to date as the part is edited.
+
+A ValidationEngine runs a set of rules over a Part once, then only checks
+again what the commands on the undo stack touched: the helices they refer
+to for helix rules, and the oligos on those helices, along with the oligos
+already in violation, for oligo rules. New rules subclass HelixRule or
+OligoRule and are added with register_rule.
+
+Helices that are still pending in HelixRecords are checked as they are
+built, except that staple loops are looked up in the records, since the
+export must not miss them.
+"""
+
+from model.contenthash import PartChangeTracker
+from views import styles
+
+
+class HelixRule(object):
+    """Checks one VirtualHelix at a time."""
+    name = None
+    description = None
+
+    def checkHelix(self, part, virtualHelix):
+        """Returns a list of violation messages for virtualHelix."""
+        raise NotImplementedError
+    # end def
+# end class
+
+
+class OligoRule(object):
+    """Checks one Oligo at a time."""
+    name = None
+    description = None
+
+    def checkOligo(self, part, oligo):
+        """Returns a violation message for oligo, or None."""
+        raise NotImplementedError
+    # end def
+
+    def checkPending(self, part, records):
+        """Builds the pending strands this rule must see; see HelixRecords."""
+        pass
+    # end def
+# end class
+
+
+class StapleLoopRule(OligoRule):
+    name = 'stapleLoop'
+    description = "staple loops"
+
+    def checkOligo(self, part, oligo):
+        if oligo.isStaple() and oligo.isLoop():
+            return "staple loop at %s" % oligo.locString()
+        return None
+    # end def
+
+    def checkPending(self, part, records):
+        for strandType, vhNum in records.stapleLoopKeys():
+            part.virtualHelix(vhNum).getStrandSetByType(strandType).materialize()
+    # end def
+# end class
+
+
+class StapleLengthRule(OligoRule):
+    name = 'stapleLength'
+    description = "staples outside the length window"
+
+    def __init__(self, minLength=styles.STAPLE_MIN_LENGTH,
+                 maxLength=styles.STAPLE_MAX_LENGTH):
+        self.minLength = minLength
+        self.maxLength = maxLength
+    # end def
+
+    def checkOligo(self, part, oligo):
+        if not oligo.isStaple() or oligo.isLoop():
+            return None
+        length = oligo.length()
+        if not self.minLength <= length <= self.maxLength:
+            return "staple %s is %d bases long" % (oligo.locString(), length)
+        return None
+    # end def
+# end class
+
+
+class CrossoverLegRule(OligoRule):
+    name = 'crossoverLeg'
+    description = "staples with short crossover legs"
+
+    def __init__(self, minStapleLegLen=styles.STAPLE_MIN_LEG_LENGTH):
+        self.minStapleLegLen = minStapleLegLen
+    # end def
+
+    def checkOligo(self, part, oligo):
+        if not oligo.isStaple():
+            return None
+        for strand in oligo.strand5p().generator3pStrand():
+            isLeg = strand.connection5p() != None or \
+                    strand.connection3p() != None
+            if isLeg and strand.totalLength() < self.minStapleLegLen:
+                vhNum = strand.virtualHelix().number()
+                return "staple %s has a %d base leg at %d[%d]" % \
+                    (oligo.locString(), strand.totalLength(), vhNum,
+                     strand.idx5Prime())
+        return None
+    # end def
+# end class
+
+
+class UnpairedScaffoldRule(HelixRule):
+    name = 'unpairedScaffold'
+    description = "helices with unpaired scaffold"
+
+    def checkHelix(self, part, virtualHelix):
+        ret = []
+        staples = [s.idxs() for s in virtualHelix.stapleStrandSet()]
+        i = 0
+        for scaf in virtualHelix.scaffoldStrandSet():
+            low, high = scaf.idxs()
+            # both lists are sorted and free of overlaps
+            while i < len(staples) and staples[i][1] < low:
+                i += 1
+            j = i
+            while low <= high:
+                if j < len(staples) and staples[j][0] <= low:
+                    low = staples[j][1] + 1
+                    j += 1
+                    continue
+                end = high
+                if j < len(staples) and staples[j][0] <= high:
+                    end = staples[j][0] - 1
+                ret.append("unpaired scaffold at %d[%d-%d]" % \
+                           (virtualHelix.number(), low, end))
+                low = end + 1
+        return ret
+    # end def
+# end class
+
+
+class EmptyBaseInsertionRule(HelixRule):
+    name = 'emptyBaseInsertion'
+    description = "insertions on empty bases"
+
+    def checkHelix(self, part, virtualHelix):
+        ret = []
+        insertions = part.insertions().get(virtualHelix.coord(), {})
+        for idx in sorted(insertions):
+            if not (virtualHelix.scaffoldStrandSet().hasStrandAt(idx, idx) or
+                    virtualHelix.stapleStrandSet().hasStrandAt(idx, idx)):
+                ret.append("insertion on empty base %d[%d]" % \
+                           (virtualHelix.number(), idx))
+        return ret
+    # end def
+# end class
+
+
+_ruleClasses = [StapleLoopRule, StapleLengthRule, CrossoverLegRule,
+                UnpairedScaffoldRule, EmptyBaseInsertionRule]
+
+def register_rule(ruleClass):
+    """Adds ruleClass to the rules of engines created from now on."""
+    if ruleClass not in _ruleClasses:
+        _ruleClasses.append(ruleClass)
+    return ruleClass
+# end def
+
+def default_rules():
+    return [ruleClass() for ruleClass in _ruleClasses]
+# end def
+
+
+class ValidationEngine(PartChangeTracker):
+    """
+    Keeps the violations of each rule for a part, as a dict from the
+    subject (an Oligo or a VirtualHelix) to its messages. Violations are
+    brought up to date when they are asked for.
+    """
+    def __init__(self, part, rules=None):
+        super(ValidationEngine, self).__init__(part)
+        self._rules = default_rules() if rules == None else list(rules)
+        self._violations = dict((rule.name, {}) for rule in self._rules)
+        self._pending = set()  # helices not yet built from HelixRecords
+    # end def
+
+    ### ACCESSORS ###
+    def rules(self):
+        return self._rules
+    # end def
+
+    ### PUBLIC METHODS ###
+    def addRule(self, rule):
+        self._rules.append(rule)
+        self._violations[rule.name] = {}
+        self.invalidate()
+    # end def
+
+    def violations(self, ruleName):
+        """Returns the {subject: [message, ...]} violations of a rule."""
+        self._update()
+        return self._violations[ruleName]
+    # end def
+
+    def counts(self):
+        """Returns [(rule, number of violations), ...] in rule order."""
+        self._update()
+        return [(rule, sum(map(len, self._violations[rule.name].itervalues())))
+                                                    for rule in self._rules]
+    # end def
+
+    def messages(self):
+        """Yields every violation message, by rule."""
+        for rule in self._rules:
+            for subject, msgs in self.violations(rule.name).iteritems():
+                for msg in msgs:
+                    yield msg
+    # end def
+
+    def isValid(self):
+        return not any(count for rule, count in self.counts())
+    # end def
+
+    ### PRIVATE SUPPORT METHODS ###
+    def _update(self):
+        part = self._part
+        helixRules = [r for r in self._rules if isinstance(r, HelixRule)]
+        oligoRules = [r for r in self._rules if isinstance(r, OligoRule)]
+        records = part.helixRecords()
+        isAll, dirty = self.takeChanges()
+        if isAll:
+            for violations in self._violations.itervalues():
+                violations.clear()
+            if records != None:
+                for rule in oligoRules:
+                    rule.checkPending(part, records)
+            helices = set(part.getVirtualHelices())
+            self._pending = set(vh for vh in helices if vh.isPending())
+            helices -= self._pending
+            oligos = part.loadedOligos()
+        else:
+            built = set(vh for vh in self._pending if not vh.isPending())
+            self._pending -= built
+            helices = dirty | built
+            if not helices:
+                return
+            oligos = set()
+            for rule in oligoRules:
+                oligos.update(self._violations[rule.name])
+            for vh in helices:
+                for violations in self._violations.itervalues():
+                    violations.pop(vh, None)
+                if self.isLiveHelix(vh):
+                    for strandSet in vh.getStrandSets():
+                        oligos.update(s.oligo() for s in strandSet)
+            helices = filter(self.isLiveHelix, helices)
+        for vh in helices:
+            for rule in helixRules:
+                msgs = rule.checkHelix(part, vh)
+                if msgs:
+                    self._violations[rule.name][vh] = msgs
+        loaded = part.loadedOligos()
+        for oligo in oligos:
+            for rule in oligoRules:
+                violations = self._violations[rule.name]
+                violations.pop(oligo, None)
+                if oligo in loaded and oligo.strand5p() != None:
+                    msg = rule.checkOligo(part, oligo)
+                    if msg != None:
+                        violations[oligo] = [msg]
+    # end def
+# end class
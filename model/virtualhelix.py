@@ -154,6 +154,11 @@ class VirtualHelix(QObject):
         return self._scafStrandSet, self._stapStrandSet
     # end def
 
+    def isPending(self):
+        """True if either StrandSet has not been built from HelixRecords."""
+        return self._scafStrandSet.isPending() or self._stapStrandSet.isPending()
+    # end def
+
     def hasStrandAtIdx(self, idx):
         return self._scafStrandSet.hasStrandAt(idx, idx)
     # end def
@@ -182,6 +187,13 @@ class VirtualHelix(QObject):
     # end def
 
     ### METHODS FOR EDITING THE MODEL ###
+    def materialize(self):
+        """Builds any strands of this helix still pending in HelixRecords."""
+        if self._part != None:
+            self._scafStrandSet.materialize()
+            self._stapStrandSet.materialize()
+    # end def
+
     def destroy(self):
         # QObject also emits a destroyed() Signal
         self.setParent(None)
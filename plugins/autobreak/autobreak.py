@@ -4,6 +4,7 @@ from model.strandset import StrandSet
 from model.enum import StrandType
 from model.parts.part import Part
 from model.oligo import Oligo
+from model.resultcache import ResultCache
 from multiprocessing import Pool, cpu_count
 from operator import itemgetter
 
@@ -15,10 +16,10 @@ except Exception as e:
     print(e)
     nx = False
 
-token_cache = {}
+# many oligos share a solution, so this holds more than the shared cache
+solutionCache = ResultCache(maxEntries=4096)
 
 def breakStaples(part, settings):
-    clearTokenCache()
     breakOligos = part.document().selectedOligos()
     if not breakOligos:
         breakOligos = part.oligos()
@@ -48,13 +49,17 @@ def nxBreakStaple(oligo, settings):
     # print "tkList", tokenList, oligo.length(), oligo.color()
     if len(tokenList) == 0:
         return
-    cacheString = stringifyToken(oligo, tokenList)
-    if cacheString in token_cache:
+    staple_limits = [minStapleLen, maxStapleLen, tgtStapleLen]
+    # solutions depend only on the tokens and limits, so they are reused
+    # across oligos, runs and designs
+    cacheKey = ('autobreak', stringifyToken(oligo, tokenList),
+                tuple(staple_limits))
+    cached = solutionCache.get(cacheKey)
+    if cached != None:
         # print "cacheHit!"
-        breakItems, shortestScoreIdx = token_cache[cacheString]
+        breakItems, shortestScoreIdx = cached
         nxPerformBreaks(oligo, breakItems, tokenList, shortestScoreIdx, minStapleLegLen)
     else:
-        staple_limits = [minStapleLen, maxStapleLen, tgtStapleLen] 
         tokenLists = [(tokenList, staple_limits,0)]
         tokenCount = tokenList[0]
         if oligo.isLoop():
@@ -82,21 +87,13 @@ def nxBreakStaple(oligo, settings):
         if scoreTuple:
             shortestScore, shortestScoreIdx = scoreTuple
             breakItems = results[shortestScoreIdx][0][1]
-            addToTokenCache(cacheString, breakItems, shortestScoreIdx)
+            solutionCache.put(cacheKey, (breakItems, shortestScoreIdx))
             nxPerformBreaks(oligo, breakItems, tokenList, shortestScoreIdx, minStapleLegLen)
         else:
             if oligo.isLoop():
                 print "unbroken Loop", oligo, oligo.length()
 # end def
 
-def addToTokenCache(cacheString, breakItems, shortestScoreIdx):
-    token_cache[cacheString] = (breakItems, shortestScoreIdx)
-# end def
-
-def clearTokenCache():
-    token_cache = {}
-# end def
-
 def stringifyToken(oligo, tokenList):
     cacheString = str(tokenList)
     if oligo.isLoop():
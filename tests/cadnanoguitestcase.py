@@ -29,6 +29,8 @@ import tests.guitestcase
 
 main = tests.guitestcase.main
 
+TEST_SCAFFOLD = "ACGTACGTACGTACGTACGTA"  # 21 bases, see createPart
+
 
 class CadnanoGuiTestCase(tests.guitestcase.GUITestCase):
     """
@@ -62,5 +64,51 @@ class CadnanoGuiTestCase(tests.guitestcase.GUITestCase):
         """
         tests.guitestcase.GUITestCase.tearDown(self)
 
+    def createPart(self):
+        """
+        Returns a new honeycomb part with helices 0 and 1. Helix 0 has a
+        scaffold strand over bases 0-20 and staple strands over 0-9 and
+        10-20. Sequences, when applied, are TEST_SCAFFOLD on the scaffold.
+        """
+        part = self.documentController.document().addHoneycombPart()
+        part.createVirtualHelix(0, 0)
+        part.createVirtualHelix(0, 1)
+        vh0 = part.virtualHelix(0)
+        vh0.scaffoldStrandSet().createStrand(0, 20)
+        vh0.stapleStrandSet().createStrand(0, 9)
+        vh0.stapleStrandSet().createStrand(10, 20)
+        return part
+
+    def staple(self, part, idx, vhNum=0):
+        """The staple strand of helix vhNum at base idx."""
+        return part.virtualHelix(vhNum).stapleStrandSet().getStrand(idx)
+
+    def scaffold(self, part, idx=0, vhNum=0):
+        """The scaffold strand of helix vhNum at base idx."""
+        return part.virtualHelix(vhNum).scaffoldStrandSet().getStrand(idx)
+
+    def reopenLazily(self, part):
+        """
+        Round trips the document of part through the binary format and
+        returns the reopened part, with every strand set still pending.
+        """
+        from cStringIO import StringIO
+        from model.document import Document
+        from model.io.binaryencoder import snapshot_binary
+        from model.io.decoder import decode
+        io = StringIO()
+        helixOrderList = [vh.coord() for vh in part.getVirtualHelices()]
+        snapshot_binary(part.document(), helixOrderList, "test").write(io)
+        document = Document()
+        decode(document, io.getvalue(), lazyMinHelices=1)
+        return document.selectedPart()
+
+    def staplesByStart(self, part):
+        """Parses the staple export into {'vh[idx]' of the 5' end: row}."""
+        rows = part.getStapleSequences().splitlines()[1:]
+        return dict((row.split(',')[0], row.split(',')) for row in rows)
+# end class
+
+
 if __name__ == '__main__':
     tests.guitestcase.main()
@@ -69,7 +69,7 @@ class FunctionalTests(CadnanoGuiTestCase):
         """docstring for testFunctional1"""
         pass
 
-    def getTestSequences(self, designname, sequencesToApply):
+    def getTestSequences(self, designname, sequencesToApply, lazyMinHelices=0):
         """
         Called by a sequence-verification functional test to read in a file
         (designname), apply scaffold sequence(s) to that design, and return
@@ -80,7 +80,7 @@ class FunctionalTests(CadnanoGuiTestCase):
         inputfile = "tests/functionaltestinputs/%s" % designname
         document = self.documentController.document()
         with file(inputfile) as f:
-            decode(document, f.read())
+            decode(document, f.read(), lazyMinHelices=lazyMinHelices)
         self.setWidget(self.documentController.win, False, None)
         part = document.selectedPart()
         # apply one or more sequences to the design
@@ -182,6 +182,709 @@ class FunctionalTests(CadnanoGuiTestCase):
         refSet = self.getRefSequences(refname)
         self.assertEqual(testSet, refSet)
 
+    def testStapleOutputSorted(self):
+        """Sorted staple export orders rows, built or pending, by sort key"""
+        from model.enum import StapleSort
+        part = self.createPart()
+        vh1Staple = part.virtualHelix(1).stapleStrandSet().createStrand(2, 7)
+        self.staple(part, 0).addInsertion(3, 1)
+        self.staple(part, 10).addInsertion(15, 2)
+        vh1Staple.addInsertion(4, 1)
+        self.staple(part, 0).oligo().applyColor("#cc0000")
+        self.staple(part, 10).oligo().applyColor("#0000cc")
+        vh1Staple.oligo().applyColor("#0000cc")
+        def rows(part, sortBy):
+            rows = part.getStapleSequences(sortBy).splitlines()[1:]
+            return [(r.split(',')[0], int(r.split(',')[3])) for r in rows]
+        expected = {StapleSort.Helix: ['0[9]', '0[20]', '1[2]'],
+                    StapleSort.Position5p: ['1[2]', '0[9]', '0[20]'],
+                    StapleSort.Color: ['0[20]', '1[2]', '0[9]']}
+        lengths = {'0[9]': 11, '0[20]': 13, '1[2]': 7}
+        # the reopened part exports every staple from its pending records
+        for p in (part, self.reopenLazily(part)):
+            for sortBy, starts in expected.iteritems():
+                self.assertEqual(rows(p, sortBy),
+                                 [(start, lengths[start]) for start in starts])
+
+    def testStaplePlates(self):
+        """Plate rows are grouped by color, length and typed modifications"""
+        from model.decorators.modifier import Modifier
+        from model.enum import StapleSort
+        from model.io.plateexport import iter_plate_rows, PLATE_96
+        class Untyped(Modifier):
+            pass
+        class Biotin(Modifier):
+            def __init__(self, idx):
+                Modifier.__init__(self, idx)
+                self._mType = "biotin"
+        part = self.createPart()
+        part.virtualHelix(1).stapleStrandSet().createStrand(2, 7)
+        for idx, vhNum in ((0, 0), (10, 0), (2, 1)):
+            self.staple(part, idx, vhNum).oligo().applyColor("#cc0000")
+        # an untyped modifier leaves the field empty
+        self.staple(part, 0).modifiers()[9] = Untyped(9)
+        self.staple(part, 10).modifiers()[10] = Biotin(10)
+        rows = list(iter_plate_rows(part, PLATE_96, groupByColor=True,
+                                    lengthBins=[(0, 10), (11, 40)],
+                                    sortBy=StapleSort.Helix))
+        rows = [row[:3] + row[4:] for row in rows]  # drop the sequence
+        self.assertEqual(rows, [
+            ("Plate 1 (#cc0000 / 0-10 nt)", "A1", "0[9]-0[0]",
+             10, "#cc0000", ""),
+            ("Plate 2 (#cc0000 / 11-40 nt / modified)", "A1", "0[20]-0[10]",
+             11, "#cc0000", "3':biotin"),
+            ("Plate 1 (#cc0000 / 0-10 nt)", "B1", "1[2]-1[7]",
+             6, "#cc0000", "")])
+
+    def testValidationIncremental(self):
+        """Validation follows edits, undo and non-undo edits alike"""
+        from model.validation import ValidationEngine, StapleLengthRule, \
+                                     UnpairedScaffoldRule
+        part = self.createPart()
+        validator = ValidationEngine(part, [StapleLengthRule(11, 60),
+                                            UnpairedScaffoldRule()])
+        messages = lambda: sorted(validator.messages())
+        self.assertEqual(messages(), ["staple 0[9] is 10 bases long"])
+        stapleSet = part.virtualHelix(0).stapleStrandSet()
+        stapleSet.removeStrand(self.staple(part, 10))
+        self.assertEqual(messages(), ["staple 0[9] is 10 bases long",
+                                      "unpaired scaffold at 0[10-20]"])
+        part.undoStack().undo()
+        self.assertEqual(messages(), ["staple 0[9] is 10 bases long"])
+        stapleSet.removeStrand(self.staple(part, 0), useUndoStack=False)
+        self.assertEqual(messages(), ["unpaired scaffold at 0[0-9]"])
+
+    def testKmerIndex(self):
+        """K-mer queries find the expected staples, after edits too"""
+        from model.kmerindex import KmerIndex
+        scafSeq = "GATTACAGGCCTTAAGCTAGC"
+        stapleA, stapleB = "GCCTGTAATC", "GCTAGCTTAAG"  # 0[9], 0[20]
+        part = self.createPart()
+        scafOligo = self.scaffold(part).oligo()
+        scafOligo.applySequence(scafSeq)
+        index = KmerIndex(part, k=4)
+        oligoA = self.staple(part, 0).oligo()
+        self.assertEqual(index.complementsOf(scafSeq[:10], 8),
+                         [(oligoA, 0, 0, 10)])
+        self.assertEqual(sorted(index.findMotif("TTACA", bothStrands=True)),
+                         sorted([(scafOligo, 2, False), (oligoA, 3, True)]))
+        sequences = lambda: sorted(index.sequences().values())
+        self.assertEqual(sequences(), sorted([scafSeq, stapleA, stapleB]))
+        stapleSet = part.virtualHelix(0).stapleStrandSet()
+        stapleSet.removeStrand(self.staple(part, 0))
+        self.assertEqual(sequences(), sorted([scafSeq, stapleB]))
+        part.undoStack().undo()
+        self.assertEqual(sequences(), sorted([scafSeq, stapleA, stapleB]))
+        stapleSet.removeStrand(self.staple(part, 10), useUndoStack=False)
+        self.assertEqual(sequences(), sorted([scafSeq, stapleA]))
+        self.assertEqual(index.findMotif("CTTA"), [(scafOligo, 11, False)])
+
+    def testPathViewVirtualization(self):
+        """Only strands in a helix's visible range get StrandItems"""
+        part = self.createPart()
+        partItem = self.documentController.win.pathroot.partItemForPart(part)
+        vhi0 = partItem.itemForVirtualHelix(part.virtualHelix(0))
+        vhi1 = partItem.itemForVirtualHelix(part.virtualHelix(1))
+        itemStrands = lambda vhi: set(i.strand() for i in vhi.strandItems())
+        self.assertEqual(set(vhi0.strandsInRange(12, 15)),
+                         set([self.scaffold(part), self.staple(part, 10)]))
+        vhi0.syncStrandItems(vhi0.strandsInRange(12, 15), (12, 15))
+        self.assertEqual(itemStrands(vhi0),
+                         set([self.scaffold(part), self.staple(part, 10)]))
+        vhi0.syncStrandItems([], None)
+        self.assertEqual(vhi0.strandItems(), [])
+        # strands added later get an item only inside the visible range
+        vhi1.syncStrandItems([], (0, 5))
+        stapleSet = part.virtualHelix(1).stapleStrandSet()
+        near = stapleSet.createStrand(2, 7)
+        stapleSet.createStrand(30, 35)
+        self.assertEqual(itemStrands(vhi1), set([near]))
+
+    def testPathViewSharedGridTiles(self):
+        """Helices of one length draw from the same cached grid paths"""
+        from PyQt4.QtGui import QImage, QPainter, QStyleOptionGraphicsItem
+        import views.pathview.virtualhelixitem as virtualhelixitem
+        part = self.createPart()
+        partItem = self.documentController.win.pathroot.partItemForPart(part)
+        vhi0 = partItem.itemForVirtualHelix(part.virtualHelix(0))
+        vhi1 = partItem.itemForVirtualHelix(part.virtualHelix(1))
+        canvasSize = part.maxBaseIdx() + 1
+        border = virtualhelixitem._borderPaths[canvasSize]
+        self.assertEqual(vhi0.path(), border)
+        self.assertEqual(vhi1.path(), border)
+        image = QImage(16, 16, QImage.Format_ARGB32)
+        def paintedTiles(vhi):
+            option = QStyleOptionGraphicsItem()
+            option.exposedRect = vhi.boundingRect()
+            painter = QPainter(image)
+            vhi.paint(painter, option)
+            painter.end()
+            return dict(virtualhelixitem._gridTiles)
+        tiles = paintedTiles(vhi0)
+        key = (part.subStepSize(), canvasSize)
+        self.assertTrue(key in tiles)
+        # the second helix reuses the tile the first one built
+        self.assertEqual(paintedTiles(vhi1), tiles)
+        self.assertTrue(virtualhelixitem._gridTile(*key) is tiles[key])
+        # a new helix builds no grid items or per-base path elements
+        part.createVirtualHelix(1, 1)
+        vhi2 = partItem.itemForVirtualHelix(part.virtualHelixAtCoord((1, 1)))
+        self.assertEqual(vhi2.childItems(), [])
+        self.assertTrue(vhi2.path().elementCount() < canvasSize)
+        self.assertEqual(virtualhelixitem._gridTiles, tiles)
+
+    def testPathViewLevelOfDetail(self):
+        """Without details, helices paint strand runs that follow edits"""
+        from PyQt4.QtGui import QImage, QPainter
+        from views import styles
+        part = self.createPart()
+        win = self.documentController.win
+        view = win.pathGraphicsView
+        partItem = win.pathroot.partItemForPart(part)
+        vhi = partItem.itemForVirtualHelix(part.virtualHelix(0))
+        image = QImage(16, 16, QImage.Format_ARGB32)
+        def batchRuns():
+            painter = QPainter(image)
+            vhi._paintBatchRuns(painter)
+            painter.end()
+            return sorted((str(color), len(lines)) \
+                                for color, lines in vhi._batchRuns.iteritems())
+        scale = styles.LOD_HIDE_DETAILS_SCALE / view.transform().m11() * 0.9
+        view.scale(scale, scale)
+        view.resetGL()
+        self.processEvents()
+        self.assertFalse(partItem.shouldShowDetails())
+        self.assertEqual(vhi.strandItems(), [])
+        self.scaffold(part).oligo().applyColor("#0000aa")
+        self.staple(part, 0).oligo().applyColor("#aa0000")
+        self.staple(part, 10).oligo().applyColor("#00aa00")
+        self.assertEqual(batchRuns(), [("#0000aa", 1), ("#00aa00", 1),
+                                       ("#aa0000", 1)])
+        # edits made without the undo stack reach the cached runs too
+        self.staple(part, 0).oligo().applyColor("#123456", useUndoStack=False)
+        self.assertEqual(vhi._batchRuns, None)
+        self.assertEqual(batchRuns(), [("#0000aa", 1), ("#00aa00", 1),
+                                       ("#123456", 1)])
+        self.staple(part, 10).strandSet().removeStrand(self.staple(part, 10),
+                                                       useUndoStack=False)
+        self.assertEqual(partItem._batchXovers, None)
+        self.assertEqual(batchRuns(), [("#0000aa", 1), ("#123456", 1)])
+        view.zoomIn()
+        self.processEvents()
+        self.assertTrue(partItem.shouldShowDetails())
+        self.assertEqual(len(vhi.strandItems()), 2)
+
+    def testStyleCaches(self):
+        """Equal style parameters give the same shared pen, brush or path"""
+        from PyQt4.QtGui import QPainterPath
+        from views import stylecache
+        pen = stylecache.cachedPen("#cc0000", 3)
+        self.assertTrue(stylecache.cachedPen("#cc0000", 3) is pen)
+        self.assertEqual(stylecache.cachedPen("#cc0000", 3, 128).color().alpha(),
+                         128)
+        self.assertTrue(stylecache.cachedBrush("#cc0000") is
+                        stylecache.cachedBrush("#cc0000"))
+        built = []
+        build = lambda: built.append(1) or QPainterPath()
+        path = stylecache.cachedPath(('test', 1), build)
+        self.assertTrue(stylecache.cachedPath(('test', 1), build) is path)
+        self.assertEqual(len(built), 1)
+
+    def testSequenceLabelLayout(self):
+        """Sequence labels are laid out lazily and cached by sequence"""
+        from tests.cadnanoguitestcase import TEST_SCAFFOLD
+        part = self.createPart()
+        partItem = self.documentController.win.pathroot.partItemForPart(part)
+        vhi = partItem.itemForVirtualHelix(part.virtualHelix(0))
+        vhi.syncStrandItems(vhi.strandsInRange(0, 20), (0, 20))
+        items = dict((item.strand(), item) for item in vhi.strandItems())
+        self.scaffold(part).oligo().applySequence(TEST_SCAFFOLD)
+        stapleItem = items[self.staple(part, 0)]
+        stapleItem._updateSequenceText()
+        self.assertTrue(stapleItem._seqLabel._staticText is None)
+        staticText = stapleItem.sequenceLayout()[0]
+        self.assertTrue(stapleItem.sequenceLayout()[0] is staticText)
+        # staples on helix 0 are drawn 3' to 5', so their text is reversed
+        texts = [str(items[strand].sequenceLayout()[0].text()) for strand in
+                 (self.scaffold(part), self.staple(part, 0),
+                  self.staple(part, 10))]
+        self.assertEqual(texts, [TEST_SCAFFOLD, "TGCATGCATG", "CATGCATGCAT"])
+        self.scaffold(part).oligo().applySequence("T" * 21)
+        self.assertEqual(str(stapleItem.sequenceLayout()[0].text()), "A" * 10)
+
+    def testPreXoverItemReuse(self):
+        """Redisplayed prexovers reuse their items and follow renumbering"""
+        part = self.documentController.document().addHoneycombPart()
+        for coord in [(0, 0), (1, 0), (0, 1)]:
+            part.createVirtualHelix(*coord)
+        vh, neighbor = part.virtualHelixAtCoord((0, 0)), \
+                       part.virtualHelixAtCoord((0, 1))
+        self.assertEqual(neighbor.number(), 3)
+        win = self.documentController.win
+        partItem = win.pathroot.partItemForPart(part)
+        vhi = partItem.itemForVirtualHelix(vh)
+        part.setActiveVirtualHelix(vh, 20)
+        partItem.setPreXoverItemsVisible(vhi)
+        shown = dict(partItem._preXoverItems)
+        self.assertTrue(shown)
+        labels = lambda: set(str(pair[0]._label.text()) for site, pair in
+                          partItem._preXoverItems.iteritems()
+                          if site[1] is neighbor)
+        self.assertEqual(labels(), set(["3"]))
+        partItem.setPreXoverItemsVisible(vhi)
+        self.assertEqual(partItem._preXoverItems, shown)
+        part.renumber([(0, 0), (0, 1), (1, 0)])
+        self.assertEqual(neighbor.number(), 1)
+        self.assertEqual(partItem._preXoverItems, shown)
+        self.assertEqual(labels(), set(["1"]))
+        partItem.setPreXoverItemsVisible(None)
+        self.assertEqual(partItem._preXoverItems, {})
+        pool = set(partItem._preXoverItemPool)
+        partItem.setPreXoverItemsVisible(vhi)
+        items = set(pxi for pair in partItem._preXoverItems.values()
+                    for pxi in pair)
+        self.assertTrue(items <= pool)
+        self.assertEqual(part.potentialCrossoverList(vh, None, 10, 20),
+                         [xover for xover in part.potentialCrossoverList(vh)
+                          if 10 <= xover[1] <= 20])
+
+    def testEmptyRegionCache(self):
+        """Cached empty regions follow edits, undo and non-undo edits"""
+        part = self.createPart()
+        strandSet = part.virtualHelix(0).stapleStrandSet()
+        maxIdx = strandSet.partMaxBaseIdx()
+        bounds = strandSet.getBoundsOfEmptyRegionContaining
+        self.assertEqual(bounds(25), (21, maxIdx))
+        self.assertEqual(bounds(maxIdx), (21, maxIdx))
+        strandSet.createStrand(30, 32)
+        self.assertEqual(bounds(25), (21, 29))
+        self.assertEqual(bounds(31), (None, None))
+        self.assertEqual(bounds(35), (33, maxIdx))
+        part.undoStack().undo()
+        self.assertEqual(bounds(25), (21, maxIdx))
+        strandSet.removeStrand(self.staple(part, 10), useUndoStack=False)
+        self.assertEqual(bounds(25), (10, maxIdx))
+
+    def testHoverBaseDedup(self):
+        """A path tool dispatches one hover per item and base"""
+        tool = self.documentController.win.pathToolManager.pencilTool
+        item = object()
+        self.assertTrue(tool.isNewHoverBase(item, 3, 0))
+        self.assertFalse(tool.isNewHoverBase(item, 3, 0))
+        self.assertTrue(tool.isNewHoverBase(item, 4, 0))
+        tool.resetHoverBase()
+        self.assertTrue(tool.isNewHoverBase(item, 4, 0))
+
+    def testSliceLattice(self):
+        """Only helices get slice items; empty positions are hit arithmetically"""
+        from PyQt4.QtCore import QPointF
+        from views import styles
+        from views.sliceview.emptyhelixitem import EmptyHelixItem
+        part = self.createPart()
+        partItem = self.documentController.win.sliceroot._instanceItems.keys()[0]
+        helixCoords = lambda: sorted(item.coord() for item in
+                                     partItem.childItems()
+                                     if isinstance(item, EmptyHelixItem))
+        self.assertEqual(helixCoords(), [(0, 0), (0, 1)])
+        r = styles.SLICE_HELIX_RADIUS
+        def center(row, col):
+            x, y = part.latticeCoordToPositionXY(row, col,
+                                                 partItem.scaleFactor())
+            return QPointF(x + r, y + r)
+        helix = partItem.helixItemAt(center(0, 1))
+        self.assertEqual(helix.coord(), (0, 1))
+        self.assertTrue(helix is partItem.emptyHelixItemAtCoord(0, 1))
+        # an empty position is served by the single hover item
+        hover = partItem.helixItemAt(center(2, 3))
+        self.assertEqual(hover.coord(), (2, 3))
+        self.assertTrue(partItem.helixItemAt(center(1, 0)) is hover)
+        self.assertEqual(hover.coord(), (1, 0))
+        # the gap below (0, 0) is two radii from every lattice position
+        self.assertEqual(partItem.helixItemAt(center(0, 0) +
+                                              QPointF(0, 2 * r)), None)
+        self.assertEqual(partItem.helixItemAt(QPointF(-2 * r, -2 * r)), None)
+        self.assertEqual(len(helixCoords()), 3)
+
+    def testOccupancyMap(self):
+        """Occupied helices follow edits, built or pending"""
+        from model.enum import StrandType
+        Scaffold, Staple = StrandType.Scaffold, StrandType.Staple
+        part = self.createPart()
+        vh0, vh1 = part.virtualHelix(0), part.virtualHelix(1)
+        vh1.stapleStrandSet().createStrand(5, 7)
+        lazyPart = self.reopenLazily(part)
+        for p in (part, lazyPart):
+            occupancy = p.occupancy()
+            numbers = lambda idx, strandType: sorted(vh.number() for vh in
+                                occupancy.occupiedHelices(idx, strandType))
+            self.assertEqual(numbers(5, Scaffold), [0])
+            self.assertEqual(numbers(5, Staple), [0, 1])
+            self.assertEqual(numbers(8, Staple), [0])
+            self.assertEqual(numbers(25, Scaffold), [])
+        self.assertTrue(lazyPart.virtualHelix(1).stapleStrandSet().isPending())
+        occupancy = part.occupancy()
+        partItem = self.documentController.win.sliceroot._instanceItems.keys()[0]
+        part.setActiveBaseIndex(6)
+        self.assertEqual(partItem._activeSliceItem._activeHelices, set([vh0]))
+        vh1.scaffoldStrandSet().createStrand(30, 32)
+        self.assertEqual(occupancy.occupiedHelices(31), set([vh1]))
+        part.undoStack().undo()
+        self.assertEqual(occupancy.occupiedHelices(31), set())
+        vh0.scaffoldStrandSet().removeStrand(self.scaffold(part),
+                                             useUndoStack=False)
+        self.assertEqual(occupancy.occupiedHelices(5), set())
+        self.assertFalse(occupancy.isOccupied(vh0, 5))
+
+    ########################### File I/O Tests ###########################
+    def openTestDesign(self, designname, lazyMinHelices=0):
+        """Decodes designname into the test document and returns its part."""
+        from model.io.decoder import decode
+        inputfile = "tests/functionaltestinputs/%s" % designname
+        document = self.documentController.document()
+        with file(inputfile) as f:
+            decode(document, f.read(), lazyMinHelices=lazyMinHelices)
+        self.setWidget(self.documentController.win, False, None)
+        return document.selectedPart()
+
+    def waitForFileTask(self, timeout=30.):
+        """Runs the event loop until the background open or save is done."""
+        dc = self.documentController
+        deadline = time.time() + timeout
+        while dc._fileWorker != None or dc._applyIter != None:
+            self.assertTrue(time.time() < deadline, "file task timed out")
+            self.processEvents()
+
+    def testStaleSaveCompletion(self):
+        """A save that completes after New does not name the new document"""
+        import os, tempfile
+        dc = self.documentController
+        dc.document().addHoneycombPart().createVirtualHelix(0, 0)
+        fd, fname = tempfile.mkstemp(suffix=".json")
+        os.close(fd)
+        dc.writeDocumentToFile(fname, inBackground=True)
+        worker = dc._fileWorker
+        dc.newDocument()
+        worker.wait()
+        self.waitForFileTask()
+        os.remove(fname)
+        self.assertEqual(dc.filename(), "untitled.json")
+        self.assertTrue(dc._hasNoAssociatedFile)
+
+    def testSaveThenOpen(self):
+        """Opening a file while a save runs lets the save finish first"""
+        import json, os, tempfile
+        dc = self.documentController
+        part = dc.document().addHoneycombPart()
+        part.createVirtualHelix(0, 0)
+        part.createVirtualHelix(0, 1)
+        fd, fname = tempfile.mkstemp(suffix=".json")
+        os.close(fd)
+        dc.writeDocumentToFile(fname, inBackground=True)
+        dc.newDocument(fname="tests/functionaltestinputs/simple42legacy.json")
+        dc._startOpen("tests/functionaltestinputs/simple42legacy.json")
+        self.waitForFileTask()
+        with open(fname) as f:
+            saved = json.load(f)
+        os.remove(fname)
+        self.assertEqual(len(saved['vstrands']), 2)
+        self.assertEqual(os.path.basename(dc.filename()),
+                         "simple42legacy.json")
+
+    def testSVGExport(self):
+        """SVG paths get the stroke of their oligo, scaffold included"""
+        from StringIO import StringIO
+        from xml.etree import ElementTree
+        from model.io.svgexport import write_svg
+        from tests.cadnanoguitestcase import TEST_SCAFFOLD
+        ns = '{http://www.w3.org/2000/svg}'
+        part = self.createPart()
+        vh1Scaffold = part.virtualHelix(1).scaffoldStrandSet().createStrand(0, 20)
+        part.createXover(self.scaffold(part), 20, vh1Scaffold, 20)
+        self.scaffold(part).oligo().applyColor("#0000aa")
+        self.staple(part, 0).oligo().applyColor("#aa0000")
+        self.staple(part, 10).oligo().applyColor("#00aa00")
+        def helixGroup(showSequences):
+            out = StringIO()
+            write_svg(part, out, showSequences=showSequences)
+            svg = ElementTree.fromstring(out.getvalue())
+            xovers = svg.findall(ns + 'g[@class="x"]/' + ns + 'path')
+            self.assertEqual([x.get('stroke') for x in xovers], ["#0000aa"])
+            return [g for g in svg.findall(ns + 'g') if g.get('id') == 'vh0'][0]
+        group = helixGroup(False)
+        paths = [p for p in group.findall(ns + 'path') if p.get('class') == 's']
+        self.assertEqual(sorted(p.get('stroke') for p in paths),
+                         ["#0000aa", "#00aa00", "#aa0000"])
+        self.assertEqual(group.findall(ns + 'text[@class="q"]'), [])
+        self.scaffold(part).oligo().applySequence(TEST_SCAFFOLD + "A" * 21)
+        texts = [t.text for t in helixGroup(True).findall(ns + 'text')
+                 if t.get('class') == 'q']
+        # staples on helix 0 are drawn 3' to 5', so their text is reversed
+        self.assertEqual(sorted(texts),
+                         sorted([TEST_SCAFFOLD, "TGCATGCATG", "CATGCATGCAT"]))
+
+    def testSVGExportFollowsSequenceDisplay(self):
+        """The SVG export has sequences only where the path view shows them"""
+        from StringIO import StringIO
+        from views import styles
+        from tests.cadnanoguitestcase import TEST_SCAFFOLD
+        part = self.createPart()
+        self.scaffold(part).oligo().applySequence(TEST_SCAFFOLD)
+        win = self.documentController.win
+        partItem = win.pathroot.partItemForPart(part)
+        view = win.pathGraphicsView
+        def exportedSVG():
+            out = StringIO()
+            self.documentController.writeSVG(out)
+            return out.getvalue()
+        view.zoomIn()
+        self.assertTrue(partItem.showsSequences())
+        svg = exportedSVG()
+        self.assertTrue('class="q"' in svg)
+        self.assertTrue(TEST_SCAFFOLD in svg)
+        scale = styles.PATH_SEQUENCE_LOD_SCALE / view.transform().m11() * 0.9
+        view.scale(scale, scale)
+        self.assertFalse(partItem.showsSequences())
+        svg = exportedSVG()
+        self.assertFalse('class="q"' in svg)
+        self.assertFalse(TEST_SCAFFOLD in svg)
+
+    def testStreamingEncoder(self):
+        """Streaming encoder output matches the file the design was read from"""
+        import json, os.path, tempfile
+        from model.io.encoder import encode
+        inputfile = "tests/functionaltestinputs/loops_and_skips.json"
+        with open(inputfile) as f:
+            refObj = json.load(f)
+        self.openTestDesign("loops_and_skips.json")
+        document = self.documentController.document()
+        helixOrderList = [(vs['row'], vs['col']) for vs in refObj['vstrands']]
+        with tempfile.NamedTemporaryFile(suffix=".json") as f:
+            encode(document, helixOrderList, f)
+            f.flush()
+            f.seek(0)
+            streamed = json.loads(f.read())
+            self.assertEqual(streamed.pop('name'), os.path.basename(f.name))
+        refObj.pop('name')
+        self.assertEqual(streamed, refObj)
+
+    def decodeDesign(self, data, lazyMinHelices=0):
+        """Decodes design data into a new Document and returns its part."""
+        from model.document import Document
+        from model.io.decoder import decode
+        document = Document()
+        decode(document, data, lazyMinHelices=lazyMinHelices)
+        return document.selectedPart()
+
+    def binaryRoundTrip(self, designname, lazyMinHelices=0):
+        """
+        Decodes designname, applies a scaffold sequence, and returns the
+        part along with the part decoded from its binary encoding.
+        """
+        from StringIO import StringIO
+        from model.io.binaryencoder import snapshot_binary
+        with open("tests/functionaltestinputs/%s" % designname) as f:
+            part = self.decodeDesign(f.read())
+        scafOligo = [o for o in part.oligos() if not o.isStaple()][0]
+        scafOligo.applySequence(sequences["p7560"], useUndoStack=False)
+        io = StringIO()
+        snapshot_binary(part.document(), part.importedVHelixOrder(),
+                        designname).write(io)
+        return part, self.decodeDesign(io.getvalue(), lazyMinHelices)
+
+    def testBinaryRoundTrip(self):
+        """A binary design decodes to the part it was encoded from"""
+        import json
+        from StringIO import StringIO
+        from model.io.encoder import encode
+        def legacyObj(part):
+            io = StringIO()
+            io.name = "design.json"
+            encode(part.document(), part.importedVHelixOrder(), io)
+            return json.loads(io.getvalue())
+        for designname in ("loops_and_skips.json", "Nature09_monolith.json"):
+            part, binaryPart = self.binaryRoundTrip(designname)
+            self.assertEqual(legacyObj(binaryPart), legacyObj(part))
+            self.assertEqual(
+                sorted(binaryPart.getStapleSequences().splitlines()),
+                sorted(part.getStapleSequences().splitlines()))
+
+    def testLazyBinaryRoundTrip(self):
+        """A lazily opened binary design keeps its runs pending until built"""
+        part, lazyPart = self.binaryRoundTrip("loops_and_skips.json",
+                                              lazyMinHelices=1)
+        for vh in lazyPart.getVirtualHelices():
+            for strandSet in vh.getStrandSets():
+                self.assertTrue(strandSet.isPending())
+        insertions = lambda p: dict((coord, sorted((idx, ins.length())
+                                        for idx, ins in d.iteritems()))
+                                    for coord, d in p.insertions().iteritems())
+        self.assertEqual(insertions(lazyPart), insertions(part))
+        self.assertEqual(
+            sorted(lazyPart.getStapleSequences().splitlines()),
+            sorted(part.getStapleSequences().splitlines()))
+
+    def testLazyOpenExport_Nature09_monolith(self):
+        """Staple export from unbuilt helix records matches the reference"""
+        part = self.openTestDesign("Nature09_monolith.json", lazyMinHelices=1)
+        vh = part.getVirtualHelices()[0]
+        # the unsequenced export only differs from the reference by '?'s
+        testRows = part.getStapleSequences().splitlines()[1:]
+        refRows = [row for row in self.getRefSequences("Nature09_monolith.csv") \
+                                        if not row.startswith("Start")]
+        strip = lambda row: [f for i, f in enumerate(row.split(',')) if i != 2]
+        self.assertEqual(sorted(map(strip, testRows)),
+                         sorted(map(strip, refRows)))
+        self.assertTrue(vh.stapleStrandSet().isPending())
+        vh.stapleStrandSet().getStrand(0)
+        self.assertFalse(vh.stapleStrandSet().isPending())
+
+    def testLazyStapleOutput_Nature09_monolith(self):
+        """Staples match reference set for a lazily opened Nature09 monolith"""
+        sequences = [("p7560", 4, 73)]
+        testSet = self.getTestSequences("Nature09_monolith.json", sequences,
+                                        lazyMinHelices=1)
+        refSet = self.getRefSequences("Nature09_monolith.csv")
+        self.assertEqual(testSet, refSet)
+
+    def testBatchJob_simple42legacy(self):
+        """A batch conversion job reproduces the reference staple export"""
+        import os, tempfile
+        from cadnano_batch import run_job
+        fd, csvPath = tempfile.mkstemp(suffix=".csv")
+        os.close(fd)
+        job = ("tests/functionaltestinputs/simple42legacy.json",
+               [('sequence', "p7308", 0, 0), ('csv', csvPath)])
+        result = run_job(job)
+        with open(csvPath) as f:
+            testSet = set(f.read().splitlines())
+        os.remove(csvPath)
+        self.assertTrue(result['ok'], result['traceback'])
+        self.assertEqual([op for op, t in result['timings']],
+                         ['open', 'sequence', 'csv'])
+        self.assertEqual(testSet, self.getRefSequences("simple42legacy.csv"))
+
+    def testBatchJob_sq100(self):
+        """A headless batch job opens a square lattice file with one column"""
+        import os, tempfile
+        from cadnano_batch import run_batch
+        fd, csvPath = tempfile.mkstemp(suffix=".csv")
+        os.close(fd)
+        job = ("tests/functionaltestinputs/sq100_col0.json", [('csv', csvPath)])
+        result, = run_batch([job], processes=1)
+        with open(csvPath) as f:
+            rows = f.read().splitlines()[1:]
+        os.remove(csvPath)
+        self.assertTrue(result['ok'], result['traceback'])
+        self.assertEqual(rows, ["0[31],0[0],%s,32,#cc0000" % ('?' * 32)])
+
+    def testRpcServer_simple42legacy(self):
+        """The JSON-RPC server loads, edits and exports over loopback"""
+        import threading
+        from cadnano_server import DesignService, make_server, call
+        service = DesignService(processes=0,
+                                root="tests/functionaltestinputs")
+        server = make_server(service, port=0)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        address = server.server_address
+        try:
+            loaded = call(address, 'load', path="simple42legacy.json")
+            edited = call(address, 'applySequence', design=loaded['design'],
+                          sequence="p7308", vhNum=0, idx=0)
+            exported = call(address, 'export', design=edited['design'])
+            summary = call(address, 'query', design=edited['design'])
+            staples = call(address, 'query', design=edited['design'],
+                           what='staples')
+        finally:
+            server.shutdown()
+            server.server_close()
+            service.close()
+        self.assertNotEqual(loaded['design'], edited['design'])
+        self.assertEqual(summary['helices'], loaded['helices'])
+        self.assertEqual(set(exported['data'].splitlines()),
+                         self.getRefSequences("simple42legacy.csv"))
+        self.assertEqual(len(staples), summary['staples'])
+        self.assertTrue(all(row[-1].startswith('#') for row in staples))
+
+    def testRpcServerErrors(self):
+        """Bad params, paths and results get JSON-RPC errors"""
+        import json
+        import cadnano_server
+        from cadnano_server import DesignService, handle_request, \
+                                   encode_response
+        service = DesignService(processes=0,
+                                root="tests/functionaltestinputs")
+        def errorCode(method, params):
+            request = {'jsonrpc': '2.0', 'id': 1, 'method': method,
+                       'params': params}
+            return handle_request(service, request)['error']['code']
+        try:
+            self.assertEqual(errorCode('ping', [1]),
+                             cadnano_server.INVALID_PARAMS)
+            self.assertEqual(errorCode('load', {'bogus': 1}),
+                             cadnano_server.INVALID_PARAMS)
+            # a TypeError raised inside the method is an internal error
+            self.assertEqual(errorCode('load', {'content': 5,
+                                                'encoding': 'base64'}),
+                             cadnano_server.INTERNAL_ERROR)
+            self.assertEqual(errorCode('nosuchmethod', []),
+                             cadnano_server.METHOD_NOT_FOUND)
+            # paths outside the root, and files that are not designs
+            for path in ("../functionaltests.py", "/etc/passwd",
+                         "simple42legacy.csv"):
+                self.assertEqual(errorCode('load', {'path': path}),
+                                 cadnano_server.INVALID_PARAMS)
+            # sequences are never read from files
+            design = service.load(path="simple42legacy.json")['design']
+            self.assertEqual(errorCode('applySequence',
+                                       {'design': design,
+                                        'sequence': "/etc/passwd"}),
+                             cadnano_server.INVALID_PARAMS)
+        finally:
+            service.close()
+        # without a root, loading by path is refused
+        service = DesignService(processes=0)
+        try:
+            self.assertEqual(errorCode('load', {'path': "simple42legacy.json"}),
+                             cadnano_server.INVALID_PARAMS)
+        finally:
+            service.close()
+        # a result json cannot encode still gets an answer
+        response = json.loads(encode_response({'jsonrpc': '2.0', 'id': 7,
+                                               'result': object()}))
+        self.assertEqual(response['id'], 7)
+        self.assertEqual(response['error']['code'],
+                         cadnano_server.INTERNAL_ERROR)
+
+    def testDesignDiff(self):
+        """A diff lists exactly the edits made to a small part"""
+        from model.designdiff import diff_designs, summarize_part
+        part = self.createPart()
+        self.staple(part, 0).oligo().applyColor("#cc0000")
+        before = summarize_part(part)
+        self.assertTrue(diff_designs(before, part).isEmpty())
+        vh1Scaffold = part.virtualHelix(1).scaffoldStrandSet().createStrand(0, 20)
+        part.createXover(self.scaffold(part), 20, vh1Scaffold, 20)
+        stapleSet = part.virtualHelix(0).stapleStrandSet()
+        stapleSet.removeStrand(self.staple(part, 10))
+        self.staple(part, 0).addInsertion(3, 2)
+        self.staple(part, 0).oligo().applyColor("#123456")
+        diff = diff_designs(before, part)
+        self.assertEqual(diff.addedStrands,
+                         [(0, 1, StrandType.Scaffold, 0, 20)])
+        self.assertEqual(diff.removedStrands,
+                         [(0, 0, StrandType.Staple, 10, 20)])
+        self.assertEqual(diff.resizedStrands, [])
+        self.assertEqual(diff.addedXovers,
+                         [(StrandType.Scaffold, 0, 0, 20, 0, 1, 20)])
+        self.assertEqual(diff.removedXovers, [])
+        self.assertEqual(diff.changedInsertions, [(0, 0, 3, 0, 2)])
+        self.assertEqual(diff.recoloredOligos,
+                         [(0, 0, 9, "#cc0000", "#123456")])
+        self.assertEqual(diff.addedHelices + diff.removedHelices +
+                         diff.renumberedHelices, [])
+
     ####################### Standard Functional Tests ########################
     # def testActiveSliceHandleAltShiftClick(self):
     #     """Alt+Shift+Click on ActiveSliceHandle extends scaffold strands."""
@@ -0,0 +1,117 @@
+# The MIT License
+#
+# Copyright (c) 2011 Wyss Institute at Harvard University
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# http://www.opensource.org/licenses/mit-license.php
+
+"""
+iobenchmarks.py
+
+Round trip checks and size/speed comparisons between the legacy JSON
+format and the binary native format, using the functional test inputs.
+
+Run from the cadnano2 root directory:
+    python -m tests.iobenchmarks            # benchmarks
+    python -m unittest tests.iobenchmarks   # round trip tests only
+"""
+
+import sys
+sys.path.insert(0, '.')
+
+import glob
+import json
+import os
+import time
+import unittest
+from cStringIO import StringIO
+
+from model.enum import StrandType
+from model.io.binaryencoder import binary_from_legacy_dict
+from model.io.binarydecoder import BinaryDesign
+
+INPUTS = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                      'functionaltestinputs')
+
+
+def designPaths():
+    return sorted(glob.glob(os.path.join(INPUTS, '*.json')))
+# end def
+
+def toBinary(obj):
+    io = StringIO()
+    binary_from_legacy_dict(obj, io)
+    return io.getvalue()
+# end def
+
+
+class IOBenchmarkTests(unittest.TestCase):
+    def testJsonBinaryRoundTrip(self):
+        """JSON -> binary -> JSON preserves every helix field."""
+        for path in designPaths():
+            with open(path) as f:
+                obj = json.load(f)
+            ret = BinaryDesign(toBinary(obj)).toLegacyDict()
+            self.assertEqual(len(ret['vstrands']), len(obj['vstrands']))
+            for old, new in zip(obj['vstrands'], ret['vstrands']):
+                for key in ('row', 'col', 'num', 'scaf', 'stap', 'loop',
+                            'skip', 'stap_colors'):
+                    self.assertEqual(old[key], new[key],
+                                     "%s: %s differs on helix %d" % \
+                                     (os.path.basename(path), key, old['num']))
+    # end def
+
+    def testStrandQuery(self):
+        """Runs read from the binary file match the legacy arrays."""
+        with open(os.path.join(INPUTS, 'Nature09_monolith.json')) as f:
+            obj = json.load(f)
+        design = BinaryDesign(toBinary(obj))
+        for helix in obj['vstrands']:
+            runs = design.strands(helix['num'], StrandType.Scaffold)
+            occupied = [i for i, base in enumerate(helix['scaf']) \
+                                if base != [-1, -1, -1, -1]]
+            covered = [i for j in xrange(0, len(runs), 2) \
+                                for i in xrange(runs[j], runs[j + 1] + 1)]
+            self.assertEqual(occupied, covered)
+    # end def
+# end class
+
+
+def benchmark(repeat=5):
+    print "%-28s %10s %10s %10s %10s" % \
+                        ("design", "json B", "binary B", "json ms", "binary ms")
+    for path in designPaths():
+        with open(path) as f:
+            text = f.read()
+        binary = toBinary(json.loads(text))
+        t0 = time.time()
+        for i in xrange(repeat):
+            json.loads(text)
+        t1 = time.time()
+        for i in xrange(repeat):
+            BinaryDesign(binary).toLegacyDict()
+        t2 = time.time()
+        print "%-28s %10d %10d %10.1f %10.1f" % \
+                        (os.path.basename(path)[:28], len(text), len(binary),
+                         1000*(t1 - t0)/repeat, 1000*(t2 - t1)/repeat)
+# end def
+
+if __name__ == '__main__':
+    benchmark()
@@ -39,7 +39,7 @@ import sys
 sys.path.insert(0, '.')
 
 import tests.cadnanoguitestcase
-from tests.cadnanoguitestcase import CadnanoGuiTestCase
+from tests.cadnanoguitestcase import CadnanoGuiTestCase, TEST_SCAFFOLD
 import time
 from model.virtualhelix import VirtualHelix
 from model.enum import StrandType
@@ -73,6 +73,185 @@ class ModelTests(CadnanoGuiTestCase):
         """docstring for testModel1"""
         pass
 
+    ############################ Content Hash ############################
+    def testContentHashUndo(self):
+        """The hash follows an edit and its undo, and keys the export cache"""
+        from model.resultcache import resultCache
+        part = self.createPart()
+        before = part.contentHash()
+        csv = part.getStapleSequences()
+        hits = resultCache.hits
+        self.assertEqual(part.getStapleSequences(), csv)
+        self.assertEqual(resultCache.hits, hits + 1)
+        self.staple(part, 0).oligo().applyColor("#123456")
+        self.assertNotEqual(part.contentHash(), before)
+        part.undoStack().undo()
+        self.assertEqual(part.contentHash(), before)
+
+    def testLargeStapleExportIsNotCached(self):
+        """A staple export over the size limit is streamed, not cached"""
+        from model.resultcache import resultCache
+        from views import styles
+        part = self.createPart()
+        limit = styles.STAPLE_CSV_CACHE_BYTES
+        styles.STAPLE_CSV_CACHE_BYTES = 16
+        try:
+            csv = part.getStapleSequences()
+            hits = resultCache.hits
+            self.assertEqual(part.getStapleSequences(), csv)
+            self.assertEqual(resultCache.hits, hits)
+        finally:
+            styles.STAPLE_CSV_CACHE_BYTES = limit
+
+    def testContentHashNonUndoEdits(self):
+        """Edits made without the undo stack reach the cached export"""
+        part = self.createPart()
+        before = self.staplesByStart(part)
+        self.assertEqual(before['0[9]'][2], '??????????')
+        self.staple(part, 0).oligo().applyColor("#123456",
+                                                useUndoStack=False)
+        self.assertEqual(self.staplesByStart(part)['0[9]'][4], "#123456")
+        self.scaffold(part).oligo().applySequence(TEST_SCAFFOLD,
+                                                  useUndoStack=False)
+        rows = self.staplesByStart(part)
+        self.assertEqual(rows['0[9]'][:4], ['0[9]', '0[0]', 'GTACGTACGT', '10'])
+        self.assertEqual(rows['0[20]'][:4],
+                         ['0[20]', '0[10]', 'TACGTACGTAC', '11'])
+        self.staple(part, 10).strandSet().removeStrand(self.staple(part, 10),
+                                                       useUndoStack=False)
+        self.assertEqual(self.staplesByStart(part).keys(), ['0[9]'])
+
+
+    ############################## Statistics ##############################
+    def testStatisticsPendingSequences(self):
+        """Pending staples are reported with the sequences stored for them"""
+        part = self.createPart()
+        self.scaffold(part).oligo().applySequence(TEST_SCAFFOLD)
+        lazyPart = self.reopenLazily(part)
+        self.assertFalse(lazyPart.helixRecords().isEmpty())
+        expected = [('0[20]', 11, 'TACGTACGTAC'), ('0[9]', 10, 'GTACGTACGT')]
+        self.assertEqual(sorted(lazyPart.statistics().staples()), expected)
+        self.assertEqual(sorted(part.statistics().staples()), expected)
+        rows = sorted(lazyPart.statistics().report()['rows'])
+        self.assertEqual([(loc, gc) for loc, length, gc, tm in rows],
+                         [('0[20]', 5. / 11), ('0[9]', .5)])
+
+    def testStatisticsNonUndoEdits(self):
+        """Statistics follow edits made without the undo stack"""
+        part = self.createPart()
+        stats = part.statistics()
+        self.assertEqual(sorted(stats.staples()),
+                         [('0[20]', 11, ''), ('0[9]', 10, '')])
+        self.scaffold(part).oligo().applySequence(TEST_SCAFFOLD,
+                                                  useUndoStack=False)
+        self.assertEqual(sorted(stats.staples()),
+                         [('0[20]', 11, 'TACGTACGTAC'),
+                          ('0[9]', 10, 'GTACGTACGT')])
+        self.staple(part, 10).strandSet().removeStrand(self.staple(part, 10),
+                                                       useUndoStack=False)
+        self.assertEqual(stats.report()['staples'], 1)
+        self.assertEqual(stats.staples(), [('0[9]', 10, 'GTACGTACGT')])
+
+    def testMeltingTemperatures(self):
+        """The NumPy and pure Python Tm agree; unknown bases have none"""
+        import model.statistics as statistics
+        seqs = ["GTACGTACGT", "TACGTACGTAC", "GGGCCCAAATTT", "ACGN", "A"]
+        tms = statistics.melting_temperatures(seqs, 1e-7, 0.05)
+        self.assertEqual(tms[3:], [None, None])
+        for seq, tm in zip(seqs[:3], tms):
+            expected = statistics._meltingTemperature(seq, 1e-7, 0.05)
+            self.assertAlmostEqual(tm, expected, 6)
+            self.assertTrue(0. < tm < 60.)
+        self.assertEqual(statistics.gc_contents(["GGCC", "ATAT", "GAN"]),
+                         [1., 0., .5])
+
+
+    ############################# Oligo Index ##############################
+    def testOligoIndexNonUndoEdits(self):
+        """Lookups follow edits made without the undo stack"""
+        part = self.createPart()
+        index = part.oligoIndex()
+        oligo0 = self.staple(part, 0).oligo()
+        oligo10 = self.staple(part, 10).oligo()
+        oligo0.applyColor("#aa0000")
+        self.assertEqual(index.oligosWithColor("#AA0000"), set([oligo0]))
+        self.assertTrue(index.oligoFromLocString("0[9]") is oligo0)
+        self.assertTrue(index.oligoAt(0, 20) is oligo10)
+        oligo0.applyColor("#123456", useUndoStack=False)
+        self.assertEqual(index.oligosWithColor("#123456"), set([oligo0]))
+        self.assertEqual(index.oligosWithColor("#aa0000"), set())
+        self.staple(part, 10).strandSet().removeStrand(self.staple(part, 10),
+                                                       useUndoStack=False)
+        self.assertEqual(index.oligoAt(0, 20), None)
+        # removed oligos are no longer connected to the index
+        self.assertEqual(index._connected, set(part.loadedOligos()))
+
+    def testOligoIndexPending(self):
+        """Pending oligos are indexed from the records, built on lookup"""
+        part = self.createPart()
+        self.staple(part, 0).oligo().applyColor("#aa0000")
+        lazyPart = self.reopenLazily(part)
+        records = lazyPart.helixRecords()
+        index = lazyPart.oligoIndex()
+        self.assertTrue("#aa0000" in index.colors())
+        self.assertTrue(records.isPending(StrandType.Staple, 0))
+        oligos = index.oligosWithColor("#aa0000")
+        self.assertEqual([o.locString() for o in oligos], ["0[9]"])
+        self.assertFalse(records.isPending(StrandType.Staple, 0))
+        self.assertTrue(records.isPending(StrandType.Scaffold, 0))
+        self.assertEqual(index.oligoAt(0, 0).locString(), "0[0]")
+        self.assertFalse(records.isPending(StrandType.Scaffold, 0))
+
+
+    ########################### Autosave Journal ###########################
+    def testAutosaveJournalReplay(self):
+        """A snapshot plus one journal record replays to the edited design"""
+        import os
+        from model.io.journal import recover_legacy_dict, journal_paths
+        part = self.createPart()
+        autosave = self.documentController._autosave
+        filename = autosave.journalFilename()
+        self.assertTrue(os.path.basename(filename).startswith(
+                        "cadnano-untitled-%d-" % os.getpid()))
+        autosave.flush()  # the first flush writes the snapshot
+        self.assertTrue(autosave._snapshotWorker != None)  # on a worker
+        autosave.waitForSnapshot()
+        self.staple(part, 0).strandSet().removeStrand(self.staple(part, 0))
+        autosave.flush()  # the second appends a record
+        journalPath, snapshotPath = journal_paths(filename)
+        self.assertTrue(os.path.exists(snapshotPath))
+        self.assertEqual(len(open(journalPath).readlines()), 1)
+        recovered = recover_legacy_dict(filename)
+        autosave.discard()
+        vstrands = dict((h['num'], h) for h in recovered['vstrands'])
+        stap = vstrands[0]['stap']
+        self.assertEqual(stap[:10], [[-1, -1, -1, -1]] * 10)
+        self.assertEqual(stap[10], [0, 11, -1, -1])  # 3' end of 10-20
+        self.assertEqual(stap[20], [-1, -1, 0, 19])  # 5' end of 10-20
+        self.assertEqual(vstrands[1]['stap'], [[-1, -1, -1, -1]] * 42)
+
+    def testAutosaveOrphanedJournals(self):
+        """Only untitled journals of processes that are gone are recovered"""
+        import os, shutil, subprocess, sys, tempfile
+        from model.io.journal import untitled_filename, \
+                                     orphaned_untitled_journals
+        directory = tempfile.mkdtemp()
+        child = subprocess.Popen([sys.executable, "-c", "pass"])
+        child.wait()  # its pid no longer runs
+        try:
+            dead = untitled_filename(directory, child.pid, 0)
+            alive = untitled_filename(directory, os.getpid(), 0)
+            empty = untitled_filename(directory, child.pid, 1)
+            for path in (dead + ".journal", alive + ".autosave"):
+                with open(path, 'w') as f:
+                    f.write("{}\n")
+            open(empty + ".journal", 'w').close()
+            open(os.path.join(directory, "cadnano-untitled.json.journal"),
+                 'w').close()
+            self.assertEqual(orphaned_untitled_journals(directory), [dead])
+        finally:
+            shutil.rmtree(directory)
+
 
 if __name__ == '__main__':
     print "Running Model Tests"
@@ -207,6 +207,21 @@ class Ui_Preferences(object):
         self.defaultToolLabel.setText(QtGui.QApplication.translate("Preferences", "Default tool at startup:", None, QtGui.QApplication.UnicodeUTF8))
         self.defaultToolLabel.setObjectName(_fromUtf8("defaultToolLabel"))
         self.formLayout.setWidget(2, QtGui.QFormLayout.LabelRole, self.defaultToolLabel)
+        self.stapleSortLabel = QtGui.QLabel(self.settings)
+        self.stapleSortLabel.setText(QtGui.QApplication.translate("Preferences", "Staple export order:", None, QtGui.QApplication.UnicodeUTF8))
+        self.stapleSortLabel.setObjectName(_fromUtf8("stapleSortLabel"))
+        self.formLayout.setWidget(4, QtGui.QFormLayout.LabelRole, self.stapleSortLabel)
+        self.stapleSortComboBox = QtGui.QComboBox(self.settings)
+        self.stapleSortComboBox.setObjectName(_fromUtf8("stapleSortComboBox"))
+        self.stapleSortComboBox.addItem(_fromUtf8(""))
+        self.stapleSortComboBox.setItemText(0, QtGui.QApplication.translate("Preferences", "Default", None, QtGui.QApplication.UnicodeUTF8))
+        self.stapleSortComboBox.addItem(_fromUtf8(""))
+        self.stapleSortComboBox.setItemText(1, QtGui.QApplication.translate("Preferences", "Helix", None, QtGui.QApplication.UnicodeUTF8))
+        self.stapleSortComboBox.addItem(_fromUtf8(""))
+        self.stapleSortComboBox.setItemText(2, QtGui.QApplication.translate("Preferences", "5\' position", None, QtGui.QApplication.UnicodeUTF8))
+        self.stapleSortComboBox.addItem(_fromUtf8(""))
+        self.stapleSortComboBox.setItemText(3, QtGui.QApplication.translate("Preferences", "Color", None, QtGui.QApplication.UnicodeUTF8))
+        self.formLayout.setWidget(4, QtGui.QFormLayout.FieldRole, self.stapleSortComboBox)
         self.verticalLayout_4.addLayout(self.formLayout)
         self.buttonBox = QtGui.QDialogButtonBox(self.settings)
         self.buttonBox.setStandardButtons(QtGui.QDialogButtonBox.RestoreDefaults)
@@ -42,7 +42,7 @@ from views import styles
 import util
 # import Qt stuff into the module namespace with PySide, PyQt4 independence
 util.qtWrapImport('QtCore', globals(), ['Qt', 'QTimer', 'pyqtSignal', 'QTimeLine'])
-util.qtWrapImport('QtGui', globals(),  ['QGraphicsView', 'QGraphicsScene', 'qApp', 'QPen','QPaintEngine'])
+util.qtWrapImport('QtGui', globals(),  ['QGraphicsView', 'QGraphicsScene', 'qApp', 'QPen','QPaintEngine', 'QMouseEvent'])
 
 # for OpenGL mode
 try:
@@ -105,6 +105,13 @@ class CustomQGraphicsView(QGraphicsView):
         self._showDetails = True
         self._last_scale_factor = 0.0
         self.sceneRootItem = None  # the item to transform
+        self._lastVisibleRect = None
+        # Hover moves are coalesced: only the latest one is delivered
+        self._pendingHover = None
+        self._hoverTimer = QTimer(self)
+        self._hoverTimer.setSingleShot(True)
+        self._hoverTimer.setInterval(styles.HOVER_INTERVAL_MS)
+        self._hoverTimer.timeout.connect(self._deliverHover)
         # Keyboard panning
         self._key_pan_delta_x = styles.PATH_BASE_WIDTH * 21
         self._key_pan_delta_y = styles.PATH_HELIX_HEIGHT + styles.PATH_HELIX_PADDING/2
@@ -126,6 +133,7 @@ class CustomQGraphicsView(QGraphicsView):
     # end def
 
     levelOfDetailChangedSignal = pyqtSignal(bool)
+    viewportChangedSignal = pyqtSignal()  # pan, zoom or resize
 
     def __repr__(self):
         clsName = self.__class__.__name__
@@ -205,17 +213,19 @@ class CustomQGraphicsView(QGraphicsView):
         # print "scaleFactor", scaleFactor
         self.sceneRootItem.window().statusBar().showMessage("%f" % scaleFactor)
 
-        if scaleFactor < .15:# and self.isGLSwitchAllowed:
+        if scaleFactor < styles.LOD_HIDE_DETAILS_SCALE:# and self.isGLSwitchAllowed:
             # self.isGLSwitchAllowed = False
             self.setGLView(True)
-            self._showDetails = False
-            self.levelOfDetailChangedSignal.emit(False) # zoomed out
+            if self._showDetails:
+                self._showDetails = False
+                self.levelOfDetailChangedSignal.emit(False) # zoomed out
             self.qTimer.singleShot(500, self.allowGLSwitch)
-        elif scaleFactor > .2:# and self.isGLSwitchAllowed:
+        elif scaleFactor > styles.LOD_SHOW_DETAILS_SCALE:# and self.isGLSwitchAllowed:
             # self.isGLSwitchAllowed = False
             self.setGLView(False)
-            self._showDetails = True
-            self.levelOfDetailChangedSignal.emit(True) # zoomed in 
+            if not self._showDetails:
+                self._showDetails = True
+                self.levelOfDetailChangedSignal.emit(True) # zoomed in 
             self.qTimer.singleShot(500, self.allowGLSwitch)
     # end def
 
@@ -223,6 +233,18 @@ class CustomQGraphicsView(QGraphicsView):
         return self._showDetails
     # end def
 
+    def visibleRootRect(self):
+        """
+        Returns the part of the scene inside the viewport, in the
+        coordinates of sceneRootItem (panning moves the root item, not
+        the view).
+        """
+        rect = self.mapToScene(self.viewport().rect()).boundingRect()
+        if self.sceneRootItem is None:
+            return rect
+        return self.sceneRootItem.mapRectFromScene(rect)
+    # end def
+
     def allowGLSwitch(self):
         self.isGLSwitchAllowed = True
     # end def
@@ -356,6 +378,8 @@ class CustomQGraphicsView(QGraphicsView):
 
     def leaveEvent(self, event):
         self.clearFocus()
+        self._hoverTimer.stop()
+        self._pendingHover = None
         QGraphicsView.leaveEvent(self, event)
 
     def mouseMoveEvent(self, event):
@@ -363,6 +387,10 @@ class CustomQGraphicsView(QGraphicsView):
         Must reimplement mouseMoveEvent of QGraphicsView to allow
         ScrollHandDrag due to the fact that events are intercepted
         breaks this feature.
+
+        Moves with no button held only hover, so they are coalesced:
+        the latest one is passed on when the hover timer fires, which
+        keeps tool hover handlers to one call per frame.
         """
         if self._transformEnable == True:
             if self.dragMode() == self._yesDrag:
@@ -376,12 +404,31 @@ class CustomQGraphicsView(QGraphicsView):
                 self._y0 = yf
             elif self._dollyZoomEnable == True:
                 self.dollyZoom(event)
+        if event.buttons() == Qt.NoButton and \
+                                        self.dragMode() != self._yesDrag:
+            self._pendingHover = QMouseEvent(event.type(), event.pos(),
+                                             event.globalPos(), event.button(),
+                                             event.buttons(), event.modifiers())
+            if not self._hoverTimer.isActive():
+                self._hoverTimer.start()
+            return
+        self._pendingHover = None
         # adding this allows events to be passed to items underneath
         QGraphicsView.mouseMoveEvent(self, event)
     # end def
 
+    def _deliverHover(self):
+        """Passes the latest coalesced hover move on to the scene."""
+        event, self._pendingHover = self._pendingHover, None
+        if event is not None:
+            QGraphicsView.mouseMoveEvent(self, event)
+    # end def
+
     def mousePressEvent(self, event):
         """docstring for mousePressEvent"""
+        # items should see the last hover position before the press
+        self._hoverTimer.stop()
+        self._deliverHover()
         if self._transformEnable == True and qApp.keyboardModifiers():
             which_buttons = event.buttons()
             if which_buttons in [self._button_pan, self._button_pan_alt]:
@@ -469,12 +516,14 @@ class CustomQGraphicsView(QGraphicsView):
         currentScaleLevel = self.transform().m11()
         scaleChange = (fractionOfMax * self._scale_limit_max) / currentScaleLevel
         self.scale(scaleChange, scaleChange)
+        self.resetGL()
     # end def
 
     def zoomOut(self, fractionOfMin=1):
         currentScaleLevel = self.transform().m11()
         scaleChange = (fractionOfMin * self._scale_limit_min) / currentScaleLevel
         self.scale(scaleChange, scaleChange)
+        self.resetGL()
     # end def
 
     def dollyZoom(self, event):
@@ -541,5 +590,9 @@ class CustomQGraphicsView(QGraphicsView):
     def paintEvent(self, event):
         if self.toolbar:
             self.toolbar.setPos(self.mapToScene(0, 0))
+        visibleRect = self.visibleRootRect()
+        if visibleRect != self._lastVisibleRect:
+            self._lastVisibleRect = visibleRect
+            self.viewportChangedSignal.emit()
         QGraphicsView.paintEvent(self, event)
 #end class
@@ -26,26 +26,29 @@
 # http://www.opensource.org/licenses/mit-license.php
 
 from collections import defaultdict
-from math import ceil
+from math import ceil, floor
 from activesliceitem import ActiveSliceItem
 from controllers.itemcontrollers.partitemcontroller import PartItemController
 from prexoveritem import PreXoverItem
+from strand.stranditem import StrandItem
 from strand.xoveritem import XoverNode3
 from ui.mainwindow.svgbutton import SVGButton
-from views import styles
+from views import styles, stylecache
 from virtualhelixitem import VirtualHelixItem
 import util
 from cadnano import app
 
 # import Qt stuff into the module namespace with PySide, PyQt4 independence
-util.qtWrapImport('QtCore', globals(), ['pyqtSlot', 'QPointF', 'QRectF', 'Qt'])
+util.qtWrapImport('QtCore', globals(), ['pyqtSlot', 'QLineF', 'QPointF',
+                                        'QRectF', 'Qt', 'QTimer'])
 util.qtWrapImport('QtGui', globals(), ['QBrush', 'QGraphicsPathItem', 'QGraphicsItem', \
                                        'QGraphicsRectItem', 'QInputDialog', \
-                                       'QPen'])
+                                       'QPen', 'QStyleOptionGraphicsItem'])
 
 _baseWidth = _bw = styles.PATH_BASE_WIDTH
 _defaultRect = QRectF(0, 0, _baseWidth, _baseWidth)
 _modPen = QPen(styles.bluestroke)
+_xoverBatchPenWidth = 0  # cosmetic, one pixel wide at any scale
 
 class ProxyParentItem(QGraphicsRectItem):
     """an invisible container that allows one to play with Z-ordering"""
@@ -64,15 +67,28 @@ class PartItem(QGraphicsRectItem):
         self._activeSliceItem = ActiveSliceItem(self, mP.activeBaseIndex())
         self._activeVirtualHelixItem = None
         self._controller = PartItemController(self, mP)
-        self._preXoverItems = []  # crossover-related
+        self._preXoverItems = {}  # site -> (PreXoverItem, complement)
+        self._preXoverItemPool = []  # released PreXoverItems, for reuse
+        self._preXoverHelixItem = None  # helix whose prexovers are shown
+        self._visibleBaseRange = (0, None)  # bases near the viewport
         self._virtualHelixHash = {}
         self._virtualHelixItemList = []
         self._vHRect = QRectF()
+        self._helixStep = styles.PATH_HELIX_HEIGHT + styles.PATH_HELIX_PADDING
+        self._liveVirtualHelixItems = set()  # helices near the viewport
+        self._strandItemPool = []  # released StrandItems, for reuse
+        self._visibleUpdatePending = False
+        self._batchXovers = None  # oligo color -> [QLineF], without details
         self.setAcceptHoverEvents(True)
         self._initModifierRect()
         self._initResizeButtons()
         self._proxyParent = ProxyParentItem(self)
         self._proxyParent.setFlag(QGraphicsItem.ItemHasNoContents)
+        view = viewroot.scene().views()[0]
+        self._showDetails = view.shouldShowDetails()
+        view.viewportChangedSignal.connect(self.viewportChangedSlot)
+        view.levelOfDetailChangedSignal.connect(self.levelOfDetailChangedSlot)
+        mP.undoStack().indexChanged.connect(self.partContentsChangedSlot)
     # end def
     
     def proxy(self):
@@ -120,6 +136,7 @@ class PartItem(QGraphicsRectItem):
     #end def
 
     def partDimensionsChangedSlot(self, part):
+        self.viewportChangedSlot()
         if len(self._virtualHelixItemList) > 0:
             vhi = self._virtualHelixItemList[0]
             vhiRect = vhi.boundingRect()
@@ -136,6 +153,15 @@ class PartItem(QGraphicsRectItem):
         self._activeSliceItem.removed()
         self.parentItem().removePartItem(self)
         scene = self.scene()
+        view = scene.views()[0]
+        view.viewportChangedSignal.disconnect(self.viewportChangedSlot)
+        view.levelOfDetailChangedSignal.disconnect(
+                                                self.levelOfDetailChangedSlot)
+        self._modelPart.undoStack().indexChanged.disconnect(
+                                                self.partContentsChangedSlot)
+        self._liveVirtualHelixItems = None
+        self._strandItemPool = None
+        self._preXoverItemPool = None
         scene.removeItem(self)
         self._modelPart = None
         self._virtualHelixHash = None
@@ -210,6 +236,54 @@ class PartItem(QGraphicsRectItem):
             self.setPreXoverItemsVisible(self.activeVirtualHelixItem())
     # end def
 
+    def viewportChangedSlot(self):
+        """Schedules a refresh of the StrandItems near the viewport."""
+        if not self._visibleUpdatePending:
+            self._visibleUpdatePending = True
+            QTimer.singleShot(0, self._updateVisibleItems)
+    # end def
+
+    def partContentsChangedSlot(self, *args):
+        """
+        Connected to the undo stack, since an edit can move a strand that
+        has no item into view, and changes what the batch painters draw.
+        """
+        if not self._showDetails:
+            self._invalidateBatch()
+        self.viewportChangedSlot()
+    # end def
+
+    def partStrandChangedSlot(self, sender, virtualHelix):
+        """
+        Also emitted for edits made without the undo stack, so the batch
+        painting caches of the helix and the xovers are dropped here.
+        """
+        if self._showDetails or virtualHelix == None:
+            return
+        self._batchXovers = None
+        vhi = self._virtualHelixHash.get(virtualHelix.coord())
+        if vhi != None:
+            vhi.invalidateBatch()
+        self.update()
+    # end def
+
+    def partOligoChangedSlot(self, sender, oligo):
+        """An oligo changed color, which its batch painted strands show."""
+        if not self._showDetails:
+            self._invalidateBatch()
+    # end def
+
+    def levelOfDetailChangedSlot(self, boolval):
+        """
+        Without details, strands are painted in batches by each
+        VirtualHelixItem (and xovers by this item) and StrandItems are
+        released, so zoomed-out views have few items to draw.
+        """
+        self._showDetails = boolval
+        self._invalidateBatch()
+        self.viewportChangedSlot()
+    # end def
+
     ### ACCESSORS ###
     def activeTool(self):
         return self._activeTool
@@ -219,6 +293,20 @@ class PartItem(QGraphicsRectItem):
         return self._activeVirtualHelixItem
     # end def
 
+    def shouldShowDetails(self):
+        return self._showDetails
+    # end def
+
+    def showsSequences(self):
+        """True if the strands of this part draw their sequence labels now."""
+        if not self._showDetails:
+            return False
+        view = self.scene().views()[0]
+        transform = self.deviceTransform(view.viewportTransform())
+        lod = QStyleOptionGraphicsItem.levelOfDetailFromTransform(transform)
+        return lod >= styles.PATH_SEQUENCE_LOD_SCALE
+    # end def
+
     def part(self):
         """Return a reference to the model's part object"""
         return self._modelPart
@@ -232,6 +320,11 @@ class PartItem(QGraphicsRectItem):
     def removeVirtualHelixItem(self, virtualHelixItem):
         vh = virtualHelixItem.virtualHelix()
         self._virtualHelixItemList.remove(virtualHelixItem)
+        self._liveVirtualHelixItems.discard(virtualHelixItem)
+        for site in [site for site in self._preXoverItems if vh in site[:2]]:
+            map(self._releasePreXoverItem, self._preXoverItems.pop(site))
+        if virtualHelixItem == self._preXoverHelixItem:
+            self._preXoverHelixItem = None
         del self._virtualHelixHash[vh.coord()]
         self._setVirtualHelixItemList(self._virtualHelixItemList)
         self._updateBoundingRect()
@@ -242,6 +335,22 @@ class PartItem(QGraphicsRectItem):
         return self._virtualHelixHash[virtualHelix.coord()]
     # end def
 
+    def acquireStrandItem(self, modelStrand, virtualHelixItem):
+        """Returns a StrandItem for modelStrand, reusing a released one."""
+        if self._strandItemPool:
+            strandItem = self._strandItemPool.pop()
+            strandItem.rebind(modelStrand, virtualHelixItem)
+            return strandItem
+        return StrandItem(modelStrand, virtualHelixItem, self._viewroot)
+    # end def
+
+    def releaseStrandItem(self, strandItem):
+        """Takes back a StrandItem that scrolled out of range."""
+        strandItem.unbind()
+        if len(self._strandItemPool) < styles.PATH_STRAND_ITEM_POOL_SIZE:
+            self._strandItemPool.append(strandItem)
+    # end def
+
     def virtualHelixBoundingRect(self):
         return self._vHRect
     # end def
@@ -342,12 +451,99 @@ class PartItem(QGraphicsRectItem):
             y += step
             self.updateXoverItems(vhi)
         # end for
+        if vhiRect:
+            self._helixStep = step
+        self._batchXovers = None
+        self.update()
+        self.viewportChangedSlot()
         self._vHRect = QRectF(leftmostExtent, -40, -leftmostExtent + rightmostExtent, y + 40)
         self._virtualHelixItemList = newList
         if zoomToFit:
             self.scene().views()[0].zoomToFit()
     # end def
 
+    def _updateVisibleItems(self):
+        """
+        Gives StrandItems to the strands in or near the viewport and
+        returns the rest to the pool, so the number of strand, endpoint
+        and xover items follows the screen rather than the design.
+        Strands whose xover lands in range are kept as well, since their
+        item draws the xover.
+        """
+        self._visibleUpdatePending = False
+        if self._modelPart is None or self.scene() is None:
+            return
+        view = self.scene().views()[0]
+        rect = self.mapRectFromItem(view.sceneRootItem,
+                                    view.visibleRootRect())
+        margin = styles.PATH_VIEWPORT_MARGIN
+        dx, dy = rect.width() * margin, rect.height() * margin
+        rect.adjust(-dx, -dy, dx, dy)
+        visibleRange = (int(floor(rect.left() / _bw)),
+                        int(ceil(rect.right() / _bw)))
+        if visibleRange != self._visibleBaseRange:
+            self._visibleBaseRange = visibleRange
+            if self._preXoverHelixItem is not None:
+                self.setPreXoverItemsVisible(self._preXoverHelixItem)
+        vhis = self._virtualHelixItemList
+        first = max(0, int(floor(rect.top() / self._helixStep)))
+        last = min(len(vhis), int(ceil(rect.bottom() / self._helixStep)) + 1)
+        if not self._showDetails:
+            first = last = 0  # the batch painters need no StrandItems
+
+        wanted = defaultdict(list)
+        live = set()
+        for vhi in vhis[first:last]:
+            live.add(vhi)
+            strands = vhi.strandsInRange(*visibleRange)
+            wanted[vhi].extend(strands)
+            for strand in strands:
+                strand5p = strand.connection5p()
+                if strand5p is not None:
+                    vhi5p = self.itemForVirtualHelix(strand5p.virtualHelix())
+                    wanted[vhi5p].append(strand5p)
+        for vhi in self._liveVirtualHelixItems.union(wanted):
+            vhi.syncStrandItems(wanted.get(vhi, []),
+                                visibleRange if vhi in live else None)
+        self._liveVirtualHelixItems = live.union(wanted)
+    # end def
+
+    def _invalidateBatch(self):
+        """Drops the batch painting caches of this item and its helices."""
+        self._batchXovers = None
+        for vhi in self._virtualHelixItemList:
+            vhi.invalidateBatch()
+        self.update()
+    # end def
+
+    def _buildBatchXovers(self):
+        """
+        Returns straight xover lines from the model, grouped by oligo
+        color, in the coordinates of this item.
+        """
+        xovers = defaultdict(list)
+        halfBaseWidth = _bw / 2.0
+        for vhi in self._virtualHelixItemList:
+            y = vhi.y() + halfBaseWidth
+            for strandSet in vhi.virtualHelix().getStrandSets():
+                if strandSet.isPending():
+                    continue
+                for strand in strandSet:
+                    strand3p = strand.connection3p()
+                    if strand3p is None:
+                        continue
+                    vhi3p = self.itemForVirtualHelix(strand3p.virtualHelix())
+                    x5, y5 = vhi.upperLeftCornerOfBase(strand.idx3Prime(),
+                                                       strand)
+                    x3, y3 = vhi3p.upperLeftCornerOfBase(strand3p.idx5Prime(),
+                                                         strand3p)
+                    xovers[strand.oligo().color()].append(
+                        QLineF(x5 + halfBaseWidth, y + y5,
+                               x3 + halfBaseWidth,
+                               vhi3p.y() + halfBaseWidth + y3))
+        return xovers
+    # end def
+
     def _updateBoundingRect(self):
         """
         Updates the bounding rect to the size of the childrenBoundingRect,
@@ -376,6 +572,24 @@ class PartItem(QGraphicsRectItem):
     # end def
 
     ### PUBLIC METHODS ###
+    def paint(self, painter, option, widget=None):
+        """
+        Without details, draws every xover as a straight line, down to
+        styles.PATH_LOD_RUNS_ONLY_SCALE.
+        """
+        QGraphicsRectItem.paint(self, painter, option, widget)
+        if self._showDetails:
+            return
+        lod = option.levelOfDetailFromTransform(painter.worldTransform())
+        if lod < styles.PATH_LOD_RUNS_ONLY_SCALE:
+            return
+        if self._batchXovers is None:
+            self._batchXovers = self._buildBatchXovers()
+        for color, lines in self._batchXovers.iteritems():
+            painter.setPen(stylecache.cachedPen(color, _xoverBatchPenWidth))
+            painter.drawLines(lines)
+    # end def
+
     def setModifyState(self, bool):
         """Hides the modRect when modify state disabled."""
         self._canShowModRect = bool
@@ -432,42 +646,61 @@ class PartItem(QGraphicsRectItem):
 
     def setPreXoverItemsVisible(self, virtualHelixItem):
         """
-        self._preXoverItems list references prexovers parented to other
-        PathHelices such that only the activeHelix maintains the list of
-        visible prexovers
+        self._preXoverItems maps each displayed crossover site to its pair
+        of prexovers, parented to the two PathHelices of the site, such
+        that only the activeHelix maintains the list of visible prexovers.
+        Sites are limited to the bases near the viewport, and only sites
+        that appear or disappear take items from or return them to the
+        pool; the rest just refresh their style and label.
         """
-        vhi = virtualHelixItem
-
-        if vhi == None:
-            if self._preXoverItems:
-                # clear all PreXoverItems
-                map(PreXoverItem.remove, self._preXoverItems)
-                self._preXoverItems = []
-            return
-
-        vh = vhi.virtualHelix()
-        partItem = self
-        part = self.part()
-        idx = part.activeVirtualHelixIdx()
-
-        # clear all PreXoverItems
-        map(PreXoverItem.remove, self._preXoverItems)
-        self._preXoverItems = []
-
-        potentialXovers = part.potentialCrossoverList(vh, idx)
-        for neighbor, index, strandType, isLowIdx in potentialXovers:
-            # create one half
+        vhi = self._preXoverHelixItem = virtualHelixItem
+        current = self._preXoverItems
+        sites = []
+        if vhi != None:
+            vh = vhi.virtualHelix()
+            part = self.part()
+            minIdx, maxIdx = self._visibleBaseRange
+            potentialXovers = part.potentialCrossoverList(vh,
+                                            part.activeVirtualHelixIdx(),
+                                            minIdx, maxIdx)
+            sites = [(vh,) + xover for xover in potentialXovers]
+        wanted = set(sites)
+
+        for site in [site for site in current if site not in wanted]:
+            map(self._releasePreXoverItem, current.pop(site))
+        for site in sites:
+            pair = current.get(site)
+            if pair is not None:
+                for pxi in pair:
+                    pxi.updateStyle()
+                    pxi._updateLabel()  # helices may have been renumbered
+                continue
+            vh, neighbor, index, strandType, isLowIdx = site
             neighborVHI = self.itemForVirtualHelix(neighbor)
-            pxi = PreXoverItem(vhi, neighborVHI, index, strandType, isLowIdx)
-            # add to list
-            self._preXoverItems.append(pxi)
-            # create the complement
-            pxi = PreXoverItem(neighborVHI, vhi, index, strandType, isLowIdx)
-            # add to list
-            self._preXoverItems.append(pxi)
+            # one half and its complement
+            current[site] = (self._acquirePreXoverItem(vhi, neighborVHI,
+                                            index, strandType, isLowIdx),
+                             self._acquirePreXoverItem(neighborVHI, vhi,
+                                            index, strandType, isLowIdx))
         # end for
     # end def
 
+    def _acquirePreXoverItem(self, fromVHI, toVHI, index, strandType,
+                             isLowIdx):
+        """Returns a PreXoverItem for the site, reusing a released one."""
+        if self._preXoverItemPool:
+            pxi = self._preXoverItemPool.pop()
+            pxi.resetPreXoverItem(fromVHI, toVHI, index, strandType, isLowIdx)
+            return pxi
+        return PreXoverItem(fromVHI, toVHI, index, strandType, isLowIdx)
+    # end def
+
+    def _releasePreXoverItem(self, pxi):
+        pxi.release()
+        if len(self._preXoverItemPool) < styles.PATH_PREXOVER_ITEM_POOL_SIZE:
+            self._preXoverItemPool.append(pxi)
+    # end def
+
     def updatePreXoverItems(self):
         self.setPreXoverItemsVisible(self.activeVirtualHelixItem())
     # end def
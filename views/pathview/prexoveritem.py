@@ -77,17 +77,39 @@ _toHelixNumFont = styles.XOVER_LABEL_FONT
 # precalculate the height of a number font.  Assumes a fixed font
 # and that only numbers will be used for labels
 _fm = QFontMetrics(_toHelixNumFont)
+_noPen = QPen(Qt.NoPen)
 
 class PreXoverItem(QGraphicsPathItem):
     def __init__(self,  fromVirtualHelixItem, toVirtualHelixItem, index, strandType, isLowIdx):
+        """
+        PreXoverItems are recycled by the PartItem (see
+        PartItem.setPreXoverItemsVisible), so everything that depends on
+        the crossover site is set up in resetPreXoverItem().
+        """
         super(PreXoverItem, self).__init__(fromVirtualHelixItem)
+        self._label = QGraphicsSimpleTextItem(self)
+        self._label.setFont(_toHelixNumFont)
+
+        # create a bounding rect item to process click events
+        # over a wide area
+        self._clickArea = cA = QGraphicsRectItem(_rect, self)
+        cA.mousePressEvent = self.mousePress
+        cA.setPen(_noPen)
+
+        self.resetPreXoverItem(fromVirtualHelixItem, toVirtualHelixItem,
+                               index, strandType, isLowIdx)
+    # end def
+
+    def resetPreXoverItem(self, fromVirtualHelixItem, toVirtualHelixItem,
+                          index, strandType, isLowIdx):
+        """Points the item at a crossover site and redraws it."""
+        self.setParentItem(fromVirtualHelixItem)
         self._fromVHItem = fromVirtualHelixItem
         self._toVHItem = toVirtualHelixItem
         self._idx = index
         self._strandType = strandType
         # translate from Low to Left for the Path View
         self._isLowIndex = isLowIdx
-        self._isActive = False
         self._pen = _scafpen if strandType == StrandType.Scaffold else _stappen
         isOnTop = fromVirtualHelixItem.isStrandTypeOnTop(strandType)
 
@@ -110,16 +132,10 @@ class PreXoverItem(QGraphicsPathItem):
         else:
             labelY = 2*halfLabelH + .5
 
-        self._label = QGraphicsSimpleTextItem(self)
         self._label.setPos(labelX, labelY)
 
-        # create a bounding rect item to process click events
-        # over a wide area
-        self._clickArea = cA = QGraphicsRectItem(_rect, self)
-        cA.mousePressEvent = self.mousePress
         yoffset = 0.2*bw if isOnTop else -0.4*bw
-        cA.setPos(0, yoffset)
-        cA.setPen(QPen(Qt.NoPen))
+        self._clickArea.setPos(0, yoffset)
 
         self.updateStyle()
         self._updateLabel()
@@ -139,6 +155,18 @@ class PreXoverItem(QGraphicsPathItem):
         self._toVHItem = None
     # end def
 
+    def release(self):
+        """
+        Takes the item and its label out of the scene, keeping them, so
+        the PartItem can reuse it for another site.
+        """
+        scene = self.scene()
+        if scene:
+            scene.removeItem(self)
+        self._fromVHItem = None
+        self._toVHItem = None
+    # end def
+
     def setPainterPath(self):
         """
         Sets the PainterPath according to the index (low = Left, high = Right)
@@ -160,19 +188,18 @@ class PreXoverItem(QGraphicsPathItem):
         toVH = self._toVHItem.virtualHelix()
         part = self._fromVHItem.part()
         pen = _disabpen
+        self._isActive = False
         self._labelBrush = _disabbrush
         if part.possibleXoverAt(fromVH, toVH, self._strandType, self._idx):
             pen = self._pen
             self._isActive = True
             self._labelBrush = _enabbrush
         self.setPen(pen)
+        self._label.setBrush(self._labelBrush)
     # end def
 
     def _updateLabel(self):
-        lbl = self._label
-        lbl.setBrush(self._labelBrush)
-        lbl.setFont(_toHelixNumFont)
-        lbl.setText( str(self._toVHItem.number() ) )
+        self._label.setText( str(self._toVHItem.number() ) )
     # end def
 
     ### TOOL METHODS ###
@@ -27,7 +27,7 @@
 
 from exceptions import NotImplementedError
 from math import floor
-from views import styles
+from views import styles, stylecache
 
 import views.pathview.pathselection as pathselection
 
@@ -90,6 +90,7 @@ pp35.addPolygon(poly35)
 
 _defaultRect = QRectF(0, 0, _baseWidth, _baseWidth)
 _noPen = QPen(Qt.NoPen)
+_defaultPen = QPen()
 
 
 class EndpointItem(QGraphicsPathItem):
@@ -106,7 +107,7 @@ class EndpointItem(QGraphicsPathItem):
         self._lowDragBound = None
         self._highDragBound = None
         self._initCapSpecificState(isDrawn5to3)
-        self.setPen(QPen())
+        self.setPen(_defaultPen)
         # for easier mouseclick
         self._clickArea = cA = QGraphicsRectItem(_defaultRect, self)
         self._clickArea.setAcceptHoverEvents(True)
@@ -446,16 +447,15 @@ class EndpointItem(QGraphicsPathItem):
     # end def
 
     def setSelectedColor(self, value):
+        alpha = None
         if value == True:
             color = styles.selected_color
         else:
             oligo = self._strandItem.strand().oligo()
-            color = QColor(oligo.color())
+            color = oligo.color()
             if oligo.shouldHighlight():
-                color.setAlpha(128)
-        brush = self.brush()
-        brush.setColor(color)
-        self.setBrush(brush)
+                alpha = 128
+        self.setBrush(stylecache.cachedBrush(color, alpha))
     # end def
 
     def updateHighlight(self, brush):
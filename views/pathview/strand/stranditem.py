@@ -29,7 +29,7 @@ from exceptions import NotImplementedError
 from math import floor
 from controllers.itemcontrollers.strand.stranditemcontroller import StrandItemController
 from endpointitem import EndpointItem
-from views import styles
+from views import styles, stylecache
 from xoveritem import XoverItem
 from decorators.insertionitem import InsertionItem
 
@@ -42,29 +42,96 @@ util.qtWrapImport('QtGui', globals(), ['QBrush', 'QColor', 'QFont', \
                                        'QFontMetricsF', 'QGraphicsLineItem', \
                                        'QGraphicsPathItem', 'QGraphicsItem', \
                                        'QGraphicsSimpleTextItem', \
-                                       'QGraphicsRectItem', 'QPen'])
+                                       'QGraphicsRectItem', 'QPen', \
+                                       'QStaticText'])
 
 _baseWidth = styles.PATH_BASE_WIDTH
 _defaultRect = QRectF(0,0, _baseWidth, _baseWidth)
 _noPen = QPen(Qt.NoPen)
+_seqPen = QPen(Qt.black)
+_seqLayouts = {}
+
+
+def _sequenceLayout(strand, key):
+    """
+    Returns (staticText, insertSeqList) for strand, where key is
+    (sequence, isDrawn5to3, lowIdx, insertion layout) as built by
+    StrandItem._sequenceKey. Strands that share a key share the layout,
+    so rebinding a pooled item or refreshing an unchanged oligo does not
+    walk getSequenceList again.
+    """
+    layout = _seqLayouts.get(key)
+    if layout is None:
+        strandSeqList = strand.getSequenceList()
+        seqList = [x[1][0] for x in strandSeqList]
+        insertSeqList = [(x[0], x[1][1]) for x in strandSeqList]
+        if not key[1]:
+            seqList = seqList[::-1]
+        staticText = QStaticText(''.join(seqList))
+        staticText.setTextFormat(Qt.PlainText)
+        if len(_seqLayouts) >= styles.SEQUENCE_LAYOUT_CACHE_ENTRIES:
+            _seqLayouts.clear()
+        layout = _seqLayouts[key] = (staticText, insertSeqList)
+    return layout
+# end def
+
+
+class SequenceLabelItem(QGraphicsItem):
+    """
+    Draws the sequence of its parent StrandItem. The text is laid out on
+    the first paint after invalidate(), so strands that are off screen or
+    too small to read never build their label.
+    """
+    def __init__(self, strandItem):
+        super(SequenceLabelItem, self).__init__(strandItem)
+        self._strandItem = strandItem
+        self._rect = QRectF()
+        self._staticText = None
+    # end def
+
+    def invalidate(self, numBases):
+        """Drops the current layout and sizes the label for numBases."""
+        self.prepareGeometryChange()
+        self._rect = QRectF(0, 0, numBases * _baseWidth,
+                            styles.SEQUENCEFONTCHARHEIGHT)
+        self._staticText = None
+        self.update()
+    # end def
+
+    def boundingRect(self):
+        return self._rect
+    # end def
+
+    def paint(self, painter, option, widget):
+        lod = option.levelOfDetailFromTransform(painter.worldTransform())
+        if lod < styles.PATH_SEQUENCE_LOD_SCALE:
+            return
+        if self._staticText is None:
+            self._staticText = self._strandItem.sequenceLayout()[0]
+        painter.setFont(styles.SEQUENCEFONT)
+        painter.setPen(_seqPen)
+        painter.drawStaticText(0, 0, self._staticText)
+    # end def
+# end class
 
 
 class StrandItem(QGraphicsLineItem):
     _filterName = "strand"
     
     def __init__(self, modelStrand, virtualHelixItem, viewroot):
-        """The parent should be a VirtualHelixItem."""
+        """
+        The parent should be a VirtualHelixItem. StrandItems are
+        recycled by the PartItem (see PartItem.acquireStrandItem), so
+        everything that depends on modelStrand is set up in rebind().
+        """
         super(StrandItem, self).__init__(virtualHelixItem)
         self._modelStrand = modelStrand
         self._virtualHelixItem = virtualHelixItem
         self._viewroot = viewroot
         self._activeTool = virtualHelixItem.activeTool()
-
-        self._controller = StrandItemController(self, modelStrand)
+        self._controller = None
         isDrawn5to3 = modelStrand.strandSet().isDrawn5to3()
 
-        self._strandFilter = modelStrand.strandFilter()
-
         self._insertionItems = {}
         # caps
         self._lowCap = EndpointItem(self, 'low', isDrawn5to3)
@@ -75,10 +142,7 @@ class StrandItem(QGraphicsLineItem):
         self._isDrawn5to3 = isDrawn5to3
         # self._isOnTop = virtualHelixItem.isStrandOnTop(modelStrand)
         # label
-        self._seqLabel = QGraphicsSimpleTextItem(self)
-        
-        self.refreshInsertionItems(modelStrand)
-        self._updateSequenceText()
+        self._seqLabel = SequenceLabelItem(self)
 
         # create a larger click area rect to capture mouse events
         self._clickArea = cA = QGraphicsRectItem(_defaultRect, self)
@@ -88,16 +152,12 @@ class StrandItem(QGraphicsLineItem):
         cA.setAcceptHoverEvents(True)
         cA.hoverMoveEvent = self.hoverMoveEvent
 
-        self.setZValue(styles.ZSTRANDITEM)
-
         # xover comming from the 3p end
         self._xover3pEnd = XoverItem(self, virtualHelixItem)
-        # initial refresh
-        self._updateColor(modelStrand)
-        self._updateAppearance(modelStrand)
 
         self.setZValue(styles.ZSTRANDITEM)
         self.setFlag(QGraphicsItem.ItemIsSelectable)
+        self.rebind(modelStrand, virtualHelixItem)
     # end def
 
     ### SIGNALS ###
@@ -133,6 +193,7 @@ class StrandItem(QGraphicsLineItem):
 
     def strandRemovedSlot(self, strand):
         # self._modelStrand = None
+        self._virtualHelixItem.removeStrandItem(self)
         self._controller.disconnectSignals()
         self._controller = None
         scene = self.scene()
@@ -285,6 +346,50 @@ class StrandItem(QGraphicsLineItem):
         # end for
     # end def
 
+    def rebind(self, modelStrand, virtualHelixItem):
+        """
+        Points the item at modelStrand on virtualHelixItem, connects its
+        signals and redraws it. Called on creation and on reuse.
+        """
+        self._modelStrand = modelStrand
+        self._strandFilter = modelStrand.strandFilter()
+        self._controller = StrandItemController(self, modelStrand)
+        self._xover3pEnd.resetXoverItem(virtualHelixItem)
+        self.resetStrandItem(virtualHelixItem,
+                             modelStrand.strandSet().isDrawn5to3())
+        self.setPos(0, 0)
+        self.refreshInsertionItems(modelStrand)
+        self._updateSequenceText()
+        self._updateColor(modelStrand)
+        self._updateAppearance(modelStrand)
+    # end def
+
+    def unbind(self):
+        """
+        Disconnects the item from its strand and takes it and its caps
+        out of the scene so the PartItem can reuse it for another strand.
+        """
+        self._controller.disconnectSignals()
+        self._controller = None
+        self._xover3pEnd.resetXoverItem(self._virtualHelixItem)
+        for insertionItem in self._insertionItems.itervalues():
+            insertionItem.remove()
+        self._insertionItems = {}
+        scene = self.scene()
+        for cap in (self._lowCap, self._highCap, self._dualCap):
+            scene.removeItem(cap)
+        scene.removeItem(self)
+        self._modelStrand = None
+        self._virtualHelixItem = None
+    # end def
+
+    def isPinned(self):
+        """True while the item, its caps or its xover are selected."""
+        return any(item.isSelected() or item.group() is not None
+                   for item in (self, self._lowCap, self._highCap,
+                                self._xover3pEnd))
+    # end def
+
     def resetStrandItem(self, virtualHelixItem, isDrawn5to3):
         self.setParentItem(virtualHelixItem)
         self._virtualHelixItem = virtualHelixItem
@@ -397,71 +502,73 @@ class StrandItem(QGraphicsLineItem):
 
     def _updateColor(self, strand):
         oligo = self._modelStrand.oligo()
-        color = QColor(oligo.color())
-        self._updateHighlight(color)
+        self._updateHighlight(oligo.color())
     # end def
 
     def _updateHighlight(self, color):
         """
-        
+        Sets the shared pen and cap brush for color (a color name or a
+        QColor), faded and widened if the oligo should be highlighted.
         """
         oligo = self._modelStrand.oligo()
         penWidth = styles.PATH_STRAND_STROKE_WIDTH
+        alpha = None
         if oligo.shouldHighlight():
-            color.setAlpha(128)
+            alpha = 128
             penWidth = styles.PATH_STRAND_HIGHLIGHT_STROKE_WIDTH
-        pen = QPen(color, penWidth)
-        # pen.setCosmetic(True)
-        brush = QBrush(color)
-        pen.setCapStyle(Qt.FlatCap)
-        self.setPen(pen)
+        self.setPen(stylecache.cachedPen(color, penWidth, alpha))
+        brush = stylecache.cachedBrush(color, alpha)
         self._lowCap.updateHighlight(brush)
         self._highCap.updateHighlight(brush)
         self._dualCap.updateHighlight(brush)
     # end def
 
+    def _sequenceKey(self):
+        """The key _sequenceLayout caches this strand's labels under."""
+        strand = self._modelStrand
+        insertLayout = ()
+        if self._insertionItems:
+            insertLayout = tuple((insertion.idx(), insertion.length())
+                                 for insertion in strand.insertionsOnStrand())
+        return (strand.sequence(), self._isDrawn5to3, strand.lowIdx(),
+                insertLayout)
+    # end def
+
+    def sequenceLayout(self):
+        """Returns the cached (staticText, insertSeqList) for the strand."""
+        return _sequenceLayout(self._modelStrand, self._sequenceKey())
+    # end def
+
     def _updateSequenceText(self):
         """
-        docstring for _updateSequenceText
+        Positions the sequence label and marks it stale; the text itself
+        is laid out when the label next paints.
         """
         bw = _baseWidth
         seqLbl = self._seqLabel
         strand = self.strand()
-        
-        seqTxt = strand.sequence()
-        isDrawn3to5 = not self._isDrawn5to3
+        iItems = self.insertionItems()
         textXCenteringOffset = styles.SEQUENCETEXTXCENTERINGOFFSET
 
-        if seqTxt == '':
+        if strand.sequence() == '':
             seqLbl.hide()
-            for iItem in self.insertionItems().itervalues():
+            for iItem in iItems.itervalues():
                 iItem.hideSequence()
             return
         # end if
 
-        strandSeqList = strand.getSequenceList()
-        seqList = [x[1][0] for x in strandSeqList]
-        insertSeqList = [(x[0], x[1][1]) for x in strandSeqList]
-        
-        iItems = self.insertionItems()
-        for idx, seqTxt in insertSeqList:
-            if seqTxt != '':
-                iItems[idx].setSequence(seqTxt)
-
-        if isDrawn3to5:
-            seqList = seqList[::-1]
-            
-        seqTxt = ''.join(seqList)
-        
-        # seqLbl.setPen(QPen( Qt.NoPen))    # leave the Pen as None for unless required
-        seqLbl.setBrush(QBrush(Qt.black))
-        seqLbl.setFont(styles.SEQUENCEFONT)
+        # insertion labels are items of their own, so set them here
+        # rather than from inside the label's paint
+        if iItems:
+            for idx, seqTxt in self.sequenceLayout()[1]:
+                if seqTxt != '':
+                    iItems[idx].setSequence(seqTxt)
 
         # this will always draw from the 5 Prime end!
         seqX = 2*textXCenteringOffset + bw*strand.idx5Prime()
         seqY = styles.SEQUENCETEXTYCENTERINGOFFSET
 
-        if isDrawn3to5:
+        if not self._isDrawn5to3:
             # offset it towards the bottom
             seqY += bw * .8
             # offset X by the reverse centering offset and the string length
@@ -469,11 +576,11 @@ class StrandItem(QGraphicsLineItem):
             # rotate the characters upside down this does not affect positioning
             # coordinate system, +Y is still Down, and +X is still Right
             seqLbl.setRotation(180)
-            # draw the text and reverse the string to draw 5 prime to 3 prime
-            # seqTxt = seqTxt[::-1]
+        else:
+            seqLbl.setRotation(0)
         # end if
-        seqLbl.setPos(seqX,seqY)
-        seqLbl.setText(seqTxt)
+        seqLbl.setPos(seqX, seqY)
+        seqLbl.invalidate(strand.length())
         seqLbl.show()
     # end def
 
@@ -485,6 +592,7 @@ class StrandItem(QGraphicsLineItem):
         """
         activeToolStr = str(self._activeTool())
         self.scene().views()[0].addToPressList(self)
+        self._activeTool().resetHoverBase()
         idx = int(floor((event.pos().x()) / _baseWidth))
         self._virtualHelixItem.setActive(idx)
         toolMethodName =  activeToolStr + "MousePress"
@@ -506,6 +614,7 @@ class StrandItem(QGraphicsLineItem):
     # end def
 
     def hoverLeaveEvent(self, event):
+        self._activeTool().resetHoverBase()
         self.partItem().updateStatusBar("")
     # end def
 
@@ -513,9 +622,12 @@ class StrandItem(QGraphicsLineItem):
         """
         Parses a mouseMoveEvent to extract strandSet and base index,
         forwarding them to approproate tool method as necessary.
+        Moves that stay on the same base are ignored.
         """
         vhiNum = self._virtualHelixItem.number()
         idx = int(floor((event.pos().x()) / _baseWidth))
+        if not self._activeTool().isNewHoverBase(self, idx):
+            return
         oligoLength = self._modelStrand.oligo().length()
         self.partItem().updateStatusBar("%d[%d]\tlength: %d" % (vhiNum, idx, oligoLength))
         toolMethodName = str(self._activeTool()) + "HoverMove"
@@ -606,13 +718,26 @@ class StrandItem(QGraphicsLineItem):
     # end def
 
     def paintToolMousePress(self, event, idx):
-        """Add an insert to the strand if possible."""
+        """
+        Color the oligo of the strand. Alt+click colors every oligo that
+        has the same color as this one.
+        """
         mStrand = self._modelStrand
         if mStrand.isStaple():
             color = self.window().pathColorPanel.stapColorName()
         else:
             color = self.window().pathColorPanel.scafColorName()
-        mStrand.oligo().applyColor(color)
+        if event != None and event.modifiers() & Qt.AltModifier:
+            oldColor = mStrand.oligo().color()
+            oligos = mStrand.part().oligoIndex().oligosWithColor(oldColor)
+            undoStack = self.window().undoStack()
+            undoStack.beginMacro("Paint %d oligos" % len(oligos))
+            for oligo in oligos:
+                if oligo.isStaple() == mStrand.isStaple():
+                    oligo.applyColor(color)
+            undoStack.endMacro()
+        else:
+            mStrand.oligo().applyColor(color)
     # end def
 
     def pencilToolHoverMove(self, idx):
@@ -697,16 +822,15 @@ class StrandItem(QGraphicsLineItem):
     # end def
 
     def setSelectedColor(self, value):
+        alpha = None
         if value == True:
-            color = QColor("#ff3333")
+            color = "#ff3333"
         else:
             oligo = self._modelStrand.oligo()
-            color = QColor(oligo.color())
+            color = oligo.color()
             if oligo.shouldHighlight():
-                color.setAlpha(128)
-        pen = self.pen()
-        pen.setColor(color)
-        self.setPen(pen)
+                alpha = 128
+        self.setPen(stylecache.cachedPen(color, self.pen().widthF(), alpha))
     # end def
 
     def itemChange(self, change, value):
@@ -27,7 +27,7 @@ Created by Nick on 2011-05-25.
 """
 from exceptions import AttributeError, NotImplementedError
 import time
-from views import styles
+from views import styles, stylecache
 
 import util, time
 
@@ -45,6 +45,7 @@ _toHelixNumFont = styles.XOVER_LABEL_FONT
 _fm = QFontMetrics(_toHelixNumFont)
 _enabbrush = QBrush(Qt.SolidPattern)  # Also for the helix number label
 _nobrush = QBrush(Qt.NoBrush)
+_noPen = QPen(Qt.NoPen)
 # _rect = QRectF(0, 0, baseWidth, baseWidth)
 _xScale = styles.PATH_XOVER_LINE_SCALE_X  # control point x constant
 _yScale = styles.PATH_XOVER_LINE_SCALE_Y  # control point y constant
@@ -66,9 +67,8 @@ class XoverNode3(QGraphicsRectItem):
 
         self.setPartnerVirtualHelix(strand3p)
 
-        self.setPen(QPen(Qt.NoPen))
         self._label = None
-        self.setPen(QPen(Qt.NoPen))
+        self.setPen(_noPen)
         self.setBrush(_nobrush)
         self.setRect(_rect)
         self.setZValue(styles.ZXOVERITEM)
@@ -237,6 +237,66 @@ class XoverNode5(XoverNode3):
     # end def
 # end class
 
+def _xoverPath(dx, dy, fiveIsTop, fiveIs5to3, threeIsTop, threeIs5to3,
+               sameStrand):
+    """
+    Returns the xover curve from a 5' node at the origin to a 3' node at
+    (dx, dy): a quad curve from the edge of the fromBase to the top or
+    bottom of the toBase (q5), and finally to the center of the toBase.
+    """
+    bw = _baseWidth
+    pt5 = QPointF(0, 0)
+    pt3 = QPointF(dx, dy)
+    sameParity = fiveIs5to3 == threeIs5to3
+
+    # Enter/exit are relative to the direction that the path travels
+    # overall.
+    fiveEnterPt = pt5 + QPointF(0 if fiveIs5to3 else 1, .5)*bw
+    fiveCenterPt = pt5 + QPointF(.5, .5)*bw
+    fiveExitPt = pt5 + QPointF(.5, 0 if fiveIsTop else 1)*bw
+
+    threeEnterPt = pt3 + QPointF(.5, 0 if threeIsTop else 1)*bw
+    threeCenterPt = pt3 + QPointF(.5, .5)*bw
+    threeExitPt = pt3 + QPointF(1 if threeIs5to3 else 0, .5)*bw
+
+    c1 = QPointF()
+    # case 1: same strand
+    if sameStrand:
+        dx = abs(threeEnterPt.x() - fiveExitPt.x())
+        c1.setX(0.5 * (fiveExitPt.x() + threeEnterPt.x()))
+        if fiveIsTop:
+            c1.setY(fiveExitPt.y() - _yScale * dx)
+        else:
+            c1.setY(fiveExitPt.y() + _yScale * dx)
+    # case 2: same parity
+    elif sameParity:
+        dy = abs(threeEnterPt.y() - fiveExitPt.y())
+        c1.setX(fiveExitPt.x() + _xScale * dy)
+        c1.setY(0.5 * (fiveExitPt.y() + threeEnterPt.y()))
+    # case 3: different parity
+    else:
+        if fiveIsTop and fiveIs5to3:
+            c1.setX(fiveExitPt.x() - _xScale *\
+                    abs(threeEnterPt.y() - fiveExitPt.y()))
+        else:
+            c1.setX(fiveExitPt.x() + _xScale *\
+                    abs(threeEnterPt.y() - fiveExitPt.y()))
+        c1.setY(0.5 * (fiveExitPt.y() + threeEnterPt.y()))
+
+    # Construct painter path
+    painterpath = QPainterPath()
+    painterpath.moveTo(fiveEnterPt)
+    painterpath.lineTo(fiveCenterPt)
+    painterpath.lineTo(fiveExitPt)
+
+    # The xover5's non-crossing-over end (3') has a connection
+    painterpath.quadTo(c1, threeEnterPt)
+    painterpath.lineTo(threeCenterPt)
+    painterpath.lineTo(threeExitPt)
+    return painterpath
+# end def
+
+
 class XoverItem(QGraphicsPathItem):
     """
     This class handles:
@@ -267,7 +327,7 @@ class XoverItem(QGraphicsPathItem):
         # cA.hoverMoveEvent = self.hoverMoveEvent
         cA.mousePressEvent = self.mousePressEvent
         cA.mouseMoveEvent = self.mouseMoveEvent
-        cA.setPen(QPen(Qt.NoPen))
+        cA.setPen(_noPen)
     # end def
 
     ### SLOTS ###
@@ -295,6 +355,22 @@ class XoverItem(QGraphicsPathItem):
     # end def
 
     ### PUBLIC SUPPORT METHODS ###
+    def resetXoverItem(self, virtualHelixItem):
+        """
+        Drops both nodes so a recycled StrandItem can draw its xover on
+        a different VirtualHelixItem.
+        """
+        self.hide()
+        if self._node3:
+            self._node3.remove()
+            self._node3 = None
+        if self._node5:
+            self._node5.remove()
+            self._node5 = None
+        self._strand5p = None
+        self._virtualHelixItem = virtualHelixItem
+    # end def
+
     def hideIt(self):
         self.hide()
         if self._node3:
@@ -364,14 +440,8 @@ class XoverItem(QGraphicsPathItem):
     ### PRIVATE SUPPORT METHODS ###
     def _updatePath(self, strand5p):
         """
-        Draws a quad curve from the edge of the fromBase
-        to the top or bottom of the toBase (q5), and
-        finally to the center of the toBase (toBaseEndpoint).
-
-        If floatPos!=None, this is a floatingXover and floatPos is the
-        destination point (where the mouse is) while toHelix, toIndex
-        are potentially None and represent the base at floatPos.
-
+        Moves the item to the 5' node and sets its path to the shared
+        curve (see _xoverPath) for the position of the 3' node.
         """
         group = self.group()
         self.tempReparent()
@@ -395,52 +465,14 @@ class XoverItem(QGraphicsPathItem):
         threeIsTop = node3.isOnTop()
         threeIs5to3 = node3.isDrawn5to3()
         sameStrand = (node5.strandType() == node3.strandType()) and vhi3 == vhi5
-        sameParity = fiveIs5to3 == threeIs5to3
-
-        # Enter/exit are relative to the direction that the path travels
-        # overall.
-        fiveEnterPt = pt5 + QPointF(0 if fiveIs5to3 else 1, .5)*bw
-        fiveCenterPt = pt5 + QPointF(.5, .5)*bw
-        fiveExitPt = pt5 + QPointF(.5, 0 if fiveIsTop else 1)*bw
-
-        threeEnterPt = pt3 + QPointF(.5, 0 if threeIsTop else 1)*bw
-        threeCenterPt = pt3 + QPointF(.5, .5)*bw
-        threeExitPt = pt3 + QPointF(1 if threeIs5to3 else 0, .5)*bw
-
-        c1 = QPointF()
-        # case 1: same strand
-        if sameStrand:
-            dx = abs(threeEnterPt.x() - fiveExitPt.x())
-            c1.setX(0.5 * (fiveExitPt.x() + threeEnterPt.x()))
-            if fiveIsTop:
-                c1.setY(fiveExitPt.y() - _yScale * dx)
-            else:
-                c1.setY(fiveExitPt.y() + _yScale * dx)
-        # case 2: same parity
-        elif sameParity:
-            dy = abs(threeEnterPt.y() - fiveExitPt.y())
-            c1.setX(fiveExitPt.x() + _xScale * dy)
-            c1.setY(0.5 * (fiveExitPt.y() + threeEnterPt.y()))
-        # case 3: different parity
-        else:
-            if fiveIsTop and fiveIs5to3:
-                c1.setX(fiveExitPt.x() - _xScale *\
-                        abs(threeEnterPt.y() - fiveExitPt.y()))
-            else:
-                c1.setX(fiveExitPt.x() + _xScale *\
-                        abs(threeEnterPt.y() - fiveExitPt.y()))
-            c1.setY(0.5 * (fiveExitPt.y() + threeEnterPt.y()))
-
-        # Construct painter path
-        painterpath = QPainterPath()
-        painterpath.moveTo(fiveEnterPt)
-        painterpath.lineTo(fiveCenterPt)
-        painterpath.lineTo(fiveExitPt)
 
-        # The xover5's non-crossing-over end (3') has a connection
-        painterpath.quadTo(c1, threeEnterPt)
-        painterpath.lineTo(threeCenterPt)
-        painterpath.lineTo(threeExitPt)
+        # The curve only depends on where the 3' node is relative to the
+        # 5' node, so it is drawn with the 5' node at the origin and shared
+        # between xovers of the same shape.
+        key = ('xover', pt3.x() - pt5.x(), pt3.y() - pt5.y(), fiveIsTop,
+               fiveIs5to3, threeIsTop, threeIs5to3, sameStrand)
+        painterpath = stylecache.cachedPath(key, lambda: _xoverPath(*key[1:]))
+        self.setPos(pt5)
 
         tempR = painterpath.boundingRect()
         tempR.adjust(-bw/2, 0, bw, 0)
@@ -463,16 +495,14 @@ class XoverItem(QGraphicsPathItem):
     
     def _updateColor(self, strand):
         oligo = strand.oligo()
-        color = self.pen().color() if self.isSelected() else QColor(oligo.color())
+        color = self.pen().color() if self.isSelected() else oligo.color()
         # print "update xover color", color.value(), self.isSelected(), self.group(), self.parentItem()
         penWidth = styles.PATH_STRAND_STROKE_WIDTH
+        alpha = None
         if oligo.shouldHighlight():
             penWidth = styles.PATH_STRAND_HIGHLIGHT_STROKE_WIDTH
-            color.setAlpha(128)
-        pen = QPen(color, penWidth)
-        # pen.setCosmetic(True)
-        pen.setCapStyle(Qt.FlatCap)
-        self.setPen(pen)
+            alpha = 128
+        self.setPen(stylecache.cachedPen(color, penWidth, alpha))
     # end def
 
     ### EVENT HANDERS ###
@@ -543,16 +573,15 @@ class XoverItem(QGraphicsPathItem):
     # end def
 
     def setSelectedColor(self, value):
+        alpha = None
         if value == True:
             color = styles.selected_color
         else:
             oligo = self._strandItem.strand().oligo()
-            color = QColor(oligo.color())
+            color = oligo.color()
             if oligo.shouldHighlight():
-                color.setAlpha(128)
-        pen = self.pen()
-        pen.setColor(color)
-        self.setPen(pen)
+                alpha = 128
+        self.setPen(stylecache.cachedPen(color, self.pen().widthF(), alpha))
     # end def
 
     def itemChange(self, change, value):
@@ -55,6 +55,7 @@ class AbstractPathTool(QGraphicsObject):
         self._window = controller.window
         self._active = False
         self._lastLocation = None
+        self._lastHoverBase = None
 
     ######################## Drawing #######################################
     def paint(self, painter, option, widget=None):
@@ -100,6 +101,22 @@ class AbstractPathTool(QGraphicsObject):
             if self.parentItem() != _mother:
                 self.setParentItem(_mother)
 
+    def isNewHoverBase(self, item, idx, strandIdx=None):
+        """
+        Returns False if item already dispatched a hover for this base,
+        so repeated hover moves within one base can be skipped; otherwise
+        remembers the base and returns True.
+        """
+        base = (item, idx, strandIdx)
+        if base == self._lastHoverBase:
+            return False
+        self._lastHoverBase = base
+        return True
+
+    def resetHoverBase(self):
+        """Makes the next hover move dispatch, e.g. after a press."""
+        self._lastHoverBase = None
+
     def lastLocation(self):
         """A tuple (virtualHelixItem, QPoint) representing the last
         known location of the mouse for purposes of positioning
@@ -113,6 +130,7 @@ class AbstractPathTool(QGraphicsObject):
         Called by PathToolManager.setActiveTool when the tool becomes
         active. Used, for example, to show/hide tool-specific ui elements.
         """
+        self._lastHoverBase = None
         if self.isActive() and not willBeActive:
             self.setParentItem(_mother)
             self.hide()
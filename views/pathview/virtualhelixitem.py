@@ -25,23 +25,85 @@
 #
 # http://www.opensource.org/licenses/mit-license.php
 
+from collections import defaultdict
 from math import floor
 from controllers.itemcontrollers.virtualhelixitemcontroller import VirtualHelixItemController
 from model.enum import StrandType
-from strand.stranditem import StrandItem
-from views import styles
+from views import styles, stylecache
 from virtualhelixhandleitem import VirtualHelixHandleItem
 import util
 # import Qt stuff into the module namespace with PySide, PyQt4 independence
-util.qtWrapImport('QtCore', globals(), ['pyqtSignal', 'QObject', 'Qt', 'QRectF'])
+util.qtWrapImport('QtCore', globals(), ['pyqtSignal', 'QObject', 'Qt', 'QLineF',
+                                        'QRectF', 'QTimer'])
 util.qtWrapImport('QtGui', globals(), ['QBrush', 'QGraphicsItem', \
                                        'QGraphicsPathItem',  'QGraphicsRectItem', \
                                        'QPainterPath', 'QPen', 'QBrush', 'QColor'])
 _baseWidth = styles.PATH_BASE_WIDTH
+# QPainterPaths are implicitly shared, so every helix of a part draws its
+# grid from the same few tiles instead of building ~10 segments per base.
+_gridTiles = {}  # (subStepSize, numBases) -> QPainterPath
+_borderPaths = {}  # canvasSize -> QPainterPath
 # _gridPen = QPen(styles.minorgridstroke, styles.MINOR_GRID_STROKE_WIDTH)
 # _gridPen.setCosmetic(True)
 
 
+def _tileBases(subStepSize):
+    """Bases per grid tile, a multiple of subStepSize so tiles line up."""
+    return subStepSize * max(1, styles.PATH_GRID_TILE_BASES // subStepSize)
+# end def
+
+
+def _gridTile(subStepSize, numBases):
+    """
+    Returns a QPainterPath of the minor tick marks for numBases bases
+    starting at x = 0, with a thick mark every subStepSize bases.
+    """
+    key = (subStepSize, numBases)
+    path = _gridTiles.get(key)
+    if path is None:
+        bw = _baseWidth
+        bw2 = 2 * bw
+        path = QPainterPath()
+        for i in range(numBases):
+            x = round(bw * i) + .5
+            if i % subStepSize == 0:
+                path.moveTo(x-.5, 0)
+                path.lineTo(x-.5, bw2)
+                path.lineTo(x-.25, bw2)
+                path.lineTo(x-.25, 0)
+                path.lineTo(x, 0)
+                path.lineTo(x, bw2)
+                path.lineTo(x+.25, bw2)
+                path.lineTo(x+.25, 0)
+                path.lineTo(x+.5, 0)
+                path.lineTo(x+.5, bw2)
+            else:
+                path.moveTo(x, 0)
+                path.lineTo(x, bw2)
+        _gridTiles[key] = path
+    return path
+# end def
+
+
+def _borderPath(canvasSize):
+    """
+    Returns a QPainterPath of the helix border and the staple-scaffold
+    divider for a canvas of canvasSize bases.
+    """
+    path = _borderPaths.get(canvasSize)
+    if path is None:
+        bw = _baseWidth
+        path = QPainterPath()
+        # border
+        path.addRect(0, 0, bw * canvasSize, 2 * bw)
+        # staple-scaffold divider
+        path.moveTo(0, bw)
+        path.lineTo(bw * canvasSize, bw)
+        _borderPaths[canvasSize] = path
+    return path
+# end def
+
+
 class VirtualHelixItem(QGraphicsPathItem):
     """VirtualHelixItem for PathView"""
     findChild = util.findChild  # for debug
@@ -58,6 +120,11 @@ class VirtualHelixItem(QGraphicsPathItem):
         self._lastStrandSet = None
         self._lastIdx = None
         self._scaffoldBackground = None
+        self._subStepSize = 1
+        self._canvasSize = 0
+        self._strandItems = {}  # modelStrand -> StrandItem, near the viewport
+        self._visibleRange = None  # (lowIdx, highIdx), None when offscreen
+        self._batchRuns = None  # oligo color -> [QLineF], without details
         self.setFlag(QGraphicsItem.ItemUsesExtendedStyleOption)
         self.setCacheMode(QGraphicsItem.DeviceCoordinateCache)
         self.setBrush(QBrush(Qt.NoBrush))
@@ -92,8 +159,17 @@ class VirtualHelixItem(QGraphicsPathItem):
         new Strand.  The StrandItem is responsible for creating its own
         controller for communication with the model, and for adding itself to
         its parent (which is *this* VirtualHelixItem, i.e. 'self').
+
+        Strands outside the part of the helix near the viewport get no
+        item until the PartItem scrolls them into range.
         """
-        StrandItem(strand, self, self._viewroot)
+        visibleRange = self._visibleRange
+        if visibleRange is None or strand in self._strandItems:
+            return
+        lowIdx, highIdx = visibleRange
+        if strand.highIdx() >= lowIdx and strand.lowIdx() <= highIdx:
+            self._strandItems[strand] = \
+                            self._partItem.acquireStrandItem(strand, self)
     # end def
 
     def decoratorAddedSlot(self, decorator):
@@ -159,6 +235,20 @@ class VirtualHelixItem(QGraphicsPathItem):
         return self._partItem.window()
     # end def
 
+    def strandItems(self):
+        """Returns the StrandItems that currently exist on this helix."""
+        return self._strandItems.values()
+    # end def
+
+    def strandItemForStrand(self, strand):
+        """Returns the StrandItem for strand, or None if it has none."""
+        return self._strandItems.get(strand)
+    # end def
+
+    def visibleRange(self):
+        return self._visibleRange
+    # end def
+
     ### DRAWING METHODS ###
     def isStrandOnTop(self, strand):
         sS = strand.strandSet()
@@ -187,68 +277,132 @@ class VirtualHelixItem(QGraphicsPathItem):
 
     def refreshPath(self):
         """
-        Returns a QPainterPath object for the minor grid lines.
-        The path also includes a border outline and a midline for
-        dividing scaffold and staple bases.
+        Sets the item path to the border outline and the midline dividing
+        scaffold and staple bases. The minor grid lines are not part of
+        the path; paint() draws them from shared tiles (see _gridTile).
         """
-        bw = _baseWidth
-        bw2 = 2 * bw
         part = self.part()
-        path = QPainterPath()
-        subStepSize = part.subStepSize()
-        canvasSize = part.maxBaseIdx()+1
-        # border
-        path.addRect(0, 0, bw * canvasSize, 2 * bw)
-        # minor tick marks
-        for i in range(canvasSize):
-            x = round(bw * i) + .5
-            if i % subStepSize == 0:
-                path.moveTo(x-.5, 0)
-                path.lineTo(x-.5, bw2)
-                path.lineTo(x-.25, bw2)
-                path.lineTo(x-.25, 0)
-                path.lineTo(x, 0)
-                path.lineTo(x, bw2)
-                path.lineTo(x+.25, bw2)
-                path.lineTo(x+.25, 0)
-                path.lineTo(x+.5, 0)
-                path.lineTo(x+.5, bw2)
-
-                # path.moveTo(x-.5, 0)
-                # path.lineTo(x-.5, 2 * bw)
-                # path.lineTo(x+.5, 2 * bw)
-                # path.lineTo(x+.5, 0)
-
-            else:
-                path.moveTo(x, 0)
-                path.lineTo(x, 2 * bw)
-
-        # staple-scaffold divider
-        path.moveTo(0, bw)
-        path.lineTo(bw * canvasSize, bw)
-        
-        self.setPath(path)
-        
-        if self._modelVirtualHelix.scaffoldIsOnTop():
-            scaffoldY = 0
-        else:
-            scaffoldY = bw
-        # if self._scaffoldBackground == None:
-        #     highlightr = QGraphicsRectItem(0, scaffoldY, bw * canvasSize, bw, self)
-        #     highlightr.setBrush(QBrush(styles.scaffold_bkg_fill))
-        #     highlightr.setPen(QPen(Qt.NoPen))
-        #     highlightr.setFlag(QGraphicsItem.ItemStacksBehindParent)
-        #     self._scaffoldBackground = highlightr
-        # else:
-        #     self._scaffoldBackground.setRect(0, scaffoldY, bw * canvasSize, bw)
-            
+        self._subStepSize = part.subStepSize()
+        self._canvasSize = part.maxBaseIdx()+1
+        self.setPath(_borderPath(self._canvasSize))
     # end def
 
     def resize(self):
         """Called by part on resize."""
         self.refreshPath()
 
+    def paint(self, painter, option, widget=None):
+        """
+        The scene only paints helices that are in view, so this is where
+        lazily opened strands get built. Building adds items, so it is
+        deferred until painting is done.
+
+        Only the grid tiles that overlap the exposed rect are drawn, and
+        without details the strands are drawn here too (see
+        _paintBatchRuns).
+        """
+        if self._modelVirtualHelix.isPending():
+            QTimer.singleShot(0, self._modelVirtualHelix.materialize)
+            # new xovers may need items on helices outside the viewport
+            QTimer.singleShot(0, self._partItem.partContentsChangedSlot)
+        painter.setPen(self.pen())
+        painter.setBrush(self.brush())
+        painter.drawPath(self.path())
+        lod = option.levelOfDetailFromTransform(painter.worldTransform())
+        if lod >= styles.PATH_LOD_RUNS_ONLY_SCALE:
+            subStepSize, canvasSize = self._subStepSize, self._canvasSize
+            tileBases = _tileBases(subStepSize)
+            tileWidth = tileBases * _baseWidth
+            rect = option.exposedRect
+            first = max(0, int(floor(rect.left() / tileWidth)))
+            last = min((canvasSize - 1) // tileBases,
+                       int(floor(rect.right() / tileWidth)))
+            for i in range(first, last + 1):
+                start = i * tileBases
+                x = start * _baseWidth
+                painter.translate(x, 0)
+                painter.drawPath(_gridTile(subStepSize,
+                                           min(tileBases, canvasSize - start)))
+                painter.translate(-x, 0)
+        if not self._partItem.shouldShowDetails():
+            self._paintBatchRuns(painter)
+    # end def
+
+    def invalidateBatch(self):
+        """Drops the cached strand runs, e.g. after the model changed."""
+        self._batchRuns = None
+        self.update()
+    # end def
+
+    def _paintBatchRuns(self, painter):
+        """
+        Without details there are no StrandItems; the strands of the
+        helix are drawn here as one line per strand, a pen per color.
+        """
+        if self._batchRuns is None:
+            runs = defaultdict(list)
+            bw = _baseWidth
+            halfBaseWidth = bw / 2.0
+            for strandSet in self._modelVirtualHelix.getStrandSets():
+                if strandSet.isPending():
+                    continue
+                for strand in strandSet:
+                    x, y = self.upperLeftCornerOfBase(strand.lowIdx(), strand)
+                    runs[strand.oligo().color()].append(
+                        QLineF(x, y + halfBaseWidth,
+                               (strand.highIdx() + 1) * bw, y + halfBaseWidth))
+            self._batchRuns = runs
+        for color, lines in self._batchRuns.iteritems():
+            painter.setPen(stylecache.cachedPen(color,
+                                            styles.PATH_LOD_STRAND_WIDTH))
+            painter.drawLines(lines)
+    # end def
+
     ### PUBLIC SUPPORT METHODS ###
+    def strandsInRange(self, lowIdx, highIdx):
+        """
+        Returns the model strands overlapping [lowIdx, highIdx]. Pending
+        StrandSets return nothing; they build their strands on first paint.
+        """
+        lowIdx = max(0, lowIdx)
+        highIdx = min(self._canvasSize - 1, highIdx)
+        if highIdx < lowIdx:
+            return []
+        strands = []
+        for strandSet in self._modelVirtualHelix.getStrandSets():
+            if strandSet.isPending():
+                continue
+            strands.extend(strandSet.getOverlappingStrands(lowIdx, highIdx))
+        return strands
+    # end def
+
+    def syncStrandItems(self, strands, visibleRange):
+        """
+        Makes the StrandItems on this helix match strands: missing ones
+        are taken from the PartItem pool and unwanted ones are returned
+        to it, except for selected items, which stay until deselected.
+        visibleRange is the (lowIdx, highIdx) window used to decide on
+        strands added later, or None if the helix is offscreen.
+        """
+        self._visibleRange = visibleRange
+        items = self._strandItems
+        partItem = self._partItem
+        wanted = set(strands)
+        for strand in wanted:
+            if strand not in items:
+                items[strand] = partItem.acquireStrandItem(strand, self)
+        if len(items) > len(wanted):
+            for strand, strandItem in items.items():
+                if strand not in wanted and not strandItem.isPinned():
+                    del items[strand]
+                    partItem.releaseStrandItem(strandItem)
+    # end def
+
+    def removeStrandItem(self, strandItem):
+        """Called by a StrandItem whose strand was removed from the model."""
+        self._strandItems.pop(strandItem.strand(), None)
+    # end def
+
     def setActive(self, idx):
         """Makes active the virtual helix associated with this item."""
         self.part().setActiveVirtualHelix(self._modelVirtualHelix, idx)
@@ -261,6 +415,7 @@ class VirtualHelixItem(QGraphicsPathItem):
         forwarding them to approproate tool method as necessary.
         """
         self.scene().views()[0].addToPressList(self)
+        self._activeTool().resetHoverBase()
         strandSet, idx = self.baseAtPoint(event.pos())
         self.setActive(idx)
         toolMethodName = str(self._activeTool()) + "MousePress"
@@ -336,6 +491,7 @@ class VirtualHelixItem(QGraphicsPathItem):
     # end def
 
     def hoverLeaveEvent(self, event):
+        self._activeTool().resetHoverBase()
         self._partItem.updateStatusBar("")
     # end def
 
@@ -343,12 +499,17 @@ class VirtualHelixItem(QGraphicsPathItem):
         """
         Parses a mouseMoveEvent to extract strandSet and base index,
         forwarding them to approproate tool method as necessary.
+        Moves that stay on the same base are ignored.
         """
-        baseIdx = int(floor(event.pos().x() / _baseWidth))
+        pos = event.pos()
+        baseIdx = int(floor(pos.x() / _baseWidth))
+        activeTool = self._activeTool()
+        if not activeTool.isNewHoverBase(self, baseIdx,
+                                         int(floor(pos.y() / _baseWidth))):
+            return
         loc = "%d[%d]" % (self.number(), baseIdx)
         self._partItem.updateStatusBar(loc)
 
-        activeTool = self._activeTool()
         toolMethodName = str(activeTool) + "HoverMove"
         if hasattr(self, toolMethodName):
             strandType, idxX, idxY = activeTool.baseAtPoint(self, event.pos())
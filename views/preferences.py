@@ -54,6 +54,7 @@ class Preferences(object):
         self.uiPrefs.autoScafComboBox.currentIndexChanged.connect(self.setAutoScaf)
         self.uiPrefs.defaultToolComboBox.currentIndexChanged.connect(self.setStartupTool)
         self.uiPrefs.zoomSpeedSlider.valueChanged.connect(self.setZoomSpeed)
+        self.uiPrefs.stapleSortComboBox.currentIndexChanged.connect(self.setStapleSortOrder)
         # self.uiPrefs.helixAddCheckBox.toggled.connect(self.setZoomToFitOnHelixAddition)
         self.uiPrefs.buttonBox.clicked.connect(self.handleButtonClick)
         self.uiPrefs.addPluginButton.clicked.connect(self.addPlugin)
@@ -87,6 +88,8 @@ class Preferences(object):
         self.startupToolIndex = self.qs.value("startupTool", styles.PREF_STARTUP_TOOL_INDEX).toInt()[0]
         self.zoomSpeed = self.qs.value("zoomSpeed", styles.PREF_ZOOM_SPEED).toInt()[0]
         self.zoomOnHelixAdd = self.qs.value("zoomOnHelixAdd", styles.PREF_ZOOM_AFTER_HELIX_ADD).toBool()
+        self.lazyOpenMinHelices = self.qs.value("lazyOpenMinHelices", styles.PREF_LAZY_OPEN_MIN_HELICES).toInt()[0]
+        self.stapleSortOrder = self.qs.value("stapleSortOrder", styles.PREF_STAPLE_SORT_ORDER).toInt()[0]
         self.qs.endGroup()
         self.uiPrefs.honeycombRowsSpinBox.setProperty("value", self.honeycombRows)
         self.uiPrefs.honeycombColsSpinBox.setProperty("value", self.honeycombCols)
@@ -97,6 +100,7 @@ class Preferences(object):
         self.uiPrefs.autoScafComboBox.setCurrentIndex(self.autoScafIndex)
         self.uiPrefs.defaultToolComboBox.setCurrentIndex(self.startupToolIndex)
         self.uiPrefs.zoomSpeedSlider.setProperty("value", self.zoomSpeed)
+        self.uiPrefs.stapleSortComboBox.setCurrentIndex(self.stapleSortOrder)
         ptw = self.uiPrefs.pluginTableWidget
         loadedPluginPaths = cadnano.loadedPlugins.keys()
         ptw.setRowCount(len(loadedPluginPaths))
@@ -117,6 +121,7 @@ class Preferences(object):
         self.uiPrefs.autoScafComboBox.setCurrentIndex(styles.PREF_AUTOSCAF_INDEX)
         self.uiPrefs.defaultToolComboBox.setCurrentIndex(styles.PREF_STARTUP_TOOL_INDEX)
         self.uiPrefs.zoomSpeedSlider.setProperty("value", styles.PREF_ZOOM_SPEED)
+        self.uiPrefs.stapleSortComboBox.setCurrentIndex(styles.PREF_STAPLE_SORT_ORDER)
         # self.uiPrefs.helixAddCheckBox.setChecked(styles.PREF_ZOOM_AFTER_HELIX_ADD)
 
     def setHoneycombRows(self, rows):
@@ -173,6 +178,12 @@ class Preferences(object):
         self.qs.setValue("zoomSpeed", self.zoomSpeed)
         self.qs.endGroup()
 
+    def setStapleSortOrder(self, index):
+        self.stapleSortOrder = index
+        self.qs.beginGroup("Preferences")
+        self.qs.setValue("stapleSortOrder", self.stapleSortOrder)
+        self.qs.endGroup()
+
     # def setZoomToFitOnHelixAddition(self, checked):
     #     self.zoomOnHelixAdd = checked
     #     self.qs.beginGroup("Preferences")
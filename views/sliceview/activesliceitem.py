@@ -46,30 +46,51 @@ class ActiveSliceItem(QGraphicsRectItem):
         self._partItem = partItem
         self._controller = ActiveSliceItemController(self, partItem.part())
         self.setFlag(QGraphicsItem.ItemHasNoContents)
+        self._activeHelices = set()  # helices drawn as in the slice
     # end def
 
     ### SLOTS ###
     def strandChangedSlot(self, sender, vh):
         if vh == None:
             return
-        partItem = self._partItem
-        vhi = partItem.getVirtualHelixItemByCoord(*vh.coord())
-        activeBaseIdx = partItem.part().activeBaseIndex()
-        isActiveNow = vh.hasStrandAtIdx(activeBaseIdx)
+        part = self.part()
+        occupancy = part.occupancy()
+        # sent before the command reaches the undo stack
+        occupancy.invalidate(vh)
+        activeBaseIdx = part.activeBaseIndex()
+        isActiveNow = occupancy.isOccupied(vh, activeBaseIdx)
+        if isActiveNow == (vh in self._activeHelices):
+            return
+        vhi = self._partItem.getVirtualHelixItemByCoord(*vh.coord())
+        if vhi == None:
+            return
         vhi.setActiveSliceView(isActiveNow, activeBaseIdx)
+        if isActiveNow:
+            self._activeHelices.add(vh)
+        else:
+            self._activeHelices.discard(vh)
     # end def
 
     def updateIndexSlot(self, sender, newActiveSliceZIndex):
+        """
+        Restyles only the helices that enter or leave the slice; the
+        others just turn their arrows to the new index.
+        """
         part = self.part()
         if part.numberOfVirtualHelices() == 0:
             return
-        newlyActiveVHs = set()
         activeBaseIdx = part.activeBaseIndex()
-        for vhi in self._partItem._virtualHelixHash.itervalues():
-            vh = vhi.virtualHelix()
-            if vh:
-                isActiveNow = vh.hasStrandAtIdx(activeBaseIdx)
-                vhi.setActiveSliceView(isActiveNow, activeBaseIdx)
+        newlyActiveVHs = part.occupancy().occupiedHelices(activeBaseIdx)
+        getItem = self._partItem.getVirtualHelixItemByCoord
+        for vh in self._activeHelices ^ newlyActiveVHs:
+            vhi = getItem(*vh.coord())
+            if vhi != None and vhi.virtualHelix() is vh:
+                vhi.setActiveSliceView(vh in newlyActiveVHs, activeBaseIdx)
+        for vh in self._activeHelices & newlyActiveVHs:
+            vhi = getItem(*vh.coord())
+            if vhi != None:
+                vhi.updateArrow(activeBaseIdx)
+        self._activeHelices = newlyActiveVHs
     # end def
 
     def updateRectSlot(self, part):
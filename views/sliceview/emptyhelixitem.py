@@ -85,10 +85,20 @@ class EmptyHelixItem(QGraphicsEllipseItem):
 
         self.setNotHovered()
 
+        self.setCoord(row, column)
+        self.show()
+    # end def
+
+    def coord(self):
+        return self._coord
+    # end def
+
+    def setCoord(self, row, column):
+        """Moves the item to a lattice position, e.g. the hovered one."""
+        partItem = self._partItem
         x, y = partItem.part().latticeCoordToPositionXY(row, column, partItem.scaleFactor())
         self.setPos(x, y)
         self._coord = (row, column)
-        self.show()
     # end def
 
     def virtualHelix(self):
@@ -119,6 +129,10 @@ class EmptyHelixItem(QGraphicsEllipseItem):
         return self._partItem.part()
     # end def
 
+    def partItem(self):
+        return self._partItem
+    # end def
+
     def translateVH(self, delta):
         """
         used to update a child virtual helix position on a hover event
@@ -176,9 +190,12 @@ class EmptyHelixItem(QGraphicsEllipseItem):
     def hoverLeaveEvent(self, event):
         """
         hoverEnterEvent changes the HelixItem brush and pen from hover
-        to the default colors if necessary.
+        to the default colors if necessary. Without a virtual helix this
+        is the hover item, which hides to leave the lattice painting.
         """
         self.setNotHovered()
+        if self.virtualHelixItem() == None:
+            self.hide()
     # end def
 
     def mousePressEvent(self, event):
@@ -190,13 +207,11 @@ class EmptyHelixItem(QGraphicsEllipseItem):
     def mouseMoveEvent(self, event):
         partItem = self._partItem
         posInParent = partItem.mapFromItem(self, QPointF(event.pos()))
-        # Qt doesn't have any way to ask for graphicsitem(s) at a
-        # particular position but it *can* do intersections, so we
-        # just use those instead
-        partItem.probe.setPos(posInParent)
-        for ci in partItem.probe.collidingItems():
-            if isinstance(ci, EmptyHelixItem):
-                self.dragSessionAction(ci)
+        # lattice positions are found arithmetically; empty ones are
+        # stood in for by the part item's hover item
+        ci = partItem.helixItemAt(posInParent)
+        if ci != None:
+            self.dragSessionAction(ci)
     # end def
 
     def autoScafMidSeam(self, strands):
@@ -0,0 +1,136 @@
+# The MIT License
+#
+# Copyright (c) 2011 Wyss Institute at Harvard University
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# http://www.opensource.org/licenses/mit-license.php
+
+"""
+latticeitem.py
+"""
+
+from math import hypot
+from emptyhelixitem import EmptyHelixItem
+
+from views import styles
+import util
+# import Qt stuff into the module namespace with PySide, PyQt4 independence
+util.qtWrapImport('QtCore', globals(), ['QRectF'])
+util.qtWrapImport('QtGui', globals(), ['QGraphicsItem'])
+
+
+class LatticeItem(QGraphicsItem):
+    """
+    Paints every lattice position of a slice PartItem as an empty helix in
+    one pass, instead of keeping an EmptyHelixItem per position. Positions
+    under the mouse are found arithmetically with Part.positionToCoord,
+    and the PartItem's single hover EmptyHelixItem is moved there, so
+    per-coordinate items exist only for virtual helices and the hovered
+    cell.
+    """
+    _radius = styles.SLICE_HELIX_RADIUS
+    _rect = EmptyHelixItem._defaultRect
+    _pen = EmptyHelixItem._defaultPen
+    _brush = EmptyHelixItem._defaultBrush
+
+    def __init__(self, partItem):
+        super(LatticeItem, self).__init__(partItem)
+        self._partItem = partItem
+        self._bounds = QRectF()
+        self.setAcceptsHoverEvents(True)
+        self.setFlag(QGraphicsItem.ItemUsesExtendedStyleOption)
+        self.setZValue(styles.ZSLICEHELIX - 1)
+        self.updateLattice()
+    # end def
+
+    def updateLattice(self):
+        """Recomputes the bounds after the part's lattice changed."""
+        part = self._partItem.part()
+        maxRow, maxCol = part.latticeDimensions()
+        sf = self._partItem.scaleFactor()
+        bounds = QRectF()
+        for row in set((0, 1, maxRow - 2, maxRow - 1)):
+            for col in set((0, 1, maxCol - 2, maxCol - 1)):
+                if 0 <= row < maxRow and 0 <= col < maxCol:
+                    x, y = part.latticeCoordToPositionXY(row, col, sf)
+                    bounds = bounds.united(self._rect.translated(x, y))
+        w = styles.SLICE_HELIX_STROKE_WIDTH
+        self.prepareGeometryChange()
+        self._bounds = bounds.adjusted(-w, -w, w, w)
+        self.update()
+    # end def
+
+    def coordAt(self, pos):
+        """
+        Returns the (row, column) of the lattice circle containing pos,
+        in PartItem coordinates, or None.
+        """
+        part = self._partItem.part()
+        sf = self._partItem.scaleFactor()
+        r = self._radius
+        row, col = part.positionToCoord(pos.x() - r, pos.y() - r, sf)
+        maxRow, maxCol = part.latticeDimensions()
+        if not (0 <= row < maxRow and 0 <= col < maxCol):
+            return None
+        x, y = part.latticeCoordToPositionXY(row, col, sf)
+        if hypot(pos.x() - r - x, pos.y() - r - y) > r:
+            return None
+        return (row, col)
+    # end def
+
+    def _coordRange(self, rect):
+        """Returns the row and column ranges that can overlap rect."""
+        part = self._partItem.part()
+        sf = self._partItem.scaleFactor()
+        d = 2 * self._radius
+        maxRow, maxCol = part.latticeDimensions()
+        r0, c0 = part.positionToCoord(rect.left() - d, rect.top() - d, sf)
+        r1, c1 = part.positionToCoord(rect.right(), rect.bottom(), sf)
+        return (xrange(max(0, r0 - 1), min(maxRow, r1 + 2)),
+                xrange(max(0, c0 - 1), min(maxCol, c1 + 2)))
+    # end def
+
+    ### QGRAPHICSITEM METHODS ###
+    def boundingRect(self):
+        return self._bounds
+    # end def
+
+    def paint(self, painter, option, widget=None):
+        part = self._partItem.part()
+        sf = self._partItem.scaleFactor()
+        toPos = part.latticeCoordToPositionXY
+        drawEllipse = painter.drawEllipse
+        rect = self._rect
+        painter.setPen(self._pen)
+        painter.setBrush(self._brush)
+        rows, cols = self._coordRange(option.exposedRect)
+        for row in rows:
+            for col in cols:
+                x, y = toPos(row, col, sf)
+                drawEllipse(rect.translated(x, y))
+    # end def
+
+    def hoverMoveEvent(self, event):
+        """Puts the PartItem's hover cell on the position under the mouse."""
+        coord = self.coordAt(self.mapToParent(event.pos()))
+        if coord != None:
+            self._partItem.emptyHelixItemAtCoord(*coord).setHovered()
+    # end def
+# end class
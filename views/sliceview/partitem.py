@@ -25,6 +25,7 @@
 # from views.pathview.handles.activeslicehandle import ActiveSliceHandle
 from controllers.itemcontrollers.partitemcontroller import PartItemController
 from emptyhelixitem import EmptyHelixItem
+from latticeitem import LatticeItem
 from virtualhelixitem import VirtualHelixItem
 from activesliceitem import ActiveSliceItem
 
@@ -51,10 +52,11 @@ class PartItem(QGraphicsItem):
         """
         Parent should be either a SliceRootItem, or an AssemblyItem.
 
-        Invariant: keys in _emptyhelixhash = range(_nrows) x range(_ncols)
-        where x is the cartesian product.
+        Invariant: keys in _emptyhelixhash = coords of the virtual helices.
+        Empty lattice positions are painted by a single LatticeItem, and
+        _hoverHelixItem stands in for whichever one is under the mouse.
         
-        Order matters for deselector, probe, and setlattice
+        Order matters for deselector and setlattice
         """
         super(PartItem, self).__init__(parent)
         self._part = modelPart
@@ -63,15 +65,15 @@ class PartItem(QGraphicsItem):
         self._scaleFactor = self._radius/modelPart.radius()
         self._emptyhelixhash = {}
         self._virtualHelixHash = {}
+        self._hoverHelixItem = None  # the hovered empty position, if any
         self._nrows, self._ncols = 0, 0
         self._rect = QRectF(0, 0, 0, 0)
         self._initDeselector()
         # Cache of VHs that were active as of last call to activeSliceChanged
         # If None, all slices will be redrawn and the cache will be filled.
         # Connect destructor. This is for removing a part from scenes.
-        self.probe = self.IntersectionProbe(self)
-        # initialize the PartItem with an empty set of old coords
-        self._setLattice([], modelPart.generatorFullLattice())
+        self._lattice = LatticeItem(self)
+        self._setLattice()
         self.setFlag(QGraphicsItem.ItemHasNoContents)  # never call paint
         self.setZValue(styles.ZPARTITEM)
         self._initModifierCircle()
@@ -127,11 +129,15 @@ class PartItem(QGraphicsItem):
             scene.removeItem(val)
             del self._emptyhelixhash[key]
         self._emptyhelixhash = None
+        if self._hoverHelixItem != None:
+            scene.removeItem(self._hoverHelixItem)
+            self._hoverHelixItem = None
+        scene.removeItem(self._lattice)
+        self._lattice = None
 
         scene.removeItem(self)
         
         self._part = None
-        self.probe = None
         self._modCirc = None
         
         self.deselector = None
@@ -161,7 +167,12 @@ class PartItem(QGraphicsItem):
         vh = virtualHelix
         coords = vh.coord()
 
-        emptyHelixItem = self._emptyhelixhash[coords]
+        emptyHelixItem = self._spawnEmptyHelixItemAt(*coords)
+        hoverItem = self._hoverHelixItem
+        if hoverItem != None and hoverItem.coord() == coords:
+            # stays shown, as it may be grabbing the mouse for a drag,
+            # but drops back under the new item
+            hoverItem.setNotHovered()
         # TODO test to see if self._virtualHelixHash is necessary
         vhi = VirtualHelixItem(vh, emptyHelixItem)
         self._virtualHelixHash[coords] = vhi
@@ -213,30 +224,20 @@ class PartItem(QGraphicsItem):
         helix = EmptyHelixItem(row, column, self)
         # helix.setFlag(QGraphicsItem.ItemStacksBehindParent, True)
         self._emptyhelixhash[(row, column)] = helix
+        return helix
     # end def
 
-    def _killHelixItemAt(row, column):
+    def _killHelixItemAt(self, row, column):
         s = self._emptyhelixhash[(row, column)]
         s.scene().removeItem(s)
         del self._emptyhelixhash[(row, column)]
     # end def
 
-    def _setLattice(self, oldCoords, newCoords):
+    def _setLattice(self):
         """A private method used to change the number of rows,
         cols in response to a change in the dimensions of the
         part represented by the receiver"""
-        oldSet = set(oldCoords)
-        oldList = list(oldSet)
-        newSet = set(newCoords)
-        newList = list(newSet)
-        for coord in oldList:
-            if coord not in newSet:
-                self._killHelixItemAt(*coord)
-        # end for
-        for coord in newList:
-            if coord not in oldSet:
-                self._spawnEmptyHelixItemAt(*coord)
-        # end for
+        self._lattice.updateLattice()
         # self._updateGeometry(newCols, newRows)
         # self.prepareGeometryChange()
         # the Deselector copies our rect so it changes too
@@ -246,10 +247,42 @@ class PartItem(QGraphicsItem):
 
     ### PUBLIC SUPPORT METHODS ###
     def getVirtualHelixItemByCoord(self, row, column):
-        if (row, column) in self._emptyhelixhash:
-            return self._virtualHelixHash[(row, column)]
-        else:
+        return self._virtualHelixHash.get((row, column))
+    # end def
+
+    def emptyHelixItemAtCoord(self, row, column):
+        """
+        Returns the EmptyHelixItem of the virtual helix at row, column, or
+        else the hover item, moved there and shown.
+        """
+        helix = self._emptyhelixhash.get((row, column))
+        if helix != None:
+            return helix
+        helix = self._hoverHelixItem
+        if helix == None:
+            helix = self._hoverHelixItem = EmptyHelixItem(row, column, self)
+        elif helix.coord() != (row, column):
+            helix.setNotHovered()
+            helix.setCoord(row, column)
+        helix.show()
+        return helix
+    # end def
+
+    def helixItemAt(self, pos):
+        """
+        Returns the EmptyHelixItem for the lattice position containing pos,
+        in PartItem coordinates, or None if pos misses every position.
+        """
+        coord = self._lattice.coordAt(pos)
+        if coord == None:
             return None
+        return self.emptyHelixItemAtCoord(*coord)
+    # end def
+
+    def removeVirtualHelixItemAt(self, row, column):
+        """Forgets the removed helix item and drops its EmptyHelixItem."""
+        del self._virtualHelixHash[(row, column)]
+        self._killHelixItemAt(row, column)
     # end def
 
     def paint(self, painter, option, widget=None):
@@ -277,7 +310,9 @@ class PartItem(QGraphicsItem):
         # self.window().statusBar().showMessage(statusString, timeout)
 
     def vhAtCoordsChanged(self, row, col):
-        self._emptyhelixhash[(row, col)].update()
+        helix = self._emptyhelixhash.get((row, col))
+        if helix != None:
+            helix.update()
     # end def
 
     def zoomToFit(self):
@@ -304,12 +339,5 @@ class PartItem(QGraphicsItem):
             super(PartItem.Deselector, self).mousePressEvent(event)
         def boundingRect(self):
             return self.parentHGI.boundingRect()
-        def paint(self, painter, option, widget=None):
-            pass
-
-
-    class IntersectionProbe(QGraphicsItem):
-        def boundingRect(self):
-            return QRectF(0, 0, .1, .1)
         def paint(self, painter, option, widget=None):
             pass
\ No newline at end of file
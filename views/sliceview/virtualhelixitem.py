@@ -102,14 +102,17 @@ class VirtualHelixItem(QGraphicsEllipseItem):
     # end def
 
     def virtualHelixRemovedSlot(self, virtualHelix):
+        emptyHelixItem = self._emptyHelixItem
         self._controller.disconnectSignals()
         self._controller = None
-        self._emptyHelixItem.setNotHovered()
+        emptyHelixItem.setNotHovered()
         self._virtualHelix = None
         self._emptyHelixItem = None
         self.scene().removeItem(self._label)
         self._label = None
         self.scene().removeItem(self)
+        emptyHelixItem.partItem().removeVirtualHelixItemAt(
+                                                    *emptyHelixItem.coord())
     # end def
 
     def strandAddedSlot(self, sender, strand):
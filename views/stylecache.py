@@ -0,0 +1,82 @@
+# The MIT License
+#
+# Copyright (c) 2011 Wyss Institute at Harvard University
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+# http://www.opensource.org/licenses/mit-license.php
+
+"""
+stylecache.py
+Shared pens, brushes and painter paths for the views. Qt implicitly shares
+these, so items that look alike can hold one instance instead of allocating
+a new one per update. Treat the returned objects as read-only. Model code
+imports views.styles, so these live here to keep it free of QPen and QBrush.
+"""
+
+from views import styles
+import util
+# import Qt stuff into the module namespace with PySide, PyQt4 independence
+util.qtWrapImport('QtCore', globals(), ['Qt'])
+util.qtWrapImport('QtGui', globals(), ['QBrush', 'QColor', 'QPen'])
+
+_penCache = {}
+_brushCache = {}
+_pathCache = {}
+
+def _colorKey(color, alpha):
+    """color is a color name or a QColor; alpha None keeps its own alpha."""
+    if isinstance(color, QColor):
+        return (color.rgb(), color.alpha() if alpha is None else alpha)
+    return (color, 255 if alpha is None else alpha)
+
+def cachedPen(color, width, alpha=None, cap=Qt.FlatCap):
+    """Returns a shared QPen for (color, alpha, width, cap)."""
+    key = _colorKey(color, alpha) + (width, cap)
+    pen = _penCache.get(key)
+    if pen is None:
+        c = QColor(color)
+        c.setAlpha(key[1])
+        pen = QPen(c, width)
+        pen.setCapStyle(cap)
+        _penCache[key] = pen
+    return pen
+
+def cachedBrush(color, alpha=None):
+    """Returns a shared solid QBrush for (color, alpha)."""
+    key = _colorKey(color, alpha)
+    brush = _brushCache.get(key)
+    if brush is None:
+        c = QColor(color)
+        c.setAlpha(key[1])
+        brush = QBrush(c)
+        _brushCache[key] = brush
+    return brush
+
+def cachedPath(key, build):
+    """
+    Returns the QPainterPath stored under key, calling build() to make it
+    the first time. key should hold every geometry parameter of the path.
+    """
+    path = _pathCache.get(key)
+    if path is None:
+        if len(_pathCache) >= styles.PAINTER_PATH_CACHE_ENTRIES:
+            _pathCache.clear()
+        path = _pathCache[key] = build()
+    return path
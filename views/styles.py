@@ -70,6 +70,18 @@ PCH_BORDER_PADDING = 1
 PATH_BASE_HL_STROKE_WIDTH = 2  # PathTool highlight box
 MINOR_GRID_STROKE_WIDTH = 0.5
 MAJOR_GRID_STROKE_WIDTH = 0.5
+PATH_GRID_TILE_BASES = 84  # bases per shared tile of minor grid ticks
+PATH_VIEWPORT_MARGIN = 0.5  # fraction of the viewport kept built on each side
+PATH_STRAND_ITEM_POOL_SIZE = 1024  # released StrandItems kept for reuse
+PATH_PREXOVER_ITEM_POOL_SIZE = 512  # released PreXoverItems kept
+# Level of detail: views hide details when zoomed out below the first scale
+# and show them again above the second. The path view then stops using
+# per-strand items and paints strand runs per helix straight from the model
+LOD_HIDE_DETAILS_SCALE = 0.15
+LOD_SHOW_DETAILS_SCALE = 0.2
+PATH_LOD_RUNS_ONLY_SCALE = 0.08  # strand runs only, no grid ticks or xovers
+PATH_LOD_STRAND_WIDTH = 0.5 * PATH_BASE_WIDTH
+PATH_SEQUENCE_LOD_SCALE = 0.5  # sequence labels are skipped below this
 oligoLenBelowWhichHighlight = 20
 oligoLenAboveWhichHighlight = 49
 
@@ -135,6 +147,29 @@ PREF_AUTOSCAF_INDEX = 0
 PREF_STARTUP_TOOL_INDEX = 0
 PREF_ZOOM_SPEED = 20#50
 PREF_ZOOM_AFTER_HELIX_ADD = True
+PREF_LAZY_OPEN_MIN_HELICES = 200  # 0 always builds the full model on open
+PREF_STAPLE_SORT_ORDER = 0  # a model.enum.StapleSort value
+PLATE_LENGTH_BINS = ()  # (low, high) staple lengths that get separate plates
+STAPLE_MIN_LENGTH = 18  # validation length window for staples
+STAPLE_MAX_LENGTH = 60
+STAPLE_MIN_LEG_LENGTH = 3  # shortest staple strand next to a crossover
+VALIDATION_TOOLTIP_LINES = 20  # violations listed in the status bar tip
+STATS_LENGTH_BIN_WIDTH = 5  # staple length histogram bin, in bases
+TM_OLIGO_CONC = 100e-9  # molar, of each strand, for melting temperatures
+TM_SALT_CONC = 0.05  # molar Na+
+TM_CACHE_ENTRIES = 200000  # memoized melting temperatures
+KMER_INDEX_K = 8  # shortest repeat or complement the staple screen finds
+AUTOSAVE_INTERVAL_MS = 30000
+AUTOSAVE_RECORDS_PER_SNAPSHOT = 100  # journal records between full snapshots
+FILE_PROGRESS_DELAY_MS = 500  # open/save progress dialog shows after this
+FILE_APPLY_SLICE_MS = 30  # time spent building an opened file per event
+HOVER_INTERVAL_MS = 16  # hover moves reach the items at most this often
+RESULT_CACHE_ENTRIES = 32  # exports and analyses kept in memory
+RESULT_CACHE_DIR = None  # also pickle cached results here when set
+STAPLE_CSV_CACHE_BYTES = 1 << 20  # larger staple exports are only streamed
+PAINTER_PATH_CACHE_ENTRIES = 4096  # shared geometry, e.g. xover curves
+SEQUENCE_LAYOUT_CACHE_ENTRIES = 4096  # laid out strand sequence labels
+OCCUPANCY_COLUMN_CACHE_ENTRIES = 2048  # helices occupied at a base index
 
 
 #Z values
@@ -205,4 +240,3 @@ XOVER_LABEL_COLOR = QColor(0,0,0)
 
 # Overwrite for Maya
 # majorgridstroke = QColor(255, 255, 255)  # ffffff for maya
-